@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the time it takes to import the modules of the entry points of ``aiida-quantumespresso-ph``.
+
+Each module is imported in a fresh interpreter, after ``aiida.engine``, ``aiida.orm`` and ``aiida.plugins``, which any
+daemon worker or ``verdi`` command imports anyway. The reported time is the median over the repetitions of the extra
+time spent on importing the module itself. Run from the root of the repository with::
+
+    python benchmarks/import_time.py
+
+to compare with the stored baseline, or with ``--update`` to overwrite the baseline with the current timings.
+"""
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+
+BASELINE = pathlib.Path(__file__).parent / 'baselines' / 'import_time.json'
+"""The file with the baseline import time in seconds of each module."""
+
+PRELOADED = ('aiida.engine', 'aiida.orm', 'aiida.plugins')
+"""The modules that are imported before the timed import, as they are imported by any AiiDA process anyway."""
+
+SCRIPT = """
+import time
+import {preloaded}
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def get_entry_point_modules():
+    """Return the modules of all entry points of ``aiida-quantumespresso-ph``, sorted by name."""
+    from importlib.metadata import distribution
+
+    entry_points = distribution('aiida-quantumespresso-ph').entry_points
+
+    return sorted({
+        entry_point.value.split(':')[0] for entry_point in entry_points if entry_point.group.startswith('aiida.')
+    })
+
+
+def get_import_time(module, repetitions=5):
+    """Return the median time in seconds to import the module in a fresh interpreter after the ``PRELOADED`` ones."""
+    script = SCRIPT.format(preloaded=', '.join(PRELOADED), module=module)
+    timings = []
+
+    for _ in range(repetitions):
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, check=True, text=True)
+        timings.append(float(output.stdout.split()[-1]))
+
+    return statistics.median(timings)
+
+
+def main():
+    """Measure the import times and compare them with the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', maxsplit=1)[0])
+    parser.add_argument('--repetitions', type=int, default=5, help='The number of imports of each module.')
+    parser.add_argument('--tolerance', type=float, default=1.5, help='The allowed factor with respect to the baseline.')
+    parser.add_argument('--update', action='store_true', help='Overwrite the baseline with the current timings.')
+    args = parser.parse_args()
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    timings = {module: get_import_time(module, args.repetitions) for module in get_entry_point_modules()}
+    regressions = []
+
+    for module, seconds in timings.items():
+        reference = baseline.get(module, None)
+
+        if reference is None:
+            print(f'{module:<75} {seconds:6.3f} s')
+            continue
+
+        # The absolute margin avoids flagging noise on modules that import in a few milliseconds
+        regressed = seconds > args.tolerance * reference + 0.05
+        print(f'{module:<75} {seconds:6.3f} s (baseline {reference:6.3f} s){"  REGRESSION" if regressed else ""}')
+
+        if regressed:
+            regressions.append(module)
+
+    if args.update:
+        BASELINE.parent.mkdir(exist_ok=True)
+        BASELINE.write_text(json.dumps({module: round(seconds, 3) for module, seconds in timings.items()}, indent=4))
+        BASELINE.write_text(BASELINE.read_text() + '\n')
+        return 0
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""Stand-ins for ``ph.x``, ``q2r.x`` and ``matdyn.x`` that write output files in the format of Quantum ESPRESSO.
+
+The stand-ins do not compute anything expensive, so that a benchmark that runs them measures the overhead of the work
+chains instead of the codes. They are called as::
+
+    python mock_codes.py ph -in aiida.in
+    python mock_codes.py q2r < aiida.in
+    python mock_codes.py matdyn < aiida.in
+
+and are meant to be wrapped in an executable per code, which is what ``scale.py`` does.
+
+The mock ``ph.x`` reads the structure from the ``mock-structure.json`` file in the ``{prefix}.save`` folder of the
+parent calculation, which ``scale.py`` writes instead of the output of ``pw.x``. It treats every q-point of the mesh as
+irreducible and every mode as an irreducible representation, and writes the dynamical matrices of a model where each
+atom is bound to its periodic images along the lattice vectors by springs. This way the dynamical matrices of all
+q-points are consistent, so the force constants of the mock ``q2r.x`` and the frequencies of the mock ``matdyn.x`` are
+those of an actual crystal.
+"""
+import json
+import os
+import re
+import sys
+import time
+
+import numpy
+
+SPRING_CONSTANT = 0.1
+"""The force constant of the springs between the atoms and their periodic images, in Ry / bohr^2."""
+
+RY_TO_CMM1 = 109737.31570111268
+"""The conversion factor from the square root of the eigenvalues of the dynamical matrix to frequencies in cm^-1."""
+
+RY_TO_THZ = 3289.8441866350436
+"""The conversion factor from the square root of the eigenvalues of the dynamical matrix to frequencies in THz."""
+
+REGEX_NAMELIST = re.compile(r'&\w+(.*?)^\s*/\s*$(.*)', re.DOTALL | re.MULTILINE)
+REGEX_KEYWORD = re.compile(r'^\s*([\w%()]+)\s*=\s*(\S+?)\s*,?\s*$', re.MULTILINE)
+
+
+def parse_input(content):
+    """Return the keywords of the first namelist of an input file and the lines that follow the namelist.
+
+    :param content: the content of the input file.
+    :return: tuple of the dictionary with the keywords in lower case and the list of lines after the namelist.
+    """
+    namelist, cards = REGEX_NAMELIST.search(content).groups()
+    keywords = {}
+
+    for key, value in REGEX_KEYWORD.findall(namelist):
+        if value.lower() in ('.true.', '.false.'):
+            value = value.lower() == '.true.'
+        elif value[0] in '\'"':
+            value = value[1:-1]
+        else:
+            try:
+                value = int(value)
+            except ValueError:
+                value = float(value.replace('d', 'e').replace('D', 'e'))
+        keywords[key.lower()] = value
+
+    return keywords, [line for line in cards.splitlines() if line.strip()]
+
+
+def get_dynamical_matrix(qpoint, structure):
+    """Return the dynamical matrix of the spring model at the q-point, not divided by the masses.
+
+    :param qpoint: the q-point in cartesian coordinates in units of ``2 pi / alat``.
+    :param structure: the structure as written by ``scale.py``.
+    :return: complex array of shape ``(3 nat, 3 nat)``.
+    """
+    phases = 2 * numpy.pi * numpy.array(structure['cell']) @ numpy.asarray(qpoint)
+    diagonal = 2 * SPRING_CONSTANT * (1 - numpy.cos(phases))
+
+    return numpy.diag(numpy.tile(diagonal, len(structure['positions']))).astype(complex)
+
+
+def get_header_lines(structure):
+    """Return the lines of the header of a dynamical matrix file with the structure, written with ``ibrav = 0``."""
+    celldm = ''.join(f'{value:11.7f}' for value in [structure['alat'], 0, 0, 0, 0, 0])
+    lines = [f'{len(structure["species"]):3d}{len(structure["positions"]):5d}{0:3d}{celldm}', 'Basis vectors']
+    lines.extend('  ' + ''.join(f'{value:15.9f}' for value in vector) for vector in structure['cell'])
+    lines.extend(
+        f"{index:12d}  '{name:<4}'  {mass:18.9f}" for index, (name, mass) in enumerate(structure['species'], 1)
+    )
+    lines.extend(
+        f'{index:5d}{atom_type:5d}' + ''.join(f'{value:18.10f}'
+                                              for value in position)
+        for index, (atom_type, position) in enumerate(zip(structure['atom_types'], structure['positions']), 1)
+    )
+    return lines
+
+
+def get_frequencies(matrix, structure):
+    """Return the frequencies in cm^-1 and the eigenvectors of the dynamical matrix, sorted by frequency."""
+    masses = numpy.array([structure['species'][atom_type - 1][1] for atom_type in structure['atom_types']])
+    masses = numpy.repeat(masses, 3)
+    eigenvalues, eigenvectors = numpy.linalg.eigh(matrix / numpy.sqrt(numpy.outer(masses, masses)))
+
+    return numpy.sign(eigenvalues) * numpy.sqrt(numpy.abs(eigenvalues)) * RY_TO_CMM1, eigenvectors.T
+
+
+def write_dynamical_matrix(filepath, qpoint, structure):
+    """Write the ``dynamical-matrix-N`` file of an irreducible q-point, whose star only contains the q-point itself.
+
+    :return: the frequencies of the q-point in cm^-1.
+    """
+    number_atoms = len(structure['positions'])
+    matrix = get_dynamical_matrix(qpoint, structure)
+    frequencies, eigenvectors = get_frequencies(matrix, structure)
+    qpoint_line = '     q = ( ' + ''.join(f'{value:14.9f}' for value in qpoint) + ' ) '
+
+    lines = ['Dynamical matrix file', ''] + get_header_lines(structure)
+    lines.extend(['', '     Dynamical  Matrix in cartesian axes', '', qpoint_line, ''])
+
+    for atom_a in range(number_atoms):
+        for atom_b in range(number_atoms):
+            lines.append(f'{atom_a + 1:5d}{atom_b + 1:5d}')
+            for axis in range(3):
+                row = matrix[3 * atom_a + axis, 3 * atom_b:3 * atom_b + 3]
+                lines.append(''.join(f'{value.real:12.8f}{value.imag:12.8f}  ' for value in row))
+
+    lines.extend(['', '     Diagonalizing the dynamical matrix', '', qpoint_line, '', ' ' + '*' * 74])
+
+    for mode, frequency in enumerate(frequencies):
+        lines.append(
+            f'     freq ({mode + 1:5d}) ={frequency * RY_TO_THZ / RY_TO_CMM1:15.6f} [THz] ={frequency:15.6f} [cm-1]'
+        )
+        for atom in range(number_atoms):
+            vector = eigenvectors[mode, 3 * atom:3 * atom + 3]
+            lines.append(' (' + ''.join(f'{value.real:10.6f} {value.imag:10.6f}   ' for value in vector) + ')')
+
+    lines.append(' ' + '*' * 74)
+
+    with open(filepath, 'w', encoding='utf-8') as handle:
+        handle.write('\n'.join(lines) + '\n')
+
+    return frequencies
+
+
+def write_patterns(filepath, number_modes):
+    """Write the ``patterns.N.xml`` file of a q-point, where each mode is its own irreducible representation."""
+    lines = ['<?xml version="1.0"?>', '<Root>', '  <IRREPS_INFO>']
+    lines.append(f'    <NUMBER_IRR_REP type="integer" size="1">{number_modes:>12d}</NUMBER_IRR_REP>')
+
+    for index in range(1, number_modes + 1):
+        lines.append(f'    <REPRESENTION.{index}>')
+        lines.append('      <NUMBER_OF_PERTURBATIONS type="integer" size="1">           1</NUMBER_OF_PERTURBATIONS>')
+        lines.append(f'    </REPRESENTION.{index}>')
+
+    lines.extend(['  </IRREPS_INFO>', '</Root>'])
+
+    with open(filepath, 'w', encoding='utf-8') as handle:
+        handle.write('\n'.join(lines) + '\n')
+
+
+def get_mesh_qpoints(mesh):
+    """Return the q-points of an unshifted mesh in crystal coordinates, where the last index runs fastest."""
+    return numpy.indices(mesh).reshape(3, -1).T / numpy.array(mesh)
+
+
+def get_timing_line(code, start):
+    """Return the line with the timing of the code in the format that the parsers of ``aiida-quantumespresso`` read."""
+    cpu = time.process_time()
+    wall = time.time() - start
+    return f'     {code:<13}:{cpu:9.2f}s CPU{wall:9.2f}s WALL'
+
+
+def run_ph(arguments):
+    """Run the stand-in of ``ph.x`` on the input file that is passed with the ``-in`` option."""
+    start = time.time()
+
+    with open(arguments[arguments.index('-in') + 1], encoding='utf-8') as handle:
+        keywords, cards = parse_input(handle.read())
+
+    outdir = keywords.get('outdir', './')
+    prefix = keywords.get('prefix', 'pwscf')
+    fildyn = keywords.get('fildyn', 'matdyn')
+
+    with open(os.path.join(outdir, f'{prefix}.save', 'mock-structure.json'), encoding='utf-8') as handle:
+        structure = json.load(handle)
+
+    # The q-points are written in cartesian coordinates in units of ``2 pi / alat``, as ``ph.x`` does
+    reciprocal = numpy.linalg.inv(numpy.array(structure['cell'])).T
+    number_modes = 3 * len(structure['positions'])
+    lines = [f'     Program PHONON v.7.2 starts on {time.strftime("%d%b%Y at %H:%M:%S")} ', '']
+    lines.append(f'     number of atoms/cell      = {len(structure["positions"]):12d}')
+
+    if keywords.get('ldisp', False):
+        mesh = [keywords['nq1'], keywords['nq2'], keywords['nq3']]
+        qpoints = get_mesh_qpoints(mesh) @ reciprocal
+        indices = range(keywords.get('start_q', 1), keywords.get('last_q', len(qpoints)) + 1)
+
+        with open(f'{fildyn}0', 'w', encoding='utf-8') as handle:
+            handle.write(''.join(f'{size:4d}' for size in mesh) + f'\n{len(qpoints):4d}\n')
+            handle.write(''.join(''.join(f'{value:24.15f}' for value in qpoint) + '\n' for qpoint in qpoints))
+
+        lines.extend([
+            '', f'     Dynamical matrices for ({mesh[0]:2d},{mesh[1]:2d},{mesh[2]:2d})  uniform grid of q-points'
+        ])
+        lines.append(f'     ({len(qpoints):4d} q-points):')
+        lines.append('       N         xq(1)         xq(2)         xq(3) ')
+        lines.extend(
+            f'{index:8d}' + ''.join(f'{value:14.9f}' for value in qpoint) for index, qpoint in enumerate(qpoints, 1)
+        )
+        filepaths = {index: f'{fildyn}{index}' for index in indices}
+    else:
+        qpoints = numpy.array([cards[0].split()[:3]], dtype=float)
+        filepaths = {1: fildyn}
+
+    if keywords.get('start_irr', 1) == keywords.get('last_irr', number_modes) == 0:
+        dirpath = os.path.join(outdir, '_ph0', f'{prefix}.phsave')
+        os.makedirs(dirpath, exist_ok=True)
+
+        for index in range(1, len(qpoints) + 1):
+            write_patterns(os.path.join(dirpath, f'patterns.{index}.xml'), number_modes)
+
+        lines.extend(['', get_timing_line('PHONON', start), '', '     Stopping after initialization'])
+        print('\n'.join(lines))
+        return
+
+    for index, filepath in filepaths.items():
+        qpoint = qpoints[index - 1]
+        frequencies = write_dynamical_matrix(filepath, qpoint, structure)
+        qpoint_text = ''.join(f'{value:14.7f}' for value in qpoint)
+
+        lines.extend(['', f'     Calculation of q = {qpoint_text}', ''])
+        lines.append(f'     There are {number_modes:3d} irreducible representations')
+        lines.extend(['', '     Diagonalizing the dynamical matrix', ''])
+        lines.append('     q = ( ' + ''.join(f'{value:14.9f}' for value in qpoint) + ' ) ')
+        lines.extend(['', '     Mode symmetry, C_1 (1)     point group:', ''])
+        lines.extend(
+            f'     freq ({mode:3d} -{mode:3d}) ={frequency:15.1f}  [cm-1]   --> A'
+            for mode, frequency in enumerate(frequencies, 1)
+        )
+
+    lines.extend(['', get_timing_line('PHONON', start), '', '   JOB DONE.'])
+    print('\n'.join(lines))
+
+
+def run_q2r():
+    """Run the stand-in of ``q2r.x`` on the input file that is passed through the standard input."""
+    from aiida_quantumespresso_ph.utils.dynamical_matrix import parse_dynamical_matrix, parse_dynamical_matrix_header
+    from aiida_quantumespresso_ph.utils.force_constants import (
+        get_force_constants,
+        get_mesh_indices,
+        write_force_constants,
+    )
+    from aiida_quantumespresso_ph.utils.qpoints import parse_dynamical_matrix_0
+
+    start = time.time()
+    keywords, _ = parse_input(sys.stdin.read())
+    fildyn = keywords['fildyn']
+
+    with open(f'{fildyn}0', encoding='utf-8') as handle:
+        mesh, qpoints = parse_dynamical_matrix_0(handle.read())
+
+    parsed = []
+
+    for index in range(1, len(qpoints) + 1):
+        with open(f'{fildyn}{index}', encoding='utf-8') as handle:
+            content = handle.read()
+        parsed.append(parse_dynamical_matrix(content))
+
+    header = parse_dynamical_matrix_header(content)
+    qpoints = numpy.concatenate([values['qpoints'] for values in parsed])
+    matrices = numpy.concatenate([values['dynamical_matrices'] for values in parsed])
+    force_constants = get_force_constants(matrices, get_mesh_indices(qpoints, header['cell'], mesh), mesh)
+
+    with open(keywords['flfrc'], 'w', encoding='utf-8') as handle:
+        handle.write(write_force_constants(force_constants, header))
+
+    lines = [f'     Program Q2R v.7.2 starts on {time.strftime("%d%b%Y at %H:%M:%S")} ', '']
+    lines.append(f'  reading grid info from file {fildyn}0')
+    lines.append(f'  q-space grid ok, #points = {len(qpoints):4d}')
+    lines.extend(['', '     fft-check success (sum of imaginary terms < 10^-12)', ''])
+    lines.extend([get_timing_line('Q2R', start), '', '   JOB DONE.'])
+    print('\n'.join(lines))
+
+
+def run_matdyn():
+    """Run the stand-in of ``matdyn.x`` on the input file that is passed through the standard input."""
+    from aiida_quantumespresso_ph.utils.interpolation import interpolate_frequencies, parse_force_constants
+
+    start = time.time()
+    keywords, cards = parse_input(sys.stdin.read())
+
+    with open(keywords['flfrc'], encoding='utf-8') as handle:
+        arrays = parse_force_constants(handle.read())
+
+    qpoints = numpy.array([line.split()[:3] for line in cards[1:int(cards[0]) + 1]], dtype=float)
+    frequencies = interpolate_frequencies(qpoints, arrays, is_path=False)
+    cartesian = qpoints @ numpy.linalg.inv(arrays['cell']).T
+
+    with open(keywords.get('flfrq', 'matdyn.freq'), 'w', encoding='utf-8') as handle:
+        handle.write(f' &plot nbnd={frequencies.shape[1]:4d}, nks={len(qpoints):4d} /\n')
+        for qpoint, values in zip(cartesian, frequencies):
+            handle.write('           ' + ''.join(f'{value:10.6f}' for value in qpoint) + '\n')
+            for row in range(0, len(values), 6):
+                handle.write(''.join(f'{value:10.4f}' for value in values[row:row + 6]) + '\n')
+
+    lines = [f'     Program MATDYN v.7.2 starts on {time.strftime("%d%b%Y at %H:%M:%S")} ', '']
+    lines.extend([get_timing_line('MATDYN', start), '', '   JOB DONE.'])
+    print('\n'.join(lines))
+
+
+def main():
+    """Run the stand-in of the code that is given as the first argument."""
+    code, arguments = sys.argv[1], sys.argv[2:]
+
+    if code == 'ph':
+        run_ph(arguments)
+    elif code == 'q2r':
+        run_q2r()
+    elif code == 'matdyn':
+        run_matdyn()
+    else:
+        raise ValueError(f'unknown code `{code}`, should be one of `ph`, `q2r` or `matdyn`.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the overhead of the phonon work chains as a function of the number of q-points.
+
+The ``PhParallelizeQpointsWorkChain``, including its ``recollect_qpoints`` and ``merge_para_ph_outputs`` calcfunctions,
+and the ``PhInterpolateWorkChain`` on its dynamical matrices are run on q-point meshes of increasing size against the
+stand-ins of ``ph.x``, ``q2r.x`` and ``matdyn.x`` of ``mock_codes.py``. These write output files in the format of
+Quantum ESPRESSO, with every q-point of the mesh irreducible, so the number of jobs equals the number of q-points.
+
+Each size is run in a fresh interpreter with a temporary profile without a broker, where the work chains are run in the
+same process, which therefore takes the role of the daemon worker. For each work chain, the benchmark reports:
+
+* the wall time of the work chain and of each step of it and of its child work chains, in total over all calls;
+* the wall time of each calcfunction, in total over all calls;
+* the CPU time of the process that runs the work chains, which excludes the stand-ins of the codes;
+* the number of nodes and links that are created and the number of bytes that are written to the repository.
+
+Run from the root of the repository with::
+
+    python benchmarks/scale.py
+
+to compare with the stored baseline, or with ``--update`` to overwrite the baseline with the current measurements.
+"""
+import argparse
+import collections
+import contextlib
+import json
+import os
+import pathlib
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BASELINE = pathlib.Path(__file__).parent / 'baselines' / 'scale.json'
+"""The file with the baseline measurements of each number of q-points."""
+
+MOCK_CODES = pathlib.Path(__file__).parent / 'mock_codes.py'
+"""The script with the stand-ins of the codes."""
+
+MESHES = {8: (2, 2, 2), 64: (4, 4, 4), 512: (8, 8, 8), 2000: (10, 10, 20)}
+"""The q-point mesh of each number of q-points that can be benchmarked."""
+
+DEFAULT_SIZES = (8, 64)
+"""The numbers of q-points that are benchmarked by default, since the larger ones take a long time."""
+
+ALAT = 10.2
+"""The lattice parameter of the simple cubic cell of the structure, in bohr."""
+
+SILICON_MASS = 25598.36731
+"""The mass of silicon in Rydberg atomic units, as written in the dynamical matrix files."""
+
+BOHR_TO_ANGSTROM = 0.529177210903
+"""The conversion factor from bohr to angstrom."""
+
+TIME_MARGIN = 0.1
+"""The absolute margin in seconds on top of the tolerance factor, which avoids flagging noise on short timings."""
+
+
+def get_structure(number_atoms):
+    """Return the structure as it is read by the mock ``ph.x``, with the atoms along the diagonal of a cubic cell."""
+    return {
+        'alat': ALAT,
+        'cell': [[1., 0., 0.], [0., 1., 0.], [0., 0., 1.]],
+        'species': [['Si', SILICON_MASS]],
+        'atom_types': [1] * number_atoms,
+        'positions': [[index / number_atoms] * 3 for index in range(number_atoms)],
+    }
+
+
+def setup_codes(dirpath, poll_interval):
+    """Create the ``localhost`` computer and the codes of the stand-ins, which are executables in ``dirpath``.
+
+    :return: dictionary with the ``InstalledCode`` of the ``ph``, ``q2r`` and ``matdyn`` stand-ins.
+    """
+    from aiida import orm
+
+    computer = orm.Computer(
+        label='localhost',
+        hostname='localhost',
+        transport_type='core.local',
+        scheduler_type='core.direct',
+        workdir=str(dirpath / 'scratch'),
+    ).store()
+    computer.configure(safe_interval=0., use_login_shell=False)
+    computer.set_minimum_job_poll_interval(poll_interval)
+    computer.set_default_mpiprocs_per_machine(1)
+
+    codes = {}
+    (dirpath / 'bin').mkdir()
+
+    for name in ('ph', 'q2r', 'matdyn'):
+        executable = dirpath / 'bin' / f'{name}.x'
+        executable.write_text(f'#!/bin/bash\nexec {sys.executable} {MOCK_CODES} {name} "$@"\n')
+        executable.chmod(0o755)
+        codes[name] = orm.InstalledCode(
+            label=f'{name}.x',
+            computer=computer,
+            filepath_executable=str(executable),
+            default_calc_job_plugin=f'quantumespresso.{name}',
+        ).store()
+
+    return codes
+
+
+def create_parent_folder(computer, dirpath, number_atoms):
+    """Create a finished ``PwCalculation`` whose remote folder contains the structure for the mock ``ph.x``.
+
+    :return: the ``RemoteData`` of the ``PwCalculation``.
+    """
+    from aiida import orm
+    from aiida.common import LinkType
+
+    structure = get_structure(number_atoms)
+    prefix = dirpath / 'out' / 'aiida.save'
+    prefix.mkdir(parents=True)
+    (dirpath / 'pseudo').mkdir()
+    (prefix / 'mock-structure.json').write_text(json.dumps(structure))
+
+    alat = ALAT * BOHR_TO_ANGSTROM
+    structure_data = orm.StructureData(cell=[[alat * value for value in vector] for vector in structure['cell']])
+
+    for position in structure['positions']:
+        structure_data.append_atom(position=[alat * value for value in position], symbols='Si')
+
+    node = orm.CalcJobNode(computer=computer, process_type='aiida.calculations:quantumespresso.pw')
+    node.set_option('resources', {'num_machines': 1})
+    node.base.links.add_incoming(structure_data.store(), LinkType.INPUT_CALC, 'structure')
+    node.base.links.add_incoming(orm.Dict({'SYSTEM': {'ecutwfc': 30.}}).store(), LinkType.INPUT_CALC, 'parameters')
+    node.store()
+
+    remote_folder = orm.RemoteData(computer=computer, remote_path=str(dirpath))
+    remote_folder.base.links.add_incoming(node, LinkType.CREATE, 'remote_folder')
+    output_parameters = orm.Dict({'number_of_symmetries': 1, 'number_of_k_points': 1})
+    output_parameters.base.links.add_incoming(node, LinkType.CREATE, 'output_parameters')
+    remote_folder.store()
+    output_parameters.store()
+    node.seal()
+
+    return remote_folder
+
+
+@contextlib.contextmanager
+def record_steps(steps):
+    """Record the number of calls and total wall time of the steps of all work chains that run in this context.
+
+    The steps are recorded in the ``steps`` dictionary under the key ``ProcessClass.step``, which is updated in place.
+    This patches the stepper of ``plumpy`` that calls each step of the outline of a ``WorkChain``.
+    """
+    from plumpy.workchains import _FunctionStepper
+
+    original = _FunctionStepper.step
+
+    def step(self):
+        start = time.perf_counter()
+
+        try:
+            return original(self)
+        finally:
+            record = steps.setdefault(f'{type(self._workchain).__name__}.{self}', {'calls': 0, 'seconds': 0.})
+            record['calls'] += 1
+            record['seconds'] += time.perf_counter() - start
+
+    _FunctionStepper.step = step
+
+    try:
+        yield steps
+    finally:
+        _FunctionStepper.step = original
+
+
+def get_storage_counts(profile):
+    """Return the number of nodes and links in the storage and the number of bytes in the repository."""
+    from aiida.manage import get_manager
+
+    entities = get_manager().get_profile_storage().get_info()['entities']
+    container = pathlib.Path(profile.storage_config['filepath']) / 'container'
+    repository_bytes = sum(path.stat().st_size for path in container.rglob('*') if path.is_file())
+
+    return {
+        'nodes': entities['Nodes']['count'],
+        'links': entities['Links']['count'],
+        'repository_bytes': repository_bytes,
+    }
+
+
+def get_calcfunction_timings(last_pk):
+    """Return the number of calls and total wall time of each calcfunction that was run after the node ``last_pk``."""
+    from aiida import orm
+
+    builder = orm.QueryBuilder().append(
+        orm.CalcFunctionNode, filters={'id': {
+            '>': last_pk
+        }}, project=['attributes.process_label', 'ctime', 'mtime']
+    )
+    timings = collections.defaultdict(lambda: {'calls': 0, 'seconds': 0.})
+
+    for label, ctime, mtime in builder.iterall():
+        timings[label]['calls'] += 1
+        timings[label]['seconds'] += (mtime - ctime).total_seconds()
+
+    return dict(sorted(timings.items()))
+
+
+def measure(profile, process_class, inputs):
+    """Run the process with the given inputs and return the node and the measurements of the run."""
+    from aiida import orm
+    from aiida.engine import run_get_node
+
+    last_pk = orm.QueryBuilder().append(orm.Node, project='id').order_by({orm.Node: {'id': 'desc'}}).first(flat=True)
+    counts = get_storage_counts(profile)
+    steps = {}
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.perf_counter()
+
+    with record_steps(steps):
+        _, node = run_get_node(process_class, **inputs)
+
+    wall_seconds = time.perf_counter() - start
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+
+    if not node.is_finished_ok:
+        raise RuntimeError(f'{node} failed with exit status {node.exit_status}.')
+
+    measurements = {
+        'wall_seconds': wall_seconds,
+        'cpu_seconds': usage_end.ru_utime + usage_end.ru_stime - usage.ru_utime - usage.ru_stime,
+    }
+    measurements.update({key: value - counts[key] for key, value in get_storage_counts(profile).items()})
+    measurements['steps'] = dict(sorted(steps.items()))
+    measurements['calcfunctions'] = get_calcfunction_timings(last_pk or 0)
+
+    return node, measurements
+
+
+def run_size(number_qpoints, number_atoms, max_concurrent, poll_interval):
+    """Run the work chains for the given number of q-points in a temporary profile and return the measurements.
+
+    This should be called in a fresh interpreter, since it creates and loads its own profile.
+    """
+    with tempfile.TemporaryDirectory() as dirname:
+        dirpath = pathlib.Path(dirname)
+        os.environ['AIIDA_PATH'] = str(dirpath / 'config')
+
+        from aiida import orm
+        from aiida.manage.configuration import create_profile, get_config, load_profile
+        from aiida.plugins import WorkflowFactory
+
+        config = get_config(create=True)
+        profile = create_profile(
+            config,
+            storage_backend='core.sqlite_dos',
+            storage_config={'filepath': str(dirpath / 'storage')},
+            name='benchmark',
+            email='benchmark@localhost',
+        )
+        config.set_option('warnings.development_version', False, scope=profile.name)
+        config.set_option('logging.aiida_loglevel', 'WARNING', scope=profile.name)
+        # Without a broker, the work chains poll whether their children finished, by default only once a minute
+        config.set_option('runner.poll.interval', 1, scope=profile.name)
+        config.store()
+        load_profile(profile.name, allow_switch=True)
+
+        codes = setup_codes(dirpath, poll_interval)
+        options = {'resources': {'num_machines': 1}, 'max_wallclock_seconds': 1800, 'withmpi': False}
+        qpoints = orm.KpointsData()
+        qpoints.set_kpoints_mesh(MESHES[number_qpoints])
+
+        parent_folder = create_parent_folder(codes['ph'].computer, dirpath / 'parent', number_atoms)
+        inputs = {
+            'ph': {
+                'code': codes['ph'],
+                'parent_folder': parent_folder,
+                'parameters': orm.Dict({'INPUTPH': {
+                    'tr2_ph': 1e-16
+                }}),
+                'metadata': {
+                    'options': options
+                },
+            },
+            'qpoints': qpoints,
+            'max_concurrent': orm.Int(max_concurrent),
+        }
+        node, results_ph = measure(profile, WorkflowFactory('quantumespresso_ph.ph.parallelize_qpoints'), inputs)
+
+        inputs = {
+            'dynmat_folder': node.outputs.retrieved,
+            'q2r': {
+                'q2r': {
+                    'code': codes['q2r'],
+                    'metadata': {
+                        'options': options
+                    }
+                }
+            },
+            'matdyn': {
+                'matdyn': {
+                    'code': codes['matdyn'],
+                    'kpoints': qpoints,
+                    'metadata': {
+                        'options': options
+                    }
+                }
+            },
+        }
+        _, results_interpolate = measure(profile, WorkflowFactory('quantumespresso.ph_interpolate'), inputs)
+
+    return {'PhParallelizeQpointsWorkChain': results_ph, 'PhInterpolateWorkChain': results_interpolate}
+
+
+def flatten(measurements, prefix=''):
+    """Return the measurements as a flat dictionary with the keys of the nested dictionaries joined by a slash."""
+    flat = {}
+
+    for key, value in measurements.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}/'))
+        else:
+            flat[f'{prefix}{key}'] = value
+
+    return flat
+
+
+def is_regression(name, value, reference, tolerance):
+    """Return whether the measured value is a regression with respect to the baseline.
+
+    Timings regress if they exceed the baseline by more than the tolerance factor plus ``TIME_MARGIN``. The numbers of
+    nodes, links and bytes are deterministic, so any increase is a regression. The number of calls of a step is not
+    compared, since it depends on the order in which the jobs finish.
+    """
+    if name.endswith('seconds'):
+        return value > tolerance * reference + TIME_MARGIN
+
+    if name.endswith(('nodes', 'links', 'bytes')):
+        return value > reference
+
+    return False
+
+
+def format_value(value):
+    """Return the measured value formatted for the report, with the timings in milliseconds precision."""
+    return f'{value:12.3f}' if isinstance(value, float) else f'{value:12d}'
+
+
+def report(number_qpoints, results, baseline, tolerance):
+    """Print the measurements of the given number of q-points and return the names of the regressed measurements."""
+    regressions = []
+    reference = flatten(baseline.get(str(number_qpoints), {}))
+
+    print(f'\n{number_qpoints} q-points')
+
+    for name, value in flatten(results).items():
+        if name not in reference:
+            print(f'  {name:<100} {format_value(value)}')
+            continue
+
+        regressed = is_regression(name, value, reference[name], tolerance)
+        suffix = '  REGRESSION' if regressed else ''
+        print(f'  {name:<100} {format_value(value)} (baseline {format_value(reference[name])}){suffix}')
+
+        if regressed:
+            regressions.append(f'{number_qpoints}/{name}')
+
+    return regressions
+
+
+def round_measurements(measurements):
+    """Return the measurements with the timings rounded to milliseconds, for storing them as the baseline."""
+    if isinstance(measurements, dict):
+        return {key: round_measurements(value) for key, value in measurements.items()}
+
+    if isinstance(measurements, float):
+        return round(measurements, 3)
+
+    return measurements
+
+
+def main():
+    """Run the benchmark for each number of q-points and compare the measurements with the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', maxsplit=1)[0])
+    parser.add_argument(
+        '--sizes',
+        type=int,
+        nargs='+',
+        choices=sorted(MESHES),
+        default=DEFAULT_SIZES,
+        help='The numbers of q-points to benchmark.'
+    )
+    parser.add_argument('--atoms', type=int, default=2, help='The number of atoms in the cell.')
+    parser.add_argument(
+        '--max-concurrent', type=int, default=16, help='The maximum number of `ph.x` jobs that run at the same time.'
+    )
+    parser.add_argument(
+        '--poll-interval', type=float, default=0.1, help='The minimum interval in seconds between scheduler updates.'
+    )
+    parser.add_argument('--tolerance', type=float, default=1.5, help='The allowed factor with respect to the baseline.')
+    parser.add_argument('--update', action='store_true', help='Overwrite the baseline with the current measurements.')
+    parser.add_argument('--run-size', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size is not None:
+        results = run_size(args.run_size, args.atoms, args.max_concurrent, args.poll_interval)
+        print(json.dumps(results))
+        return 0
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    regressions = []
+
+    for number_qpoints in args.sizes:
+        command = [
+            sys.executable, __file__, '--run-size',
+            str(number_qpoints), '--atoms',
+            str(args.atoms), '--max-concurrent',
+            str(args.max_concurrent), '--poll-interval',
+            str(args.poll_interval)
+        ]
+        output = subprocess.run(command, capture_output=True, check=True, text=True)
+        results = json.loads(output.stdout.splitlines()[-1])
+        regressions.extend(report(number_qpoints, results, baseline, args.tolerance))
+        baseline[str(number_qpoints)] = round_measurements(results)
+
+    if args.update:
+        BASELINE.parent.mkdir(exist_ok=True)
+        BASELINE.write_text(json.dumps(dict(sorted(baseline.items(), key=lambda item: int(item[0]))), indent=4) + '\n')
+        return 0
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
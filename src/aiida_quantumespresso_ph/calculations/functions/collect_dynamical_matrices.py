@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to collect the dynamical matrices of a ``FolderData`` into a single ``DynamicalMatrixData``."""
+import os
+
+from aiida.engine import ExitCode, calcfunction
+from aiida.orm import FolderData
+from aiida.plugins import CalculationFactory
+
+from aiida_quantumespresso_ph.data.dynamical_matrix import DynamicalMatrixData
+from aiida_quantumespresso_ph.utils.dynamical_matrix import parse_dynamical_matrix
+
+
+@calcfunction
+def collect_dynamical_matrices(retrieved: FolderData) -> DynamicalMatrixData:
+    """Parse the dynamical matrix files of all irreducible q-points into a single ``DynamicalMatrixData``.
+
+    :param retrieved: a ``FolderData`` with the ``dynamical-matrix-N`` files, e.g. the output of ``recollect_qpoints``.
+    :return: a ``DynamicalMatrixData`` with the dynamical matrices of all q-points, or an ``ExitCode`` if one of the
+        files cannot be parsed.
+    """
+    PhCalculation = CalculationFactory('quantumespresso.ph')
+    dynmat_prefix = PhCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX  # pylint: disable=protected-access
+    dirname, basename = os.path.split(dynmat_prefix)
+
+    # The `dynamical-matrix-0` file only contains the list of irreducible q-points
+    indices = sorted(
+        int(filename[len(basename):])
+        for filename in retrieved.base.repository.list_object_names(dirname)
+        if filename[len(basename):].isdigit() and filename != f'{basename}0'
+    )
+
+    dynamical_matrices = DynamicalMatrixData()
+
+    try:
+        dynamical_matrices.set_dynamical_matrices([
+            parse_dynamical_matrix(retrieved.base.repository.get_object_content(f'{dynmat_prefix}{index}'))
+            for index in indices
+        ])
+    except ValueError as exception:
+        return ExitCode(300, f'failed to parse the dynamical matrices: {exception}')
+
+    return dynamical_matrices
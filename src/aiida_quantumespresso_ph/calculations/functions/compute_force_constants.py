@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to compute the real-space force constants from the dynamical matrices of a ``FolderData``."""
+import io
+import os
+from typing import Optional
+
+from aiida.engine import calcfunction
+from aiida.orm import FolderData, Str
+from aiida.plugins import CalculationFactory, DataFactory
+import numpy
+
+from aiida_quantumespresso_ph.utils.dynamical_matrix import parse_dynamical_matrix, parse_dynamical_matrix_header
+from aiida_quantumespresso_ph.utils.force_constants import (
+    get_force_constants,
+    get_mesh_indices,
+    get_rigid_ion_term,
+    write_force_constants,
+)
+from aiida_quantumespresso_ph.utils.qpoints import parse_dynamical_matrix_0
+
+ForceConstantsData = DataFactory('quantumespresso.force_constants')
+
+
+@calcfunction
+def compute_force_constants(retrieved: FolderData, asr: Optional[Str] = None) -> ForceConstantsData:
+    """Compute the real-space force constants from the dynamical matrices of all q-points of a mesh.
+
+    This is the equivalent of ``q2r.x``: the dynamical matrices of all q-points in the stars of the irreducible q-points
+    are Fourier transformed to real space with NumPy. If the effective charges were computed, the long-range
+    dipole-dipole term is subtracted from the dynamical matrices first, such that the force constants are short-ranged,
+    and the dielectric tensor and effective charges are written to the file for ``matdyn.x``.
+
+    :param retrieved: a ``FolderData`` with the ``dynamical-matrix-N`` files of all irreducible q-points of a mesh, e.g.
+        the ``retrieved`` output of a ``PhCalculation`` or of ``recollect_qpoints``.
+    :param asr: the acoustic sum rule, ``no`` or ``simple``, which is imposed on the effective charges and the force
+        constants. Defaults to ``no``, as for ``q2r.x``.
+    :return: a ``ForceConstantsData`` with the same file name and format as the output of ``q2r.x``.
+    """
+    PhCalculation = CalculationFactory('quantumespresso.ph')
+    Q2rCalculation = CalculationFactory('quantumespresso.q2r')
+
+    asr = 'no' if asr is None else asr.value
+
+    if asr not in ('no', 'simple'):
+        raise ValueError(f'the acoustic sum rule `{asr}` is not supported, should be `no` or `simple`.')
+
+    dynmat_prefix = PhCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX  # pylint: disable=protected-access
+    dirname, basename = os.path.split(dynmat_prefix)
+
+    indices = sorted(
+        int(filename[len(basename):])
+        for filename in retrieved.base.repository.list_object_names(dirname)
+        if filename[len(basename):].isdigit() and filename != f'{basename}0'
+    )
+
+    if not indices:
+        raise ValueError('the `retrieved` folder does not contain any dynamical matrix file.')
+
+    mesh, _ = parse_dynamical_matrix_0(retrieved.base.repository.get_object_content(f'{dynmat_prefix}0'))
+    header = parse_dynamical_matrix_header(retrieved.base.repository.get_object_content(f'{dynmat_prefix}{indices[0]}'))
+
+    if header['ibrav'] != 0:
+        raise ValueError(
+            f'only dynamical matrices with `ibrav = 0` are supported, but got `ibrav = {header["ibrav"]}`.'
+        )
+
+    qpoints = []
+    dynamical_matrices = []
+    dielectric = {}
+
+    for index in indices:
+        parsed = parse_dynamical_matrix(retrieved.base.repository.get_object_content(f'{dynmat_prefix}{index}'))
+        qpoints.append(parsed['qpoints'])
+        dynamical_matrices.append(parsed['dynamical_matrices'])
+
+        if 'effective_charges_eu' in parsed and 'dielectric_tensor' in parsed:
+            dielectric = {key: parsed[key] for key in ('dielectric_tensor', 'effective_charges_eu')}
+
+    qpoints = numpy.concatenate(qpoints)
+    dynamical_matrices = numpy.concatenate(dynamical_matrices)
+    effective_charges = dielectric.get('effective_charges_eu')
+
+    if effective_charges is not None:
+        if asr != 'no':
+            # The simple acoustic sum rule of the effective charges, for which the charges of all atoms sum to zero
+            effective_charges = effective_charges - effective_charges.mean(axis=0)
+
+        dynamical_matrices -= get_rigid_ion_term(
+            qpoints,
+            header['cell'],
+            header['positions'],
+            header['celldm'][0],
+            dielectric['dielectric_tensor'],
+            effective_charges,
+            mesh,
+        )
+
+    force_constants = get_force_constants(
+        dynamical_matrices, get_mesh_indices(qpoints, header['cell'], mesh), mesh, asr=asr
+    )
+    content = write_force_constants(force_constants, header, dielectric.get('dielectric_tensor'), effective_charges)
+    filename = Q2rCalculation._FORCE_CONSTANTS_NAME  # pylint: disable=protected-access
+
+    return ForceConstantsData(io.BytesIO(content.encode('utf-8')), filename=filename)
@@ -1,26 +1,18 @@
 # -*- coding: utf-8 -*-
 """Calcfunction to split the q-point grid of a completed ``PhCalculation`` into individual q-points."""
-from typing import Dict
+from typing import Dict, Optional
 
 from aiida.engine import calcfunction
-from aiida.orm import FolderData, KpointsData
+from aiida.orm import Bool, FolderData, KpointsData, StructureData
 from aiida.plugins import CalculationFactory
 from numpy import linalg, pi
 
+from aiida_quantumespresso_ph.utils.qpoints import get_star_multiplicities, parse_dynamical_matrix_0
 
-@calcfunction
-def distribute_qpoints(retrieved: FolderData) -> Dict[str, KpointsData]:
-    """Split the q-point grid of a completed ``PhCalculation`` into individual q-points.
 
-    :param retrieved: A ``FolderData`` that is the ``retrieved`` output of a ``PhCalculation``.
-    :return: A dictionary of ``KpointsData`` with link labels of form ``qpoint_N`` where ``N`` is the q-point index.
-    """
-    # pylint: disable=too-many-locals
+def _get_structure_from_retrieved(retrieved: FolderData) -> StructureData:
+    """Return the structure of the ``PwCalculation`` preceding the ``PhCalculation`` that created the given folder."""
     PhCalculation = CalculationFactory('quantumespresso.ph')
-
-    if not isinstance(retrieved, FolderData):
-        raise TypeError(f'The retrieved argument should be a `FolderData` object, but got: {retrieved}')
-
     ph_calculation = retrieved.creator
 
     if ph_calculation.process_class != PhCalculation:
@@ -38,23 +30,59 @@ def distribute_qpoints(retrieved: FolderData) -> Dict[str, KpointsData]:
         # Otherwise, take the input structure
         structure = pw_calculation.inputs.structure
 
+    return structure
+
+
+@calcfunction
+def distribute_qpoints(
+    retrieved: FolderData,
+    structure: Optional[StructureData] = None,
+    compact: Optional[Bool] = None
+) -> Dict[str, KpointsData]:
+    """Split the q-point grid of a completed ``PhCalculation`` into individual q-points.
+
+    :param retrieved: A ``FolderData`` that is the ``retrieved`` output of a ``PhCalculation``, or any ``FolderData``
+        with a ``dynamical-matrix-0`` file if the ``structure`` is provided.
+    :param structure: The ``StructureData`` for which the q-points were generated. If not provided, it is taken from the
+        ``PwCalculation`` preceding the ``PhCalculation`` that created the ``retrieved`` folder.
+    :param compact: If ``True``, return all q-points in a single ``KpointsData`` instead, whose weights are the number
+        of q-points in the star of each q-point if these can be determined with ``spglib``.
+    :return: A dictionary of ``KpointsData`` with link labels of form ``qpoint_N`` where ``N`` is the q-point index, or
+        with the single link label ``qpoints`` if ``compact`` is ``True``.
+    """
+    PhCalculation = CalculationFactory('quantumespresso.ph')
+
+    if not isinstance(retrieved, FolderData):
+        raise TypeError(f'The retrieved argument should be a `FolderData` object, but got: {retrieved}')
+
+    if structure is None:
+        structure = _get_structure_from_retrieved(retrieved)
+
     dynmat_prefix = PhCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX  # pylint: disable=protected-access
     dynmat_file = f'{dynmat_prefix}0'
 
-    with retrieved.open(dynmat_file, 'r') as handle:
-        lines = handle.readlines()
-
     try:
-        _ = [float(i) for i in lines[0].split()]
-    except (IndexError, ValueError) as exception:
+        mesh, qpoint_coordinates = parse_dynamical_matrix_0(retrieved.base.repository.get_object_content(dynmat_file))
+    except ValueError as exception:
         raise ValueError(f'File `{dynmat_file}` does not contain the list of q-points') from exception
 
     cell = structure.cell
     alat = linalg.norm(cell[0])
-    fact = 2. * pi / alat
 
-    # Read q-points, converting them from 2pi/a coordinates to inverse angstrom
-    qpoint_coordinates = [[float(i) * fact for i in j.split()] for j in lines[2:]]
+    # Convert the q-points from 2pi/a coordinates to inverse angstrom
+    qpoint_coordinates = qpoint_coordinates * 2. * pi / alat
+
+    if compact is not None and compact.value:
+        qpoints = KpointsData()
+        qpoints.set_cell(cell)
+        qpoints.set_kpoints(qpoint_coordinates, cartesian=True)
+        multiplicities = get_star_multiplicities(structure, mesh, qpoints.get_kpoints())
+
+        if multiplicities is not None:
+            qpoints.set_kpoints(qpoints.get_kpoints(), weights=multiplicities.astype(float))
+
+        return {'qpoints': qpoints}
+
     qpoints = {}
 
     for index, qpoint_coordinate in enumerate(qpoint_coordinates):
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to interpolate the phonon frequencies from the real-space force constants with NumPy."""
+from typing import Optional
+
+from aiida.engine import calcfunction
+from aiida.orm import BandsData, Int, KpointsData, Str
+from aiida.plugins import DataFactory
+from qe_tools import CONSTANTS
+
+from aiida_quantumespresso_ph.utils.interpolation import interpolate_frequencies, parse_force_constants
+
+ForceConstantsData = DataFactory('quantumespresso.force_constants')
+
+
+@calcfunction
+def interpolate_phonon_bands(
+    force_constants: ForceConstantsData,
+    kpoints: KpointsData,
+    asr: Optional[Str] = None,
+    chunk_size: Optional[Int] = None,
+    max_workers: Optional[Int] = None,
+) -> BandsData:
+    """Interpolate the phonon frequencies at the given q-points from the real-space force constants.
+
+    This is the equivalent of ``matdyn.x`` for the phonon frequencies: the dynamical matrices are Fourier interpolated
+    with the same Wigner-Seitz weights, including the long-range dipole-dipole term and, at the Gamma points of a path,
+    the non-analytic term of polar materials. The q-points are processed in chunks, optionally in a pool of processes.
+
+    :param force_constants: the ``ForceConstantsData``, e.g. the output of ``q2r.x`` or ``compute_force_constants``.
+    :param kpoints: the q-points, either as an explicit list, e.g. a band path, or as a mesh. The non-analytic term is
+        only added for an explicit list, with the direction of approach of each Gamma point taken from its neighbours.
+    :param asr: the acoustic sum rule, ``no`` or ``simple``, which is imposed on the effective charges and the force
+        constants. Defaults to ``no``.
+    :param chunk_size: the number of q-points that are interpolated at once. Defaults to 1000.
+    :param max_workers: the number of processes over which the chunks are distributed. By default, the chunks are
+        interpolated in the current process. The processes are spawned, so they are safe to start from the daemon.
+    :return: a ``BandsData`` with the frequencies in THz, as the ``output_phonon_bands`` of a ``MatdynCalculation``.
+    """
+    arrays = parse_force_constants(force_constants.get_content(), 'no' if asr is None else asr.value)
+
+    try:
+        qpoints = kpoints.get_kpoints()
+        kpoints_for_bands = kpoints.clone()
+        is_path = True
+    except AttributeError:
+        qpoints = kpoints.get_kpoints_mesh(print_list=True)
+        kpoints_for_bands = KpointsData()
+        kpoints_for_bands.set_kpoints(qpoints)
+        is_path = False
+
+    frequencies = interpolate_frequencies(
+        qpoints,
+        arrays,
+        is_path=is_path,
+        chunk_size=1000 if chunk_size is None else chunk_size.value,
+        max_workers=None if max_workers is None else max_workers.value,
+    )
+
+    bands = BandsData()
+    bands.set_kpointsdata(kpoints_for_bands)
+    bands.set_bands(frequencies * CONSTANTS.invcm_to_THz, units='THz')
+
+    return bands
@@ -1,32 +1,155 @@
 # -*- coding: utf-8 -*-
-"""merge data from mulitple ph runs called by one PhBase."""
+"""merge data from multiple ph runs called by one PhBase."""
 from aiida import orm
 from aiida.engine import calcfunction
+import numpy
+
+DYNAMICAL_MATRIX_COLUMNS = ('q_point', 'frequencies', 'mode_symmetry', 'point_group')
+"""Keys of the ``dynamical_matrix_N`` dictionaries of the output parameters that are stored as arrays."""
+
+
+def get_column(values):
+    """Return the array of the values of a key of the ``dynamical_matrix_N`` dictionaries of all q-points.
+
+    Missing values, e.g. of the mode symmetries that ``ph.x`` could not determine, are filled with ``nan`` for numbers
+    and an empty string for strings, as are numbers that ``ph.x`` could not format and were parsed as ``None``.
+
+    :param values: the value of each q-point, or ``None`` if the key is missing for a q-point.
+    :return: the array with the values along the first axis.
+    """
+    reference = numpy.array(next(value for value in values if value is not None))
+    dtype = str if reference.dtype.kind in ('U', 'S') else float
+    missing = numpy.full(reference.shape, '' if dtype is str else numpy.nan)
+
+    return numpy.array([missing if value is None else numpy.array(value, dtype=dtype) for value in values], dtype=dtype)
+
+
+def concatenate_columns(blocks, name):
+    """Return the concatenation of a column of the given blocks of rows, or ``None`` if none of them contains it.
+
+    The rows of the blocks that do not contain the column are filled in the same way as the missing values of
+    ``get_column``.
+
+    :param blocks: dictionaries with the ``qpoint_indices`` and the columns of consecutive rows as arrays.
+    :param name: the name of the column.
+    :return: the array with the rows of all blocks along the first axis.
+    """
+    reference = next((block[name] for block in blocks if name in block), None)
+
+    if reference is None:
+        return None
+
+    fill_value = '' if reference.dtype.kind in ('U', 'S') else numpy.nan
+
+    return numpy.concatenate([
+        block[name] if name in block else numpy.full((len(block['qpoint_indices']), *reference.shape[1:]), fill_value)
+        for block in blocks
+    ])
 
 
 @calcfunction
 def merge_para_ph_outputs(**kwargs):
-    """Calcfunction to merge outputs from multiple parallelized `ph.x` calculations with different q-points."""
+    """Calcfunction to merge outputs from multiple parallelized `ph.x` calculations with different q-points.
 
-    # Get the outputs, sorted by label
-    outputs = [el[1].get_dict() for el in sorted(list(kwargs.items()), key=lambda l: l[0])]
+    The bulky results of each q-point, i.e. the ``dynamical_matrix_N`` dictionaries of the output parameters, are
+    stored column-wise in the ``output_arrays``, with one row per q-point in the order of the ``qpoint_indices``. The
+    ``output_parameters`` contain the scalars and the summaries of the q-points. Any other key of the
+    ``dynamical_matrix_N`` dictionaries is kept in the ``dynamical_matrix_N`` dictionary of the ``output_parameters``,
+    renumbered with the index of the q-point. The columns of previous calls are concatenated as arrays with those of the
+    new outputs, so only the dictionaries of the q-points of the new outputs are loaded in memory.
 
-    merged = {}
+    :param kwargs: keys are of the form ``output_N`` for the output parameters of the calculation of the single q-point
+        with index ``N``, or ``output_S_L`` for those of a calculation of the range of q-points from index ``S`` up to
+        and including ``L``. The dynamical matrices of each output are renumbered according to these indices. Keys
+        starting with ``merged`` and ``merged_arrays``, e.g. ``merged_N`` and ``merged_arrays_N``, can contain the
+        outputs of previous calls of this calcfunction for other q-points, which are combined with the other outputs.
+        This allows to merge the outputs in parts as they become available.
+    :return: dictionary with the merged ``output_parameters`` and the ``output_arrays``.
+    """
+
+    def get_indices(label):
+        return [int(index) for index in label.split('_')[1:]]
+
+    previous_arrays = [kwargs.pop(key) for key in sorted(kwargs) if key.startswith('merged_arrays')]
+    previous = [kwargs.pop(key).get_dict() for key in sorted(kwargs) if key.startswith('merged')]
 
+    # Get the outputs, sorted by the index of their first q-point
+    outputs = sorted(kwargs.items(), key=lambda item: get_indices(item[0]))
+
+    merged = {}
     total_walltime = 0
-    number_irreps = []
+    number_irreps = {}
+    number_qpoints = 0
+    dynamical_matrices = {}
+    blocks = [{name: arrays.get_array(name) for name in arrays.get_arraynames()} for arrays in previous_arrays]
+
+    for parameters in previous:
+        total_walltime += parameters.pop('wall_time_seconds', 0)
+        number_irreps.update(
+            zip(parameters.pop('qpoint_indices', []), parameters.pop('number_of_irr_representations_for_each_q', []))
+        )
+        number_qpoints += parameters.pop('number_of_qpoints', 0)
+        merged.update(parameters)
+
+    for label, node in outputs:
 
-    for index, output in enumerate(outputs):
+        output = node.get_dict()
+        indices = get_indices(label)
 
         total_walltime += output.pop('wall_time_seconds', 0)
-        number_irreps.extend(output.pop('number_of_irr_representations_for_each_q', []))
-        merged[f'dynamical_matrix_{index + 1}'] = output.pop('dynamical_matrix_1')
+        number_irreps.update(
+            zip(range(indices[0], indices[-1] + 1), output.pop('number_of_irr_representations_for_each_q', []))
+        )
+        number_qpoints += indices[-1] - indices[0] + 1
+
+        for key in [key for key in output if key.startswith('dynamical_matrix_')]:
+            dynamical_matrix = output.pop(key)
+
+            # The units are the same for all q-points, so they are kept in the output parameters
+            for units in [name for name in dynamical_matrix if name.endswith('_units')]:
+                merged[units] = dynamical_matrix.pop(units)
+
+            index = indices[0] + int(key.split('_')[-1]) - 1
+            dynamical_matrices[index] = {
+                name: value for name, value in dynamical_matrix.items() if name in DYNAMICAL_MATRIX_COLUMNS
+            }
+
+            # Keys that are not stored as arrays are kept in the output parameters, so no result is lost
+            remaining = {
+                name: value for name, value in dynamical_matrix.items() if name not in DYNAMICAL_MATRIX_COLUMNS
+            }
+
+            if remaining:
+                merged[f'dynamical_matrix_{index}'] = remaining
 
         for key, value in output.items():
             merged[key] = value
 
     merged['wall_time_seconds'] = total_walltime
-    merged['number_of_irr_representations_for_each_q'] = number_irreps
-    merged['number_of_qpoints'] = len(outputs)
+    merged['number_of_irr_representations_for_each_q'] = [number_irreps[index] for index in sorted(number_irreps)]
+    merged['qpoint_indices'] = sorted(number_irreps)
+    merged['number_of_qpoints'] = number_qpoints
+
+    # The rows of the new outputs are added as one more block to those of the previous calls
+    block = {'qpoint_indices': numpy.array(sorted(dynamical_matrices), dtype=int)}
+
+    for name in DYNAMICAL_MATRIX_COLUMNS:
+        values = [dynamical_matrices[index].get(name) for index in block['qpoint_indices']]
+
+        if any(value is not None for value in values):
+            block[name] = get_column(values)
+
+    blocks.append(block)
+    qpoint_indices = numpy.concatenate([block['qpoint_indices'] for block in blocks])
+    order = numpy.argsort(qpoint_indices, kind='stable')
+
+    arrays = orm.ArrayData()
+    arrays.set_array('qpoint_indices', qpoint_indices[order])
+
+    for name in DYNAMICAL_MATRIX_COLUMNS:
+        column = concatenate_columns(blocks, name)
+
+        if column is not None:
+            arrays.set_array(name, column[order])
 
-    return orm.Dict(dict=merged)
+    return {'output_parameters': orm.Dict(merged), 'output_arrays': arrays}
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to merge the phonon frequencies of the chunks of q-points of parallel ``matdyn.x`` calculations."""
+from typing import Optional
+
+from aiida.engine import calcfunction
+from aiida.orm import BandsData, Dict, KpointsData, XyData
+import numpy
+
+from aiida_quantumespresso_ph.utils.dos import get_phonon_dos
+
+DOS_KEYWORDS = ('dos', 'nk1', 'nk2', 'nk3', 'deltae', 'ndos', 'degauss', 'fldos')
+"""Keywords of the ``INPUT`` namelist of ``matdyn.x`` that concern the density of states, in lower case."""
+
+
+def get_dos_parameters(parameters: Optional[dict]) -> Optional[dict]:
+    """Return the density of states keywords of the ``INPUT`` namelist of the ``matdyn.x`` parameters.
+
+    :param parameters: the parameters of the ``MatdynCalculation``, or ``None``.
+    :return: dictionary with the ``delta_e``, ``ndos`` and ``degauss`` arguments of ``get_phonon_dos``, or ``None`` if
+        the density of states is not requested.
+    """
+    namelist = {key.lower(): value for key, value in (parameters or {}).get('INPUT', {}).items()}
+
+    if not namelist.get('dos', False):
+        return None
+
+    return {
+        'delta_e': float(namelist.get('deltae', 1.0)),
+        'ndos': namelist.get('ndos', None),
+        'degauss': float(namelist.get('degauss', 0.)),
+    }
+
+
+@calcfunction
+def merge_phonon_bands(kpoints: KpointsData, parameters: Optional[Dict] = None, **kwargs) -> dict:
+    """Merge the phonon frequencies of the chunks of q-points of parallel ``matdyn.x`` calculations.
+
+    The frequencies of the chunks are concatenated into a single ``BandsData`` on all q-points of the ``kpoints``. If
+    the density of states is requested in the ``parameters`` and the ``kpoints`` are a mesh, it is computed from the
+    merged frequencies as ``matdyn.x`` with ``dos = .true.`` would: every q-point of the mesh has the same weight and
+    the same ``deltaE``, ``ndos`` and ``degauss`` keywords are used.
+
+    :param kpoints: the q-points of all chunks, either as an explicit list or as a mesh.
+    :param parameters: the parameters of the ``MatdynCalculation``, of which only the density of states keywords of the
+        ``INPUT`` namelist are used.
+    :param kwargs: keys are of the form ``bands_N`` for the ``output_phonon_bands`` of the chunk with index ``N``, which
+        are merged in the order of these indices.
+    :return: dictionary with the merged ``output_phonon_bands`` and, if requested, the ``output_phonon_dos``.
+    """
+    from qe_tools import CONSTANTS
+
+    chunks = sorted(kwargs.items(), key=lambda item: int(item[0].split('_')[-1]))
+    frequencies = numpy.concatenate([bands.get_bands() for _, bands in chunks])
+
+    try:
+        qpoints = kpoints.get_kpoints()
+        kpoints_for_bands = kpoints.clone()
+        mesh = None
+    except AttributeError:
+        qpoints = kpoints.get_kpoints_mesh(print_list=True)
+        kpoints_for_bands = KpointsData()
+        kpoints_for_bands.set_kpoints(qpoints)
+        mesh = kpoints.get_kpoints_mesh()[0]
+
+    if len(frequencies) != len(qpoints):
+        raise ValueError(f'the chunks contain {len(frequencies)} q-points but the `kpoints` contain {len(qpoints)}.')
+
+    output_phonon_bands = BandsData()
+    output_phonon_bands.set_kpointsdata(kpoints_for_bands)
+    output_phonon_bands.set_bands(frequencies, units='THz')
+
+    results = {'output_phonon_bands': output_phonon_bands}
+    dos_parameters = get_dos_parameters(None if parameters is None else parameters.get_dict())
+
+    if dos_parameters is not None and mesh is not None:
+        energies, dos = get_phonon_dos(frequencies / CONSTANTS.invcm_to_THz, mesh, **dos_parameters)
+
+        output_phonon_dos = XyData()
+        output_phonon_dos.set_x(energies, 'frequency', 'cm^(-1)')
+        output_phonon_dos.set_y(dos, 'dos', 'states * cm')
+        results['output_phonon_dos'] = output_phonon_dos
+
+    return results
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 """Calcfunction to collect the dynamical matrices of individual ``PhCalculation``s into a single ``FolderData``."""
+import os
+
 from aiida.engine import calcfunction
 from aiida.orm import FolderData
 from aiida.plugins import CalculationFactory
@@ -12,9 +14,12 @@ def recollect_qpoints(**kwargs):
     A different number is put at the end of each final dynamical matrix file, obtained from the input link, which
     corresponds to its place in the list of q-points originally generated by distribute_qpoints.
 
-    :param kwargs: keys are the string representation of the q-point index and the value is the
-        corresponding retrieved folder object. A special case is the folder at key '0' which is
-        the folder of the initialization calculation.
+    :param kwargs: keys are of the form ``qpoint_N`` for the retrieved folder of the calculation of the single q-point
+        with index ``N``, or ``qpoints_S_L`` for the retrieved folder of a calculation of the range of q-points from
+        index ``S`` up to and including ``L``. A special case is the folder at key ``qpoint_0`` which is the folder of
+        the initialization calculation. Keys starting with ``recollected``, e.g. ``recollected_N``, can contain the
+        outputs of previous calls of this calcfunction for other q-points, whose files are copied as is, which allows
+        to collect the dynamical matrices in parts as they become available.
     :return: FolderData object containing the dynamic matrix files of the computed PhBaseWorkChains
     """
     PhCalculation = CalculationFactory('quantumespresso.ph')
@@ -22,17 +27,28 @@ def recollect_qpoints(**kwargs):
 
     # Initialize the merged folder, by creating the subdirectory for the dynamical matrix files
     merged_folder = FolderData()
+    filepaths = []
 
     for key, retrieved_folder in kwargs.items():
-        index = key.split('_')[-1]
-        filepath_src = dynmat_prefix
-        filepath_dst = f'{dynmat_prefix}{index}'
-
-        if int(index) == 0:
-            with retrieved_folder.base.repository.open(filepath_dst, 'rb') as handle:
-                merged_folder.base.repository.put_object_from_filelike(handle, filepath_dst)
+        if key.startswith('recollected'):
+            dirname = os.path.dirname(dynmat_prefix)
+            filepaths.extend((retrieved_folder, os.path.join(dirname, filename), os.path.join(dirname, filename))
+                             for filename in retrieved_folder.base.repository.list_object_names(dirname))
+            continue
+
+        indices = [int(index) for index in key.split('_')[1:]]
+
+        if len(indices) == 2:
+            # A range of q-points computed on the full grid, for which the files already have the right index
+            filepaths.extend((retrieved_folder, f'{dynmat_prefix}{index}', f'{dynmat_prefix}{index}')
+                             for index in range(indices[0], indices[1] + 1))
+        elif indices[0] == 0:
+            filepaths.append((retrieved_folder, f'{dynmat_prefix}0', f'{dynmat_prefix}0'))
         else:
-            with retrieved_folder.base.repository.open(filepath_src, 'rb') as handle:
-                merged_folder.base.repository.put_object_from_filelike(handle, filepath_dst)
+            filepaths.append((retrieved_folder, dynmat_prefix, f'{dynmat_prefix}{indices[0]}'))
+
+    for retrieved_folder, filepath_src, filepath_dst in filepaths:
+        with retrieved_folder.base.repository.open(filepath_src, 'rb') as handle:
+            merged_folder.base.repository.put_object_from_filelike(handle, filepath_dst)
 
     return merged_folder
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Calcfunction to reduce a q-point mesh to its irreducible q-points without running ``ph.x``."""
+import io
+
+from aiida.engine import calcfunction
+from aiida.orm import Bool, FolderData, KpointsData, StructureData
+from aiida.plugins import CalculationFactory
+import numpy
+
+from aiida_quantumespresso_ph.utils.qpoints import get_irreducible_qpoints
+
+
+@calcfunction
+def reduce_qpoints(structure: StructureData, qpoints: KpointsData, time_reversal: Bool) -> FolderData:
+    """Reduce a q-point mesh to its irreducible q-points, using the symmetries of the structure found by ``spglib``.
+
+    The q-points are written to a ``dynamical-matrix-0`` file in the same format as the one that is written by the
+    initialization run of ``ph.x``, i.e. the q-point mesh, the number of irreducible q-points and their cartesian
+    coordinates in units of ``2 pi / alat``. Here, ``alat`` is the length of the first cell vector, consistent with
+    ``distribute_qpoints``.
+
+    :param structure: the ``StructureData`` of the ``pw.x`` calculation.
+    :param qpoints: a ``KpointsData`` with an unshifted q-point mesh.
+    :param time_reversal: whether the q-points ``q`` and ``-q`` are equivalent.
+    :return: a ``FolderData`` with the ``dynamical-matrix-0`` file.
+    """
+    PhCalculation = CalculationFactory('quantumespresso.ph')
+    dynmat_prefix = PhCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX  # pylint: disable=protected-access
+
+    mesh, offset = qpoints.get_kpoints_mesh()
+
+    if any(offset):
+        raise ValueError(f'The q-point mesh should not be shifted, but got offset: {offset}')
+
+    cell = numpy.array(structure.cell)
+    alat = numpy.linalg.norm(cell[0])
+    qpoints_crystal, _ = get_irreducible_qpoints(structure, mesh, time_reversal=time_reversal.value)
+    qpoints_cartesian = qpoints_crystal @ numpy.linalg.inv(cell).T * alat
+
+    lines = [f'{mesh[0]:4d}{mesh[1]:4d}{mesh[2]:4d}', f'{len(qpoints_cartesian):4d}']
+    lines.extend(''.join(f'{coordinate:24.15E}' for coordinate in qpoint) for qpoint in qpoints_cartesian)
+
+    folder = FolderData()
+    folder.base.repository.put_object_from_filelike(io.StringIO('\n'.join(lines) + '\n'), f'{dynmat_prefix}0')
+
+    return folder
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""`CalcJob` to collect the irreducible representations that were computed in separate `ph.x` runs or images."""
+import os
+
+from aiida import orm
+from aiida.plugins import CalculationFactory
+
+PhCalculation = CalculationFactory('quantumespresso.ph')
+
+
+class PhCollectCalculation(PhCalculation):
+    """``PhCalculation`` that collects the irreducible representations computed in separate calculations or images.
+
+    Each of the ``partial_folders`` is the remote folder of a ``PhCalculation`` that computed a range of the irreducible
+    representations of a q-point through the ``start_irr`` and ``last_irr`` inputs, or the single remote folder of a
+    ``PhCalculation`` run with images through the ``-ni`` command line option. The ``parent_folder`` should be the one
+    of the ``pw.x`` calculation, as for the partial calculations. The ``_ph*`` folders of the first partial folder,
+    sorted by key, i.e. the ``_ph0`` folder or the folder of each image, are copied in the output folder, after which
+    the partial dynamical matrices of the others are copied in the ``{prefix}.phsave`` folder of ``_ph0``. Running
+    ``ph.x`` with ``recover = .true.`` and without restricting the irreducible representations or using images then
+    computes the dynamical matrices from all of them.
+    """
+
+    @classmethod
+    def define(cls, spec):
+        """Define the process specification."""
+        super().define(spec)
+        spec.input_namespace(
+            'partial_folders',
+            valid_type=orm.RemoteData,
+            dynamic=True,
+            help='The remote folders of the `PhCalculation`s whose partial dynamical matrices should be collected.'
+        )
+
+    def prepare_for_submission(self, folder):
+        """Prepare the calculation job for submission, adding the partial dynamical matrices to the remote copy list.
+
+        :param folder: a sandbox folder to temporarily write files on disk.
+        :return: :py:class:`~aiida.common.datastructures.CalcInfo` instance.
+        """
+        calcinfo = super().prepare_for_submission(folder)
+
+        dirpath_phsave = os.path.join(self._OUTPUT_SUBFOLDER, '_ph0', f'{self._PREFIX}.phsave')
+        remote_folders = [remote_folder for _, remote_folder in sorted(self.inputs.partial_folders.items())]
+
+        calcinfo.remote_copy_list.append((
+            remote_folders[0].computer.uuid,
+            os.path.join(remote_folders[0].get_remote_path(), self._OUTPUT_SUBFOLDER, '_ph*'),
+            self._OUTPUT_SUBFOLDER,
+        ))
+
+        for remote_folder in remote_folders[1:]:
+            calcinfo.remote_copy_list.append((
+                remote_folder.computer.uuid,
+                os.path.join(remote_folder.get_remote_path(), dirpath_phsave, 'dynmat.*.xml'),
+                dirpath_phsave,
+            ))
+
+        return calcinfo
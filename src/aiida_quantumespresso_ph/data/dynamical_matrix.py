@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Sub class of `ArrayData` to store the dynamical matrices of all q-points of a ``ph.x`` calculation as arrays."""
+from typing import Sequence
+
+from aiida.orm import ArrayData
+import numpy
+
+
+class DynamicalMatrixData(ArrayData):
+    """Class to store the dynamical matrices, frequencies and eigenvectors of all q-points of a ``ph.x`` calculation.
+
+    The dynamical matrices are stored for all q-points in the stars of the irreducible q-points, in the order of the
+    ``dynamical-matrix-N`` files. The frequencies and eigenvectors are only stored for the irreducible q-points, i.e.
+    the first q-point of each star. For polar materials, the dielectric tensor and the effective charges that ``ph.x``
+    computes at Gamma are stored as well, such that the non-analytic term can be added to the force constants.
+    """
+
+    def set_dynamical_matrices(self, dynamical_matrices: Sequence[dict]):
+        """Set the arrays from the parsed ``dynamical-matrix-N`` file of each irreducible q-point.
+
+        :param dynamical_matrices: the dictionaries returned by
+            :py:func:`~aiida_quantumespresso_ph.utils.dynamical_matrix.parse_dynamical_matrix` for each irreducible
+            q-point, in the order of the q-points.
+        :raises ValueError: if the list is empty or if the number of atoms differs between the q-points.
+        """
+        if not dynamical_matrices:
+            raise ValueError('at least one dynamical matrix should be specified.')
+
+        number_atoms = {parsed['number_of_atoms'] for parsed in dynamical_matrices}
+
+        if len(number_atoms) != 1:
+            raise ValueError(f'the dynamical matrices have a different number of atoms: {number_atoms}')
+
+        star_indices = [numpy.full(len(parsed['qpoints']), index) for index, parsed in enumerate(dynamical_matrices)]
+
+        self.set_array('qpoints', numpy.concatenate([parsed['qpoints'] for parsed in dynamical_matrices]))
+        self.set_array(
+            'dynamical_matrices', numpy.concatenate([parsed['dynamical_matrices'] for parsed in dynamical_matrices])
+        )
+        self.set_array('star_indices', numpy.concatenate(star_indices))
+        self.set_array('frequencies', numpy.array([parsed['frequencies'] for parsed in dynamical_matrices]))
+        self.set_array('eigenvectors', numpy.array([parsed['eigenvectors'] for parsed in dynamical_matrices]))
+        self.base.attributes.set('number_of_atoms', number_atoms.pop())
+
+        for name in ('dielectric_tensor', 'effective_charges_eu'):
+            values = [parsed[name] for parsed in dynamical_matrices if name in parsed]
+
+            if values:
+                self.set_array(name, numpy.array(values[0]))
+
+    @property
+    def number_of_atoms(self):
+        """Return the number of atoms.
+
+        :return: a scalar
+        """
+        return self.base.attributes.get('number_of_atoms')
+
+    @property
+    def qpoints(self):
+        """Return the q-points in cartesian coordinates in units of ``2 pi / alat``.
+
+        :return: array of shape ``(nq, 3)``
+        """
+        return self.get_array('qpoints')
+
+    @property
+    def dynamical_matrices(self):
+        """Return the dynamical matrices in cartesian axes, in units of Ry / bohr^2 and not divided by the masses.
+
+        :return: complex array of shape ``(nq, 3 nat, 3 nat)``
+        """
+        return self.get_array('dynamical_matrices')
+
+    @property
+    def star_indices(self):
+        """Return the index of the irreducible q-point in whose star each q-point is.
+
+        :return: array of shape ``(nq,)``
+        """
+        return self.get_array('star_indices')
+
+    @property
+    def frequencies(self):
+        """Return the frequencies of the irreducible q-points in cm^-1.
+
+        :return: array of shape ``(nq_irr, 3 nat)``
+        """
+        return self.get_array('frequencies')
+
+    @property
+    def eigenvectors(self):
+        """Return the eigenvectors of the irreducible q-points, where ``eigenvectors[q, m]`` is that of mode ``m``.
+
+        :return: complex array of shape ``(nq_irr, 3 nat, 3 nat)``
+        """
+        return self.get_array('eigenvectors')
+
+    @property
+    def dielectric_tensor(self):
+        """Return the dielectric tensor, if it was computed.
+
+        :return: array of shape ``(3, 3)``, or ``None``
+        """
+        return self.get_array('dielectric_tensor') if 'dielectric_tensor' in self.get_arraynames() else None
+
+    @property
+    def effective_charges_eu(self):
+        """Return the effective charges of each atom, if they were computed.
+
+        The first axis of the 3 x 3 matrix of each atom is the direction of the electric field.
+
+        :return: array of shape ``(nat, 3, 3)``, or ``None``
+        """
+        return self.get_array('effective_charges_eu') if 'effective_charges_eu' in self.get_arraynames() else None
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""Submit a ``DynamicalMatrixWorkChain`` for each structure of a group with a budget of running calculations."""
+from datetime import datetime
+import math
+import time
+from typing import Callable, Dict, List, Optional
+
+from aiida import orm
+from aiida.common import timezone
+from aiida.engine import ProcessBuilder, submit
+
+BATCH_STATUS_EXTRA_PREFIX = 'dynamical_matrix_batch_'
+"""Prefix of the extras of the group of structures with the status of each structure, followed by its UUID."""
+
+BATCH_STRUCTURE_EXTRA = 'dynamical_matrix_batch_structure'
+"""Name of the extra of a submitted ``DynamicalMatrixWorkChain`` with the UUID of its structure."""
+
+ACTIVE_PROCESS_STATES = ('created', 'waiting', 'running')
+"""The process states of processes that have not terminated yet."""
+
+
+def get_number_of_active_calcjobs() -> int:
+    """Return the number of calculation jobs of the profile that have not terminated yet."""
+    filters = {'attributes.process_state': {'in': ACTIVE_PROCESS_STATES}}
+
+    return orm.QueryBuilder().append(orm.CalcJobNode, filters=filters).count()
+
+
+def estimate_cost(structure: orm.StructureData, builder: ProcessBuilder) -> float:
+    """Return an estimate of the relative cost of the ``DynamicalMatrixWorkChain`` of a structure.
+
+    The cost of a ``ph.x`` calculation scales with the number of q-points, with the cube of the number of atoms, since
+    the number of irreducible representations and the cost of each of them both grow with the system size, and with the
+    number of plane waves, i.e. the wave function cutoff to the power of ``3/2``. The estimate is only meant to order
+    the structures, so the prefactor is arbitrary.
+
+    :param structure: the structure.
+    :param builder: the builder of the ``DynamicalMatrixWorkChain`` of the structure.
+    :return: the estimated cost.
+    """
+    ph_main = builder.ph_main
+
+    if 'qpoints' in ph_main and ph_main.qpoints is not None:
+        qpoints = ph_main.qpoints
+    else:
+        qpoints = orm.KpointsData()
+        qpoints.set_cell_from_structure(structure)
+        qpoints.set_kpoints_mesh_from_density(ph_main.qpoints_distance.value)
+
+    try:
+        number_of_qpoints = math.prod(qpoints.get_kpoints_mesh()[0])
+    except AttributeError:
+        number_of_qpoints = len(qpoints.get_kpoints())
+
+    try:
+        ecutwfc = builder.relax.base.pw.parameters['SYSTEM']['ecutwfc']
+    except (AttributeError, KeyError, TypeError):
+        ecutwfc = 1.
+
+    return number_of_qpoints * len(structure.sites)**3 * ecutwfc**1.5
+
+
+class DynamicalMatrixBatchSubmitter:
+    """Submit a ``DynamicalMatrixWorkChain`` for each structure of a group, while keeping a global concurrency budget.
+
+    Each call of :meth:`step` updates the status of the submitted work chains and submits new ones, in order of their
+    estimated cost, as long as the number of calculation jobs of the profile that have not terminated is below the
+    ``max_concurrent_calcjobs``. Work chains that have not started yet count towards the budget as a single calculation
+    job, since the daemon did not launch their calculations yet. Since a work chain that is running can launch many
+    calculation jobs at once, the number of submitted work chains that have not terminated can also be limited by the
+    ``max_concurrent_workchains``. The most expensive structures are submitted first by default, which keeps the
+    allocation saturated until the end of the batch.
+
+    The status of each structure is stored in the extras of the group, so the batch can be resumed by creating a new
+    submitter for the same group after it was interrupted. A structure is marked as ``submitting`` before its work chain
+    is submitted, and each submitted work chain gets the UUID of its structure as an extra. If the submission was
+    interrupted before its status was recorded, the work chain is recovered from the extra or, if that was not set
+    either, from its input structure, so a structure is never submitted twice.
+    """
+
+    def __init__(
+        self,
+        group: orm.Group,
+        get_builder: Callable[[orm.StructureData], ProcessBuilder],
+        max_concurrent_calcjobs: int,
+        max_concurrent_workchains: Optional[int] = None,
+        max_submissions_per_step: Optional[int] = None,
+        get_cost: Callable[[orm.StructureData, ProcessBuilder], float] = estimate_cost,
+        descending: bool = True,
+    ):
+        """Construct a new instance.
+
+        :param group: the group with the ``StructureData`` nodes.
+        :param get_builder: function that returns the builder of the ``DynamicalMatrixWorkChain`` of a structure, e.g.
+            a wrapper around ``DynamicalMatrixWorkChain.get_builder_from_protocol``.
+        :param max_concurrent_calcjobs: the maximum number of calculation jobs that have not terminated.
+        :param max_concurrent_workchains: the maximum number of submitted work chains that have not terminated, by
+            default there is no limit besides the ``max_concurrent_calcjobs``.
+        :param max_submissions_per_step: the maximum number of work chains submitted in a single step, which limits the
+            load on the daemon when many slots free up at once.
+        :param get_cost: function that returns the estimated cost of a structure from the structure and its builder.
+        :param descending: whether to submit the most expensive structures first.
+        """
+        if max_concurrent_calcjobs < 1:
+            raise ValueError(
+                f'`max_concurrent_calcjobs` should be a positive integer, but got {max_concurrent_calcjobs}'
+            )
+
+        if max_concurrent_workchains is not None and max_concurrent_workchains < 1:
+            raise ValueError(
+                f'`max_concurrent_workchains` should be a positive integer, but got {max_concurrent_workchains}'
+            )
+
+        self.group = group
+        self.get_builder = get_builder
+        self.max_concurrent_calcjobs = max_concurrent_calcjobs
+        self.max_concurrent_workchains = max_concurrent_workchains
+        self.max_submissions_per_step = max_submissions_per_step
+        self.get_cost = get_cost
+        self.descending = descending
+
+    def get_status(self) -> Dict[str, dict]:
+        """Return the status of each structure of the group, with its UUID as the key.
+
+        :return: dictionary with the ``status``, i.e. ``pending``, ``submitting``, ``submitted``, ``finished`` or
+            ``failed``, the estimated ``cost`` and, once submitted, the ``pk`` of the work chain of each structure.
+        """
+        extras = self.group.base.extras.all
+
+        return {
+            key[len(BATCH_STATUS_EXTRA_PREFIX):]: value
+            for key, value in extras.items()
+            if key.startswith(BATCH_STATUS_EXTRA_PREFIX)
+        }
+
+    def set_status(self, structure_uuid: str, **kwargs):
+        """Update the status of a structure in the extras of the group."""
+        key = f'{BATCH_STATUS_EXTRA_PREFIX}{structure_uuid}'
+        self.group.base.extras.set(key, {**self.group.base.extras.get(key, {}), **kwargs})
+
+    def get_submitted_workchain(self,
+                                structure_uuid: str,
+                                submitted_after: Optional[datetime] = None) -> Optional[orm.WorkflowNode]:
+        """Return the most recent work chain that was submitted for a structure, if any.
+
+        :param structure_uuid: the UUID of the structure.
+        :param submitted_after: if given, a work chain that was created after this time with the structure as its input
+            is also returned if it does not have the extra with the UUID of the structure, e.g. because the submission
+            was interrupted before the extra was set.
+        :return: the work chain node or ``None`` if there is none.
+        """
+        builder = orm.QueryBuilder().append(
+            orm.WorkflowNode, filters={f'extras.{BATCH_STRUCTURE_EXTRA}': structure_uuid}
+        )
+        builder.order_by({orm.WorkflowNode: {'ctime': 'desc'}}).limit(1)
+        workchain = builder.first(flat=True)
+
+        if workchain is not None or submitted_after is None:
+            return workchain
+
+        builder = orm.QueryBuilder().append(orm.StructureData, filters={'uuid': structure_uuid}, tag='structure')
+        builder.append(
+            orm.WorkflowNode,
+            with_incoming='structure',
+            filters={'ctime': {
+                '>=': submitted_after
+            }},
+            edge_filters={'label': 'structure'},
+            tag='workchain',
+        )
+        builder.order_by({'workchain': {'ctime': 'desc'}}).limit(1)
+        workchain = builder.first(flat=True)
+
+        if workchain is not None:
+            workchain.base.extras.set(BATCH_STRUCTURE_EXTRA, structure_uuid)
+
+        return workchain
+
+    def update_status(self) -> Dict[str, dict]:
+        """Update the status of the structures of the group and return it.
+
+        New structures of the group are added as ``pending`` with their estimated cost, unless a work chain was already
+        submitted for them, and submitted work chains that terminated are marked as ``finished`` or ``failed``. The
+        structures whose submission was interrupted are marked as ``submitted`` if their work chain is found, and as
+        ``pending`` otherwise.
+
+        :return: the status of each structure, as returned by :meth:`get_status`.
+        """
+        status = self.get_status()
+
+        for structure in self.group.nodes:
+            if not isinstance(structure, orm.StructureData):
+                continue
+
+            if structure.uuid not in status:
+                workchain = self.get_submitted_workchain(structure.uuid)
+
+                if workchain is not None:
+                    self.set_status(structure.uuid, status='submitted', pk=workchain.pk)
+                else:
+                    cost = float(self.get_cost(structure, self.get_builder(structure)))
+                    self.set_status(structure.uuid, status='pending', cost=cost)
+
+        for structure_uuid, entry in self.get_status().items():
+            if entry['status'] == 'submitting':
+                submitted_after = datetime.fromisoformat(entry['submission_time'])
+                workchain = self.get_submitted_workchain(structure_uuid, submitted_after)
+
+                if workchain is None:
+                    self.set_status(structure_uuid, status='pending')
+                    continue
+
+                self.set_status(structure_uuid, status='submitted', pk=workchain.pk)
+                entry = self.get_status()[structure_uuid]
+
+            if entry['status'] == 'submitted':
+                workchain = orm.load_node(entry['pk'])
+
+                if workchain.is_terminated:
+                    self.set_status(structure_uuid, status='finished' if workchain.is_finished_ok else 'failed')
+
+        return self.get_status()
+
+    def get_number_of_free_slots(self) -> int:
+        """Return the number of work chains that can be submitted without exceeding the concurrency budget.
+
+        The work chains that have not started yet count as a single calculation job. If ``max_concurrent_workchains``
+        is given, the submitted work chains that have not terminated also count against that limit.
+        """
+        filters = {'extras': {'has_key': BATCH_STRUCTURE_EXTRA}, 'attributes.process_state': 'created'}
+        number_of_created = orm.QueryBuilder().append(orm.WorkflowNode, filters=filters).count()
+        number_of_free_slots = self.max_concurrent_calcjobs - get_number_of_active_calcjobs() - number_of_created
+
+        if self.max_concurrent_workchains is not None:
+            filters['attributes.process_state'] = {'in': ACTIVE_PROCESS_STATES}
+            number_of_active = orm.QueryBuilder().append(orm.WorkflowNode, filters=filters).count()
+            number_of_free_slots = min(number_of_free_slots, self.max_concurrent_workchains - number_of_active)
+
+        return max(number_of_free_slots, 0)
+
+    def step(self) -> List[orm.WorkflowNode]:
+        """Update the status of the structures and submit the next work chains, if the budget allows.
+
+        :return: the work chains that were submitted.
+        """
+        status = self.update_status()
+        pending = [uuid for uuid, entry in status.items() if entry['status'] == 'pending']
+        pending.sort(key=lambda uuid: status[uuid]['cost'], reverse=self.descending)
+
+        number_of_submissions = self.get_number_of_free_slots()
+
+        if self.max_submissions_per_step is not None:
+            number_of_submissions = min(number_of_submissions, self.max_submissions_per_step)
+
+        submitted = []
+
+        for structure_uuid in pending[:number_of_submissions]:
+            structure = orm.load_node(structure_uuid)
+            builder = self.get_builder(structure)
+
+            # The status is recorded before the submission, such that an interrupted submission is recovered on resume
+            self.set_status(structure_uuid, status='submitting', submission_time=timezone.now().isoformat())
+            workchain = submit(builder)
+            workchain.base.extras.set(BATCH_STRUCTURE_EXTRA, structure_uuid)
+            self.set_status(structure_uuid, status='submitted', pk=workchain.pk)
+            submitted.append(workchain)
+
+        return submitted
+
+    def is_finished(self) -> bool:
+        """Return whether the work chains of all structures of the group have terminated."""
+        return all(entry['status'] in ('finished', 'failed') for entry in self.update_status().values())
+
+    def run(self, interval: float = 60.):
+        """Submit the work chains of all structures of the group and wait until they have terminated.
+
+        :param interval: the number of seconds between two steps.
+        """
+        while not self.is_finished():
+            self.step()
+            time.sleep(interval)
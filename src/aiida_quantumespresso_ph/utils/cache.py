@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""Utilities to reuse the results of relaxations, single q-points and force constants across workflows."""
+from collections.abc import Mapping
+import hashlib
+import os
+from typing import List, Optional, Sequence
+
+from aiida import orm
+from aiida.common.hashing import make_hash
+import numpy
+
+from aiida_quantumespresso_ph.utils.qpoints import get_spglib_cell
+
+QPOINT_CACHE_KEY_EXTRA = 'qpoint_cache_key'
+"""Name of the extra of a ``PhBaseWorkChain`` with the cache key of its q-point."""
+
+FORCE_CONSTANTS_CACHE_KEY_EXTRA = 'force_constants_cache_key'
+"""Name of the extra of a ``ForceConstantsData`` with the cache key of the dynamical matrices it was computed from."""
+
+RELAX_CACHE_KEY_EXTRA = 'relax_cache_key'
+"""Name of the extra of a ``PwRelaxWorkChain`` with the cache key of its input structure and inputs."""
+
+IGNORED_INPUTPH_KEYS = ('start_q', 'last_q', 'start_irr', 'last_irr', 'recover', 'max_seconds')
+"""Keys of the ``INPUTPH`` namelist that do not affect the results of a q-point."""
+
+
+def get_qpoint_cache_key(pw_calculation: orm.CalcJobNode, ph_parameters: dict, qpoint: Sequence[float]) -> str:
+    """Return the cache key of the result of a ``ph.x`` calculation of a single q-point.
+
+    The key is a hash of the content of the structure, the parameters, k-points and pseudopotentials of the ``pw.x``
+    calculation, the parameters of the ``ph.x`` calculation and the coordinates of the q-point. Hence it is the same for
+    q-points that are shared by different q-point meshes of the same ``pw.x`` calculation, or of another ``pw.x``
+    calculation with the same inputs.
+
+    :param pw_calculation: the ``PwCalculation`` on whose output folder the ``ph.x`` calculation is run.
+    :param ph_parameters: the parameters of the ``ph.x`` calculation.
+    :param qpoint: the coordinates of the q-point in crystal coordinates.
+    :return: the cache key.
+    """
+    try:
+        structure = pw_calculation.outputs.output_structure
+    except AttributeError:
+        structure = pw_calculation.inputs.structure
+
+    try:
+        kpoints = pw_calculation.inputs.kpoints.get_kpoints_mesh()
+    except AttributeError:
+        kpoints = numpy.round(pw_calculation.inputs.kpoints.get_kpoints(), 8).tolist()
+
+    inputph = {key: value for key, value in ph_parameters.get('INPUTPH', {}).items() if key not in IGNORED_INPUTPH_KEYS}
+
+    return make_hash({
+        'structure': structure.base.attributes.all,
+        'pw_parameters': pw_calculation.inputs.parameters.get_dict(),
+        'kpoints': kpoints,
+        'pseudos': {kind: pseudo.md5 for kind, pseudo in pw_calculation.inputs.pseudos.items()},
+        'ph_parameters': {
+            **ph_parameters, 'INPUTPH': inputph
+        },
+        'qpoint': (numpy.round(qpoint, 8) + 0.).tolist(),
+    })
+
+
+def get_cached_workchain(key: str) -> Optional[orm.WorkflowNode]:
+    """Return the most recent ``PhBaseWorkChain`` with the given cache key that finished successfully, if any.
+
+    :param key: the cache key as returned by ``get_qpoint_cache_key``.
+    :return: the work chain node or ``None`` if there is none.
+    """
+    workchains = get_cached_workchains(key, QPOINT_CACHE_KEY_EXTRA, limit=1)
+
+    return workchains[0] if workchains else None
+
+
+def get_cached_workchains(key: str, extra: str, limit: Optional[int] = None) -> List[orm.WorkflowNode]:
+    """Return the work chains with the given cache key that finished successfully, the most recent first.
+
+    :param key: the cache key.
+    :param extra: the name of the extra with the cache key, e.g. ``QPOINT_CACHE_KEY_EXTRA``.
+    :param limit: the maximum number of work chains to return.
+    :return: the list of work chain nodes.
+    """
+    builder = orm.QueryBuilder().append(
+        orm.WorkflowNode,
+        filters={
+            f'extras.{extra}': key,
+            'attributes.process_state': 'finished',
+            'attributes.exit_status': 0,
+        },
+    )
+    builder.order_by({orm.WorkflowNode: {'ctime': 'desc'}})
+
+    if limit is not None:
+        builder.limit(limit)
+
+    return builder.all(flat=True)
+
+
+def get_structure_fingerprint(structure: orm.StructureData, symprec: float = 1e-5, decimals: int = 4) -> dict:
+    """Return a fingerprint of a structure that does not depend on its orientation or the order of its sites.
+
+    The sites are expressed in the standardized conventional cell of ``spglib``, such that structures that only differ
+    in the orientation of the cell, the order of the lattice vectors or the order of the sites have the same
+    fingerprint. The cell is not reduced to the primitive cell, and the number of sites and the volume of the input cell
+    are part of the fingerprint, such that a supercell or the conventional cell of a crystal has a different fingerprint
+    than its primitive cell, since the results of a calculation on these cells are not interchangeable. Since the origin
+    of the standardized cell is not unique, the sites are shifted such that each site is at the origin in turn, and the
+    smallest of the sorted lists of sites is used. The sites are identified by the name, symbols and mass of their kind,
+    since the kind names can be referenced by the parameters.
+
+    :param structure: the ``StructureData`` of the crystal.
+    :param symprec: the tolerance for the symmetry search.
+    :param decimals: the number of decimals to which the lattice vectors and the scaled positions are rounded.
+    :return: dictionary with the ``number_of_sites`` and the rounded ``volume`` of the input cell, and the rounded
+        ``lattice`` vectors and the sorted ``sites`` of the standardized cell.
+    """
+    import spglib
+
+    cell = get_spglib_cell(structure)
+    standardized = spglib.standardize_cell(cell, to_primitive=False, symprec=symprec)
+    lattice, positions, numbers = cell if standardized is None else standardized
+
+    kinds = [(kind.name, kind.symbols, kind.weights, round(kind.mass, decimals)) for kind in structure.kinds]
+    candidates = []
+
+    for origin in positions:
+        shifted = numpy.round(numpy.round(positions - origin, decimals) % 1, decimals) + 0.
+        candidates.append(
+            sorted((kinds[number - 1], tuple(position.tolist())) for number, position in zip(numbers, shifted))
+        )
+
+    return {
+        'number_of_sites': len(structure.sites),
+        'volume': round(structure.get_cell_volume(), decimals) + 0.,
+        'lattice': (numpy.round(lattice, decimals) + 0.).tolist(),
+        'sites': min(candidates),
+    }
+
+
+def get_inputs_fingerprint(inputs: Mapping) -> dict:
+    """Return a fingerprint of the content of the nodes of a namespace of inputs.
+
+    The ``metadata`` and the codes are ignored, such that the fingerprint only depends on the inputs that affect the
+    results and not on where or how a calculation is run.
+
+    :param inputs: the nested mapping of inputs, e.g. the ``relax`` inputs of the ``DynamicalMatrixWorkChain``.
+    :return: the nested dictionary with the fingerprint of each input node.
+    """
+    fingerprint = {}
+
+    for key, value in inputs.items():
+        if key == 'metadata' or isinstance(value, orm.AbstractCode):
+            continue
+
+        if isinstance(value, Mapping):
+            fingerprint[key] = get_inputs_fingerprint(value)
+        elif isinstance(value, orm.Dict):
+            fingerprint[key] = value.get_dict()
+        elif isinstance(value, orm.BaseType):
+            fingerprint[key] = value.value
+        elif isinstance(value, orm.KpointsData):
+            try:
+                fingerprint[key] = value.get_kpoints_mesh()
+            except AttributeError:
+                fingerprint[key] = numpy.round(value.get_kpoints(), 8).tolist()
+        elif isinstance(value, orm.Data) and 'md5' in value.base.attributes.keys():
+            fingerprint[key] = value.base.attributes.get('md5')
+        else:
+            fingerprint[key] = value.base.caching.get_hash()
+
+    return fingerprint
+
+
+def get_relax_cache_key(structure: orm.StructureData, inputs: Mapping) -> str:
+    """Return the cache key of a relaxation of a structure with the given inputs.
+
+    :param structure: the input structure of the relaxation.
+    :param inputs: the inputs of the ``PwRelaxWorkChain``, without the structure.
+    :return: the cache key.
+    """
+    return make_hash({'structure': get_structure_fingerprint(structure), 'inputs': get_inputs_fingerprint(inputs)})
+
+
+def get_force_constants_cache_key(dynmat_folder: orm.FolderData, parameters: dict) -> str:
+    """Return the cache key of the force constants computed from the dynamical matrices of a folder.
+
+    The key is a hash of the content of the ``dynamical-matrix-N`` files of the folder and of the parameters with which
+    the force constants are computed. Hence it is the same for different folders with the same dynamical matrices, e.g.
+    the retrieved folders of different work chains, but other files of the folder are ignored.
+
+    :param dynmat_folder: the folder with the dynamical matrix files.
+    :param parameters: the parameters that affect the force constants, e.g. those of the ``q2r.x`` calculation.
+    :return: the cache key.
+    :raises ValueError: if the folder does not contain any dynamical matrix file.
+    """
+    from aiida.plugins import CalculationFactory
+
+    PhCalculation = CalculationFactory('quantumespresso.ph')
+    dynmat_prefix = PhCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX  # pylint: disable=protected-access
+    dirname, basename = os.path.split(dynmat_prefix)
+    digests = {}
+
+    try:
+        filenames = sorted(dynmat_folder.base.repository.list_object_names(dirname))
+    except FileNotFoundError:
+        filenames = []
+
+    for filename in filenames:
+        if filename.startswith(basename):
+            with dynmat_folder.base.repository.open(os.path.join(dirname, filename), 'rb') as handle:
+                digests[filename] = hashlib.sha256(handle.read()).hexdigest()
+
+    if not digests:
+        raise ValueError('the `dynmat_folder` does not contain any dynamical matrix file.')
+
+    return make_hash({'dynamical_matrices': digests, 'parameters': parameters})
+
+
+def get_cached_force_constants(key: str) -> Optional[orm.SinglefileData]:
+    """Return the most recent ``ForceConstantsData`` with the given cache key, if any.
+
+    :param key: the cache key as returned by ``get_force_constants_cache_key``.
+    :return: the force constants node or ``None`` if there is none.
+    """
+    from aiida.plugins import DataFactory
+
+    ForceConstantsData = DataFactory('quantumespresso.force_constants')
+    builder = orm.QueryBuilder().append(ForceConstantsData, filters={f'extras.{FORCE_CONSTANTS_CACHE_KEY_EXTRA}': key})
+    builder.order_by({ForceConstantsData: {'ctime': 'desc'}}).limit(1)
+
+    return builder.first(flat=True)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Utilities to clean the remote folders of many calculations with a single transport per computer."""
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+from typing import Dict, Iterable, List
+
+from aiida import orm
+from aiida.common.escaping import escape_for_bash
+from aiida.common.exceptions import NotExistent
+
+
+def get_remove_command(paths: List[str]) -> str:
+    """Return the shell command that removes the given paths in parallel.
+
+    Each path is removed by a background job, and the exit status of each job is checked with ``wait``, such that the
+    command fails if any of the paths could not be removed.
+
+    :param paths: the absolute paths to remove.
+    :return: the command.
+    """
+    jobs = ' '.join(f'rm -rf {escape_for_bash(path)} & pids="$pids $!";' for path in paths)
+
+    return f'pids=""; {jobs} status=0; for pid in $pids; do wait $pid || status=1; done; exit $status'
+
+
+def remove_remote_paths(transport, paths: List[str], batch_size: int = 50) -> Dict[str, str]:
+    """Remove the given remote paths and their contents through a single transport session.
+
+    The paths are removed in batches, where each batch is a single command that removes all paths of the batch in
+    parallel on the remote computer. If the command fails, e.g. if the transport cannot execute commands or one of the
+    paths could not be removed, the remaining paths of the batch are removed one by one through the transport instead.
+
+    :param transport: the transport of the computer of the paths, which is opened and closed by this function.
+    :param paths: the absolute paths to remove.
+    :param batch_size: the number of paths that are removed by a single command.
+    :return: the paths that could not be removed, with the reason of the failure.
+    """
+    failed = {}
+
+    with transport:
+        for start in range(0, len(paths), batch_size):
+            batch = paths[start:start + batch_size]
+            try:
+                retval, _, _ = transport.exec_command_wait(get_remove_command(batch))
+            except (NotImplementedError, OSError):
+                retval = None
+
+            if retval == 0:
+                continue
+
+            for path in batch:
+                try:
+                    if transport.path_exists(path):
+                        transport.rmtree(path)
+                except OSError as exception:
+                    failed[path] = str(exception)
+
+    return failed
+
+
+async def remove_remote_paths_async(transport, paths: List[str], batch_size: int = 50) -> Dict[str, str]:
+    """Remove the given remote paths and their contents through an open transport, without blocking the event loop.
+
+    This is the equivalent of :func:`remove_remote_paths` for a transport that is opened by the ``TransportQueue`` of
+    the engine, which also closes it.
+
+    :param transport: the open transport of the computer of the paths.
+    :param paths: the absolute paths to remove.
+    :param batch_size: the number of paths that are removed by a single command.
+    :return: the paths that could not be removed, with the reason of the failure.
+    """
+    failed = {}
+
+    for start in range(0, len(paths), batch_size):
+        batch = paths[start:start + batch_size]
+        try:
+            retval, _, _ = await transport.exec_command_wait_async(get_remove_command(batch))
+        except (NotImplementedError, OSError):
+            retval = None
+
+        if retval == 0:
+            continue
+
+        for path in batch:
+            try:
+                if await transport.path_exists_async(path):
+                    await transport.rmtree_async(path)
+            except OSError as exception:
+                failed[path] = str(exception)
+
+    return failed
+
+
+def get_folders_per_computer(remote_folders: Iterable[orm.RemoteData]) -> Dict[str, List[orm.RemoteData]]:
+    """Return the remote folders that were not cleaned yet, grouped by the UUID of their computer."""
+    folders_per_computer = {}
+
+    for remote_folder in remote_folders:
+        if not remote_folder.is_cleaned:
+            folders_per_computer.setdefault(remote_folder.computer.uuid, []).append(remote_folder)
+
+    return folders_per_computer
+
+
+def set_cleaned(folders: List[orm.RemoteData], result, logger: logging.Logger) -> List[orm.RemoteData]:
+    """Mark the folders of a computer that were removed as cleaned and report those that were not.
+
+    :param folders: the folders of a single computer.
+    :param result: the paths that could not be removed as returned by :func:`remove_remote_paths`, or the exception
+        that prevented the folders of the computer from being cleaned at all.
+    :param logger: the logger to which the failures are reported, e.g. that of the process that cleans the folders.
+    :return: the folders that were cleaned.
+    """
+    label = folders[0].computer.label
+
+    if isinstance(result, Exception):
+        logger.warning(f'failed to clean the remote folders on computer `{label}`: {result}')
+        return []
+
+    cleaned = []
+
+    for folder in folders:
+        path = folder.get_remote_path()
+
+        if path in result:
+            logger.warning(f'failed to clean the remote folder `{path}` on computer `{label}`: {result[path]}')
+            continue
+
+        folder.base.extras.set(orm.RemoteData.KEY_EXTRA_CLEANED, True)
+        cleaned.append(folder)
+
+    return cleaned
+
+
+def clean_remote_folders(
+    remote_folders: Iterable[orm.RemoteData],
+    logger: logging.Logger,
+    batch_size: int = 50,
+    max_workers: int = 4,
+) -> List[orm.RemoteData]:
+    """Clean the remote folders, with one transport session per computer and the computers in parallel.
+
+    Folders that were already cleaned are skipped. The folders that could not be cleaned are reported to the logger and
+    left for a later cleanup. This function blocks until all folders are cleaned and opens the transports itself, so it
+    should only be used outside of the event loop of the engine, see :func:`clean_remote_folders_async` instead.
+
+    :param remote_folders: the ``RemoteData`` nodes of the folders to clean.
+    :param logger: the logger to which the failures are reported.
+    :param batch_size: the number of folders of a computer that are removed by a single command.
+    :param max_workers: the maximum number of computers whose folders are cleaned at the same time.
+    :return: the list of folders that were cleaned, each of which has the ``RemoteData.KEY_EXTRA_CLEANED`` extra set.
+    """
+    folders_per_computer = get_folders_per_computer(remote_folders)
+    results = {}
+
+    if not folders_per_computer:
+        return []
+
+    # The transports are created in the main thread, since this requires access to the storage
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(folders_per_computer)))) as executor:
+        for uuid, folders in folders_per_computer.items():
+            try:
+                transport = folders[0].get_authinfo().get_transport()
+            except NotExistent as exception:
+                results[uuid] = exception
+                continue
+
+            paths = [folder.get_remote_path() for folder in folders]
+            results[uuid] = executor.submit(remove_remote_paths, transport, paths, batch_size)
+
+    cleaned = []
+
+    for uuid, future in results.items():
+        try:
+            result = future.result() if isinstance(future, Future) else future
+        except Exception as exception:  # pylint: disable=broad-except
+            result = exception
+
+        cleaned.extend(set_cleaned(folders_per_computer[uuid], result, logger))
+
+    return cleaned
+
+
+async def clean_remote_folders_async(
+    remote_folders: Iterable[orm.RemoteData],
+    transport_queue,
+    logger: logging.Logger,
+    batch_size: int = 50,
+) -> List[orm.RemoteData]:
+    """Clean the remote folders through the transport queue of the engine, with the computers in parallel.
+
+    The transport of each computer is requested from the ``TransportQueue``, as for the tasks of a ``CalcJob``, so it
+    is shared with the other processes of the runner and respects the safe open interval of the computer. The folders
+    that could not be cleaned are reported to the logger and left for a later cleanup.
+
+    :param remote_folders: the ``RemoteData`` nodes of the folders to clean.
+    :param transport_queue: the ``TransportQueue`` of the runner, e.g. ``self.runner.transport`` of a process.
+    :param logger: the logger to which the failures are reported.
+    :param batch_size: the number of folders of a computer that are removed by a single command.
+    :return: the list of folders that were cleaned, as returned by :func:`clean_remote_folders`.
+    """
+    folders_per_computer = get_folders_per_computer(remote_folders)
+
+    async def clean_computer(folders):
+        paths = [folder.get_remote_path() for folder in folders]
+
+        async with transport_queue.request_transport(folders[0].get_authinfo()) as request:
+            transport = await request
+            return await remove_remote_paths_async(transport, paths, batch_size)
+
+    results = await asyncio.gather(
+        *(clean_computer(folders) for folders in folders_per_computer.values()), return_exceptions=True
+    )
+    cleaned = []
+
+    for folders, result in zip(folders_per_computer.values(), results):
+        cleaned.extend(set_cleaned(folders, result, logger))
+
+    return cleaned
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Utilities to compute the phonon density of states from the frequencies on a q-point mesh, as ``matdyn.x``."""
+from typing import Optional, Sequence, Tuple
+
+import numpy
+
+CUBE_CORNERS = ((0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0), (0, 0, 1), (1, 0, 1), (0, 1, 1), (1, 1, 1))
+"""The shifts of the corners of a cube of the q-point mesh, in the order of ``tetra_init`` in Quantum ESPRESSO."""
+
+CUBE_TETRAHEDRA = ((0, 1, 2, 5), (1, 2, 3, 5), (0, 2, 4, 5), (2, 3, 5, 7), (2, 5, 6, 7), (2, 4, 5, 6))
+"""The corners of the six tetrahedra of a cube of the q-point mesh, in the order of ``tetra_init`` in QE."""
+
+
+def get_tetrahedra(mesh: Sequence[int]) -> numpy.ndarray:
+    """Return the tetrahedra of an unshifted q-point mesh, as ``tetra_init`` in Quantum ESPRESSO.
+
+    :param mesh: the number of q-points along each reciprocal lattice vector, where the q-points are ordered such that
+        the last index runs fastest.
+    :return: array of shape ``(6 nq, 4)`` with the indices of the q-points at the corners of each tetrahedron.
+    """
+    mesh = numpy.array(mesh)
+    indices = numpy.indices(mesh).reshape(3, -1).T
+    corners = []
+
+    for shift in CUBE_CORNERS:
+        shifted = (indices + shift) % mesh
+        corners.append((shifted[:, 0] * mesh[1] + shifted[:, 1]) * mesh[2] + shifted[:, 2])
+
+    corners = numpy.stack(corners, axis=1)
+
+    return corners[:, CUBE_TETRAHEDRA].reshape(-1, 4)
+
+
+def get_energies(frequencies: numpy.ndarray, delta_e: float = 1.0, ndos: Optional[int] = None) -> numpy.ndarray:
+    """Return the frequencies at which the density of states is computed, as ``matdyn.x``.
+
+    The frequencies range from the lowest frequency, or zero if all frequencies are positive, to the highest frequency.
+
+    :param frequencies: array with the frequencies of all modes and q-points.
+    :param delta_e: the spacing of the frequencies, which is only used if ``ndos`` is not specified.
+    :param ndos: the number of frequencies.
+    :return: array with the frequencies.
+    """
+    minimum = min(0., frequencies.min())
+    maximum = max(0., frequencies.max())
+
+    if ndos is not None and ndos > 1:
+        delta_e = (maximum - minimum) / (ndos - 1)
+    else:
+        ndos = int(numpy.rint((maximum - minimum) / delta_e + 1.51))
+
+    return minimum + numpy.arange(ndos) * delta_e
+
+
+def get_phonon_dos(
+    frequencies: numpy.ndarray,
+    mesh: Sequence[int],
+    delta_e: float = 1.0,
+    ndos: Optional[int] = None,
+    degauss: float = 0.,
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return the phonon density of states from the frequencies on a q-point mesh, as ``matdyn.x`` with ``dos``.
+
+    All q-points of the mesh have the same weight. The density of states is computed with the linear tetrahedron method
+    of ``dos_t`` in Quantum ESPRESSO, or with a Gaussian smearing if ``degauss`` is positive, and is normalized to the
+    number of modes.
+
+    :param frequencies: array of shape ``(nq, nmodes)`` with the frequencies of each q-point of the mesh, where the
+        q-points are ordered such that the last index of the mesh runs fastest.
+    :param mesh: the number of q-points along each reciprocal lattice vector.
+    :param delta_e: the spacing of the frequencies of the density of states.
+    :param ndos: the number of frequencies of the density of states, which takes precedence over ``delta_e``.
+    :param degauss: the width of the Gaussian smearing, in the same units as the frequencies.
+    :return: tuple of the arrays with the frequencies and the density of states.
+    """
+    frequencies = numpy.asarray(frequencies)
+
+    if len(frequencies) != numpy.prod(mesh):
+        raise ValueError(f'the number of q-points {len(frequencies)} does not match the mesh {list(mesh)}.')
+
+    energies = get_energies(frequencies, delta_e, ndos)
+    dos = numpy.zeros_like(energies)
+
+    if degauss > 0:
+        for energy_slice in _get_slices(len(energies), frequencies.size):
+            arguments = (energies[energy_slice, None] - frequencies.ravel()[None, :]) / degauss
+            dos[energy_slice] = numpy.exp(-arguments**2).sum(axis=1) / numpy.sqrt(numpy.pi) / degauss
+
+        return energies, dos / len(frequencies)
+
+    # The sorted frequencies at the corners of each tetrahedron, of shape ``(4, ntetra * nmodes)``
+    corners = numpy.sort(frequencies[get_tetrahedra(mesh)], axis=1).transpose(1, 0, 2).reshape(4, -1)
+    number_tetrahedra = 6 * len(frequencies)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        for energy_slice in _get_slices(len(energies), corners.shape[1]):
+            dos[energy_slice] = _get_tetrahedron_dos(energies[energy_slice, None], *corners).sum(axis=1)
+
+    return energies, dos / number_tetrahedra
+
+
+def _get_tetrahedron_dos(energy, e1, e2, e3, e4):
+    """Return the density of states of the tetrahedra with the sorted corner frequencies, as ``dos_t`` in QE."""
+    lower = 3 * (energy - e1)**2 / (e2 - e1) / (e3 - e1) / (e4 - e1)
+    middle = (3 * (e2 - e1) + 6 * (energy - e2) - 3 * (e3 - e1 + e4 - e2) / (e3 - e2) / (e4 - e2) *
+              (energy - e2)**2) / (e3 - e1) / (e4 - e1)
+    upper = 3 * (e4 - energy)**2 / (e4 - e1) / (e4 - e2) / (e4 - e3)
+
+    return numpy.select(
+        [(energy > e1) & (energy < e2), (energy >= e2) & (energy < e3), (energy >= e3) & (energy < e4)],
+        [lower, middle, upper],
+        default=0.,
+    )
+
+
+def _get_slices(number_energies: int, number_values: int, max_size: int = 10**6):
+    """Return the slices of the energies such that each slice evaluates at most ``max_size`` values at once."""
+    step = max(1, max_size // max(1, number_values))
+    return [slice(start, start + step) for start in range(0, number_energies, step)]
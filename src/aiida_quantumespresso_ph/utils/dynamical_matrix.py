@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Utilities to parse the ``dynamical-matrix-N`` files that ``ph.x`` writes for each irreducible q-point."""
+import re
+
+import numpy
+
+REGEX_FLOAT = re.compile(r'-?\d+\.\d+(?:[EeDd][-+]?\d+)?')
+"""Regular expression of a floating point number in a dynamical matrix file, which also separates the numbers of a
+fixed-width format that are not separated by whitespace, as long as the second number is negative."""
+
+REGEX_DYNAMICAL_MATRIX = re.compile(r'Dynamical\s+Matrix in cartesian axes')
+REGEX_DIAGONALIZATION = re.compile(r'Diagonalizing the dynamical matrix')
+REGEX_FREQUENCY = re.compile(r'\[THz\]\s*=\s*(\S+)\s*\[cm-1\]')
+REGEX_EIGENVECTOR = re.compile(r'^\s*\(([^()]*)\)\s*$', re.MULTILINE)
+REGEX_DIELECTRIC_TENSOR = re.compile(r'Dielectric Tensor:')
+REGEX_EFFECTIVE_CHARGES = re.compile(r'Effective Charges E-U:')
+REGEX_SPECIES = re.compile(r"^\s*(\d+)\s+'(.*)'\s+(\S+)\s*$")
+
+
+def parse_dynamical_matrix(content: str) -> dict:
+    """Parse the dynamical matrices, frequencies and eigenvectors of a ``dynamical-matrix-N`` file written by ``ph.x``.
+
+    The file contains the dynamical matrix of each q-point in the star of the irreducible q-point, followed by the
+    frequencies and eigenvectors of the first q-point of the star. Instead of parsing the file line by line, all numbers
+    of each section are extracted at once and reshaped into arrays.
+
+    :param content: the content of the file.
+    :return: dictionary with the following keys:
+
+        * ``number_of_atoms``: the number of atoms in the cell.
+        * ``qpoints``: array of shape ``(nq, 3)`` with the q-points of the star in cartesian coordinates in units of
+          ``2 pi / alat``.
+        * ``dynamical_matrices``: complex array of shape ``(nq, 3 nat, 3 nat)`` with the dynamical matrices of the
+          q-points in cartesian axes, in units of Ry / bohr^2 and not divided by the masses.
+        * ``frequencies``: array of shape ``(3 nat,)`` with the frequencies of the first q-point in cm^-1.
+        * ``eigenvectors``: complex array of shape ``(3 nat, 3 nat)`` with the eigenvectors of the first q-point, where
+          ``eigenvectors[m]`` is the eigenvector of mode ``m``.
+        * ``dielectric_tensor``: array of shape ``(3, 3)`` with the dielectric tensor, only if it was computed.
+        * ``effective_charges_eu``: array of shape ``(nat, 3, 3)`` with the effective charges of each atom, where the
+          first axis of each 3 x 3 matrix is the direction of the electric field, only if they were computed.
+
+    :raises ValueError: if the content is not that of a dynamical matrix file.
+    """
+    try:
+        number_atoms = int(content.splitlines()[2].split()[1])
+    except (IndexError, ValueError) as exception:
+        raise ValueError('the content does not contain the header of a dynamical matrix file') from exception
+
+    content_matrices, *content_diagonalization = REGEX_DIAGONALIZATION.split(content, maxsplit=1)
+    sections = REGEX_DYNAMICAL_MATRIX.split(content_matrices)[1:]
+
+    if not sections or not content_diagonalization:
+        raise ValueError('the content does not contain the dynamical matrices and their diagonalization')
+
+    number_modes = 3 * number_atoms
+    number_values = 3 + 2 * number_modes**2
+
+    try:
+        values = numpy.array([REGEX_FLOAT.findall(section)[:number_values] for section in sections], dtype=float)
+    except ValueError as exception:
+        raise ValueError('the dynamical matrices do not contain the expected number of values') from exception
+
+    if values.shape != (len(sections), number_values):
+        raise ValueError('the dynamical matrices do not contain the expected number of values')
+
+    # The matrix is written in blocks of 3 x 3 for each pair of atoms, with the real and imaginary parts of each element
+    blocks = values[:, 3:].reshape(len(sections), number_atoms, number_atoms, 3, 3, 2)
+    matrices = (blocks[..., 0] + 1j * blocks[..., 1]).transpose(0, 1, 3, 2, 4).reshape(-1, number_modes, number_modes)
+
+    frequencies = numpy.array(REGEX_FREQUENCY.findall(content_diagonalization[0]), dtype=float)
+    eigenvectors = numpy.array(' '.join(REGEX_EIGENVECTOR.findall(content_diagonalization[0])).split(), dtype=float)
+
+    if frequencies.shape != (number_modes,) or eigenvectors.shape != (2 * number_modes**2,):
+        raise ValueError('the diagonalization does not contain the expected number of frequencies and eigenvectors')
+
+    eigenvectors = eigenvectors.reshape(number_modes, number_modes, 2)
+
+    parsed = {
+        'number_of_atoms': number_atoms,
+        'qpoints': values[:, :3],
+        'dynamical_matrices': matrices,
+        'frequencies': frequencies,
+        'eigenvectors': eigenvectors[..., 0] + 1j * eigenvectors[..., 1],
+    }
+    parsed.update(parse_dielectric_properties(sections[-1], number_atoms))
+
+    return parsed
+
+
+def parse_dielectric_properties(content: str, number_atoms: int) -> dict:
+    """Parse the dielectric tensor and effective charges that ``ph.x`` writes after the dynamical matrix at Gamma.
+
+    :param content: the content of the file after the last dynamical matrix.
+    :param number_atoms: the number of atoms in the cell.
+    :return: dictionary with the ``dielectric_tensor`` and ``effective_charges_eu`` arrays, for those that are present.
+    :raises ValueError: if a section does not contain the expected number of values.
+    """
+    parsed = {}
+
+    for key, regex, shape in (
+        ('dielectric_tensor', REGEX_DIELECTRIC_TENSOR, (3, 3)),
+        ('effective_charges_eu', REGEX_EFFECTIVE_CHARGES, (number_atoms, 3, 3)),
+    ):
+        sections = regex.split(content, maxsplit=1)
+
+        if len(sections) == 1:
+            continue
+
+        # The section ends at the next one, e.g. the effective charges ``Effective Charges U-E`` if they are computed
+        section = re.split(r'\n\s*\n\s*[A-Z]', sections[1].lstrip('\n'), maxsplit=1)[0]
+        values = numpy.array(REGEX_FLOAT.findall(section), dtype=float)
+
+        if values.size != numpy.prod(shape):
+            raise ValueError(f'the `{key}` section does not contain the expected number of values')
+
+        parsed[key] = values.reshape(shape)
+
+    return parsed
+
+
+def parse_dynamical_matrix_header(content: str) -> dict:
+    """Parse the header of a ``dynamical-matrix-N`` file written by ``ph.x`` with the structure of the cell.
+
+    :param content: the content of the file.
+    :return: dictionary with the following keys:
+
+        * ``ibrav``: the Bravais lattice index.
+        * ``celldm``: the six lattice parameters, where ``celldm[0]`` is the lattice parameter ``alat`` in bohr.
+        * ``cell``: array with the lattice vectors as rows in units of ``alat``, only if ``ibrav`` is zero.
+        * ``species``: list of tuples with the name and mass in Rydberg atomic units of each species.
+        * ``atom_types``: list with the index of the species of each atom, starting from one.
+        * ``positions``: array of shape ``(nat, 3)`` with the cartesian positions of the atoms in units of ``alat``.
+
+    :raises ValueError: if the content does not contain the header of a dynamical matrix file.
+    """
+    lines = content.splitlines()
+
+    try:
+        values = lines[2].split()
+        number_species, number_atoms, ibrav = (int(value) for value in values[:3])
+        parsed = {'ibrav': ibrav, 'celldm': [float(value) for value in values[3:9]]}
+        start = 3
+
+        if ibrav == 0:
+            parsed['cell'] = numpy.array(' '.join(lines[4:7]).split(), dtype=float).reshape(3, 3)
+            start = 7
+
+        species = [REGEX_SPECIES.match(line).groups() for line in lines[start:start + number_species]]
+        parsed['species'] = [(name.strip(), float(mass)) for _, name, mass in species]
+
+        atoms = numpy.array(
+            ' '.join(lines[start + number_species:start + number_species + number_atoms]).split(), dtype=float
+        ).reshape(number_atoms, 5)
+        parsed['atom_types'] = atoms[:, 1].astype(int).tolist()
+        parsed['positions'] = atoms[:, 2:]
+    except (AttributeError, IndexError, ValueError) as exception:
+        raise ValueError('the content does not contain the header of a dynamical matrix file') from exception
+
+    return parsed
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""Utilities to compute the real-space force constants from the dynamical matrices on a q-point mesh with NumPy."""
+import io
+from typing import Optional, Sequence
+
+import numpy
+
+EWALD_ALPHA = 1.0
+"""The Ewald parameter of the long-range dipole-dipole term in units of ``(2 pi / alat)^2``, as in ``rgd_blk`` of QE."""
+
+EWALD_GMAX = 14.0
+"""The cutoff of the Gaussian ``exp(-|q + G|^2 / 4 alpha)`` of the long-range term, as in ``rgd_blk`` of QE."""
+
+E2 = 2.0
+"""The square of the electron charge in Rydberg atomic units."""
+
+
+def get_mesh_indices(qpoints: numpy.ndarray, cell: numpy.ndarray, mesh: Sequence[int]) -> numpy.ndarray:
+    """Return the indices of the q-points on the q-point mesh.
+
+    :param qpoints: array of shape ``(nq, 3)`` with the q-points in cartesian coordinates in units of ``2 pi / alat``.
+    :param cell: array with the lattice vectors as rows in units of ``alat``.
+    :param mesh: the number of q-points along each reciprocal lattice vector.
+    :return: array of shape ``(nq, 3)`` with the index of each q-point along each reciprocal lattice vector.
+    :raises ValueError: if a q-point is not on the mesh.
+    """
+    addresses = qpoints @ numpy.array(cell).T * numpy.array(mesh)
+    indices = numpy.rint(addresses).astype(int)
+
+    if not numpy.allclose(addresses, indices, atol=1e-5):
+        raise ValueError('the q-points of the dynamical matrices are not on the q-point mesh.')
+
+    return indices % numpy.array(mesh)
+
+
+def get_rigid_ion_term(
+    qpoints: numpy.ndarray,
+    cell: numpy.ndarray,
+    positions: numpy.ndarray,
+    alat: float,
+    dielectric_tensor: numpy.ndarray,
+    effective_charges: numpy.ndarray,
+    mesh: Sequence[int] = (2, 2, 2),
+) -> numpy.ndarray:
+    """Return the long-range dipole-dipole term of the dynamical matrices of a polar material at the given q-points.
+
+    This is a vectorized implementation of the reciprocal-space Ewald sum of ``rgd_blk`` in Quantum ESPRESSO, following
+    X. Gonze et al., Phys. Rev. B 50, 13035 (1994). The term is subtracted from the dynamical matrices before the
+    Fourier transform to real space, and added again when the force constants are interpolated.
+
+    :param qpoints: array of shape ``(nq, 3)`` with the q-points in cartesian coordinates in units of ``2 pi / alat``.
+    :param cell: array with the lattice vectors as rows in units of ``alat``.
+    :param positions: array of shape ``(nat, 3)`` with the cartesian positions of the atoms in units of ``alat``.
+    :param alat: the lattice parameter in bohr.
+    :param dielectric_tensor: the 3 x 3 dielectric tensor.
+    :param effective_charges: array of shape ``(nat, 3, 3)`` with the effective charges of each atom.
+    :param mesh: the q-point mesh, where a single q-point along a direction disables the sum along that direction.
+    :return: complex array of shape ``(nq, 3 nat, 3 nat)`` in units of Ry / bohr^2.
+    """
+    qpoints = numpy.array(qpoints, dtype=float).reshape(-1, 3)
+    cell = numpy.array(cell)
+    reciprocal_cell = numpy.linalg.inv(cell).T
+    volume = abs(numpy.linalg.det(cell)) * alat**3
+    number_atoms = len(positions)
+    factor = E2 * 4 * numpy.pi / volume
+
+    # Generate all reciprocal lattice vectors that can be within the cutoff of the Gaussian
+    ranges = []
+    for size, vector in zip(mesh, reciprocal_cell):
+        limit = 0 if size == 1 else int(numpy.sqrt(4 * EWALD_ALPHA * EWALD_GMAX) / numpy.linalg.norm(vector)) + 1
+        ranges.append(numpy.arange(-limit, limit + 1))
+
+    gvectors = numpy.stack(numpy.meshgrid(*ranges, indexing='ij'), axis=-1).reshape(-1, 3) @ reciprocal_cell
+
+    def get_weights(vectors):
+        products = numpy.einsum('...i,ij,...j->...', vectors, dielectric_tensor, vectors)
+        mask = (products > 0) & (products / EWALD_ALPHA / 4 < EWALD_GMAX)
+        products = numpy.where(mask, products, 1.)
+        return numpy.where(mask, factor * numpy.exp(-products / EWALD_ALPHA / 4) / products, 0.)
+
+    # The term at q = 0 with the phases ``cos(2 pi G (tau_a - tau_b))``, which is subtracted from the diagonal blocks to
+    # satisfy the acoustic sum rule. The charges are ``Z_a(G)_j = sum_i G_i Z_a,ij``.
+    charges = numpy.einsum('gi,aij->gaj', gvectors, effective_charges)
+    phases = numpy.exp(2j * numpy.pi * (gvectors @ positions.T))
+    sums = numpy.einsum('gab,gbj->gaj', (phases[:, :, None] * phases.conj()[:, None, :]).real, charges)
+    diagonal = numpy.einsum('g,gai,gaj->aij', get_weights(gvectors), charges, sums)
+
+    # Only keep the reciprocal lattice vectors that are within the cutoff for at least one of the q-points
+    radius = numpy.sqrt(4 * EWALD_ALPHA * EWALD_GMAX / numpy.linalg.eigvalsh(dielectric_tensor).min())
+    gvectors = gvectors[numpy.linalg.norm(gvectors, axis=1) < radius + numpy.linalg.norm(qpoints, axis=1).max()]
+
+    # The term ``sum_G w(q + G) Z_a(q + G)_i Z_b(q + G)_j exp(2 pi i (q + G) (tau_a - tau_b))`` as a batched product
+    vectors = gvectors[None, :, :] + qpoints[:, None, :]
+    charges = numpy.einsum('qgi,aij->qgaj', vectors, effective_charges)
+    phases = numpy.exp(2j * numpy.pi * (vectors @ positions.T))
+    amplitudes = (phases[..., None] * charges).reshape(len(qpoints), len(gvectors), 3 * number_atoms)
+    term = (amplitudes * get_weights(vectors)[..., None]).transpose(0, 2, 1) @ amplitudes.conj()
+
+    for atom in range(number_atoms):
+        term[:, 3 * atom:3 * atom + 3, 3 * atom:3 * atom + 3] -= diagonal[atom]
+
+    return term
+
+
+def get_nonanalytic_term(
+    directions: numpy.ndarray,
+    cell: numpy.ndarray,
+    alat: float,
+    dielectric_tensor: numpy.ndarray,
+    effective_charges: numpy.ndarray,
+) -> numpy.ndarray:
+    """Return the non-analytic term of the dynamical matrices of a polar material at Gamma along the given directions.
+
+    This is the LO-TO splitting of ``nonanal`` in Quantum ESPRESSO, ``4 pi e^2 / Omega (q Z_a)_i (q Z_b)_j / (q eps q)``
+    for the limit of ``q`` to zero along the direction ``q``.
+
+    :param directions: array of shape ``(nq, 3)`` with the cartesian directions, for which a zero vector gives no term.
+    :param cell: array with the lattice vectors as rows in units of ``alat``.
+    :param alat: the lattice parameter in bohr.
+    :param dielectric_tensor: the 3 x 3 dielectric tensor.
+    :param effective_charges: array of shape ``(nat, 3, 3)`` with the effective charges of each atom.
+    :return: array of shape ``(nq, 3 nat, 3 nat)`` in units of Ry / bohr^2.
+    """
+    directions = numpy.array(directions, dtype=float).reshape(-1, 3)
+    volume = abs(numpy.linalg.det(cell)) * alat**3
+    products = numpy.einsum('qi,ij,qj->q', directions, dielectric_tensor, directions)
+    mask = products > 1e-8
+
+    charges = numpy.einsum('qi,aij->qaj', directions, effective_charges).reshape(len(directions), -1)
+    term = charges[:, :, None] * charges[:, None, :] / numpy.where(mask, products, 1.)[:, None, None]
+
+    return numpy.where(mask[:, None, None], E2 * 4 * numpy.pi / volume * term, 0.)
+
+
+def set_acoustic_sum_rule(force_constants: numpy.ndarray) -> numpy.ndarray:
+    """Impose the simple acoustic sum rule on the force constants.
+
+    The on-site force constants are corrected such that the force constants of each atom sum to zero.
+
+    :param force_constants: array of shape ``(nr1, nr2, nr3, 3, 3, nat, nat)`` with the force constants.
+    :return: the force constants, which are corrected in place.
+    """
+    number_atoms = force_constants.shape[-1]
+    sums = force_constants.sum(axis=(0, 1, 2, 6))
+    force_constants[0, 0, 0][..., numpy.arange(number_atoms), numpy.arange(number_atoms)] -= sums
+
+    return force_constants
+
+
+def get_force_constants(
+    dynamical_matrices: numpy.ndarray,
+    indices: numpy.ndarray,
+    mesh: Sequence[int],
+    asr: str = 'no',
+) -> numpy.ndarray:
+    """Return the real-space force constants from the dynamical matrices of all q-points of a mesh.
+
+    :param dynamical_matrices: complex array of shape ``(nq, 3 nat, 3 nat)`` with the dynamical matrices.
+    :param indices: array of shape ``(nq, 3)`` with the indices of the q-points on the mesh.
+    :param mesh: the number of q-points along each reciprocal lattice vector.
+    :param asr: the acoustic sum rule imposed on the force constants, either ``no`` or ``simple``, for which the
+        on-site force constants are corrected such that the force constants of each atom sum to zero.
+    :return: array of shape ``(nr1, nr2, nr3, 3, 3, nat, nat)`` with the force constants, in the order of the file
+        written by ``q2r.x``.
+    :raises ValueError: if the dynamical matrices are not given for all q-points of the mesh.
+    """
+    if asr not in ('no', 'simple'):
+        raise ValueError(f'the acoustic sum rule `{asr}` is not supported, should be `no` or `simple`.')
+
+    number_atoms = dynamical_matrices.shape[-1] // 3
+    matrices = numpy.zeros(tuple(mesh) + (3 * number_atoms, 3 * number_atoms), dtype=complex)
+    is_set = numpy.zeros(tuple(mesh), dtype=bool)
+
+    matrices[tuple(indices.T)] = dynamical_matrices
+    is_set[tuple(indices.T)] = True
+
+    if not is_set.all():
+        raise ValueError(f'the dynamical matrices of {numpy.count_nonzero(~is_set)} q-points of the mesh are missing.')
+
+    # The force constants are ``C(R) = 1 / N sum_q D(q) exp(i q R)``, which is the inverse discrete Fourier transform
+    force_constants = numpy.fft.ifftn(matrices, axes=(0, 1, 2)).real
+    force_constants = force_constants.reshape(tuple(mesh) + (number_atoms, 3, number_atoms, 3))
+    force_constants = force_constants.transpose(0, 1, 2, 4, 6, 3, 5)
+
+    if asr == 'simple':
+        set_acoustic_sum_rule(force_constants)
+
+    return force_constants
+
+
+def write_force_constants(
+    force_constants: numpy.ndarray,
+    header: dict,
+    dielectric_tensor: Optional[numpy.ndarray] = None,
+    effective_charges: Optional[numpy.ndarray] = None,
+) -> str:
+    """Return the content of the force constants file in the format written by ``q2r.x``.
+
+    :param force_constants: array of shape ``(nr1, nr2, nr3, 3, 3, nat, nat)`` with the force constants.
+    :param header: the header of the dynamical matrix files as returned by ``parse_dynamical_matrix_header``.
+    :param dielectric_tensor: the 3 x 3 dielectric tensor, if the effective charges are defined.
+    :param effective_charges: array of shape ``(nat, 3, 3)`` with the effective charges of each atom.
+    :return: the content of the file.
+    """
+    mesh = force_constants.shape[:3]
+    number_atoms = force_constants.shape[-1]
+    celldm = ''.join(f'{value:11.7f}' for value in header['celldm'])
+
+    lines = [f'{len(header["species"]):3d}{number_atoms:5d}{header["ibrav"]:3d}{celldm}']
+
+    if header['ibrav'] == 0:
+        lines.extend('  ' + ''.join(f'{value:15.9f}' for value in vector) for vector in header['cell'])
+
+    lines.extend(f"{index:12d}  '{name}'  {mass:.10f}" for index, (name, mass) in enumerate(header['species'], 1))
+    lines.extend(
+        f'{index:5d}{atom_type:5d}' + ''.join(f'{value:18.10f}'
+                                              for value in position)
+        for index, (atom_type, position) in enumerate(zip(header['atom_types'], header['positions']), 1)
+    )
+
+    lines.append(' T' if effective_charges is not None else ' F')
+
+    if effective_charges is not None:
+        lines.extend(''.join(f'{value:24.12f}' for value in row) for row in dielectric_tensor)
+        for index, charges in enumerate(effective_charges, 1):
+            lines.append(f'{index:5d}')
+            lines.extend(''.join(f'{value:15.7f}' for value in row) for row in charges)
+
+    lines.append(''.join(f'{size:4d}' for size in mesh))
+
+    # The indices of the supercells, in the order of the file where the first index runs fastest
+    grid = numpy.indices(mesh[::-1]).reshape(3, -1)[::-1].T + 1
+    stream = io.StringIO()
+    stream.write('\n'.join(lines) + '\n')
+
+    for axis_a in range(3):
+        for axis_b in range(3):
+            for atom_a in range(number_atoms):
+                for atom_b in range(number_atoms):
+                    stream.write(f'{axis_a + 1:4d}{axis_b + 1:4d}{atom_a + 1:4d}{atom_b + 1:4d}\n')
+                    values = force_constants[:, :, :, axis_a, axis_b, atom_a, atom_b].transpose(2, 1, 0).ravel()
+                    numpy.savetxt(stream, numpy.column_stack([grid, values]), fmt='%4d%4d%4d  %18.11E')
+
+    return stream.getvalue()
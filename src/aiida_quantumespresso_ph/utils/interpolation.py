@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""Utilities to interpolate the phonon frequencies from the real-space force constants with NumPy."""
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import multiprocessing
+from typing import Optional
+
+import numpy
+from qe_tools import CONSTANTS
+
+from aiida_quantumespresso_ph.utils.force_constants import (
+    get_nonanalytic_term,
+    get_rigid_ion_term,
+    set_acoustic_sum_rule,
+)
+
+RY_TO_CMM1 = 109737.31570111268
+"""The conversion factor from the square root of the eigenvalues of the dynamical matrix in Rydberg atomic units to
+frequencies in cm^-1, as ``RY_TO_CMM1`` in Quantum ESPRESSO."""
+
+WIGNER_SEITZ_TOLERANCE = 1e-6
+"""The tolerance for a vector to lie on the boundary of the Wigner-Seitz cell, as in ``wsweight`` of QE."""
+
+_WORKER_STATE = {}
+"""The arrays and the kernel of the interpolation, which are sent once to each process of the pool."""
+
+
+def parse_force_constants(content: str, asr: str = 'no') -> dict:
+    """Parse the force constants file written by ``q2r.x`` into the arrays that are needed for the interpolation.
+
+    :param content: the content of the file.
+    :param asr: the acoustic sum rule imposed on the effective charges and force constants, either ``no`` or ``simple``.
+    :return: dictionary with the following keys:
+
+        * ``force_constants``: array of shape ``(nr1, nr2, nr3, 3, 3, nat, nat)`` with the force constants.
+        * ``cell``: array with the lattice vectors as rows in units of ``alat``.
+        * ``positions``: array of shape ``(nat, 3)`` with the cartesian positions of the atoms in units of ``alat``.
+        * ``alat``: the lattice parameter in bohr.
+        * ``masses``: array of shape ``(nat,)`` with the masses of the atoms in Rydberg atomic units.
+        * ``dielectric_tensor`` and ``effective_charges``: the dielectric tensor and the effective charges of shape
+          ``(nat, 3, 3)``, only if they were computed.
+
+    :raises ValueError: if the file cannot be parsed or the acoustic sum rule is not supported.
+    """
+    from aiida_quantumespresso.data.force_constants import parse_q2r_force_constants_file
+
+    if asr not in ('no', 'simple'):
+        raise ValueError(f'the acoustic sum rule `{asr}` is not supported, should be `no` or `simple`.')
+
+    lines = content.splitlines()
+    parsed, force_constants, _ = parse_q2r_force_constants_file(lines, also_force_constants=True)
+
+    # The cell and positions are parsed in angstrom, but the interpolation works in units of ``alat``
+    alat = float(lines[0].split()[3])
+    conversion = 1 / (alat * CONSTANTS.bohr_to_ang)
+
+    arrays = {
+        'force_constants': set_acoustic_sum_rule(force_constants) if asr == 'simple' else force_constants,
+        'cell': numpy.array(parsed['cell']) * conversion,
+        'positions': numpy.array([atom[2:] for atom in parsed['atom_list']]) * conversion,
+        'alat': alat,
+        'masses': numpy.array([atom[1] for atom in parsed['atom_list']]),
+    }
+
+    if parsed['has_done_electric_field']:
+        effective_charges = numpy.array(parsed['effective_charges_eu'])
+
+        if asr == 'simple':
+            effective_charges = effective_charges - effective_charges.mean(axis=0)
+
+        arrays['dielectric_tensor'] = numpy.array(parsed['dielectric_tensor'])
+        arrays['effective_charges'] = effective_charges
+
+    return arrays
+
+
+def get_wigner_seitz_weights(vectors: numpy.ndarray, supercell: numpy.ndarray) -> numpy.ndarray:
+    """Return the weight of each vector in the Wigner-Seitz cell of the supercell, as ``wsweight`` in QE.
+
+    The weight is zero for vectors outside of the Wigner-Seitz cell, one for those inside, and one divided by the number
+    of equivalent vectors for those on its boundary.
+
+    :param vectors: array of shape ``(n, 3)`` with the cartesian vectors.
+    :param supercell: array with the lattice vectors of the supercell as rows.
+    :return: array of shape ``(n,)`` with the weights.
+    """
+    images = numpy.array([image for image in itertools.product(range(-2, 3), repeat=3) if any(image)]) @ supercell
+    distances = vectors @ images.T - 0.5 * numpy.sum(images**2, axis=1)
+
+    is_outside = numpy.any(distances > WIGNER_SEITZ_TOLERANCE, axis=1)
+    number_equivalent = 1 + numpy.count_nonzero(numpy.abs(distances) < WIGNER_SEITZ_TOLERANCE, axis=1)
+
+    return numpy.where(is_outside, 0., 1. / number_equivalent)
+
+
+def get_interpolation_kernel(force_constants: numpy.ndarray, cell: numpy.ndarray, positions: numpy.ndarray) -> tuple:
+    """Return the lattice vectors and the weighted force constants of the Fourier interpolation, as in ``frc_blk``.
+
+    The force constants of each pair of atoms are assigned to the lattice vectors ``R`` for which ``R + tau_a - tau_b``
+    is within the Wigner-Seitz cell of the supercell. The dynamical matrix at any q-point is then the Fourier sum
+    ``D(q) = sum_R C(R) exp(-2 pi i q R)``, which is computed for many q-points at once as a single matrix product.
+
+    :param force_constants: array of shape ``(nr1, nr2, nr3, 3, 3, nat, nat)`` with the force constants.
+    :param cell: array with the lattice vectors as rows in units of ``alat``.
+    :param positions: array of shape ``(nat, 3)`` with the cartesian positions of the atoms in units of ``alat``.
+    :return: tuple of the array of shape ``(nR, 3)`` with the cartesian lattice vectors in units of ``alat`` and the
+        array of shape ``(nR, 3 nat, 3 nat)`` with the weighted force constants.
+    """
+    mesh = numpy.array(force_constants.shape[:3])
+    number_atoms = force_constants.shape[-1]
+    supercell = numpy.array(cell) * mesh[:, None]
+
+    indices = numpy.stack(numpy.meshgrid(*(numpy.arange(-2 * size, 2 * size + 1) for size in mesh), indexing='ij'))
+    indices = indices.reshape(3, -1).T
+    vectors = indices @ cell
+
+    weights = numpy.zeros((len(vectors), number_atoms, number_atoms))
+
+    for atom_a, atom_b in itertools.product(range(number_atoms), repeat=2):
+        shifted = vectors + positions[atom_a] - positions[atom_b]
+        weights[:, atom_a, atom_b] = get_wigner_seitz_weights(shifted, supercell)
+
+    # Only keep the lattice vectors within the Wigner-Seitz cell for at least one pair of atoms
+    is_used = numpy.any(weights > 0, axis=(1, 2))
+    indices, vectors, weights = indices[is_used], vectors[is_used], weights[is_used]
+
+    # The force constants of each lattice vector, of shape ``(nR, 3, 3, nat, nat)``, in the layout ``(3 nat, 3 nat)``
+    matrices = force_constants[tuple((indices % mesh).T)] * weights[:, None, None, :, :]
+    matrices = matrices.transpose(0, 3, 1, 4, 2).reshape(len(vectors), 3 * number_atoms, 3 * number_atoms)
+
+    return vectors, matrices
+
+
+def get_gamma_directions(qpoints: numpy.ndarray) -> numpy.ndarray:
+    """Return the direction of approach of the Gamma points of a path, for the non-analytic term, as in ``matdyn.x``.
+
+    The direction of a Gamma point is the difference with the preceding q-point of the path, or with the next one if the
+    Gamma point is the first of the path or if the preceding q-point is also Gamma.
+
+    :param qpoints: array of shape ``(nq, 3)`` with the cartesian q-points of the path.
+    :return: array of shape ``(nq, 3)`` with the unit direction of each Gamma point and zero vectors for the others.
+    """
+    directions = numpy.zeros_like(qpoints)
+    is_gamma = numpy.all(qpoints == 0, axis=1)
+
+    for index in numpy.flatnonzero(is_gamma):
+        if index > 0 and not is_gamma[index - 1]:
+            directions[index] = qpoints[index] - qpoints[index - 1]
+        elif index < len(qpoints) - 1:
+            directions[index] = qpoints[index] - qpoints[index + 1]
+
+    norms = numpy.linalg.norm(directions, axis=1)
+
+    return directions / numpy.where(norms > 0, norms, 1.)[:, None]
+
+
+def get_frequencies(qpoints: numpy.ndarray, arrays: dict, kernel: tuple, directions: Optional[numpy.ndarray] = None):
+    """Return the phonon frequencies at the given q-points.
+
+    The dynamical matrices of all q-points are computed at once, including the long-range dipole-dipole term and the
+    non-analytic term at Gamma for polar materials, and diagonalized with a single batched call.
+
+    :param qpoints: array of shape ``(nq, 3)`` with the cartesian q-points in units of ``2 pi / alat``.
+    :param arrays: the arrays returned by ``parse_force_constants``.
+    :param kernel: the lattice vectors and weighted force constants returned by ``get_interpolation_kernel``.
+    :param directions: optional array of shape ``(nq, 3)`` with the direction of approach of the Gamma points.
+    :return: array of shape ``(nq, 3 nat)`` with the frequencies in cm^-1 in ascending order, where imaginary
+        frequencies are returned as negative numbers.
+    """
+    vectors, matrices = kernel
+    number_modes = matrices.shape[-1]
+
+    phases = numpy.exp(-2j * numpy.pi * (qpoints @ vectors.T))
+    dynamical_matrices = (phases @ matrices.reshape(len(vectors), -1)).reshape(-1, number_modes, number_modes)
+
+    if 'effective_charges' in arrays:
+        cell, alat = arrays['cell'], arrays['alat']
+        dielectric_tensor, effective_charges = arrays['dielectric_tensor'], arrays['effective_charges']
+        mesh = arrays['force_constants'].shape[:3]
+
+        dynamical_matrices += get_rigid_ion_term(
+            qpoints, cell, arrays['positions'], alat, dielectric_tensor, effective_charges, mesh
+        )
+
+        if directions is not None:
+            dynamical_matrices += get_nonanalytic_term(directions, cell, alat, dielectric_tensor, effective_charges)
+
+    masses = numpy.sqrt(numpy.repeat(arrays['masses'], 3))
+    dynamical_matrices /= masses[:, None] * masses[None, :]
+    dynamical_matrices = 0.5 * (dynamical_matrices + dynamical_matrices.conj().transpose(0, 2, 1))
+
+    eigenvalues = numpy.linalg.eigvalsh(dynamical_matrices)
+
+    return numpy.sign(eigenvalues) * numpy.sqrt(numpy.abs(eigenvalues)) * RY_TO_CMM1
+
+
+def interpolate_frequencies(
+    qpoints: numpy.ndarray,
+    arrays: dict,
+    is_path: bool = True,
+    chunk_size: int = 1000,
+    max_workers: Optional[int] = None,
+) -> numpy.ndarray:
+    """Return the phonon frequencies at the given q-points, which are processed in chunks to bound the memory.
+
+    :param qpoints: array of shape ``(nq, 3)`` with the q-points in crystal coordinates of the reciprocal cell.
+    :param arrays: the arrays returned by ``parse_force_constants``.
+    :param is_path: whether the q-points are a path, for which the non-analytic term is added at the Gamma points.
+    :param chunk_size: the number of q-points of each chunk.
+    :param max_workers: the number of processes over which the chunks are distributed. By default, the chunks are
+        processed one after the other in the current process. The processes are spawned instead of forked, since
+        forking a process with threads and open connections, such as the daemon, is not safe, and the arrays and
+        kernel are passed once to each process instead of with each chunk.
+    :return: array of shape ``(nq, 3 nat)`` with the frequencies in cm^-1.
+    """
+    kernel = get_interpolation_kernel(arrays['force_constants'], arrays['cell'], arrays['positions'])
+    qpoints = numpy.array(qpoints, dtype=float).reshape(-1, 3) @ numpy.linalg.inv(arrays['cell']).T
+    directions = get_gamma_directions(qpoints) if is_path else None
+
+    chunks = [slice(start, start + chunk_size) for start in range(0, len(qpoints), chunk_size)]
+    arguments = [(qpoints[chunk], None if directions is None else directions[chunk]) for chunk in chunks]
+
+    if max_workers is None or max_workers < 2 or len(chunks) < 2:
+        results = [get_frequencies(qpoints, arrays, kernel, directions) for qpoints, directions in arguments]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_initialize_worker,
+            initargs=(arrays, kernel),
+        ) as executor:
+            results = list(executor.map(_get_frequencies, arguments))
+
+    if not results:
+        return numpy.zeros((0, 3 * arrays['force_constants'].shape[-1]))
+
+    return numpy.concatenate(results)
+
+
+def _initialize_worker(arrays, kernel):
+    """Store the arrays and the kernel of the interpolation in a process of the pool."""
+    _WORKER_STATE.update(arrays=arrays, kernel=kernel)
+
+
+def _get_frequencies(argument):
+    """Return the frequencies of a chunk of q-points, with a single argument for ``ProcessPoolExecutor.map``."""
+    qpoints, directions = argument
+    return get_frequencies(qpoints, _WORKER_STATE['arrays'], _WORKER_STATE['kernel'], directions)
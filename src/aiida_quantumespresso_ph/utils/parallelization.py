@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Utilities to choose how the q-points of a ``ph.x`` calculation are distributed over jobs."""
+import heapq
+from typing import Optional, Sequence
+
+from aiida_quantumespresso_ph.utils.partition import partition_costs
+
+PARALLELIZATION_EXTRA = 'parallelization'
+"""Name of the extra of a ``PhWorkChain`` with the chosen way to distribute the q-points and its estimated makespan."""
+
+PARALLELIZATION_MODES = ('serial', 'parallel', 'batch')
+"""The ways to distribute the q-points over jobs, in order of preference for the same estimated makespan."""
+
+JOB_OVERHEAD_SECONDS = 1800
+"""The estimated overhead of each job in seconds, i.e. the time spent in the queue and on the start-up of ``ph.x``."""
+
+DEFAULT_IRREP_SECONDS = 300
+"""The estimated wallclock time in seconds of a single irreducible representation, if it cannot be predicted."""
+
+
+def get_list_makespan(durations: Sequence[float], number_of_slots: int) -> float:
+    """Return the makespan of jobs that are started in the given order as soon as one of the slots is free.
+
+    :param durations: the duration of each job.
+    :param number_of_slots: the number of jobs that can run at the same time.
+    :return: the time at which the last job finishes.
+    """
+    slots = [0.] * max(1, number_of_slots)
+
+    for duration in durations:
+        heapq.heappush(slots, heapq.heappop(slots) + duration)
+
+    return max(slots)
+
+
+def estimate_makespans(
+    qpoint_seconds: Sequence[float],
+    max_concurrent: Optional[int] = None,
+    job_overhead_seconds: float = JOB_OVERHEAD_SECONDS,
+) -> dict:
+    """Return the estimated makespan of each way to distribute the q-points over jobs.
+
+    * ``serial``: a single job computes all q-points.
+    * ``parallel``: after an initialization job, each q-point is computed by its own job, of which at most
+      ``max_concurrent`` run at the same time.
+    * ``batch``: after an initialization job, the q-points are grouped in ``max_concurrent`` contiguous batches,
+      balanced by their cost, that all run at the same time.
+
+    :param qpoint_seconds: the estimated wallclock time in seconds of each irreducible q-point.
+    :param max_concurrent: the maximum number of jobs that run at the same time, by default unlimited.
+    :param job_overhead_seconds: the overhead of each job in seconds, which is also the estimated duration of the
+        initialization job.
+    :return: dictionary with the makespan in seconds of each of the ``PARALLELIZATION_MODES`` and the
+        ``number_of_batches`` of the ``batch`` mode.
+    """
+    number_qpoints = len(qpoint_seconds)
+    number_of_slots = number_qpoints if max_concurrent is None else min(max_concurrent, number_qpoints)
+    batches = partition_costs(qpoint_seconds, number_of_slots)
+
+    parallel = get_list_makespan([job_overhead_seconds + seconds for seconds in qpoint_seconds], number_of_slots)
+    batch = job_overhead_seconds + max(sum(qpoint_seconds[start:stop]) for start, stop in batches)
+
+    return {
+        'serial': job_overhead_seconds + sum(qpoint_seconds),
+        'parallel': job_overhead_seconds + parallel,
+        'batch': job_overhead_seconds + batch,
+        'number_of_batches': len(batches),
+    }
+
+
+def select_parallelization_mode(makespans: dict, number_qpoints: int) -> str:
+    """Return the way to distribute the q-points over jobs with the smallest estimated makespan.
+
+    For the same makespan, the mode that comes first in ``PARALLELIZATION_MODES`` is chosen, since it runs fewer jobs.
+    The ``batch`` mode is only considered if it groups at least two q-points in a batch.
+
+    :param makespans: the estimated makespans as returned by ``estimate_makespans``.
+    :param number_qpoints: the number of irreducible q-points.
+    :return: one of the ``PARALLELIZATION_MODES``.
+    """
+    modes = [
+        mode for mode in PARALLELIZATION_MODES if mode != 'batch' or makespans['number_of_batches'] < number_qpoints
+    ]
+
+    return min(modes, key=lambda mode: makespans[mode])
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Utilities to balance the computational cost of a sequence of tasks over a number of jobs."""
+from typing import List, Sequence, Tuple
+
+
+def _get_partition(costs: Sequence[float], max_cost: float) -> List[Tuple[int, int]]:
+    """Greedily split ``costs`` in contiguous ranges whose total cost does not exceed ``max_cost``."""
+    ranges = []
+    start = 0
+    total = 0
+
+    for index, cost in enumerate(costs):
+        if index > start and total + cost > max_cost:
+            ranges.append((start, index))
+            start = index
+            total = 0
+        total += cost
+
+    ranges.append((start, len(costs)))
+
+    return ranges
+
+
+def partition_costs(costs: Sequence[float], number_of_parts: int) -> List[Tuple[int, int]]:
+    """Partition a sequence of costs in contiguous ranges such that the cost of the most expensive range is minimal.
+
+    The ranges are contiguous because ``ph.x`` can only select a range of q-points or irreducible representations
+    through the ``start_q``/``last_q`` and ``start_irr``/``last_irr`` inputs. The optimal maximum cost is found through
+    a bisection between the largest single cost and the total cost. Note that fewer ranges than ``number_of_parts`` can
+    be returned, if adding more ranges would not decrease the cost of the most expensive one.
+
+    :param costs: the estimated cost of each task.
+    :param number_of_parts: the maximum number of ranges.
+    :return: list of ``(start, stop)`` tuples with the indices of each range, where ``stop`` is excluded.
+    """
+    if number_of_parts < 1:
+        raise ValueError(f'the number of parts should be a positive integer, but got: {number_of_parts}')
+
+    if not costs:
+        return []
+
+    if number_of_parts >= len(costs):
+        return [(index, index + 1) for index in range(len(costs))]
+
+    lower = max(costs)
+    upper = sum(costs)
+
+    while upper - lower > 1e-6 * upper:
+        middle = (lower + upper) / 2
+
+        if len(_get_partition(costs, middle)) <= number_of_parts:
+            upper = middle
+        else:
+            lower = middle
+
+    return _get_partition(costs, upper)
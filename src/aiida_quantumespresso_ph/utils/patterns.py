@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Utilities to read the displacement patterns that ``ph.x`` writes during the initialization of a q-point grid."""
+import os
+import re
+from typing import Dict, List
+
+from aiida.orm import FolderData
+from aiida.plugins import CalculationFactory
+
+
+def get_patterns_retrieve_list() -> list:
+    """Return the ``additional_retrieve_list`` entries needed to retrieve the displacement patterns of a ``ph.x`` run.
+
+    The ``patterns.N.xml`` files are written in the ``_ph0/{prefix}.phsave`` folder of the output directory and contain
+    the irreducible representations of the N-th q-point. Since the filepath contains a wildcard, the files are retrieved
+    in the top level directory of the ``retrieved`` folder.
+    """
+    PhCalculation = CalculationFactory('quantumespresso.ph')
+
+    filepath = os.path.join(
+        PhCalculation._OUTPUT_SUBFOLDER,  # pylint: disable=protected-access
+        '_ph0',
+        f'{PhCalculation._PREFIX}.phsave',  # pylint: disable=protected-access
+        'patterns.*.xml',
+    )
+    return [filepath]
+
+
+def get_perturbations_from_patterns(retrieved: FolderData) -> Dict[int, List[int]]:
+    """Return the number of perturbations of each irreducible representation for every q-point.
+
+    :param retrieved: a ``FolderData`` with the ``patterns.N.xml`` files in its top level directory.
+    :return: dictionary with the q-point index (starting from 1, as in ``ph.x``) as keys and the list with the number of
+        perturbations, i.e. modes, of each irreducible representation as values. The dictionary is empty if the folder
+        does not contain any patterns.
+    """
+    perturbations = {}
+
+    for filename in retrieved.base.repository.list_object_names():
+        match = re.match(r'patterns\.(\d+)\.xml$', filename)
+
+        if match is None:
+            continue
+
+        content = retrieved.base.repository.get_object_content(filename)
+        number_irreps = re.search(r'<NUMBER_IRR_REP[^>]*>\s*(\d+)', content)
+        number_perturbations = [int(value) for value in re.findall(r'<NUMBER_OF_PERTURBATIONS[^>]*>\s*(\d+)', content)]
+
+        if number_irreps is None or int(number_irreps.group(1)) != len(number_perturbations):
+            raise ValueError(f'could not parse the irreducible representations from `{filename}`.')
+
+        perturbations[int(match.group(1))] = number_perturbations
+
+    return perturbations
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Utilities to determine the irreducible q-points of a q-point mesh from the symmetries of the structure."""
+from typing import List, Optional, Sequence, Tuple
+
+from aiida.orm import StructureData
+import numpy
+
+
+def get_spglib_cell(structure: StructureData) -> tuple:
+    """Return the ``spglib`` cell tuple of a structure, where sites with a different kind are inequivalent.
+
+    :param structure: the ``StructureData`` of the crystal.
+    :return: tuple of the cell, the scaled positions and the kind numbers of the sites.
+    """
+    cell = numpy.array(structure.cell)
+    positions = numpy.array([site.position for site in structure.sites])
+    kind_names = [kind.name for kind in structure.kinds]
+    numbers = [kind_names.index(site.kind_name) + 1 for site in structure.sites]
+
+    return cell, numpy.linalg.solve(cell.T, positions.T).T, numbers
+
+
+def get_number_of_symmetries(structure: StructureData, symprec: float = 1e-5) -> int:
+    """Return the number of symmetry operations of a structure, as determined by ``spglib``.
+
+    :param structure: the ``StructureData`` of the crystal.
+    :param symprec: the tolerance for the symmetry search.
+    :return: the number of symmetry operations.
+    """
+    import spglib
+
+    symmetry = spglib.get_symmetry(get_spglib_cell(structure), symprec=symprec)
+
+    if symmetry is None:
+        raise ValueError('`spglib` could not determine the symmetries of the structure.')
+
+    return len(symmetry['rotations'])
+
+
+def get_irreducible_qpoints(
+    structure: StructureData,
+    mesh: Sequence[int],
+    time_reversal: bool = True,
+    symprec: float = 1e-5
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return the irreducible q-points of an unshifted q-point mesh, as determined by ``spglib``.
+
+    The first q-point is always the Gamma point, as for the q-points that are generated by ``ph.x``.
+
+    :param structure: the ``StructureData`` of the crystal.
+    :param mesh: the number of q-points along each reciprocal lattice vector.
+    :param time_reversal: whether the q-points ``q`` and ``-q`` are equivalent.
+    :param symprec: the tolerance for the symmetry search.
+    :return: tuple of the irreducible q-points in crystal coordinates and the number of q-points in their star.
+    """
+    mapping, grid_addresses = _get_ir_reciprocal_mesh(structure, mesh, time_reversal, symprec)
+    indices, multiplicities = numpy.unique(mapping, return_counts=True)
+
+    return grid_addresses[indices] / numpy.array(mesh), multiplicities
+
+
+def get_star_multiplicities(
+    structure: StructureData,
+    mesh: Sequence[int],
+    qpoints: numpy.ndarray,
+    time_reversal: bool = True,
+    symprec: float = 1e-5
+) -> Optional[numpy.ndarray]:
+    """Return the number of q-points in the star of each of the given irreducible q-points of a mesh.
+
+    :param structure: the ``StructureData`` of the crystal.
+    :param mesh: the number of q-points along each reciprocal lattice vector.
+    :param qpoints: array with the irreducible q-points in crystal coordinates.
+    :param time_reversal: whether the q-points ``q`` and ``-q`` are equivalent.
+    :param symprec: the tolerance for the symmetry search.
+    :return: array with the number of q-points in the star of each q-point, or ``None`` if the q-points are not on the
+        mesh or if their stars do not add up to the full mesh, i.e. if the symmetries differ from those used to reduce
+        the q-points.
+    """
+    mesh = numpy.array(mesh)
+    addresses = qpoints * mesh
+
+    if not numpy.allclose(addresses, numpy.rint(addresses), atol=1e-5):
+        return None
+
+    mapping, grid_addresses = _get_ir_reciprocal_mesh(structure, mesh, time_reversal, symprec)
+    star_sizes = numpy.bincount(mapping, minlength=len(mapping))
+    grid_indices = {tuple(address): index for index, address in enumerate(grid_addresses % mesh)}
+
+    try:
+        indices = [grid_indices[tuple(address)] for address in numpy.rint(addresses).astype(int) % mesh]
+    except KeyError:
+        return None
+
+    multiplicities = star_sizes[mapping[indices]]
+
+    if len(set(mapping[indices])) != len(indices) or multiplicities.sum() != mesh.prod():
+        return None
+
+    return multiplicities
+
+
+def parse_dynamical_matrix_0(content: str) -> Tuple[List[int], numpy.ndarray]:
+    """Parse the ``dynamical-matrix-0`` file that ``ph.x`` writes with the irreducible q-points of a mesh.
+
+    :param content: the content of the file.
+    :return: tuple of the q-point mesh and the array with the q-points in cartesian coordinates in units of
+        ``2 pi / alat``.
+    :raises ValueError: if the content does not contain the list of q-points.
+    """
+    values = content.split()
+
+    try:
+        mesh = [int(value) for value in values[:3]]
+        number_qpoints = int(values[3])
+        qpoints = numpy.array(values[4:4 + 3 * number_qpoints], dtype=float).reshape(number_qpoints, 3)
+    except (IndexError, ValueError) as exception:
+        raise ValueError('the content does not contain the list of q-points') from exception
+
+    return mesh, qpoints
+
+
+def _get_ir_reciprocal_mesh(structure, mesh, time_reversal, symprec):
+    """Return the mapping to the irreducible q-points and the grid addresses of an unshifted mesh from ``spglib``."""
+    import spglib
+
+    result = spglib.get_ir_reciprocal_mesh(
+        numpy.array(mesh),
+        get_spglib_cell(structure),
+        is_shift=[0, 0, 0],
+        is_time_reversal=time_reversal,
+        symprec=symprec
+    )
+
+    if result is None:
+        raise ValueError('`spglib` could not determine the irreducible q-points of the structure.')
+
+    return result
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""Utilities to predict the wallclock time of ``ph.x`` calculations from the completed calculations in the database."""
+from typing import List, Optional, Tuple
+
+from aiida import orm
+import numpy
+
+WALLTIME_FEATURES = ('number_of_atoms', 'number_of_irreps', 'number_of_k_points', 'ecutwfc')
+"""The features of a ``ph.x`` calculation from which its cost is predicted, in the order of the model coefficients."""
+
+MIN_WALLCLOCK_SECONDS = 600
+"""The minimum wallclock time in seconds that is requested for a calculation, to absorb the start-up overhead."""
+
+
+def get_pw_features(pw_calculation: orm.CalcJobNode) -> dict:
+    """Return the features of the ``pw.x`` calculation on whose output folder a ``ph.x`` calculation is run.
+
+    :param pw_calculation: the ``PwCalculation``.
+    :return: dictionary with the ``number_of_atoms``, ``number_of_k_points`` and ``ecutwfc``.
+    :raises ValueError: if one of the features cannot be determined.
+    """
+    try:
+        structure = pw_calculation.outputs.output_structure
+    except AttributeError:
+        structure = pw_calculation.inputs.structure
+
+    try:
+        number_of_k_points = pw_calculation.outputs.output_parameters.get_dict()['number_of_k_points']
+    except (AttributeError, KeyError):
+        try:
+            number_of_k_points = int(numpy.prod(pw_calculation.inputs.kpoints.get_kpoints_mesh()[0]))
+        except AttributeError:
+            number_of_k_points = len(pw_calculation.inputs.kpoints.get_kpoints())
+
+    try:
+        ecutwfc = pw_calculation.inputs.parameters.get_dict()['SYSTEM']['ecutwfc']
+    except KeyError as exception:
+        raise ValueError(f'the `ecutwfc` of {pw_calculation} is not defined.') from exception
+
+    return {'number_of_atoms': len(structure.sites), 'number_of_k_points': number_of_k_points, 'ecutwfc': ecutwfc}
+
+
+def get_number_of_computed_irreps(output_parameters: dict, inputph: dict) -> int:
+    """Return the number of irreducible representations that were computed by a ``ph.x`` calculation.
+
+    :param output_parameters: the output parameters of the ``PhCalculation``.
+    :param inputph: the ``INPUTPH`` namelist of the input parameters of the ``PhCalculation``.
+    :return: the number of irreducible representations, which is zero for an initialization run with ``only_init`` or
+        ``last_irr = 0``, since these only determine the irreducible representations without computing them.
+    """
+    start_irr = inputph.get('start_irr', 1)
+    last_irr = inputph.get('last_irr', None)
+
+    if inputph.get('only_init', False) or last_irr == 0:
+        return 0
+
+    number_of_irreps = sum(output_parameters.get('number_of_irr_representations_for_each_q', []))
+
+    # A calculation of a range of irreducible representations of a single q-point only computes that range
+    if last_irr is not None and number_of_irreps:
+        number_of_irreps = min(number_of_irreps, last_irr) - start_irr + 1
+
+    return number_of_irreps
+
+
+def get_walltime_sample_from_attributes(
+    output_parameters: dict,
+    inputph: dict,
+    resources: dict,
+    pw_features: dict,
+) -> Optional[Tuple[List[float], float]]:
+    """Return the features and the cost of a completed ``PhCalculation`` from its attributes.
+
+    :param output_parameters: the output parameters of the ``PhCalculation``.
+    :param inputph: the ``INPUTPH`` namelist of the input parameters of the ``PhCalculation``.
+    :param resources: the ``resources`` option of the ``PhCalculation``.
+    :param pw_features: the features of the parent ``PwCalculation`` as returned by ``get_pw_features``.
+    :return: tuple of the features in the order of ``WALLTIME_FEATURES`` and the cost, or ``None`` if the calculation
+        did not compute any irreducible representation.
+    """
+    wall_time_seconds = output_parameters.get('wall_time_seconds', 0) or 0
+    number_of_irreps = get_number_of_computed_irreps(output_parameters, inputph)
+
+    if wall_time_seconds <= 0 or number_of_irreps <= 0:
+        return None
+
+    features = {**pw_features, 'number_of_irreps': number_of_irreps}
+    num_machines = resources.get('num_machines', 1)
+
+    return [float(features[key]) for key in WALLTIME_FEATURES], wall_time_seconds * num_machines
+
+
+def get_restart_chain(calculation: orm.CalcJobNode) -> Tuple[List[orm.CalcJobNode], Optional[orm.CalcJobNode]]:
+    """Return the ``PhCalculation``s that were restarted from each other's output folder up to the given calculation.
+
+    :param calculation: the last ``PhCalculation`` of the chain.
+    :return: tuple of the ``PhCalculation``s of the chain in the order in which they were run, and the calculation on
+        whose output folder the first one was run, e.g. the ``PwCalculation``, or ``None`` if there is none.
+    """
+    from aiida.plugins import CalculationFactory
+
+    process_type = CalculationFactory('quantumespresso.ph').build_process_type()
+    chain = [calculation]
+    parent = calculation.inputs.parent_folder.creator if 'parent_folder' in calculation.inputs else None
+
+    while parent is not None and parent.process_type == process_type and parent not in chain:
+        chain.append(parent)
+        parent = parent.inputs.parent_folder.creator if 'parent_folder' in parent.inputs else None
+
+    return chain[::-1], parent
+
+
+def get_machine_seconds(calculation: orm.CalcJobNode) -> Optional[float]:
+    """Return the number of machine-seconds that a calculation ran, e.g. one of a restart chain that did not finish.
+
+    :param calculation: the ``PhCalculation``.
+    :return: the ``wall_time_seconds`` of the output parameters, or the ``max_wallclock_seconds`` of a calculation that
+        was killed before writing them, multiplied by the number of machines, or ``None`` if neither is known.
+    """
+    try:
+        wall_time_seconds = calculation.outputs.output_parameters.get('wall_time_seconds', 0) or 0
+    except AttributeError:
+        wall_time_seconds = 0
+
+    wall_time_seconds = wall_time_seconds or calculation.base.attributes.get('max_wallclock_seconds', None)
+
+    if not wall_time_seconds:
+        return None
+
+    return wall_time_seconds * calculation.base.attributes.get('resources', {}).get('num_machines', 1)
+
+
+def get_walltime_sample(calculation: orm.CalcJobNode) -> Optional[Tuple[List[float], float]]:
+    """Return the features and the cost of a completed ``PhCalculation``.
+
+    The cost is the number of machine-seconds, i.e. the ``wall_time_seconds`` of the output parameters multiplied by the
+    number of machines, such that calculations on a different number of machines can be compared. For a calculation
+    that was restarted from the output folder of earlier ``PhCalculation``s, the features are those of the
+    ``PwCalculation`` at the start of the chain and the cost is that of all calculations of the chain, since the last
+    one only computed the part of the irreducible representations that the others did not finish.
+
+    :param calculation: the ``PhCalculation``.
+    :return: tuple of the features in the order of ``WALLTIME_FEATURES`` and the cost, or ``None`` if the calculation
+        did not compute any irreducible representation, e.g. an initialization run, or if its features cannot be
+        determined.
+    """
+    chain, pw_calculation = get_restart_chain(calculation)
+
+    try:
+        pw_features = get_pw_features(pw_calculation)
+    except (AttributeError, ValueError):
+        return None
+
+    sample = get_walltime_sample_from_attributes(
+        calculation.outputs.output_parameters.get_dict(),
+        calculation.inputs.parameters.get_dict().get('INPUTPH', {}),
+        calculation.base.attributes.get('resources', {}),
+        pw_features,
+    )
+    costs = [get_machine_seconds(node) for node in chain[:-1]]
+
+    if sample is None or None in costs:
+        return None
+
+    return sample[0], sample[1] + sum(costs)
+
+
+def get_walltime_samples(limit: int = 1000) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """Return the features and costs of the most recent ``PhCalculation``s in the database that finished successfully.
+
+    The attributes that are needed for the features and the costs are projected by a single query over the
+    calculations, their input and output parameters and the inputs and outputs of the ``PwCalculation`` on whose
+    output folder they were run, so the nodes are never loaded one by one. The restarts from the output folder of an
+    earlier ``PhCalculation`` are queried separately and their restart chains are followed back to the
+    ``PwCalculation`` by ``get_walltime_sample``, such that the calculations that only finished the work of a chain do
+    not bias the model towards lower costs.
+
+    :param limit: the maximum number of calculations that are considered, as well as of restarts.
+    :return: tuple of the array of shape ``(n, len(WALLTIME_FEATURES))`` with the features and the array of shape
+        ``(n,)`` with the costs in machine-seconds.
+    """
+    from aiida.plugins import CalculationFactory
+
+    PhCalculation = CalculationFactory('quantumespresso.ph')
+    PwCalculation = CalculationFactory('quantumespresso.pw')
+
+    builder = orm.QueryBuilder().append(
+        orm.CalcJobNode,
+        filters={
+            'process_type': PhCalculation.build_process_type(),
+            'attributes.process_state': 'finished',
+            'attributes.exit_status': 0,
+        },
+        project=['attributes.resources'],
+        tag='ph',
+    )
+    builder.append(
+        orm.Dict,
+        with_outgoing='ph',
+        edge_filters={'label': 'parameters'},
+        project=['attributes.INPUTPH'],
+    )
+    builder.append(
+        orm.Dict,
+        with_incoming='ph',
+        edge_filters={'label': 'output_parameters'},
+        project=['attributes.wall_time_seconds', 'attributes.number_of_irr_representations_for_each_q'],
+    )
+    builder.append(orm.RemoteData, with_outgoing='ph', edge_filters={'label': 'parent_folder'}, tag='parent_folder')
+    builder.append(
+        orm.CalcJobNode,
+        with_outgoing='parent_folder',
+        filters={'process_type': PwCalculation.build_process_type()},
+        tag='pw',
+    )
+    builder.append(orm.Dict, with_outgoing='pw', edge_filters={'label': 'parameters'}, project=['attributes.SYSTEM'])
+    builder.append(
+        orm.StructureData, with_outgoing='pw', edge_filters={'label': 'structure'}, project=['attributes.sites']
+    )
+    builder.append(
+        orm.KpointsData,
+        with_outgoing='pw',
+        edge_filters={'label': 'kpoints'},
+        project=['attributes.mesh', 'attributes.array|kpoints'],
+    )
+    builder.append(
+        orm.Dict,
+        with_incoming='pw',
+        edge_filters={'label': 'output_parameters'},
+        project=['attributes.number_of_k_points'],
+    )
+    builder.order_by({'ph': {'ctime': 'desc'}}).limit(limit)
+
+    samples = []
+
+    for row in builder.iterall():
+        resources, inputph, wall_time_seconds, number_of_irreps, system, sites, mesh, shape, number_of_k_points = row
+
+        if (system or {}).get('ecutwfc') is None:
+            continue
+
+        if number_of_k_points is None:
+            number_of_k_points = int(numpy.prod(mesh)) if mesh is not None else shape[0]
+
+        pw_features = {
+            'number_of_atoms': len(sites),
+            'number_of_k_points': number_of_k_points,
+            'ecutwfc': system['ecutwfc'],
+        }
+        output_parameters = {
+            'wall_time_seconds': wall_time_seconds,
+            'number_of_irr_representations_for_each_q': number_of_irreps or [],
+        }
+        sample = get_walltime_sample_from_attributes(output_parameters, inputph or {}, resources or {}, pw_features)
+
+        if sample is not None:
+            samples.append(sample)
+
+    builder = orm.QueryBuilder().append(
+        orm.CalcJobNode,
+        filters={
+            'process_type': PhCalculation.build_process_type(),
+            'attributes.process_state': 'finished',
+            'attributes.exit_status': 0,
+        },
+        project=['*'],
+        tag='ph',
+    )
+    builder.append(orm.RemoteData, with_outgoing='ph', edge_filters={'label': 'parent_folder'}, tag='parent_folder')
+    builder.append(
+        orm.CalcJobNode, with_outgoing='parent_folder', filters={'process_type': PhCalculation.build_process_type()}
+    )
+    builder.order_by({'ph': {'ctime': 'desc'}}).limit(limit)
+
+    for calculation in builder.all(flat=True):
+        sample = get_walltime_sample(calculation)
+
+        if sample is not None:
+            samples.append(sample)
+
+    if not samples:
+        return numpy.zeros((0, len(WALLTIME_FEATURES))), numpy.zeros(0)
+
+    features, costs = zip(*samples)
+
+    return numpy.array(features), numpy.array(costs)
+
+
+def fit_walltime_model(features: numpy.ndarray, costs: numpy.ndarray) -> dict:
+    """Fit a power law of the features to the costs of ``ph.x`` calculations.
+
+    The logarithm of the cost is fitted by linear least squares as a linear function of the logarithms of the features,
+    i.e. the cost is modelled as ``exp(c_0) * prod_i feature_i ** c_i``. For fewer samples than coefficients, the
+    minimum norm solution is used, which for a single sample amounts to assuming that the cost is proportional to the
+    product of the features.
+
+    :param features: array of shape ``(n, len(WALLTIME_FEATURES))`` with the features of each calculation.
+    :param costs: array of shape ``(n,)`` with the costs of each calculation in machine-seconds.
+    :return: the model as a dictionary with the ``coefficients`` of the fit, the standard deviation of the logarithms of
+        the costs around the fit as the ``residual`` and the ``number_of_samples``.
+    :raises ValueError: if there are no samples.
+    """
+    if len(costs) == 0:
+        raise ValueError('cannot fit the wallclock time model without any samples.')
+
+    matrix = numpy.hstack([numpy.ones((len(costs), 1)), numpy.log(features)])
+    coefficients = numpy.linalg.lstsq(matrix, numpy.log(costs), rcond=None)[0]
+    residuals = numpy.log(costs) - matrix @ coefficients
+    degrees_of_freedom = max(len(costs) - len(coefficients), 1)
+
+    return {
+        'coefficients': coefficients.tolist(),
+        'residual': float(numpy.sqrt(numpy.sum(residuals**2) / degrees_of_freedom)),
+        'number_of_samples': len(costs),
+    }
+
+
+def get_walltime_model(limit: int = 1000, min_samples: int = 5) -> Optional[dict]:
+    """Return the model of the cost of ``ph.x`` calculations fitted on the completed calculations in the database.
+
+    :param limit: the maximum number of calculations that are considered, the most recent first.
+    :param min_samples: the minimum number of calculations for which a model is fitted.
+    :return: the model as returned by ``fit_walltime_model``, or ``None`` if there are fewer than ``min_samples``.
+    """
+    features, costs = get_walltime_samples(limit)
+
+    if len(costs) < min_samples:
+        return None
+
+    return fit_walltime_model(features, costs)
+
+
+def predict_cost(model: dict, features: dict) -> float:
+    """Return the predicted cost in machine-seconds of a ``ph.x`` calculation.
+
+    :param model: the model as returned by ``fit_walltime_model``.
+    :param features: dictionary with the value of each of the ``WALLTIME_FEATURES``.
+    :return: the predicted cost in machine-seconds.
+    """
+    values = numpy.log([float(features[key]) for key in WALLTIME_FEATURES])
+    coefficients = numpy.array(model['coefficients'])
+
+    return float(numpy.exp(coefficients[0] + values @ coefficients[1:]))
+
+
+def get_predicted_resources(
+    model: dict,
+    features: dict,
+    max_wallclock_seconds: int,
+    max_num_machines: int = 1,
+    safety_factor: float = 1.5,
+) -> Tuple[int, int]:
+    """Return the number of machines and the wallclock time to request for a ``ph.x`` calculation.
+
+    The requested wallclock time is the predicted cost divided by the number of machines, assuming ideal scaling, with a
+    margin of two standard deviations of the residual of the fit and the ``safety_factor``. The smallest number of
+    machines for which this fits in ``max_wallclock_seconds`` is used, up to ``max_num_machines``.
+
+    :param model: the model as returned by ``fit_walltime_model``.
+    :param features: dictionary with the value of each of the ``WALLTIME_FEATURES``.
+    :param max_wallclock_seconds: the maximum wallclock time in seconds that can be requested.
+    :param max_num_machines: the maximum number of machines that can be requested.
+    :param safety_factor: the factor with which the predicted wallclock time is multiplied.
+    :return: tuple of the number of machines and the wallclock time in seconds.
+    """
+    cost = predict_cost(model, features) * numpy.exp(2 * model['residual']) * safety_factor
+    num_machines = int(min(max(numpy.ceil(cost / max_wallclock_seconds), 1), max_num_machines))
+    wallclock_seconds = int(numpy.ceil(cost / num_machines))
+
+    return num_machines, min(max(wallclock_seconds, MIN_WALLCLOCK_SECONDS), max_wallclock_seconds)
@@ -3,30 +3,41 @@
 from aiida import orm
 from aiida.common.extendeddicts import AttributeDict
 from aiida.engine import WorkChain, if_
-from aiida.plugins import CalculationFactory, WorkflowFactory
+from aiida.plugins import WorkflowFactory
 from aiida_quantumespresso.workflows.protocols.utils import ProtocolMixin
+from plumpy import has_portal
 
+from aiida_quantumespresso_ph.utils.cache import RELAX_CACHE_KEY_EXTRA, get_cached_workchains, get_relax_cache_key
+from aiida_quantumespresso_ph.utils.cleanup import clean_remote_folders, clean_remote_folders_async
 from aiida_quantumespresso_ph.workflows.ph.main import PhWorkChain
 
-PwRelaxWorkChain = WorkflowFactory('quantumespresso.pw.relax')
-PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
-PwBaseWorkChain = WorkflowFactory('quantumespresso.pw.base')
-Q2rBaseWorkChain = WorkflowFactory('quantumespresso.q2r.base')
-MatdynBaseWorkChain = WorkflowFactory('quantumespresso.matdyn.base')
-
-PhCalculation = CalculationFactory('quantumespresso.ph')
-
 
 class DynamicalMatrixWorkChain(ProtocolMixin, WorkChain):
-    """Workchain to compute the dynamical matrix for an input structure."""
+    """Workchain to compute the dynamical matrix for an input structure.
+
+    With the ``use_relax_cache`` input, the relaxation is looked up among earlier ``PwRelaxWorkChain``s of a structure
+    with the same fingerprint and the same ``relax`` inputs. If the remote folder of such a relaxation is still
+    available, the ``ph.x`` calculation is run on it directly. Otherwise only an SCF calculation of the relaxed
+    structure is run, instead of the full relaxation. Each relaxation or SCF that is run gets its cache key as the
+    ``relax_cache_key`` extra, so it can be reused by later work chains.
+    """
 
     @classmethod
     def define(cls, spec):
         """Define the work chain specification."""
+        PwRelaxWorkChain = WorkflowFactory('quantumespresso.pw.relax')
         super().define(spec)
 
         spec.input('structure', valid_type=orm.StructureData, required=False)
         spec.input('clean_workdir', valid_type=orm.Bool, default=lambda: orm.Bool(False))
+        spec.input(
+            'use_relax_cache',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Reuse an earlier relaxation of a structure with the same fingerprint, i.e. the same cell up to its '
+            'orientation and the order of its sites, and with the same `relax` inputs, if any. If its remote folder '
+            'has been cleaned, an SCF calculation of the relaxed structure is run instead of the relaxation.'
+        )
         spec.input(
             'parent_folder',
             valid_type=orm.RemoteData,
@@ -40,7 +51,7 @@ class DynamicalMatrixWorkChain(ProtocolMixin, WorkChain):
         spec.outline(
             cls.setup,
             if_(cls.should_run_relax)(
-                cls.run_relax,
+                if_(cls.should_run_scf)(cls.run_scf).else_(cls.run_relax),
                 cls.inspect_relax,
             ),
             cls.run_ph,
@@ -82,6 +93,7 @@ class DynamicalMatrixWorkChain(ProtocolMixin, WorkChain):
             sub processes that are called by this workchain.
         :return: a process builder instance with all inputs defined ready for launch.
         """
+        PwRelaxWorkChain = WorkflowFactory('quantumespresso.pw.relax')
         inputs = cls.get_protocol_inputs(protocol, overrides)
 
         args = (pw_code, structure, protocol)
@@ -109,12 +121,68 @@ class DynamicalMatrixWorkChain(ProtocolMixin, WorkChain):
         else:
             self.report('no parent given')
 
+            if self.inputs.use_relax_cache.value:
+                self.apply_relax_cache()
+
+    def apply_relax_cache(self):
+        """Look up an earlier relaxation of the structure with the same inputs and reuse it if possible.
+
+        The most recent relaxation whose remote folder is still available is reused directly. If the remote folders of
+        all relaxations have been cleaned, the relaxed structure of the most recent one is used for an SCF calculation.
+        """
+        PwRelaxWorkChain = WorkflowFactory('quantumespresso.pw.relax')
+        inputs = self.exposed_inputs(PwRelaxWorkChain, namespace='relax')
+        self.ctx.relax_cache_key = get_relax_cache_key(self.ctx.current_structure, inputs)
+        workchains = get_cached_workchains(self.ctx.relax_cache_key, RELAX_CACHE_KEY_EXTRA)
+
+        for workchain in workchains:
+            if self.is_remote_folder_available(workchain.outputs.remote_folder):
+                self.report(f'reusing the relaxation {workchain} from the cache')
+                self.ctx.workchain_relax = workchain
+                self.ctx.current_folder = workchain.outputs.remote_folder
+                self.ctx.current_structure = self.get_relaxed_structure(workchain)
+                self.out('output_structure', self.ctx.current_structure)
+                return
+
+        if workchains:
+            self.report(f'the remote folder of the relaxation {workchains[0]} has been cleaned, running an SCF instead')
+            self.ctx.scf_structure = self.get_relaxed_structure(workchains[0])
+
+    @staticmethod
+    def get_relaxed_structure(workchain):
+        """Return the relaxed structure of a `PwRelaxWorkChain`, or the structure of a `PwBaseWorkChain` SCF."""
+        if 'output_structure' in workchain.outputs:
+            return workchain.outputs.output_structure
+
+        if 'structure' in workchain.inputs:
+            return workchain.inputs.structure
+
+        return workchain.inputs.pw.structure
+
+    def is_remote_folder_available(self, remote_folder):
+        """Return whether the remote folder has not been cleaned and is on the computer on which `ph.x` is run.
+
+        Only the ``RemoteData.KEY_EXTRA_CLEANED`` extra is checked, such that no transport is opened while the step is
+        run. Folders that were removed without setting this extra are therefore considered available.
+        """
+        computer = self.inputs.ph_main.ph.code.computer
+
+        if computer is not None and remote_folder.computer.uuid != computer.uuid:
+            return False
+
+        return not remote_folder.is_cleaned
+
     def should_run_relax(self):
         """Check if the work chain should run the  ``PwRelaxWorkChain`` for either relax or scf."""
-        return 'parent_folder' not in self.inputs
+        return 'current_folder' not in self.ctx
+
+    def should_run_scf(self):
+        """Return whether only an SCF of the relaxed structure of a cleaned relaxation from the cache should be run."""
+        return 'scf_structure' in self.ctx
 
     def run_relax(self):
         """Run the PwRelaxWorkChain to run a relax PwCalculation."""
+        PwRelaxWorkChain = WorkflowFactory('quantumespresso.pw.relax')
         inputs = AttributeDict(self.exposed_inputs(PwRelaxWorkChain, namespace='relax'))
         inputs.metadata.call_link_label = 'relax'
         inputs.structure = self.ctx.current_structure
@@ -127,6 +195,25 @@ class DynamicalMatrixWorkChain(ProtocolMixin, WorkChain):
         self.report(f'launching PwRelaxWorkChain<{node.pk}>')
         self.to_context(**{'workchain_relax': node})
 
+    def run_scf(self):
+        """Run a PwBaseWorkChain to compute the ground state of the relaxed structure of a cleaned relaxation."""
+        PwRelaxWorkChain = WorkflowFactory('quantumespresso.pw.relax')
+        PwBaseWorkChain = WorkflowFactory('quantumespresso.pw.base')
+        inputs = AttributeDict(self.exposed_inputs(PwRelaxWorkChain, namespace='relax')['base'])
+        inputs.pw.structure = self.ctx.scf_structure
+
+        parameters = inputs.pw.parameters.get_dict()
+        parameters.setdefault('CONTROL', {})['calculation'] = 'scf'
+        parameters.pop('IONS', None)
+        parameters.pop('CELL', None)
+        inputs.pw.parameters = orm.Dict(parameters)
+        inputs.metadata.call_link_label = 'scf'
+
+        node = self.submit(PwBaseWorkChain, **inputs)
+
+        self.report(f'launching PwBaseWorkChain<{node.pk}>')
+        self.to_context(**{'workchain_relax': node})
+
     def inspect_relax(self):
         """Verify that the PwRelaxWorkChain finished successfully."""
         workchain = self.ctx.workchain_relax
@@ -139,12 +226,22 @@ class DynamicalMatrixWorkChain(ProtocolMixin, WorkChain):
         if 'output_structure' in workchain.outputs:
             self.ctx.current_structure = workchain.outputs.output_structure
             self.out('output_structure', workchain.outputs.output_structure)
+        elif 'scf_structure' in self.ctx:
+            self.ctx.current_structure = self.ctx.scf_structure
+            self.out('output_structure', self.ctx.scf_structure)
+
+        if 'relax_cache_key' in self.ctx:
+            workchain.base.extras.set(RELAX_CACHE_KEY_EXTRA, self.ctx.relax_cache_key)
 
     def run_ph(self):
         """Run the PhWorkChain."""
         inputs = AttributeDict(self.inputs.ph_main)
         inputs.ph.parent_folder = self.ctx.current_folder
 
+        # The remote folders of the q-points are cleaned at the end anyway, so they can be cleaned as soon as possible
+        if self.inputs.clean_workdir.value:
+            inputs.clean_finished_qpoints = orm.Bool(True)
+
         key = 'phonon'
         inputs.metadata.call_link_label = key
 
@@ -170,22 +267,32 @@ class DynamicalMatrixWorkChain(ProtocolMixin, WorkChain):
         self.out('ph_retrieved', self.ctx.workchain_ph.outputs.retrieved)
 
     def on_terminated(self):
-        """Clean the working directories of all child calculations if `clean_workdir=True` in the inputs."""
+        """Clean the working directories of all child calculations if `clean_workdir=True` in the inputs.
+
+        The folders that were already cleaned, e.g. those of the finished q-points, are skipped and the others are
+        cleaned with a single transport per computer. If the process terminates within a step, the transports are
+        requested from the transport queue of the runner, otherwise, e.g. when the process is killed while waiting, they
+        are opened directly. The folders that could not be cleaned are reported.
+        """
         super().on_terminated()
 
         if self.inputs.clean_workdir.value is False:
             self.report('remote folders will not be cleaned')
             return
 
-        cleaned_calcs = []
-
-        for called_descendant in self.node.called_descendants:
-            if isinstance(called_descendant, orm.CalcJobNode):
-                try:
-                    called_descendant.outputs.remote_folder._clean()  # pylint: disable=protected-access
-                    cleaned_calcs.append(called_descendant.pk)
-                except (IOError, OSError, KeyError):
-                    pass
+        remote_folders = [
+            called_descendant.outputs.remote_folder
+            for called_descendant in self.node.called_descendants
+            if isinstance(called_descendant, orm.CalcJobNode) and 'remote_folder' in called_descendant.outputs
+        ]
+        if has_portal():
+            cleaned = self.runner.run_until_complete(
+                clean_remote_folders_async(remote_folders, self.runner.transport, self.logger)
+            )
+        else:
+            cleaned = clean_remote_folders(remote_folders, self.logger)
 
-        if cleaned_calcs:
-            self.report(f"cleaned remote folders of calculations: {' '.join(map(str, cleaned_calcs))}")
+        if cleaned:
+            self.report(
+                f"cleaned remote folders of calculations: {' '.join(str(folder.creator.pk) for folder in cleaned)}"
+            )
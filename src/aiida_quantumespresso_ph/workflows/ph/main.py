@@ -1,10 +1,20 @@
 # -*- coding: utf-8 -*-
 """Workchain to perform a ph.x calculation with optional parallelization over q-points."""
 from aiida import orm
+from aiida.common import AttributeDict
 from aiida.engine import WorkChain, if_
-from aiida_quantumespresso.workflows.ph.base import PhBaseWorkChain
+from aiida.plugins import CalculationFactory, DataFactory, WorkflowFactory
 from aiida_quantumespresso.workflows.protocols.utils import ProtocolMixin
+import numpy
 
+from aiida_quantumespresso_ph.calculations.functions.merge_para_ph_outputs import merge_para_ph_outputs
+from aiida_quantumespresso_ph.utils.parallelization import (
+    DEFAULT_IRREP_SECONDS,
+    PARALLELIZATION_EXTRA,
+    PARALLELIZATION_MODES,
+    estimate_makespans,
+    select_parallelization_mode,
+)
 from aiida_quantumespresso_ph.workflows.ph.parallelize_qpoints import PhParallelizeQpointsWorkChain
 
 
@@ -14,17 +24,66 @@ class PhWorkChain(WorkChain, ProtocolMixin):
     If specified through the 'parallelize_qpoints' boolean input parameter, the calculation will be parallelized over
     the provided q-points by running the `PhParallelizeQpointsWorkChain`. Otherwise a single `PhBaseWorkChain` will be
     launched that will compute every q-point serially.
+
+    The ``parallelization_mode`` input takes precedence over ``parallelize_qpoints``. Besides ``serial`` and
+    ``parallel``, it can be ``batch`` to group the q-points in ``max_concurrent`` batches, or ``auto`` to choose the
+    mode with the smallest estimated makespan. The estimate is based on the number of irreducible q-points, three
+    irreducible representations per atom for each q-point, whose wallclock time is predicted from the completed
+    ``PhCalculation``s in the database if possible, the number of machines and the overhead of each job. The chosen
+    mode and the estimated makespans are reported and stored in the ``parallelization`` extra.
+
+    The ``image`` mode instead runs a single ``ph.x`` calculation with ``-ni`` set to the ``number_of_images`` input,
+    which distributes the irreducible representations over that many images of one large allocation, followed by a
+    ``PhCollectCalculation`` with ``recover`` that collects the dynamical matrices of all images. The ``image`` mode is
+    not considered by the ``auto`` mode, as it depends on the resources that are requested for the single calculation.
     """
 
     @classmethod
     def define(cls, spec):
         """Define the process specification."""
+        PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
         super().define(spec)
         spec.expose_inputs(PhBaseWorkChain, exclude=('only_initialization',))
         spec.input('parallelize_qpoints', valid_type=orm.Bool, default=lambda: orm.Bool(False))
+        spec.input(
+            'parallelization_mode',
+            valid_type=orm.Str,
+            required=False,
+            validator=cls.validate_parallelization_mode,
+            help='How to distribute the q-points over jobs: `serial`, `parallel`, `batch`, `image` or `auto` to choose '
+            'the mode with the smallest estimated makespan. Takes precedence over `parallelize_qpoints`.'
+        )
+        spec.input(
+            'number_of_images',
+            valid_type=orm.Int,
+            required=False,
+            help='The number of images of the `ph.x` calculation, passed as the `-ni` command line option, for the '
+            '`image` mode. The resources in the `ph.metadata.options` should suffice for all images.'
+        )
+        spec.input(
+            'max_concurrent',
+            valid_type=orm.Int,
+            required=False,
+            help='The maximum number of jobs that run at the same time, which is the number of batches for the `batch` '
+            'mode.'
+        )
+        spec.input(
+            'clean_finished_qpoints',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Clean the remote folders of each q-point as soon as its dynamical matrices are retrieved, only for '
+            'the parallelized calculation.'
+        )
+
+        spec.inputs.validator = cls.validate_inputs
 
         spec.outline(
-            if_(cls.should_run_parallel)(cls.run_parallel,).else_(
+            cls.setup,
+            if_(cls.should_run_images)(
+                cls.run_images,
+                cls.inspect_images,
+                cls.run_collect,
+            ).elif_(cls.should_run_parallel)(cls.run_parallel,).else_(
                 cls.run_serial,
             ),
             cls.inspect_workchain,
@@ -33,9 +92,43 @@ class PhWorkChain(WorkChain, ProtocolMixin):
 
         spec.output('retrieved', valid_type=orm.FolderData)
         spec.output('output_parameters', valid_type=orm.Dict)
+        spec.output(
+            'output_arrays',
+            valid_type=orm.ArrayData,
+            help='The q-point, frequencies and mode symmetries of the output parameters of each q-point as arrays.'
+        )
+        spec.output(
+            'dynamical_matrix',
+            valid_type=DataFactory('quantumespresso_ph.dynamical_matrix'),
+            required=False,
+            help='The dynamical matrices of all q-points as arrays, only for the parallelized calculation.'
+        )
 
         spec.exit_code(300, 'ERROR_CHILD_WORKCHAIN_FAILED', message='A child work chain failed.')
 
+    @staticmethod
+    def validate_parallelization_mode(value, _):
+        """Validate the ``parallelization_mode`` input."""
+        if value is not None and value.value not in PARALLELIZATION_MODES + ('image', 'auto'):
+            return f'The `parallelization_mode` should be one of {PARALLELIZATION_MODES + ("image", "auto")}.'
+
+    @classmethod
+    def validate_inputs(cls, value, _):
+        """Validate the top level namespace."""
+        if 'max_concurrent' in value and value['max_concurrent'].value <= 0:
+            return 'The `max_concurrent` input should be positive.'
+
+        if 'number_of_images' in value and value['number_of_images'].value <= 0:
+            return 'The `number_of_images` input should be positive.'
+
+        if 'parallelization_mode' in value and value['parallelization_mode'].value == 'batch':
+            if 'max_concurrent' not in value:
+                return 'The `batch` parallelization mode requires the `max_concurrent` input.'
+
+        if 'parallelization_mode' in value and value['parallelization_mode'].value == 'image':
+            if 'number_of_images' not in value:
+                return 'The `image` parallelization mode requires the `number_of_images` input.'
+
     @classmethod
     def get_protocol_filepath(cls):
         """Return ``pathlib.Path`` to the ``.yaml`` file that defines the protocols."""
@@ -46,17 +139,23 @@ class PhWorkChain(WorkChain, ProtocolMixin):
 
     @classmethod
     def get_builder_from_protocol(
-        cls, code, parent_folder=None, protocol='moderate', overrides=None, options=None, **_
+        cls, code, parent_folder=None, protocol='moderate', overrides=None, options=None, predict_wallclock=False, **_
     ):
         """Return a builder prepopulated with inputs selected according to the chosen protocol.
 
+        With ``predict_wallclock``, the ``max_wallclock_seconds`` of the protocol is replaced by the wallclock time
+        predicted from the ``PhCalculation``s in the database that finished successfully, if there are enough of them.
+        As the irreducible representations are not known yet, three per atom are assumed for each irreducible q-point.
+
         :param code: the ``Code`` instance configured for the ``quantumespresso.ph`` plugin.
         :param structure: the ``StructureData`` instance to use.
         :param protocol: protocol to use, if not specified, the default will be used.
         :param overrides: optional dictionary of inputs to override the defaults of the protocol.
         :param options: options for computational resources
+        :param predict_wallclock: whether to predict the wallclock time, which requires the ``parent_folder``.
         :return: a process builder instance with all inputs defined ready for launch.
         """
+        PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
         inputs = cls.get_protocol_inputs(protocol, overrides)
 
         data = PhBaseWorkChain.get_builder_from_protocol(  # pylint: disable=protected-access
@@ -68,23 +167,253 @@ class PhWorkChain(WorkChain, ProtocolMixin):
         if 'parallelize_qpoints' in inputs:
             data['parallelize_qpoints'] = orm.Bool(inputs['parallelize_qpoints'])
 
+        if 'parallelization_mode' in inputs:
+            data['parallelization_mode'] = orm.Str(inputs['parallelization_mode'])
+
         builder = cls.get_builder()
         builder._data = data  # pylint: disable=protected-access
 
+        if predict_wallclock and parent_folder is not None:
+            cls.set_predicted_wallclock(builder)
+
         return builder
 
+    @staticmethod
+    def set_predicted_wallclock(builder):
+        """Set the predicted wallclock time of the ``ph.x`` calculation of a builder with a ``parent_folder``.
+
+        The wallclock time is only changed if enough completed ``PhCalculation``s are in the database and the q-points
+        are defined as an unshifted mesh or through the ``qpoints_distance``. The ``max_wallclock_seconds`` of the
+        builder is the maximum, and the number of machines is not changed.
+
+        :param builder: the builder of the ``PhWorkChain``, which is updated in place.
+        """
+        from aiida_quantumespresso_ph.utils.walltime import get_predicted_resources, get_pw_features, get_walltime_model
+
+        model = get_walltime_model()
+        pw_calculation = builder.ph.parent_folder.creator
+
+        if model is None or pw_calculation is None:
+            return
+
+        try:
+            features = get_pw_features(pw_calculation)
+        except (AttributeError, ValueError):
+            return
+
+        number_qpoints = PhWorkChain.get_number_of_irreducible_qpoints(pw_calculation, builder)
+
+        if number_qpoints is None:
+            return
+
+        options = builder.ph.metadata.options
+        _, wallclock_seconds = get_predicted_resources(
+            model,
+            {
+                **features, 'number_of_irreps': 3 * features['number_of_atoms'] * number_qpoints
+            },
+            max_wallclock_seconds=options.get('max_wallclock_seconds', 43200),
+            max_num_machines=options.get('resources', {}).get('num_machines', 1),
+        )
+        options['max_wallclock_seconds'] = wallclock_seconds
+
+    @staticmethod
+    def get_number_of_irreducible_qpoints(pw_calculation, inputs):
+        """Return the number of irreducible q-points of a ``ph.x`` calculation on the output of a ``pw.x`` calculation.
+
+        The q-points of an unshifted mesh are reduced with the symmetries found by ``spglib``, whereas a shifted mesh or
+        an explicit list of q-points is not reduced.
+
+        :param pw_calculation: the ``PwCalculation`` on whose output folder the ``ph.x`` calculation is run.
+        :param inputs: the inputs or builder of the ``PhBaseWorkChain``, with either the ``qpoints`` or the
+            ``qpoints_distance`` and optionally the ``qpoints_force_parity``.
+        :return: the number of irreducible q-points, or ``None`` if the q-points are not defined.
+        """
+        from aiida_quantumespresso.calculations.functions.create_kpoints_from_distance import (
+            create_kpoints_from_distance,
+        )
+
+        from aiida_quantumespresso_ph.utils.qpoints import get_irreducible_qpoints
+
+        try:
+            structure = pw_calculation.outputs.output_structure
+        except AttributeError:
+            structure = pw_calculation.inputs.structure
+
+        if inputs.get('qpoints', None) is not None:
+            qpoints = inputs['qpoints']
+        elif inputs.get('qpoints_distance', None) is not None:
+            qpoints = create_kpoints_from_distance(  # pylint: disable=unexpected-keyword-arg
+                structure,
+                distance=inputs['qpoints_distance'],
+                force_parity=inputs.get('qpoints_force_parity', None) or orm.Bool(False),
+                metadata={'store_provenance': False},
+            )
+        else:
+            return None
+
+        try:
+            mesh, offset = qpoints.get_kpoints_mesh()
+        except AttributeError:
+            return len(qpoints.get_kpoints())
+
+        if any(offset):
+            return int(numpy.prod(mesh))
+
+        return len(get_irreducible_qpoints(structure, mesh)[0])
+
+    def setup(self):
+        """Determine whether the q-points are computed serially, in parallel or in batches."""
+        if 'parallelization_mode' not in self.inputs:
+            self.ctx.parallelization_mode = 'parallel' if self.inputs.parallelize_qpoints.value else 'serial'
+        elif self.inputs.parallelization_mode.value == 'auto':
+            self.ctx.parallelization_mode = self.select_parallelization_mode()
+        else:
+            self.ctx.parallelization_mode = self.inputs.parallelization_mode.value
+
+    def get_qpoint_seconds(self, pw_calculation, number_qpoints):
+        """Return the estimated wallclock time in seconds of each irreducible q-point.
+
+        Each q-point is assumed to have three irreducible representations per atom. Their wallclock time is predicted
+        from the completed ``PhCalculation``s in the database, with the number of machines of the options, or the
+        ``DEFAULT_IRREP_SECONDS`` is used for each of them if that is not possible.
+
+        :param pw_calculation: the ``PwCalculation`` on whose output folder the ``ph.x`` calculation is run.
+        :param number_qpoints: the number of irreducible q-points.
+        :return: list with the estimated wallclock time of each q-point.
+        """
+        from aiida_quantumespresso_ph.utils.walltime import get_pw_features, get_walltime_model, predict_cost
+
+        model = get_walltime_model()
+
+        try:
+            features = get_pw_features(pw_calculation)
+        except (AttributeError, ValueError):
+            features = None
+
+        if model is None or features is None:
+            try:
+                structure = pw_calculation.outputs.output_structure
+            except AttributeError:
+                structure = pw_calculation.inputs.structure
+            return [3 * len(structure.sites) * DEFAULT_IRREP_SECONDS] * number_qpoints
+
+        num_machines = self.inputs.ph.metadata.options.get('resources', {}).get('num_machines', 1)
+        seconds = predict_cost(model, {**features, 'number_of_irreps': 3 * features['number_of_atoms']}) / num_machines
+
+        return [seconds] * number_qpoints
+
+    def select_parallelization_mode(self):
+        """Return the parallelization mode with the smallest estimated makespan.
+
+        If the number of irreducible q-points cannot be determined, the ``parallelize_qpoints`` input is used instead.
+        """
+        fallback = 'parallel' if self.inputs.parallelize_qpoints.value else 'serial'
+        pw_calculation = self.inputs.ph.parent_folder.creator
+
+        try:
+            number_qpoints = self.get_number_of_irreducible_qpoints(pw_calculation, self.inputs)
+        except (AttributeError, ValueError):
+            number_qpoints = None
+
+        if not number_qpoints:
+            self.report(f'cannot determine the number of irreducible q-points, running in `{fallback}` mode')
+            return fallback
+
+        max_concurrent = self.inputs.max_concurrent.value if 'max_concurrent' in self.inputs else None
+        makespans = estimate_makespans(self.get_qpoint_seconds(pw_calculation, number_qpoints), max_concurrent)
+        mode = select_parallelization_mode(makespans, number_qpoints)
+
+        if mode == 'batch':
+            self.ctx.number_of_batches = makespans['number_of_batches']
+
+        self.node.base.extras.set(
+            PARALLELIZATION_EXTRA, {
+                'mode': mode,
+                'estimated_makespan_seconds': makespans[mode],
+                'makespans': {mode: makespans[mode] for mode in PARALLELIZATION_MODES},
+                'number_of_qpoints': number_qpoints,
+            }
+        )
+        estimates = ', '.join(f'{mode} {makespans[mode]:.0f}' for mode in PARALLELIZATION_MODES)
+        self.report(
+            f'chose the `{mode}` mode for {number_qpoints} irreducible q-points, with an estimated makespan of '
+            f'{makespans[mode]:.0f} seconds ({estimates})'
+        )
+
+        return mode
+
+    def should_run_images(self):
+        """Return whether the calculation should be parallelized over the images of a single ``ph.x`` run."""
+        return self.ctx.parallelization_mode == 'image'
+
     def should_run_parallel(self):
         """Return whether the calculation should be parallelized over the qpoints."""
-        return self.inputs.parallelize_qpoints
+        return self.ctx.parallelization_mode != 'serial'
+
+    def run_images(self):
+        """Run the ``PhBaseWorkChain`` with the ``-ni`` command line option to compute the images in a single job."""
+        PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
+        inputs = AttributeDict(self.exposed_inputs(PhBaseWorkChain))
+        settings = inputs.ph.settings.get_dict() if 'settings' in inputs.ph else {}
+        settings['CMDLINE'] = list(settings.get('CMDLINE', [])) + ['-ni', str(self.inputs.number_of_images.value)]
+        inputs.ph.settings = orm.Dict(settings)
+        inputs.metadata.call_link_label = 'ph_images'
+
+        running = self.submit(PhBaseWorkChain, **inputs)
+        self.report(
+            f'running with {self.inputs.number_of_images.value} images, launching PhBaseWorkChain<{running.pk}>'
+        )
+        self.to_context(workchain_images=running)
+
+    def inspect_images(self):
+        """Inspect the ``PhBaseWorkChain`` of the images."""
+        if not self.ctx.workchain_images.is_finished_ok:
+            self.report('the PhBaseWorkChain of the images did not finish successfully')
+            return self.exit_codes.ERROR_CHILD_WORKCHAIN_FAILED
+
+    def run_collect(self):
+        """Run the ``PhCollectCalculation`` with ``recover`` that collects the dynamical matrices of all images.
+
+        The calculation is run without images on the parent folder of the ``pw.x`` calculation, to which the ``_ph*``
+        folder of each image is copied from the remote folder of the calculation of the images. The q-points are those
+        of that calculation, since the ``PhBaseWorkChain`` may have created them from the ``qpoints_distance``.
+        """
+        PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
+        PhCollectCalculation = CalculationFactory('quantumespresso_ph.ph_collect')
+        remote_folder = self.ctx.workchain_images.outputs.remote_folder
+
+        inputs = AttributeDict(self.exposed_inputs(PhBaseWorkChain).ph)
+        parameters = inputs.parameters.get_dict()
+        parameters.setdefault('INPUTPH', {})['recover'] = True
+        inputs.parameters = orm.Dict(parameters)
+        inputs.qpoints = remote_folder.creator.inputs.qpoints
+        inputs.partial_folders = {'images': remote_folder}
+        inputs.metadata.call_link_label = 'ph_collect'
+
+        running = self.submit(PhCollectCalculation, **inputs)
+        self.report(f'collecting the images, launching PhCollectCalculation<{running.pk}>')
+        self.to_context(workchain=running)
 
     def run_parallel(self):
-        """Run the ``PhParallelizeQpointsWorkChain``."""
-        running = self.submit(PhParallelizeQpointsWorkChain, **self.exposed_inputs(PhBaseWorkChain))
+        """Run the ``PhParallelizeQpointsWorkChain``, grouping the q-points in batches for the ``batch`` mode."""
+        PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
+        inputs = self.exposed_inputs(PhBaseWorkChain)
+        inputs['clean_finished_qpoints'] = self.inputs.clean_finished_qpoints
+
+        if 'max_concurrent' in self.inputs:
+            inputs['max_concurrent'] = self.inputs.max_concurrent
+
+        if self.ctx.parallelization_mode == 'batch':
+            inputs['number_of_batches'] = orm.Int(self.ctx.get('number_of_batches', self.inputs.max_concurrent.value))
+
+        running = self.submit(PhParallelizeQpointsWorkChain, **inputs)
         self.report(f'running in parallel, launching PhParallelizeQpointsWorkChain<{running.pk}>')
         self.to_context(workchain=running)
 
     def run_serial(self):
         """Run the ``PhBaseWorkChain``."""
+        PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
         running = self.submit(PhBaseWorkChain, **self.exposed_inputs(PhBaseWorkChain))
         self.report(f'running in serial, launching PhBaseWorkChain<{running.pk}>')
         self.to_context(workchain=running)
@@ -96,8 +425,31 @@ class PhWorkChain(WorkChain, ProtocolMixin):
             return self.exit_codes.ERROR_CHILD_WORKCHAIN_FAILED
 
     def results(self):
-        """Attach results to the workchain."""
+        """Attach results to the workchain.
+
+        The output parameters of a calculation that is not parallelized over the q-points are merged in the same way as
+        those of the ``PhParallelizeQpointsWorkChain``, so the results of each q-point are in the ``output_arrays`` for
+        all parallelization modes.
+        """
         retrieved = self.ctx.workchain.outputs.retrieved
+        output_parameters = self.ctx.workchain.outputs.output_parameters
+
+        if 'output_arrays' in self.ctx.workchain.outputs:
+            output_arrays = self.ctx.workchain.outputs.output_arrays
+        else:
+            number_qpoints = len([key for key in output_parameters.keys() if key.startswith('dynamical_matrix_')])
+            merged = merge_para_ph_outputs(
+                **{f'output_1_{number_qpoints}': output_parameters},
+                metadata={'call_link_label': 'merge_para_ph_outputs'}
+            )
+            output_parameters = merged['output_parameters']
+            output_arrays = merged['output_arrays']
+
         self.out('retrieved', retrieved)
-        self.out('output_parameters', self.ctx.workchain.outputs.output_parameters)
+        self.out('output_parameters', output_parameters)
+        self.out('output_arrays', output_arrays)
+
+        if 'dynamical_matrix' in self.ctx.workchain.outputs:
+            self.out('dynamical_matrix', self.ctx.workchain.outputs.dynamical_matrix)
+
         self.report(f'workchain completed, output in {retrieved.__class__.__name__}<{retrieved.pk}>')
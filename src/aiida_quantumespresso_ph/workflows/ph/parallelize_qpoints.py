@@ -2,15 +2,17 @@
 """Workchain to perform a ``PhBaseWorkChain`` with automatic parallelization over q-points."""
 from aiida import orm
 from aiida.common import AttributeDict
-from aiida.engine import WorkChain, append_
-from aiida.plugins import CalculationFactory, WorkflowFactory
+from aiida.engine import WorkChain, append_, if_, while_
+from aiida.plugins import CalculationFactory, DataFactory, WorkflowFactory
 import numpy
 
 from aiida_quantumespresso_ph.calculations.functions.merge_para_ph_outputs import merge_para_ph_outputs
-
-PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
-distribute_qpoints = CalculationFactory('quantumespresso_ph.distribute_qpoints')
-recollect_qpoints = CalculationFactory('quantumespresso_ph.recollect_qpoints')
+from aiida_quantumespresso_ph.utils.cache import QPOINT_CACHE_KEY_EXTRA, get_cached_workchain, get_qpoint_cache_key
+from aiida_quantumespresso_ph.utils.cleanup import clean_remote_folders_async
+from aiida_quantumespresso_ph.utils.partition import partition_costs
+from aiida_quantumespresso_ph.utils.patterns import get_patterns_retrieve_list, get_perturbations_from_patterns
+from aiida_quantumespresso_ph.utils.qpoints import get_number_of_symmetries, parse_dynamical_matrix_0
+from aiida_quantumespresso_ph.utils.walltime import get_predicted_resources, get_pw_features, get_walltime_model
 
 
 class PhParallelizeQpointsWorkChain(WorkChain):
@@ -19,29 +21,316 @@ class PhParallelizeQpointsWorkChain(WorkChain):
     This workchain differs from the ``PhBaseWorkChain`` in that the computation is parallelized over the q-points. For
     each individual q-point a separate ``PhBaseWorkChain`` is run. At the end, the computed dynamical matrices of each
     individual workchain are collected into a single ``FolderData`` as output.
+
+    The irreducible q-points are determined by an initialization run of ``ph.x``. With the ``reduce_qpoints`` input,
+    they are instead computed with ``spglib`` from the structure and the q-point mesh, which avoids waiting in the queue
+    for the initialization run. The initialization run is still used as a fallback if the number of symmetries found by
+    ``spglib`` differs from the one of the ``pw.x`` calculation. Note that without the initialization run, the number of
+    irreducible representations of each q-point is not known, so all q-points are assumed to have the same cost. Since
+    the order of the q-points of ``spglib`` is not guaranteed to match the one of ``ph.x``, each q-point is then run
+    explicitly, so the ``reduce_qpoints`` input cannot be combined with inputs that select the q-points by their index,
+    i.e. ``compact_qpoints``, ``number_of_batches`` and ``batch_wallclock_seconds``.
+
+    For dense q-point grids, the ``compact_qpoints`` input stores all irreducible q-points in a single ``KpointsData``
+    instead of one per q-point. Each job is then run on the q-point mesh and selects its q-points by their index
+    through the ``start_q`` and ``last_q`` inputs of ``ph.x``.
+
+    With the ``use_qpoint_cache`` input, the results of single q-points are reused from earlier ``PhBaseWorkChain``s
+    with the same structure, ``pw.x`` and ``ph.x`` inputs and q-point, e.g. when the q-point is shared by a coarser
+    q-point mesh. Only the q-points that are not found in the cache are computed. Each ``PhBaseWorkChain`` of a single
+    q-point gets its cache key as the ``qpoint_cache_key`` extra, so it can be reused by later work chains.
+
+    Optionally, the q-points can be grouped in batches to reduce the number of jobs, by specifying either the
+    ``number_of_batches`` or the ``batch_wallclock_seconds`` input. Each batch is a contiguous range of q-points that is
+    computed by a single ``PhBaseWorkChain`` through the ``start_q`` and ``last_q`` inputs of ``ph.x``. The ranges are
+    balanced by the number of irreducible representations of each q-point, as determined by the initialization run.
+
+    For large cells, the irreducible representations of each q-point can instead be split over several
+    ``PhBaseWorkChain``s through the ``number_of_irrep_chunks`` input. Each chunk computes a contiguous range of the
+    irreducible representations through the ``start_irr`` and ``last_irr`` inputs of ``ph.x``, balanced by their number
+    of modes. The partial results of the chunks are then collected by a ``PhCollectCalculation`` for each q-point.
+
+    The number of ``PhBaseWorkChain``s that run at the same time can be limited with the ``max_concurrent`` input, in
+    which case the next jobs are submitted as the running ones finish.
+
+    With the ``incremental_recollection`` input, the dynamical matrices and output parameters of the q-points that
+    finished since the previous step are merged while the other q-points are still running. Each step extends a single
+    accumulated result with the newly finished q-points, so the final recollection only adds the q-points that finished
+    last.
+
+    With the ``clean_finished_qpoints`` input, the remote folders of the calculations of each q-point are cleaned as
+    soon as its dynamical matrices are retrieved, instead of keeping all of them on the scratch until the end.
+
+    By default, the work chain fails as soon as one of the ``PhBaseWorkChain``s of the q-points fails. With the
+    ``max_qpoint_retries`` input, only the failed jobs are resubmitted up to that number of times, optionally with an
+    increased wallclock time through ``retry_wallclock_factor`` and other options through ``retry_options``.
+
+    With the ``predict_wallclock`` input, the wallclock time and number of machines of each job are predicted from the
+    ``PhCalculation``s in the database that finished successfully, based on the number of atoms, irreducible
+    representations and k-points and the wavefunction cutoff. The ``max_wallclock_seconds`` of the options is then the
+    maximum that is requested, and the number of machines is increased up to ``max_num_machines`` for jobs that would
+    not fit in it.
     """
 
     @classmethod
     def define(cls, spec):
         """Define the process specification."""
+        PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
         super().define(spec)
         spec.expose_inputs(PhBaseWorkChain, exclude=('only_initialization',))
+        spec.input(
+            'number_of_batches',
+            valid_type=orm.Int,
+            required=False,
+            help='Group the q-points in at most this number of `PhBaseWorkChain`s, balanced by their estimated cost.'
+        )
+        spec.input(
+            'batch_wallclock_seconds',
+            valid_type=orm.Int,
+            required=False,
+            help='Group the q-points in batches with an estimated wallclock time of at most this number of seconds. '
+            'Requires `irrep_wallclock_seconds` to estimate the wallclock time of each q-point.'
+        )
+        spec.input(
+            'irrep_wallclock_seconds',
+            valid_type=orm.Float,
+            required=False,
+            help='The estimated wallclock time in seconds to compute a single irreducible representation.'
+        )
+        spec.input(
+            'number_of_irrep_chunks',
+            valid_type=orm.Int,
+            required=False,
+            help='Split the irreducible representations of each q-point over at most this number of '
+            '`PhBaseWorkChain`s, balanced by their number of modes.'
+        )
+        spec.input(
+            'max_concurrent',
+            valid_type=orm.Int,
+            required=False,
+            help='The maximum number of `PhBaseWorkChain`s for the q-points that are running at the same time.'
+        )
+        spec.input(
+            'incremental_recollection',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Recollect the results of the q-points as they finish, instead of after all of them have finished.'
+        )
+        spec.input(
+            'clean_finished_qpoints',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Clean the remote folders of the calculations of each q-point as soon as its dynamical matrices are '
+            'retrieved, while the other q-points are still running.'
+        )
+        spec.input(
+            'max_qpoint_retries',
+            valid_type=orm.Int,
+            default=lambda: orm.Int(0),
+            help='The maximum number of times that the `PhBaseWorkChain` of a job is resubmitted if it fails.'
+        )
+        spec.input(
+            'retry_wallclock_factor',
+            valid_type=orm.Float,
+            required=False,
+            help='Multiply the `max_wallclock_seconds` of a resubmitted job by this factor for each retry.'
+        )
+        spec.input(
+            'retry_options',
+            valid_type=orm.Dict,
+            required=False,
+            help='The `metadata.options` of the `PhCalculation` that are overridden for a resubmitted job, e.g. to '
+            'increase the `resources` or change the `queue_name`.'
+        )
+        spec.input(
+            'predict_wallclock',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Predict the wallclock time and number of machines of each job from the completed `PhCalculation`s in '
+            'the database, with the `max_wallclock_seconds` of the options as the maximum.'
+        )
+        spec.input(
+            'wallclock_safety_factor',
+            valid_type=orm.Float,
+            default=lambda: orm.Float(1.5),
+            help='Multiply the predicted wallclock time of each job by this factor.'
+        )
+        spec.input(
+            'max_num_machines',
+            valid_type=orm.Int,
+            required=False,
+            help='The maximum number of machines of a job whose predicted wallclock time exceeds the '
+            '`max_wallclock_seconds` of the options. By default, the number of machines of the options is not changed.'
+        )
+        spec.input(
+            'reduce_qpoints',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Compute the irreducible q-points with `spglib` instead of running the `ph.x` initialization, which '
+            'is only used if the symmetries found by `spglib` do not match those of the `pw.x` calculation.'
+        )
+        spec.input(
+            'compact_qpoints',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Store the irreducible q-points in a single `KpointsData`, with the number of q-points in their star '
+            'as weights, and select them in each job by their index on the q-point mesh.'
+        )
+        spec.input(
+            'use_qpoint_cache',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Reuse the results of single q-points from earlier `PhBaseWorkChain`s with the same inputs.'
+        )
+        spec.input(
+            'share_parent_folder',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='Symlink the output folder of the `pw.x` calculation in all `ph.x` calculations instead of copying '
+            'it. The `ph.x` calculations only read the ground-state data and write to their own `_ph0` folder.'
+        )
+        spec.inputs.validator = cls.validate_inputs
 
         spec.outline(
-            cls.run_ph_init,
-            cls.inspect_init,
+            if_(cls.should_reduce_qpoints)(cls.run_reduce_qpoints,),
+            if_(cls.should_run_init)(
+                cls.run_ph_init,
+                cls.inspect_init,
+            ),
             cls.run_distribute_qpoints,
-            cls.run_ph_qgrid,
+            while_(cls.should_run_ph_qgrid)(
+                cls.run_ph_qgrid,
+                if_(cls.should_recollect_incrementally)(cls.recollect_finished_qpoints,),
+                if_(cls.should_clean_finished_qpoints)(cls.clean_finished_qpoints,),
+            ),
+            if_(cls.should_clean_finished_qpoints)(cls.clean_finished_qpoints,),
             cls.inspect_qpoints,
+            if_(cls.should_collect_irreps)(
+                cls.run_collect_irreps,
+                cls.inspect_collect_irreps,
+            ),
             cls.run_recollect_qpoints,
             cls.results,
         )
 
         spec.output('retrieved', valid_type=orm.FolderData)
         spec.output('output_parameters', valid_type=orm.Dict)
+        spec.output(
+            'output_arrays',
+            valid_type=orm.ArrayData,
+            help='The q-point, frequencies and mode symmetries of the output parameters of each q-point as arrays.'
+        )
+        spec.output(
+            'dynamical_matrix',
+            valid_type=DataFactory('quantumespresso_ph.dynamical_matrix'),
+            help='The dynamical matrices, frequencies and eigenvectors of all q-points as arrays.'
+        )
 
         spec.exit_code(300, 'ERROR_QPOINT_WORKCHAIN_FAILED', message='A child work chain failed.')
         spec.exit_code(301, 'ERROR_INITIALIZATION_WORKCHAIN_FAILED', message='The child work chain failed.')
+        spec.exit_code(
+            302,
+            'ERROR_COLLECT_CALCULATION_FAILED',
+            message='A calculation that collects the irreducible representations of a q-point failed.'
+        )
+        spec.exit_code(
+            303,
+            'ERROR_COLLECT_DYNAMICAL_MATRICES_FAILED',
+            message='The dynamical matrices of the recollected q-points could not be parsed.'
+        )
+
+    @classmethod
+    def validate_inputs(cls, value, _):
+        """Validate the top level namespace."""
+        if 'number_of_batches' in value and 'batch_wallclock_seconds' in value:
+            return 'Only one of `number_of_batches` and `batch_wallclock_seconds` can be specified.'
+
+        if 'batch_wallclock_seconds' in value and 'irrep_wallclock_seconds' not in value:
+            return 'The `batch_wallclock_seconds` input requires `irrep_wallclock_seconds` to be specified.'
+
+        if 'number_of_irrep_chunks' in value and ('number_of_batches' in value or 'batch_wallclock_seconds' in value):
+            return 'The q-points cannot be grouped in batches when splitting the irreducible representations in chunks.'
+
+        for key in (
+            'number_of_batches', 'batch_wallclock_seconds', 'irrep_wallclock_seconds', 'number_of_irrep_chunks',
+            'max_concurrent', 'max_num_machines'
+        ):
+            if key in value and value[key].value <= 0:
+                return f'The `{key}` input should be positive.'
+
+        if value['max_qpoint_retries'].value < 0:
+            return 'The `max_qpoint_retries` input should not be negative.'
+
+        if 'retry_wallclock_factor' in value and value['retry_wallclock_factor'].value < 1:
+            return 'The `retry_wallclock_factor` input should be at least 1.'
+
+        if value['wallclock_safety_factor'].value < 1:
+            return 'The `wallclock_safety_factor` input should be at least 1.'
+
+        index_inputs = [key for key in ('number_of_batches', 'batch_wallclock_seconds') if key in value]
+
+        if 'compact_qpoints' in value and value['compact_qpoints'].value:
+            index_inputs.insert(0, 'compact_qpoints')
+
+        if value['reduce_qpoints'].value and index_inputs:
+            return (
+                f'The `reduce_qpoints` input cannot be combined with `{index_inputs[0]}`, since the order of the '
+                'q-points of `spglib` is not guaranteed to match the one of `ph.x`.'
+            )
+
+    def should_reduce_qpoints(self):
+        """Return whether the irreducible q-points should be computed with ``spglib``."""
+        return self.inputs.reduce_qpoints.value
+
+    def run_reduce_qpoints(self):
+        """Compute the irreducible q-points with ``spglib``, if its symmetries match those of the ``pw.x`` calculation.
+
+        If the q-points cannot be computed this way, the initialization run of ``ph.x`` is used instead.
+        """
+        reduce_qpoints = CalculationFactory('quantumespresso_ph.reduce_qpoints')
+        if 'qpoints' not in self.inputs:
+            self.report('the q-points are not specified as a mesh, running the initialization instead')
+            return
+
+        try:
+            _, offset = self.inputs.qpoints.get_kpoints_mesh()
+        except AttributeError:
+            self.report('the q-points are not specified as a mesh, running the initialization instead')
+            return
+
+        if any(offset):
+            self.report('the q-point mesh is shifted, running the initialization instead')
+            return
+
+        pw_calculation = self.inputs.ph.parent_folder.creator
+
+        try:
+            structure = pw_calculation.outputs.output_structure
+        except AttributeError:
+            structure = pw_calculation.inputs.structure
+
+        try:
+            output_parameters = pw_calculation.outputs.output_parameters.get_dict()
+        except AttributeError:
+            output_parameters = {}
+
+        number_of_symmetries = get_number_of_symmetries(structure)
+
+        if number_of_symmetries != output_parameters.get('number_of_symmetries', None):
+            self.report(
+                f'`spglib` found {number_of_symmetries} symmetries, but the `pw.x` calculation found '
+                f'{output_parameters.get("number_of_symmetries", None)}, running the initialization instead'
+            )
+            return
+
+        time_reversal = orm.Bool(output_parameters.get('time_reversal_flag', True))
+        self.ctx.init_retrieved = reduce_qpoints(structure, self.inputs.qpoints, time_reversal)
+        self.ctx.init_structure = structure
+        self.report(f'computed the irreducible q-points with `spglib` using {number_of_symmetries} symmetries')
+
+    def should_run_init(self):
+        """Return whether the initialization run of ``ph.x`` is needed to determine the irreducible q-points."""
+        return 'init_retrieved' not in self.ctx
 
     def run_ph_init(self):
         """Run a first dummy ``PhBaseWorkChain`` that will exit straight after initialization.
@@ -49,6 +338,7 @@ class PhParallelizeQpointsWorkChain(WorkChain):
         At that point it will have generated the q-point list, which we use to determine how to distribute these over
         the available computational resources.
         """
+        PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
         inputs = AttributeDict(self.exposed_inputs(PhBaseWorkChain))
 
         # Toggle the only initialization flag and define minimal resources
@@ -57,7 +347,13 @@ class PhParallelizeQpointsWorkChain(WorkChain):
         parameters['INPUTPH']['last_irr'] = 0
         parameters['INPUTPH']['start_irr'] = 0
         inputs.ph.parameters = orm.Dict(parameters)
-        inputs.ph.metadata.options.max_wallclock_seconds = 1800
+        inputs.ph.metadata.options.max_wallclock_seconds = min(
+            1800, inputs.ph.metadata.options.get('max_wallclock_seconds', 1800)
+        )
+        self.set_parent_folder_symlink(inputs.ph)
+        inputs.ph.metadata.options.additional_retrieve_list = (
+            list(inputs.ph.metadata.options.get('additional_retrieve_list', [])) + get_patterns_retrieve_list()
+        )
         inputs.metadata.call_link_label = 'phonon_initialization'
 
         node = self.submit(PhBaseWorkChain, **inputs)
@@ -73,30 +369,397 @@ class PhParallelizeQpointsWorkChain(WorkChain):
             return self.exit_codes.ERROR_INITIALIZATION_WORKCHAIN_FAILED  # pylint: disable=no-member
 
     def run_distribute_qpoints(self):
-        """Distribute the q-points."""
+        """Distribute the q-points and define the jobs over which they are parallelized."""
+        distribute_qpoints = CalculationFactory('quantumespresso_ph.distribute_qpoints')
         self.report('launching `distribute_qpoints`')
-        retrieved = self.ctx.ph_init.outputs.retrieved
-        self.ctx.qpoints = distribute_qpoints(retrieved=retrieved)
 
-    def run_ph_qgrid(self):
-        """Launch individual ``PhBaseWorkChain``s for each distributed q-point."""
+        inputs = {'compact': self.inputs.compact_qpoints}
+
+        if 'init_retrieved' in self.ctx:
+            inputs['structure'] = self.ctx.init_structure
+        else:
+            self.ctx.init_retrieved = self.ctx.ph_init.outputs.retrieved
+
+        qpoints = distribute_qpoints(retrieved=self.ctx.init_retrieved, **inputs)
+        self.ctx.qpoints = qpoints['qpoints'] if self.inputs.compact_qpoints.value else qpoints
+
+        self.ctx.jobs = self.get_qpoint_jobs()
+        self.ctx.workchains = []
+
+        if self.inputs.use_qpoint_cache.value:
+            self.apply_qpoint_cache()
+
+        if self.inputs.predict_wallclock.value:
+            self.set_walltime_model()
+
+        self.ctx.recollected_jobs = []
+        self.ctx.partial_result = None
+        self.ctx.cleaned_jobs = []
+        self.ctx.retries = [0] * len(self.ctx.jobs)
+
+    def get_number_of_qpoints(self):
+        """Return the number of irreducible q-points."""
+        if self.inputs.compact_qpoints.value:
+            return len(self.ctx.qpoints.get_kpoints())
+
+        return len(self.ctx.qpoints)
+
+    def get_qpoint_coordinates(self, job):
+        """Return the array with the coordinates of the q-points of the given job, in crystal coordinates."""
+        if self.inputs.compact_qpoints.value:
+            return self.ctx.qpoints.get_kpoints()[job['start_q'] - 1:job['last_q']]
+
+        return numpy.array([
+            self.ctx.qpoints[f'qpoint_{index - 1}'].get_kpoints()[0]
+            for index in range(job['start_q'], job['last_q'] + 1)
+        ])
+
+    def is_explicit_job(self, job):
+        """Return whether the job is run for its explicit q-point, rather than for a range of the q-point mesh."""
+        return job['start_q'] == job['last_q'] and not self.inputs.compact_qpoints.value
+
+    def get_qpoint_costs(self):
+        """Return the estimated cost of each q-point, i.e. its number of irreducible representations.
+
+        The number of irreducible representations is obtained from the displacement patterns of the initialization run.
+        If these are not available, all q-points are assumed to have the same cost.
+        """
+        perturbations = get_perturbations_from_patterns(self.ctx.init_retrieved)
+        number_qpoints = self.get_number_of_qpoints()
+
+        if sorted(perturbations) != list(range(1, number_qpoints + 1)):
+            self.report('could not determine the irreducible representations of all q-points, assuming equal costs')
+            return [1] * number_qpoints
+
+        return [len(perturbations[index]) for index in range(1, number_qpoints + 1)]
+
+    def get_qpoint_jobs(self):
+        """Return the list of jobs, each a contiguous range of q-points that is computed by one ``PhBaseWorkChain``.
+
+        Each job is a dictionary with the ``start_q`` and ``last_q`` indices of its range, following the ``ph.x``
+        convention that the first q-point has index 1.
+        """
+        number_qpoints = self.get_number_of_qpoints()
+        single_jobs = [{'start_q': index, 'last_q': index} for index in range(1, number_qpoints + 1)]
+
+        if 'number_of_irrep_chunks' in self.inputs:
+            return self.get_irrep_jobs()
+
+        if 'number_of_batches' not in self.inputs and 'batch_wallclock_seconds' not in self.inputs:
+            return single_jobs
+
+        costs = self.get_qpoint_costs()
+
+        if 'number_of_batches' in self.inputs:
+            number_of_batches = self.inputs.number_of_batches.value
+        else:
+            total_seconds = sum(costs) * self.inputs.irrep_wallclock_seconds.value
+            number_of_batches = int(numpy.ceil(total_seconds / self.inputs.batch_wallclock_seconds.value))
+
+        if number_of_batches >= number_qpoints:
+            return single_jobs
+
+        jobs = [{'start_q': start + 1, 'last_q': stop} for start, stop in partition_costs(costs, number_of_batches)]
+        batch_costs = [sum(costs[job['start_q'] - 1:job['last_q']]) for job in jobs]
+
+        self.report(
+            f'grouped {number_qpoints} q-points in {len(jobs)} batches with estimated cost between {min(batch_costs)} '
+            f'and {max(batch_costs)} irreducible representations'
+        )
+
+        return jobs
+
+    def get_irrep_jobs(self):
+        """Return the list of jobs, each a contiguous range of irreducible representations of a single q-point.
+
+        Each job is a dictionary with the ``start_q`` and ``last_q`` index of its q-point and, if the q-point is split
+        in more than one chunk, the ``start_irr`` and ``last_irr`` indices of the range of irreducible representations.
+        """
+        number_qpoints = self.get_number_of_qpoints()
+        number_of_chunks = self.inputs.number_of_irrep_chunks.value
+        perturbations = get_perturbations_from_patterns(self.ctx.init_retrieved)
+
+        if sorted(perturbations) != list(range(1, number_qpoints + 1)):
+            self.report('could not determine the irreducible representations of all q-points, running them unsplit')
+            return [{'start_q': index, 'last_q': index} for index in range(1, number_qpoints + 1)]
+
+        jobs = []
+
+        for index in range(1, number_qpoints + 1):
+            chunks = partition_costs(perturbations[index], number_of_chunks)
+
+            if len(chunks) == 1:
+                jobs.append({'start_q': index, 'last_q': index})
+                continue
+
+            for start, stop in chunks:
+                jobs.append({'start_q': index, 'last_q': index, 'start_irr': start + 1, 'last_irr': stop})
+
+        self.report(f'split the irreducible representations of {number_qpoints} q-points in {len(jobs)} chunks')
+
+        return jobs
+
+    def get_job_inputs(self, job):
+        """Return the inputs of the ``PhBaseWorkChain`` that computes the q-points of the given job.
+
+        A job with a single q-point is run for that explicit q-point, whereas a batch of q-points is run for the full
+        q-point grid, restricted to the range of the batch through the ``start_q`` and ``last_q`` inputs. With the
+        ``compact_qpoints`` input, all jobs are run on the full q-point grid.
+
+        :param job: a dictionary with the ``start_q`` and ``last_q`` indices of the job.
+        :return: tuple of the call link label and the inputs.
+        """
+        PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
         inputs = AttributeDict(self.exposed_inputs(PhBaseWorkChain))
-        parameters = inputs.ph.parameters.get_dict()
+        label, parameters = self.get_job_parameters(job)
+
+        if self.is_explicit_job(job):
+            inputs.qpoints = self.ctx.qpoints[f'qpoint_{job["start_q"] - 1}']
+
+        inputs.ph.parameters = orm.Dict(parameters)
+        inputs.metadata.call_link_label = label
+        self.set_parent_folder_symlink(inputs.ph)
+        self.set_predicted_resources(job, inputs.ph.metadata.options)
+
+        return label, inputs
+
+    def get_job_parameters(self, job):
+        """Return the call link label and the parameters of the ``PhCalculation`` of the given job.
+
+        :param job: a dictionary with the ``start_q`` and ``last_q`` indices of the job.
+        :return: tuple of the call link label and the parameters as a dictionary.
+        """
+        parameters = self.inputs.ph.parameters.get_dict()
+        parameters.setdefault('INPUTPH', {})
+
+        if 'start_irr' in job:
+            label = f'qpoint_{job["start_q"] - 1}_irreps_{job["start_irr"]}_{job["last_irr"]}'
+            parameters['INPUTPH']['start_irr'] = job['start_irr']
+            parameters['INPUTPH']['last_irr'] = job['last_irr']
+        elif self.is_explicit_job(job):
+            label = f'qpoint_{job["start_q"] - 1}'
+        else:
+            label = f'qpoints_{job["start_q"]}_{job["last_q"]}'
 
-        for q_point_key, qpoint in sorted(self.ctx.qpoints.items()):
-            inputs.qpoints = qpoint
+        if not self.is_explicit_job(job):
+            parameters['INPUTPH']['start_q'] = job['start_q']
+            parameters['INPUTPH']['last_q'] = job['last_q']
 
-            # For `epsil` == True, only the gamma point should be calculated with this setting, see
-            # https://www.quantum-espresso.org/Doc/INPUT_PH.html#idm69
-            if parameters.get('INPUTPH', {}).get('epsil', False) and not numpy.all(qpoint.get_kpoints() == [0, 0, 0]):
-                parameters['INPUTPH']['epsil'] = False
-                inputs.ph.parameters = orm.Dict(parameters)
+        # For `epsil` == True, only the gamma point should be calculated with this setting, see
+        # https://www.quantum-espresso.org/Doc/INPUT_PH.html#idm69
+        # When splitting the irreducible representations, the dielectric properties are computed by the collection step
+        if parameters['INPUTPH'].get('epsil', False):
+            is_gamma = bool(numpy.any(numpy.all(self.get_qpoint_coordinates(job) == 0, axis=1)))
+            parameters['INPUTPH']['epsil'] = is_gamma and 'start_irr' not in job
 
-            inputs.metadata.call_link_label = q_point_key
+        return label, parameters
+
+    def set_walltime_model(self):
+        """Fit the model of the wallclock time of ``ph.x`` calculations on the completed calculations in the database.
+
+        The model and the features of the ``pw.x`` calculation are stored in the context, together with the number of
+        irreducible representations of each q-point. If these are not known from the initialization run, the maximum of
+        three times the number of atoms is assumed.
+        """
+        model = get_walltime_model()
+
+        if model is None:
+            self.report('not enough completed `PhCalculation`s to predict the wallclock time, using the options')
+            return
+
+        try:
+            features = get_pw_features(self.inputs.ph.parent_folder.creator)
+        except (AttributeError, ValueError) as exception:
+            self.report(f'cannot predict the wallclock time: {exception}')
+            return
+
+        perturbations = get_perturbations_from_patterns(self.ctx.init_retrieved)
+        number_qpoints = self.get_number_of_qpoints()
+
+        if sorted(perturbations) == list(range(1, number_qpoints + 1)):
+            irreps = [len(perturbations[index]) for index in range(1, number_qpoints + 1)]
+        else:
+            irreps = [3 * features['number_of_atoms']] * number_qpoints
+
+        self.ctx.walltime_model = model
+        self.ctx.walltime_features = features
+        self.ctx.qpoint_irreps = irreps
+        self.report(f'predicting the wallclock time of the jobs from {model["number_of_samples"]} calculations')
+
+    def set_predicted_resources(self, job, options):
+        """Set the predicted wallclock time and number of machines of the given job, if the model is available.
+
+        :param job: a dictionary with the ``start_q`` and ``last_q`` indices of the job.
+        :param options: the ``metadata.options`` of the ``PhCalculation``, which are updated in place.
+        """
+        if 'walltime_model' not in self.ctx:
+            return
+
+        if 'start_irr' in job:
+            number_of_irreps = job['last_irr'] - job['start_irr'] + 1
+        else:
+            number_of_irreps = sum(self.ctx.qpoint_irreps[job['start_q'] - 1:job['last_q']])
+
+        resources = dict(options.get('resources', {}))
+        num_machines, wallclock_seconds = get_predicted_resources(
+            self.ctx.walltime_model,
+            {
+                **self.ctx.walltime_features, 'number_of_irreps': number_of_irreps
+            },
+            max_wallclock_seconds=options.get('max_wallclock_seconds', 43200),
+            max_num_machines=self.inputs.max_num_machines.value
+            if 'max_num_machines' in self.inputs else resources.get('num_machines', 1),
+            safety_factor=self.inputs.wallclock_safety_factor.value,
+        )
+        resources['num_machines'] = num_machines
+        options.resources = resources
+        options.max_wallclock_seconds = wallclock_seconds
+
+    def set_parent_folder_symlink(self, inputs):
+        """Set the ``PhCalculation`` inputs to symlink the output folder of the parent if ``share_parent_folder``.
+
+        The ``PhCalculation`` then symlinks each file and folder of the output folder of the ``pw.x`` calculation
+        instead of copying the complete folder, including the wavefunctions. The ``_ph0`` folder, to which ``ph.x``
+        writes its own data, is created in the output folder of each calculation and hence is not shared.
+
+        :param inputs: the inputs of the ``PhCalculation``, which are updated in place.
+        """
+        if not self.inputs.share_parent_folder.value:
+            return
+
+        settings = inputs['settings'].get_dict() if 'settings' in inputs else {}
+        settings['PARENT_FOLDER_SYMLINK'] = True
+        inputs['settings'] = orm.Dict(settings)
+
+    def get_qpoint_cache_key(self, job):
+        """Return the cache key of the given job if it is run for an explicit q-point, or ``None`` otherwise."""
+        if 'start_irr' in job or not self.is_explicit_job(job):
+            return None
+
+        _, parameters = self.get_job_parameters(job)
+        pw_calculation = self.inputs.ph.parent_folder.creator
+
+        return get_qpoint_cache_key(pw_calculation, parameters, self.get_qpoint_coordinates(job)[0])
+
+    def apply_qpoint_cache(self):
+        """Look up the jobs of single q-points in the cache and reuse the work chains that are found.
+
+        The jobs whose results are found are moved to the front of the list of jobs, with the cached work chains as
+        their work chains, such that only the remaining jobs are submitted. The cache keys of the jobs are stored in the
+        ``qpoint_cache_keys`` in the same order, such that they are not computed again when the jobs are submitted.
+        """
+        hits = []
+        misses = []
+
+        for job in self.ctx.jobs:
+            key = self.get_qpoint_cache_key(job)
+            workchain = get_cached_workchain(key) if key is not None else None
+
+            if workchain is None:
+                misses.append((job, key))
+            else:
+                hits.append((job, key, workchain))
+
+        self.ctx.jobs = [job for job, _, _ in hits] + [job for job, _ in misses]
+        self.ctx.qpoint_cache_keys = [key for _, key, _ in hits] + [key for _, key in misses]
+        self.ctx.workchains = [workchain for _, _, workchain in hits]
+        self.ctx.number_of_cached_jobs = len(hits)
+
+        for job, _, workchain in hits:
+            self.report(f'reusing {workchain} from the cache for q-point {job["start_q"] - 1}')
+
+        self.report(f'found {len(hits)} of {len(self.ctx.jobs)} jobs in the q-point cache, {len(misses)} misses')
+
+    def get_retry_jobs(self):
+        """Return the indices of the jobs whose work chain failed and that can still be resubmitted."""
+        max_retries = self.inputs.max_qpoint_retries.value
+
+        return [
+            index for index, workchain in enumerate(self.ctx.workchains)
+            if workchain.is_terminated and not workchain.is_finished_ok and self.ctx.retries[index] < max_retries
+        ]
+
+    def should_run_ph_qgrid(self):
+        """Return whether there are q-point jobs that are running, not yet submitted or should be retried."""
+        if len(self.ctx.workchains) < len(self.ctx.jobs) or self.get_retry_jobs():
+            return True
+
+        return any(not workchain.is_terminated for workchain in self.ctx.workchains)
+
+    def get_retry_inputs(self, index, inputs):
+        """Update the inputs of the job with the given index for its next retry.
+
+        :param index: the index of the job that is resubmitted.
+        :param inputs: the inputs of the job as returned by ``get_job_inputs``.
+        :return: the updated inputs.
+        """
+        retries = self.ctx.retries[index] + 1
+        options = inputs.ph.metadata.options
+
+        if 'retry_wallclock_factor' in self.inputs and 'max_wallclock_seconds' in options:
+            factor = self.inputs.retry_wallclock_factor.value**retries
+            options.max_wallclock_seconds = int(options.max_wallclock_seconds * factor)
+
+        if 'retry_options' in self.inputs:
+            options.update(self.inputs.retry_options.get_dict())
+
+        return inputs
+
+    def run_ph_qgrid(self):
+        """Launch a ``PhBaseWorkChain`` for the next jobs of distributed q-points, as long as there are free slots.
+
+        The ``PhBaseWorkChain``s are added to the ``workchains`` list in the order of the jobs upon submission. Failed
+        jobs that can be retried are resubmitted first, replacing their failed work chain in the list. The step then
+        waits for the running work chain that was submitted first, after which the next step submits jobs in the slots
+        of all work chains that terminated in the meantime. A slot that is freed by another work chain is therefore
+        only refilled once the awaited work chain terminates.
+        """
+        PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
+        running = [workchain for workchain in self.ctx.workchains if not workchain.is_terminated]
+        submit_indices = self.get_retry_jobs() + list(range(len(self.ctx.workchains), len(self.ctx.jobs)))
+
+        if 'max_concurrent' in self.inputs:
+            submit_indices = submit_indices[:max(self.inputs.max_concurrent.value - len(running), 0)]
+
+        for index in submit_indices:
+            job = self.ctx.jobs[index]
+            label, inputs = self.get_job_inputs(job)
+
+            if 'start_irr' in job:
+                description = f'irreps {job["start_irr"]} to {job["last_irr"]} of q-point {job["start_q"] - 1}'
+            elif self.is_explicit_job(job):
+                description = f'q-point {label.split("_")[-1]} <{inputs.qpoints.pk}>'
+            elif job['start_q'] == job['last_q']:
+                description = f'q-point {job["start_q"] - 1}'
+            else:
+                description = f'q-points {job["start_q"]} to {job["last_q"]}'
+
+            if index < len(self.ctx.workchains):
+                inputs = self.get_retry_inputs(index, inputs)
+                self.ctx.retries[index] += 1
+                description += f', retry {self.ctx.retries[index]} after failed {self.ctx.workchains[index]}'
 
             node = self.submit(PhBaseWorkChain, **inputs)
-            self.report(f'launching PhBaseWorkChain<{node.pk}> for q-point {q_point_key.split("_")[-1]} <{qpoint.pk}>')
-            self.to_context(workchains=append_(node))
+            self.report(f'launching PhBaseWorkChain<{node.pk}> for {description}')
+
+            key = self.ctx.qpoint_cache_keys[index] if 'qpoint_cache_keys' in self.ctx else None
+
+            if key is not None:
+                node.base.extras.set(QPOINT_CACHE_KEY_EXTRA, key)
+
+            if index < len(self.ctx.workchains):
+                self.ctx.workchains[index] = node
+            else:
+                self.ctx.workchains.append(node)
+
+            running.append(node)
+
+        if running:
+            # Only the running work chain that was submitted first, and hence is expected to finish first, is awaited,
+            # such that the next step refills the slots of all work chains that terminated in the meantime
+            oldest = min(running, key=lambda node: node.pk)
+            self.report(f'{len(running)} work chains running, waiting for {oldest} to finish')
+            self.to_context(running_workchain=oldest)
 
     def inspect_qpoints(self):
         """Inspect each parallel qpoint `PhBaseWorkChain`."""
@@ -105,24 +768,234 @@ class PhParallelizeQpointsWorkChain(WorkChain):
                 self.report(f'child work chain {workchain} failed with status {workchain.exit_status}, aborting.')
                 return self.exit_codes.ERROR_QPOINT_WORKCHAIN_FAILED  # pylint: disable=no-member
 
-    def run_recollect_qpoints(self):
-        """Recollect the dynamical matrices from individual q-points calculations."""
-        self.report('launching `recollect_qpoints`')
-        retrieved_folders = {'qpoint_0': self.ctx.ph_init.outputs.retrieved}
+    def should_collect_irreps(self):
+        """Return whether the irreducible representations of any of the q-points were split in chunks."""
+        return any('start_irr' in job for job in self.ctx.jobs)
+
+    def run_collect_irreps(self):
+        """Launch a ``PhCollectCalculation`` for each q-point whose irreducible representations were split in chunks.
+
+        The calculation is run on the parent folder of the ``pw.x`` calculation, to which the partial results of all
+        chunks are copied.
+        """
+        PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
+        PhCollectCalculation = CalculationFactory('quantumespresso_ph.ph_collect')
+        chunks = {}
+
+        for job, workchain in zip(self.ctx.jobs, self.ctx.workchains):
+            if 'start_irr' in job:
+                chunks.setdefault(job['start_q'], []).append(workchain.outputs.remote_folder)
+
+        for index, remote_folders in sorted(chunks.items()):
+            job = {'start_q': index, 'last_q': index}
+            inputs = AttributeDict(self.exposed_inputs(PhBaseWorkChain).ph)
+            parameters = inputs.parameters.get_dict()
+            parameters.setdefault('INPUTPH', {})
+            parameters['INPUTPH']['recover'] = True
+
+            if self.is_explicit_job(job):
+                inputs.qpoints = self.ctx.qpoints[f'qpoint_{index - 1}']
+            else:
+                inputs.qpoints = self.get_qpoints_mesh()
+                parameters['INPUTPH']['start_q'] = index
+                parameters['INPUTPH']['last_q'] = index
+
+            if parameters['INPUTPH'].get('epsil', False):
+                parameters['INPUTPH']['epsil'] = bool(numpy.all(self.get_qpoint_coordinates(job) == 0))
+
+            inputs.parameters = orm.Dict(parameters)
+            inputs.partial_folders = {f'chunk_{chunk}': folder for chunk, folder in enumerate(remote_folders, 1)}
+            self.set_parent_folder_symlink(inputs)
+            inputs.metadata.call_link_label = f'collect_qpoint_{index - 1}'
+
+            node = self.submit(PhCollectCalculation, **inputs)
+            self.report(f'launching PhCollectCalculation<{node.pk}> for q-point {index - 1}')
+            self.to_context(collections=append_(node))
+
+        self.ctx.collected_qpoints = sorted(chunks)
+
+    def get_qpoints_mesh(self):
+        """Return the q-point mesh, which is taken from the ``dynamical-matrix-0`` file if not specified as input."""
+        PhCollectCalculation = CalculationFactory('quantumespresso_ph.ph_collect')
+        if 'qpoints' in self.inputs:
+            return self.inputs.qpoints
+
+        dynmat_file = f'{PhCollectCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX}0'  # pylint: disable=protected-access
+        mesh, _ = parse_dynamical_matrix_0(self.ctx.init_retrieved.base.repository.get_object_content(dynmat_file))
+        qpoints = orm.KpointsData()
+        qpoints.set_kpoints_mesh(mesh)
+
+        return qpoints
+
+    def inspect_collect_irreps(self):
+        """Inspect each ``PhCollectCalculation``."""
+        for calculation in self.ctx.collections:
+            if not calculation.is_finished_ok:
+                self.report(f'collection {calculation} failed with status {calculation.exit_status}, aborting.')
+                return self.exit_codes.ERROR_COLLECT_CALCULATION_FAILED  # pylint: disable=no-member
+
+    def should_recollect_incrementally(self):
+        """Return whether the results of the q-points should be recollected as they finish."""
+        return self.inputs.incremental_recollection.value
+
+    def recollect_finished_qpoints(self):
+        """Recollect the dynamical matrices and output parameters of the q-points that finished since the last step.
+
+        The q-points that finished since the last step are merged with the accumulated result of the previous steps,
+        such that the final recollection only has to add the q-points that finished last. Work chains that failed are
+        skipped, as well as the chunks of split irreducible representations, which are only recollected through their
+        collection calculation.
+        """
+        children = []
+
+        for index, (job, workchain) in enumerate(zip(self.ctx.jobs, self.ctx.workchains)):
+            if index in self.ctx.recollected_jobs or 'start_irr' in job or not workchain.is_finished_ok:
+                continue
+            children.append((job, workchain))
+            self.ctx.recollected_jobs.append(index)
+
+        if children:
+            self.ctx.partial_result = self.recollect(children, self.ctx.partial_result)
+            number_qpoints = sum(
+                self.ctx.jobs[index]['last_q'] - self.ctx.jobs[index]['start_q'] + 1
+                for index in self.ctx.recollected_jobs
+            )
+            self.report(f'recollected {number_qpoints} of {self.get_number_of_qpoints()} q-points')
+
+    def should_clean_finished_qpoints(self):
+        """Return whether the remote folders of the q-points should be cleaned as they finish."""
+        return self.inputs.clean_finished_qpoints.value
+
+    def clean_finished_qpoints(self):
+        """Clean the remote folders of the calculations of the q-points that finished since the last step.
+
+        Only the jobs that finished successfully and whose retrieved folder contains the dynamical matrices of all their
+        q-points are cleaned. The work chains that are reused from the q-point cache are skipped, since they were not
+        run by this work chain, as well as the chunks of split irreducible representations, whose remote folders are
+        still needed by their collection calculation.
+
+        The transports are requested from the transport queue of the runner and the cleanup is awaited within this
+        step, without blocking the event loop while the folders are removed. Folders that could not be removed are
+        reported and not marked as cleaned, so they are left for the final cleanup of the ``DynamicalMatrixWorkChain``.
+        """
+        remote_folders = []
+
+        for index, (job, workchain) in enumerate(zip(self.ctx.jobs, self.ctx.workchains)):
+            if index in self.ctx.cleaned_jobs or index < self.ctx.get('number_of_cached_jobs', 0) or 'start_irr' in job:
+                continue
+
+            if not workchain.is_finished_ok or not self.has_dynamical_matrices(job, workchain.outputs.retrieved):
+                continue
+
+            self.ctx.cleaned_jobs.append(index)
+            remote_folders.extend(
+                node.outputs.remote_folder
+                for node in workchain.called_descendants
+                if isinstance(node, orm.CalcJobNode) and 'remote_folder' in node.outputs
+            )
+
+        if not remote_folders:
+            return
+
+        cleaned = self.runner.run_until_complete(
+            clean_remote_folders_async(remote_folders, self.runner.transport, self.logger)
+        )
+
+        if cleaned:
+            self.report(
+                f"cleaned remote folders of calculations: {' '.join(str(folder.creator.pk) for folder in cleaned)}"
+            )
+
+    def has_dynamical_matrices(self, job, retrieved):
+        """Return whether the retrieved folder of the given job contains the dynamical matrices of all its q-points."""
+        PhCollectCalculation = CalculationFactory('quantumespresso_ph.ph_collect')
+        dynmat_prefix = PhCollectCalculation._OUTPUT_DYNAMICAL_MATRIX_PREFIX  # pylint: disable=protected-access
+
+        if self.is_explicit_job(job):
+            filepaths = [dynmat_prefix]
+        else:
+            filepaths = [f'{dynmat_prefix}{index}' for index in range(job['start_q'], job['last_q'] + 1)]
+
+        try:
+            for filepath in filepaths:
+                retrieved.base.repository.get_object(filepath)
+        except FileNotFoundError:
+            return False
+
+        return True
+
+    def recollect(self, children, partial_result=None, include_initialization=False):
+        """Return the merged dynamical matrices and output parameters of the given children and partial result.
+
+        :param children: list of tuples of a job and the corresponding work chain or calculation.
+        :param partial_result: the result of an earlier call, which is extended with those of the children.
+        :param include_initialization: whether to include the dynamical matrix of the initialization run.
+        :return: dictionary with the merged ``retrieved`` folder, ``output_parameters`` and ``output_arrays``.
+        """
+        recollect_qpoints = CalculationFactory('quantumespresso_ph.recollect_qpoints')
+        retrieved_folders = {'qpoint_0': self.ctx.init_retrieved} if include_initialization else {}
         output_dict = {}
 
-        for index, workchain in enumerate(self.ctx.workchains):
-            ind = index + 1
-            retrieved_folders[f'qpoint_{ind}'] = workchain.outputs.retrieved
-            output_dict[f'output_{ind}'] = workchain.outputs.output_parameters
+        if partial_result is not None:
+            retrieved_folders['recollected'] = partial_result['retrieved']
+            output_dict['merged'] = partial_result['output_parameters']
+            output_dict['merged_arrays'] = partial_result['output_arrays']
+
+        for job, workchain in children:
+            if self.is_explicit_job(job):
+                retrieved_folders[f'qpoint_{job["start_q"]}'] = workchain.outputs.retrieved
+                output_dict[f'output_{job["start_q"]}'] = workchain.outputs.output_parameters
+            else:
+                retrieved_folders[f'qpoints_{job["start_q"]}_{job["last_q"]}'] = workchain.outputs.retrieved
+                output_dict[f'output_{job["start_q"]}_{job["last_q"]}'] = workchain.outputs.output_parameters
 
         retrieved_folders['metadata'] = {'call_link_label': 'recollect_qpoints'}
+        merged = merge_para_ph_outputs(**output_dict)
 
-        self.ctx.merged_retrieved = recollect_qpoints(**retrieved_folders)
-        self.ctx.merged_output_parameters = merge_para_ph_outputs(**output_dict)
+        return {
+            'retrieved': recollect_qpoints(**retrieved_folders),
+            'output_parameters': merged['output_parameters'],
+            'output_arrays': merged['output_arrays'],
+        }
+
+    def run_recollect_qpoints(self):
+        """Recollect the dynamical matrices from individual q-points calculations.
+
+        The q-points that were already recollected incrementally are taken from the accumulated partial result.
+        """
+        self.report('launching `recollect_qpoints`')
+
+        children = [(job, node)
+                    for index, (job, node) in enumerate(zip(self.ctx.jobs, self.ctx.workchains))
+                    if 'start_irr' not in job and index not in self.ctx.recollected_jobs]
+
+        # The q-points whose irreducible representations were split are taken from the collection calculations instead
+        for index, calculation in zip(self.ctx.get('collected_qpoints', []), self.ctx.get('collections', [])):
+            children.append(({'start_q': index, 'last_q': index}, calculation))
+
+        merged = self.recollect(children, self.ctx.get('partial_result'), include_initialization=True)
+        self.ctx.merged_retrieved = merged['retrieved']
+        self.ctx.merged_output_parameters = merged['output_parameters']
+        self.ctx.merged_output_arrays = merged['output_arrays']
 
     def results(self):
-        """Attach the ``FolderData`` with all collected dynamical matrices as output."""
+        """Attach the ``FolderData`` with all collected dynamical matrices as output.
+
+        The dynamical matrices are only attached as arrays if all files can be parsed, otherwise the other outputs are
+        still attached before the work chain fails.
+        """
+        collect_dynamical_matrices = CalculationFactory('quantumespresso_ph.collect_dynamical_matrices')
         self.out('retrieved', self.ctx.merged_retrieved)
         self.out('output_parameters', self.ctx.merged_output_parameters)
+        self.out('output_arrays', self.ctx.merged_output_arrays)
+
+        dynamical_matrix, node = collect_dynamical_matrices.run_get_node(
+            self.ctx.merged_retrieved, metadata={'call_link_label': 'collect_dynamical_matrices'}
+        )
+
+        if not node.is_finished_ok:
+            self.report(f'collect_dynamical_matrices<{node.pk}> failed: {node.exit_message}')
+            return self.exit_codes.ERROR_COLLECT_DYNAMICAL_MATRICES_FAILED  # pylint: disable=no-member
+
+        self.out('dynamical_matrix', dynamical_matrix)
         self.report('workchain completed successfully')
@@ -4,15 +4,48 @@
 """Workchain to compute the phonon dispersion from the raw initial unrelaxed structure."""
 from aiida import orm
 from aiida.common.extendeddicts import AttributeDict
-from aiida.engine import ToContext, WorkChain
-from aiida.plugins import CalculationFactory, WorkflowFactory
+from aiida.engine import ToContext, WorkChain, append_, if_
+from aiida.plugins import CalculationFactory, DataFactory, WorkflowFactory
+import numpy
 
-PhBaseWorkChain = WorkflowFactory('quantumespresso.ph.base')
-PwBaseWorkChain = WorkflowFactory('quantumespresso.pw.base')
-Q2rBaseWorkChain = WorkflowFactory('quantumespresso.q2r.base')
-MatdynBaseWorkChain = WorkflowFactory('quantumespresso.matdyn.base')
+from aiida_quantumespresso_ph.calculations.functions.merge_phonon_bands import DOS_KEYWORDS
+from aiida_quantumespresso_ph.utils.cache import (
+    FORCE_CONSTANTS_CACHE_KEY_EXTRA,
+    get_cached_force_constants,
+    get_force_constants_cache_key,
+)
 
-PhCalculation = CalculationFactory('quantumespresso.ph')
+
+def validate_inputs(inputs, _):
+    """Validate the top level namespace."""
+    if 'use_native_q2r' in inputs and inputs['use_native_q2r'].value:
+        if not isinstance(inputs['dynmat_folder'], orm.FolderData):
+            return 'The `dynmat_folder` should be a `FolderData` to compute the force constants with `use_native_q2r`.'
+    elif 'q2r' not in inputs:
+        return 'The `q2r` inputs are required unless `use_native_q2r` is set to `True`.'
+
+    if 'use_force_constants_cache' in inputs and inputs['use_force_constants_cache'].value:
+        if not isinstance(inputs['dynmat_folder'], orm.FolderData):
+            return (
+                'The `dynmat_folder` should be a `FolderData` to look up the force constants with '
+                '`use_force_constants_cache`.'
+            )
+
+    if ('matdyn' in inputs) == ('native_matdyn' in inputs):
+        return 'Exactly one of the `matdyn` and `native_matdyn` inputs should be specified.'
+
+    if 'matdyn_chunks' in inputs:
+        if inputs['matdyn_chunks'].value < 1:
+            return 'The `matdyn_chunks` should be a positive integer.'
+        if 'matdyn' not in inputs:
+            return 'The `matdyn_chunks` input can only be used with the `matdyn` inputs.'
+
+    if inputs.get('matdyn_targets', None):
+        if 'matdyn' not in inputs:
+            return 'The `matdyn_targets` input can only be used with the `matdyn` inputs.'
+        for label, target in inputs['matdyn_targets'].items():
+            if 'kpoints' not in target:
+                return f'The `kpoints` of the `matdyn_targets.{label}` target are not specified.'
 
 
 class PhInterpolateWorkChain(WorkChain):
@@ -21,6 +54,8 @@ class PhInterpolateWorkChain(WorkChain):
     @classmethod
     def define(cls, spec):
         """Define the work chain specification."""
+        Q2rBaseWorkChain = WorkflowFactory('quantumespresso.q2r.base')
+        MatdynBaseWorkChain = WorkflowFactory('quantumespresso.matdyn.base')
         super().define(spec)
         spec.input(
             'dynmat_folder',
@@ -28,23 +63,152 @@ class PhInterpolateWorkChain(WorkChain):
             required=True,
             help='Retrieved folder containing the dynamical matrix'
         )
-        spec.expose_inputs(Q2rBaseWorkChain, namespace='q2r', exclude=('q2r.parent_folder',))
-        spec.expose_inputs(MatdynBaseWorkChain, namespace='matdyn', exclude=('matdyn.force_constants',))
+        spec.input(
+            'use_native_q2r',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='If `True`, compute the force constants from the dynamical matrices with NumPy in the '
+            '`compute_force_constants` calcfunction instead of running `q2r.x`. The `dynmat_folder` should be a '
+            '`FolderData` in this case, and the `q2r` inputs are not used.'
+        )
+        spec.input(
+            'native_q2r_asr',
+            valid_type=orm.Str,
+            default=lambda: orm.Str('no'),
+            help='The acoustic sum rule, `no` or `simple`, that is imposed on the effective charges and the force '
+            'constants if `use_native_q2r` is `True`.'
+        )
+        spec.input(
+            'use_force_constants_cache',
+            valid_type=orm.Bool,
+            default=lambda: orm.Bool(False),
+            help='If `True`, look up force constants that were computed earlier from dynamical matrix files with the '
+            'same content and with the same parameters, in which case neither `q2r.x` nor `compute_force_constants` '
+            'is run. The force constants that are computed get the `force_constants_cache_key` extra, so they can be '
+            'reused by later work chains. The `dynmat_folder` should be a `FolderData` in this case.'
+        )
+        spec.expose_inputs(
+            Q2rBaseWorkChain,
+            namespace='q2r',
+            exclude=('q2r.parent_folder',),
+            namespace_options={
+                'required': False,
+                'populate_defaults': False
+            }
+        )
+        spec.expose_inputs(
+            MatdynBaseWorkChain,
+            namespace='matdyn',
+            exclude=('matdyn.force_constants',),
+            namespace_options={
+                'required': False,
+                'populate_defaults': False
+            }
+        )
+        spec.input(
+            'matdyn_chunks',
+            valid_type=orm.Int,
+            required=False,
+            help='The number of chunks in which the q-points of the `matdyn` inputs are split, each of which is run as '
+            'a separate `MatdynBaseWorkChain` in parallel with the same force constants. The frequencies of the chunks '
+            'are merged into a single `output_phonon_bands` and, if `dos` is set in the `INPUT` namelist and the '
+            'q-points are a mesh, the density of states is computed from the merged frequencies.'
+        )
+        spec.input_namespace(
+            'matdyn_targets',
+            valid_type=(orm.KpointsData, orm.Dict),
+            dynamic=True,
+            required=False,
+            help='Additional `matdyn.x` targets, e.g. other band paths or DOS meshes, that are interpolated from the '
+            'same force constants in parallel with the `matdyn` inputs. Each target is a namespace with the `kpoints` '
+            'and optionally the `parameters`, which replace those of the `matdyn` inputs, and its outputs are '
+            'returned in the `matdyn_targets` output namespace under the same label.'
+        )
+        spec.input_namespace(
+            'native_matdyn',
+            required=False,
+            populate_defaults=False,
+            help='Inputs to interpolate the phonon frequencies with NumPy in the `interpolate_phonon_bands` '
+            'calcfunction instead of running `matdyn.x`, in which case the `matdyn` inputs should not be specified.'
+        )
+        spec.input(
+            'native_matdyn.kpoints',
+            valid_type=orm.KpointsData,
+            help='The q-points at which the frequencies are interpolated, either as a path or as a mesh.'
+        )
+        spec.input(
+            'native_matdyn.asr',
+            valid_type=orm.Str,
+            default=lambda: orm.Str('no'),
+            help='The acoustic sum rule, `no` or `simple`, that is imposed on the effective charges and the force '
+            'constants.'
+        )
+        spec.input(
+            'native_matdyn.chunk_size',
+            valid_type=orm.Int,
+            required=False,
+            help='The number of q-points that are interpolated at once, which bounds the memory usage.'
+        )
+        spec.input(
+            'native_matdyn.max_workers',
+            valid_type=orm.Int,
+            required=False,
+            help='The number of processes over which the chunks of q-points are distributed.'
+        )
+        spec.inputs.validator = validate_inputs
         spec.outline(
             cls.setup,
-            cls.run_q2r,
-            cls.run_matdyn,
+            if_(cls.should_compute_force_constants
+                )(if_(cls.should_run_q2r)(cls.run_q2r).else_(cls.run_compute_force_constants),),
+            if_(cls.should_run_matdyn)(cls.run_matdyn).else_(cls.run_native_matdyn),
             cls.results,
         )
-        spec.output('output_parameters', valid_type=orm.Dict)
+        spec.output('output_parameters', valid_type=orm.Dict, required=False)
         spec.output('output_phonon_bands', valid_type=orm.BandsData)
+        spec.output('output_phonon_dos', valid_type=orm.XyData, required=False)
+        spec.output('force_constants', valid_type=DataFactory('quantumespresso.force_constants'), required=False)
+        spec.output_namespace(
+            'matdyn_targets',
+            valid_type=(orm.Dict, orm.BandsData, orm.XyData),
+            dynamic=True,
+            required=False,
+            help='The outputs of the `MatdynBaseWorkChain` of each of the `matdyn_targets`.'
+        )
+        spec.exit_code(401, 'ERROR_SUB_PROCESS_FAILED_MATDYN', message='One of the MatdynBaseWorkChain failed.')
 
     def setup(self):
         """Initialize context variables."""
         #self.ctx.structure = self.inputs.pw.pw.structure
+        if self.inputs.use_force_constants_cache.value:
+            self.ctx.force_constants_cache_key = get_force_constants_cache_key(
+                self.inputs.dynmat_folder, self.get_force_constants_parameters()
+            )
+            force_constants = get_cached_force_constants(self.ctx.force_constants_cache_key)
+
+            if force_constants is not None:
+                self.report(f'reusing the force constants {force_constants} from the cache')
+                self.ctx.force_constants = force_constants
+
+    def get_force_constants_parameters(self):
+        """Return the parameters that affect the force constants, which are part of their cache key."""
+        if not self.should_run_q2r():
+            return {'method': 'native', 'asr': self.inputs.native_q2r_asr.value}
+
+        parameters = self.inputs.q2r.q2r.parameters.get_dict() if 'parameters' in self.inputs.q2r.q2r else {}
+
+        return {'method': 'q2r', 'parameters': parameters}
+
+    def should_compute_force_constants(self):
+        """Return whether the force constants should be computed, i.e. they were not found in the cache."""
+        return 'force_constants' not in self.ctx
+
+    def should_run_q2r(self):
+        """Return whether the force constants should be computed with `q2r.x`."""
+        return not self.inputs.use_native_q2r.value
 
     def run_q2r(self):
         """Run the Q2rCalculation."""
+        Q2rBaseWorkChain = WorkflowFactory('quantumespresso.q2r.base')
         inputs = AttributeDict(self.inputs.q2r)
 
         # Load parent folder from completed PhBaseWorkChain if not provided in inputs
@@ -57,13 +221,42 @@ class PhInterpolateWorkChain(WorkChain):
 
         return ToContext(workflow_q2r=running)
 
+    def run_compute_force_constants(self):
+        """Compute the force constants from the dynamical matrices with NumPy instead of running `q2r.x`."""
+        compute_force_constants = CalculationFactory('quantumespresso_ph.compute_force_constants')
+        self.ctx.force_constants = compute_force_constants(
+            self.inputs.dynmat_folder,
+            self.inputs.native_q2r_asr,
+            metadata={'call_link_label': 'compute_force_constants'},
+        )
+
+    def get_force_constants(self):
+        """Return the force constants, which are taken from the `Q2rBaseWorkChain` unless computed with NumPy."""
+        if 'force_constants' not in self.ctx:
+            self.ctx.force_constants = self.ctx.workflow_q2r.outputs.force_constants
+
+        if 'force_constants_cache_key' in self.ctx:
+            self.ctx.force_constants.base.extras.set(
+                FORCE_CONSTANTS_CACHE_KEY_EXTRA, self.ctx.force_constants_cache_key
+            )
+
+        return self.ctx.force_constants
+
+    def should_run_matdyn(self):
+        """Return whether the frequencies should be interpolated with `matdyn.x`."""
+        return 'native_matdyn' not in self.inputs
+
     def run_matdyn(self):
         """Run the MatdynCalculation."""
+        MatdynBaseWorkChain = WorkflowFactory('quantumespresso.matdyn.base')
         inputs = AttributeDict(self.inputs.matdyn)
+        inputs['matdyn']['force_constants'] = self.get_force_constants()
 
-        # Load parent folder from completed PhBaseWorkChain if not provided in inputs
-        if 'force_constants' not in inputs:
-            inputs['matdyn']['force_constants'] = self.ctx.workflow_q2r.outputs.force_constants
+        for label, target in self.inputs.get('matdyn_targets', {}).items():
+            self.run_matdyn_target(label, target)
+
+        if 'matdyn_chunks' in self.inputs and self.inputs.matdyn_chunks.value > 1:
+            return self.run_matdyn_chunks(inputs)
 
         running = self.submit(MatdynBaseWorkChain, **inputs)
 
@@ -71,9 +264,103 @@ class PhInterpolateWorkChain(WorkChain):
 
         return ToContext(workflow_matdyn=running)
 
+    def run_matdyn_target(self, label, target):
+        """Run a `MatdynBaseWorkChain` for one of the `matdyn_targets` with the same force constants."""
+        MatdynBaseWorkChain = WorkflowFactory('quantumespresso.matdyn.base')
+        inputs = AttributeDict(self.inputs.matdyn)
+        inputs['matdyn']['force_constants'] = self.get_force_constants()
+        inputs['matdyn'].update(target)
+        inputs.metadata = {**inputs.get('metadata', {}), 'call_link_label': f'matdyn_{label}'}
+
+        running = self.submit(MatdynBaseWorkChain, **inputs)
+
+        self.report(f'launching MatdynBaseWorkChain<{running.pk}> for the `{label}` target')
+        self.to_context(**{f'workflow_matdyn_targets.{label}': running})
+
+    def run_matdyn_chunks(self, inputs):
+        """Run a `MatdynBaseWorkChain` for each chunk of the q-points, which share the same force constants.
+
+        The chunks are explicit lists of q-points, so the density of states keywords are removed from the parameters of
+        the chunks and the density of states is computed from the merged frequencies instead.
+        """
+        MatdynBaseWorkChain = WorkflowFactory('quantumespresso.matdyn.base')
+        kpoints = inputs['matdyn']['kpoints']
+
+        try:
+            qpoints = kpoints.get_kpoints()
+        except AttributeError:
+            qpoints = kpoints.get_kpoints_mesh(print_list=True)
+
+        if 'parameters' in inputs['matdyn']:
+            parameters = inputs['matdyn']['parameters'].get_dict()
+            namelist = parameters.get('INPUT', {})
+            parameters['INPUT'] = {key: value for key, value in namelist.items() if key.lower() not in DOS_KEYWORDS}
+            inputs['matdyn']['parameters'] = orm.Dict(parameters)
+
+        for index, chunk in enumerate(numpy.array_split(qpoints, self.inputs.matdyn_chunks.value)):
+            if len(chunk) == 0:
+                continue
+
+            kpoints_chunk = orm.KpointsData()
+            kpoints_chunk.set_kpoints(chunk)
+
+            if kpoints.base.attributes.get('cell', None) is not None:
+                kpoints_chunk.set_cell(kpoints.cell)
+
+            inputs['matdyn']['kpoints'] = kpoints_chunk
+            inputs.metadata = {**inputs.get('metadata', {}), 'call_link_label': f'matdyn_chunk_{index:02d}'}
+
+            running = self.submit(MatdynBaseWorkChain, **inputs)
+
+            self.report(f'launching MatdynBaseWorkChain<{running.pk}> for chunk {index} with {len(chunk)} q-points')
+            self.to_context(workflow_matdyn_chunks=append_(running))
+
+    def run_native_matdyn(self):
+        """Interpolate the frequencies with NumPy instead of running `matdyn.x`."""
+        interpolate_phonon_bands = CalculationFactory('quantumespresso_ph.interpolate_phonon_bands')
+        self.ctx.phonon_bands = interpolate_phonon_bands(
+            self.get_force_constants(),
+            **self.inputs.native_matdyn,
+            metadata={'call_link_label': 'interpolate_phonon_bands'},
+        )
+
     def results(self):
         """Run the final step after computing the dispersion steps."""
-        matdyn_calc = self.ctx.workflow_matdyn
+        merge_phonon_bands = CalculationFactory('quantumespresso_ph.merge_phonon_bands')
+
+        for label, workchain in self.ctx.get('workflow_matdyn_targets', {}).items():
+            if not workchain.is_finished_ok:
+                self.report(f'MatdynBaseWorkChain<{workchain.pk}> failed with exit status {workchain.exit_status}')
+                return self.exit_codes.ERROR_SUB_PROCESS_FAILED_MATDYN  # pylint: disable=no-member
+
+            for name in ('output_parameters', 'output_phonon_bands', 'output_phonon_dos'):
+                if name in workchain.outputs:
+                    self.out(f'matdyn_targets.{label}.{name}', workchain.outputs[name])
+
+        if 'workflow_matdyn_chunks' in self.ctx:
+            for workchain in self.ctx.workflow_matdyn_chunks:
+                if not workchain.is_finished_ok:
+                    self.report(f'MatdynBaseWorkChain<{workchain.pk}> failed with exit status {workchain.exit_status}')
+                    return self.exit_codes.ERROR_SUB_PROCESS_FAILED_MATDYN  # pylint: disable=no-member
+
+            chunks = {
+                f'bands_{index}': workchain.outputs.output_phonon_bands
+                for index, workchain in enumerate(self.ctx.workflow_matdyn_chunks)
+            }
+            if 'parameters' in self.inputs.matdyn.matdyn:
+                chunks['parameters'] = self.inputs.matdyn.matdyn.parameters
+
+            merged = merge_phonon_bands(
+                self.inputs.matdyn.matdyn.kpoints,
+                **chunks,
+                metadata={'call_link_label': 'merge_phonon_bands'},
+            )
+            self.out_many(merged)
+        elif 'workflow_matdyn' in self.ctx:
+            matdyn_calc = self.ctx.workflow_matdyn
+            self.out('output_parameters', matdyn_calc.outputs.output_parameters)
+            self.out('output_phonon_bands', matdyn_calc.outputs.output_phonon_bands)
+        else:
+            self.out('output_phonon_bands', self.ctx.phonon_bands)
 
-        self.out('output_parameters', matdyn_calc.outputs.output_parameters)
-        self.out('output_phonon_bands', matdyn_calc.outputs.output_phonon_bands)
+        self.out('force_constants', self.ctx.force_constants)
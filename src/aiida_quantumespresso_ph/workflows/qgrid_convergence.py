@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""Workchain to converge the q-point mesh of a phonon calculation with respect to the interpolated frequencies."""
+from aiida import orm
+from aiida.common.extendeddicts import AttributeDict
+from aiida.engine import WorkChain, while_
+import numpy
+
+from aiida_quantumespresso_ph.workflows.ph.parallelize_qpoints import PhParallelizeQpointsWorkChain
+from aiida_quantumespresso_ph.workflows.ph_interpolate import PhInterpolateWorkChain
+
+
+def validate_initial_mesh(value, _):
+    """Validate the ``initial_mesh`` input."""
+    mesh = value.get_list()
+
+    if len(mesh) != 3 or any(not isinstance(number, int) or number < 1 for number in mesh):
+        return f'The `initial_mesh` should be a list of three positive integers, but got: {mesh}'
+
+
+class PhQgridConvergenceWorkChain(WorkChain):
+    """Workchain to converge the q-point mesh of a phonon calculation with respect to the interpolated frequencies.
+
+    Starting from the ``initial_mesh``, the dynamical matrices are computed with the
+    ``PhParallelizeQpointsWorkChain`` on increasingly dense q-point meshes, each of which doubles the previous mesh.
+    After each step, the frequencies are interpolated on the fixed path of the ``interpolate.matdyn.matdyn.kpoints``
+    with the ``PhInterpolateWorkChain``. The work chain stops once the frequencies of two successive meshes differ by
+    at most the ``frequency_tolerance``.
+
+    Since each mesh contains all q-points of the previous meshes, the q-point cache of the
+    ``PhParallelizeQpointsWorkChain`` is used to avoid recomputing the q-points that are shared between meshes. Since
+    the cache only applies to jobs of a single q-point, the inputs to batch the q-points, compact them or split their
+    irreducible representations are not exposed.
+    """
+
+    @classmethod
+    def define(cls, spec):
+        """Define the work chain specification."""
+        super().define(spec)
+        spec.expose_inputs(
+            PhParallelizeQpointsWorkChain,
+            namespace='ph',
+            exclude=(
+                'qpoints', 'qpoints_distance', 'use_qpoint_cache', 'number_of_batches', 'batch_wallclock_seconds',
+                'compact_qpoints', 'number_of_irrep_chunks'
+            )
+        )
+        spec.expose_inputs(PhInterpolateWorkChain, namespace='interpolate', exclude=('dynmat_folder',))
+        spec.input(
+            'initial_mesh',
+            valid_type=orm.List,
+            validator=validate_initial_mesh,
+            help='The q-point mesh of the first step. The mesh of each next step doubles the previous mesh.'
+        )
+        spec.input(
+            'frequency_tolerance',
+            valid_type=orm.Float,
+            default=lambda: orm.Float(1.0),
+            help='The maximum difference in cm^-1 between the interpolated frequencies of two successive meshes.'
+        )
+        spec.input(
+            'max_iterations',
+            valid_type=orm.Int,
+            default=lambda: orm.Int(4),
+            help='The maximum number of q-point meshes that are computed.'
+        )
+
+        spec.outline(
+            cls.setup,
+            while_(cls.should_run_iteration)(
+                cls.run_ph,
+                cls.inspect_ph,
+                cls.run_interpolate,
+                cls.inspect_interpolate,
+                cls.inspect_convergence,
+            ),
+            cls.results,
+        )
+
+        spec.output('retrieved', valid_type=orm.FolderData)
+        spec.output('output_parameters', valid_type=orm.Dict)
+        spec.output('output_phonon_bands', valid_type=orm.BandsData)
+        spec.output('qpoints', valid_type=orm.KpointsData, help='The q-point mesh of the last step.')
+
+        spec.exit_code(401, 'ERROR_SUB_PROCESS_FAILED_PH', message='The PhParallelizeQpointsWorkChain failed.')
+        spec.exit_code(402, 'ERROR_SUB_PROCESS_FAILED_INTERPOLATE', message='The PhInterpolateWorkChain failed.')
+        spec.exit_code(
+            403,
+            'ERROR_CONVERGENCE_NOT_REACHED',
+            message='The frequencies did not converge within the maximum number of iterations.'
+        )
+
+    def setup(self):
+        """Initialize context variables."""
+        self.ctx.iteration = 0
+        self.ctx.is_converged = False
+        self.ctx.previous_bands = None
+
+    def should_run_iteration(self):
+        """Return whether a denser q-point mesh should be computed."""
+        return not self.ctx.is_converged and self.ctx.iteration < self.inputs.max_iterations.value
+
+    def run_ph(self):
+        """Run the ``PhParallelizeQpointsWorkChain`` for the next q-point mesh."""
+        self.ctx.iteration += 1
+
+        qpoints = orm.KpointsData()
+        factor = 2**(self.ctx.iteration - 1)
+        qpoints.set_kpoints_mesh([factor * number for number in self.inputs.initial_mesh.get_list()])
+
+        inputs = AttributeDict(self.exposed_inputs(PhParallelizeQpointsWorkChain, namespace='ph'))
+        inputs.qpoints = qpoints
+        inputs.use_qpoint_cache = orm.Bool(True)
+        inputs.metadata.call_link_label = f'ph_iteration_{self.ctx.iteration:02d}'
+
+        node = self.submit(PhParallelizeQpointsWorkChain, **inputs)
+        self.report(f'launching PhParallelizeQpointsWorkChain<{node.pk}> for mesh {qpoints.get_kpoints_mesh()[0]}')
+        self.to_context(workchain_ph=node)
+
+    def inspect_ph(self):
+        """Inspect the ``PhParallelizeQpointsWorkChain``."""
+        workchain = self.ctx.workchain_ph
+
+        if not workchain.is_finished_ok:
+            self.report(f'PhParallelizeQpointsWorkChain failed with exit status {workchain.exit_status}')
+            return self.exit_codes.ERROR_SUB_PROCESS_FAILED_PH  # pylint: disable=no-member
+
+    def run_interpolate(self):
+        """Run the ``PhInterpolateWorkChain`` to interpolate the frequencies on the fixed path."""
+        inputs = AttributeDict(self.exposed_inputs(PhInterpolateWorkChain, namespace='interpolate'))
+        inputs.dynmat_folder = self.ctx.workchain_ph.outputs.retrieved
+        inputs.metadata.call_link_label = f'interpolate_iteration_{self.ctx.iteration:02d}'
+
+        node = self.submit(PhInterpolateWorkChain, **inputs)
+        self.report(f'launching PhInterpolateWorkChain<{node.pk}>')
+        self.to_context(workchain_interpolate=node)
+
+    def inspect_interpolate(self):
+        """Inspect the ``PhInterpolateWorkChain``."""
+        workchain = self.ctx.workchain_interpolate
+
+        if not workchain.is_finished_ok:
+            self.report(f'PhInterpolateWorkChain failed with exit status {workchain.exit_status}')
+            return self.exit_codes.ERROR_SUB_PROCESS_FAILED_INTERPOLATE  # pylint: disable=no-member
+
+    def inspect_convergence(self):
+        """Compare the interpolated frequencies with those of the previous q-point mesh.
+
+        The frequencies of the ``output_phonon_bands`` are in THz, so they are converted to cm^-1, the units of the
+        ``frequency_tolerance``.
+        """
+        from qe_tools import CONSTANTS
+
+        bands = self.ctx.workchain_interpolate.outputs.output_phonon_bands
+
+        if self.ctx.previous_bands is not None:
+            difference = numpy.abs(bands.get_bands() -
+                                   self.ctx.previous_bands.get_bands()).max() / CONSTANTS.invcm_to_THz
+            self.ctx.is_converged = bool(difference <= self.inputs.frequency_tolerance.value)
+            self.report(
+                f'maximum difference of the frequencies with the previous mesh: {difference:.3f} cm^-1, '
+                f'{"converged" if self.ctx.is_converged else "not converged"}'
+            )
+
+        self.ctx.previous_bands = bands
+
+    def results(self):
+        """Attach the results of the last q-point mesh as outputs."""
+        self.out('retrieved', self.ctx.workchain_ph.outputs.retrieved)
+        self.out('output_parameters', self.ctx.workchain_ph.outputs.output_parameters)
+        self.out('output_phonon_bands', self.ctx.workchain_interpolate.outputs.output_phonon_bands)
+        self.out('qpoints', self.ctx.workchain_ph.inputs.qpoints)
+
+        if not self.ctx.is_converged:
+            self.report(f'the frequencies did not converge after {self.ctx.iteration} iterations')
+            return self.exit_codes.ERROR_CONVERGENCE_NOT_REACHED  # pylint: disable=no-member
+
+        mesh = self.ctx.workchain_ph.inputs.qpoints.get_kpoints_mesh()[0]
+        self.report(f'the frequencies converged for the mesh {mesh}')
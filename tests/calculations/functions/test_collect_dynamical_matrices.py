@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `collect_dynamical_matrices` calcfunction."""
+import io
+
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.collect_dynamical_matrices import collect_dynamical_matrices
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_collect_dynamical_matrices(generate_dynamical_matrix):
+    """Test `collect_dynamical_matrices` collects the files in the order of the q-points, skipping the q-point list."""
+    from aiida.orm import FolderData
+
+    folder = FolderData()
+    folder.base.repository.put_object_from_filelike(io.StringIO('   2   2   2\n'), 'DYN_MAT/dynamical-matrix-0')
+    expected = []
+
+    for index, number_qpoints in enumerate((1, 3, 4, 4, 2, 1, 3, 4, 6, 8, 4), start=1):
+        content, arrays = generate_dynamical_matrix(number_qpoints=number_qpoints, seed=index)
+        folder.base.repository.put_object_from_filelike(io.StringIO(content), f'DYN_MAT/dynamical-matrix-{index}')
+        expected.append(arrays)
+
+    dynamical_matrix = collect_dynamical_matrices(folder)
+
+    assert dynamical_matrix.number_of_atoms == 2
+    assert dynamical_matrix.frequencies.shape == (11, 6)
+    assert numpy.allclose(dynamical_matrix.qpoints, numpy.concatenate([arrays['qpoints'] for arrays in expected]))
+    assert numpy.allclose(
+        dynamical_matrix.dynamical_matrices, numpy.concatenate([arrays['dynamical_matrices'] for arrays in expected])
+    )
+    assert numpy.all(dynamical_matrix.star_indices[:5] == [0, 1, 1, 1, 2])
+    assert numpy.allclose(dynamical_matrix.eigenvectors[10], expected[10]['eigenvectors'])
+    assert dynamical_matrix.dielectric_tensor is None
+    assert dynamical_matrix.effective_charges_eu is None
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_collect_dynamical_matrices_dielectric(generate_dynamical_matrix):
+    """Test `collect_dynamical_matrices` stores the dielectric tensor and effective charges computed at Gamma."""
+    from aiida.orm import FolderData
+
+    dielectric_tensor = numpy.diag([13.7, 13.7, 12.1])
+    effective_charges = numpy.array([numpy.diag([2.1, 2.1, 1.9]), -numpy.diag([2.1, 2.1, 1.9])])
+
+    folder = FolderData()
+    folder.base.repository.put_object_from_filelike(io.StringIO('   2   2   2\n'), 'DYN_MAT/dynamical-matrix-0')
+    content, _ = generate_dynamical_matrix(
+        qpoints=[[0., 0., 0.]], dielectric_tensor=dielectric_tensor, effective_charges=effective_charges
+    )
+    folder.base.repository.put_object_from_filelike(io.StringIO(content), 'DYN_MAT/dynamical-matrix-1')
+    content, _ = generate_dynamical_matrix(number_qpoints=3, seed=2)
+    folder.base.repository.put_object_from_filelike(io.StringIO(content), 'DYN_MAT/dynamical-matrix-2')
+
+    dynamical_matrix = collect_dynamical_matrices(folder)
+
+    assert numpy.allclose(dynamical_matrix.dielectric_tensor, dielectric_tensor)
+    assert numpy.allclose(dynamical_matrix.effective_charges_eu, effective_charges)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_collect_dynamical_matrices_invalid():
+    """Test `collect_dynamical_matrices` returns an exit code if a file cannot be parsed."""
+    from aiida.orm import FolderData
+
+    folder = FolderData()
+    folder.base.repository.put_object_from_filelike(io.StringIO('   2   2   2\n'), 'DYN_MAT/dynamical-matrix-0')
+    folder.base.repository.put_object_from_filelike(io.StringIO('truncated\n'), 'DYN_MAT/dynamical-matrix-1')
+
+    _, node = collect_dynamical_matrices.run_get_node(folder)
+
+    assert node.exit_status == 300
+    assert 'failed to parse the dynamical matrices' in node.exit_message
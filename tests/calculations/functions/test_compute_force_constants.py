@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `compute_force_constants` calcfunction."""
+import io
+
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.compute_force_constants import compute_force_constants
+from aiida_quantumespresso_ph.utils.force_constants import get_rigid_ion_term
+
+CELL = numpy.array([[-0.5, 0., 0.5], [0., 0.5, 0.5], [-0.5, 0.5, 0.]])
+POSITIONS = numpy.array([[0., 0., 0.], [0.25, 0.25, 0.25]])
+MESH = (2, 2, 2)
+
+
+def get_rigid_ion_term_reference(qpoint, cell, positions, alat, epsil, zeu, mesh):  # pylint: disable=too-many-locals
+    """Return the long-range term of the dynamical matrix at a single q-point with the loops of ``rgd_blk`` of QE.
+
+    This is a literal transcription of ``rgd_blk`` of ``LR_Modules/rigid.f90`` in Quantum ESPRESSO for a 3D mesh, with
+    ``sign = +1``, such that it does not share any code with the vectorized ``get_rigid_ion_term``.
+    """
+    nat = len(positions)
+    bg = numpy.linalg.inv(cell).T
+    omega = abs(numpy.linalg.det(cell)) * alat**3
+    e2, alph, gmax = 2.0, 1.0, 14.0
+    nrx = [
+        0 if size == 1 else int(numpy.sqrt(gmax * alph * 4.0) / numpy.linalg.norm(bg[i])) + 1
+        for i, size in enumerate(mesh)
+    ]
+    fac = e2 * 4 * numpy.pi / omega
+    dyn = numpy.zeros((3, 3, nat, nat), dtype=complex)
+
+    for m1 in range(-nrx[0], nrx[0] + 1):
+        for m2 in range(-nrx[1], nrx[1] + 1):
+            for m3 in range(-nrx[2], nrx[2] + 1):
+                g = m1 * bg[0] + m2 * bg[1] + m3 * bg[2]
+                geg = g @ epsil @ g
+
+                if geg > 0.0 and geg / alph / 4.0 < gmax:
+                    facgd = fac * numpy.exp(-geg / alph / 4.0) / geg
+                    for na in range(nat):
+                        zag = g @ zeu[na]
+                        fnat = numpy.zeros(3)
+                        for nb in range(nat):
+                            arg = 2.0 * numpy.pi * g @ (positions[na] - positions[nb])
+                            fnat += g @ zeu[nb] * numpy.cos(arg)
+                        dyn[:, :, na, na] -= facgd * numpy.outer(zag, fnat)
+
+                g = g + qpoint
+                geg = g @ epsil @ g
+
+                if geg > 0.0 and geg / alph / 4.0 < gmax:
+                    facgd = fac * numpy.exp(-geg / alph / 4.0) / geg
+                    for nb in range(nat):
+                        zbg = g @ zeu[nb]
+                        for na in range(nat):
+                            zag = g @ zeu[na]
+                            arg = 2.0 * numpy.pi * g @ (positions[na] - positions[nb])
+                            dyn[:, :, na, nb] += facgd * numpy.exp(1j * arg) * numpy.outer(zag, zbg)
+
+    return dyn.transpose(2, 0, 3, 1).reshape(3 * nat, 3 * nat)
+
+
+@pytest.fixture
+def generate_dynamical_matrices_folder(generate_dynamical_matrix):
+    """Return a ``FolderData`` with the dynamical matrices of the given force constants on a 2 x 2 x 2 mesh."""
+
+    def _generate_dynamical_matrices_folder(
+        force_constants, dielectric_tensor=None, effective_charges=None, rigid_ion_term=None
+    ):
+        from aiida.orm import FolderData
+
+        matrices = numpy.fft.fftn(force_constants, axes=(0, 1, 2)).reshape(-1, 6, 6)
+        indices = numpy.indices(MESH).reshape(3, -1).T
+        qpoints = (indices / MESH) @ numpy.linalg.inv(CELL).T
+
+        if rigid_ion_term is not None:
+            matrices += rigid_ion_term(qpoints)
+        elif effective_charges is not None:
+            matrices += get_rigid_ion_term(qpoints, CELL, POSITIONS, 10.2, dielectric_tensor, effective_charges, MESH)
+
+        folder = FolderData()
+        lines = ['   2   2   2', '   3'
+                 ] + [''.join(f'{value:14.9f}' for value in qpoints[index]) for index in (0, 1, 3)]
+        content = '\n'.join(lines) + '\n'
+        folder.base.repository.put_object_from_filelike(io.StringIO(content), 'DYN_MAT/dynamical-matrix-0')
+
+        # Group the q-points in stars of different sizes, where Gamma contains the dielectric properties
+        for index, star in enumerate(([0], [1, 2, 4, 7], [3, 5, 6]), start=1):
+            content, _ = generate_dynamical_matrix(
+                qpoints=qpoints[star],
+                matrices=matrices[star],
+                cell=CELL,
+                positions=POSITIONS,
+                dielectric_tensor=dielectric_tensor if index == 1 else None,
+                effective_charges=effective_charges if index == 1 else None,
+            )
+            folder.base.repository.put_object_from_filelike(io.StringIO(content), f'DYN_MAT/dynamical-matrix-{index}')
+
+        return folder
+
+    return _generate_dynamical_matrices_folder
+
+
+@pytest.mark.usefixtures('aiida_profile')
+@pytest.mark.parametrize('polar', (False, True))
+def test_compute_force_constants(generate_dynamical_matrices_folder, polar):
+    """Test `compute_force_constants` recovers the force constants in the format of the output of `q2r.x`."""
+    from aiida_quantumespresso.data.force_constants import parse_q2r_force_constants_file
+
+    force_constants = numpy.random.default_rng(0).uniform(-1, 1, MESH + (2, 3, 2, 3))
+    dielectric_tensor = numpy.diag([13.7, 13.7, 12.1]) if polar else None
+    effective_charges = numpy.array([numpy.eye(3) * 2.1, -numpy.eye(3) * 2.1]) if polar else None
+
+    folder = generate_dynamical_matrices_folder(force_constants, dielectric_tensor, effective_charges)
+    result = compute_force_constants(folder)
+
+    assert result.filename == 'real_space_force_constants.dat'
+    assert result.qpoints_mesh == MESH
+    assert result.number_of_atoms == 2
+    assert result.has_done_electric_field is polar
+
+    parsed, parsed_force_constants, _ = parse_q2r_force_constants_file(
+        result.get_content().splitlines(), also_force_constants=True
+    )
+    assert numpy.allclose(parsed_force_constants, force_constants.transpose(0, 1, 2, 4, 6, 3, 5), atol=1e-6)
+    assert numpy.allclose(numpy.array(parsed['cell']) / parsed['cell'][1][1], CELL / CELL[1][1])
+
+    if polar:
+        assert numpy.allclose(result.dielectric_tensor, dielectric_tensor)
+        assert numpy.allclose(result.effective_charges_eu, effective_charges)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_compute_force_constants_polar(generate_dynamical_matrices_folder):
+    """Test the subtraction of the long-range term and the acoustic sum rule of the charges against ``rgd_blk``.
+
+    The dynamical matrices contain the long-range term of ``rgd_blk`` for the effective charges after the acoustic sum
+    rule, as ``q2r.x`` with ``zasr = 'simple'`` subtracts it, while the Gamma file contains the charges before it.
+    """
+    from aiida.orm import Str
+    from aiida_quantumespresso.data.force_constants import parse_q2r_force_constants_file
+
+    from aiida_quantumespresso_ph.utils.force_constants import set_acoustic_sum_rule
+
+    rng = numpy.random.default_rng(1)
+    force_constants = set_acoustic_sum_rule(rng.uniform(-1, 1, MESH + (3, 3, 2, 2)))
+    dielectric_tensor = numpy.array([[13.7, 0.4, 0.], [0.4, 12.9, 0.2], [0., 0.2, 12.1]])
+    effective_charges = numpy.array([numpy.diag([2.1, 2.0, 1.9]), -numpy.diag([1.9, 2.0, 1.8])])
+    effective_charges += rng.uniform(-0.1, 0.1, (2, 3, 3))
+    neutral_charges = effective_charges - effective_charges.mean(axis=0)
+    arguments = (CELL, POSITIONS, 10.2, dielectric_tensor, neutral_charges, MESH)
+
+    # The vectorized implementation agrees with the loops of `rgd_blk`, also away from the mesh
+    for qpoint in ([0., 0., 0.], [0.5, -0.5, 0.5], [0.13, -0.27, 0.41]):
+        assert numpy.allclose(
+            get_rigid_ion_term(numpy.array([qpoint]), *arguments)[0],
+            get_rigid_ion_term_reference(numpy.array(qpoint), *arguments)
+        )
+
+    folder = generate_dynamical_matrices_folder(
+        force_constants.transpose(0, 1, 2, 5, 3, 6, 4),
+        dielectric_tensor,
+        effective_charges,
+        rigid_ion_term=lambda qpoints: numpy.array([get_rigid_ion_term_reference(q, *arguments) for q in qpoints]),
+    )
+    result = compute_force_constants(folder, Str('simple'))
+
+    _, parsed_force_constants, _ = parse_q2r_force_constants_file(
+        result.get_content().splitlines(), also_force_constants=True
+    )
+    assert numpy.allclose(parsed_force_constants, force_constants, atol=1e-6)
+    assert numpy.allclose(result.dielectric_tensor, dielectric_tensor)
+    assert numpy.allclose(result.effective_charges_eu, neutral_charges, atol=1e-6)
+    assert numpy.allclose(numpy.array(result.effective_charges_eu).sum(axis=0), 0, atol=1e-6)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_compute_force_constants_asr(generate_dynamical_matrices_folder):
+    """Test `compute_force_constants` imposes the acoustic sum rule on the force constants."""
+    from aiida.orm import Str
+    from aiida_quantumespresso.data.force_constants import parse_q2r_force_constants_file
+
+    force_constants = numpy.random.default_rng(0).uniform(-1, 1, MESH + (2, 3, 2, 3))
+    result = compute_force_constants(generate_dynamical_matrices_folder(force_constants), Str('simple'))
+    _, parsed_force_constants, _ = parse_q2r_force_constants_file(
+        result.get_content().splitlines(), also_force_constants=True
+    )
+    assert numpy.allclose(parsed_force_constants.sum(axis=(0, 1, 2, 6)), 0, atol=1e-8)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_compute_force_constants_invalid(generate_dynamical_matrix):
+    """Test `compute_force_constants` raises for an unsupported Bravais lattice index or acoustic sum rule."""
+    from aiida.orm import FolderData, Str
+
+    folder = FolderData()
+    folder.base.repository.put_object_from_filelike(
+        io.StringIO('   1   1   1\n   1\n 0. 0. 0.\n'), 'DYN_MAT/dynamical-matrix-0'
+    )
+    folder.base.repository.put_object_from_filelike(
+        io.StringIO(generate_dynamical_matrix(qpoints=[[0., 0., 0.]])[0]), 'DYN_MAT/dynamical-matrix-1'
+    )
+
+    with pytest.raises(ValueError, match='only dynamical matrices with `ibrav = 0` are supported'):
+        compute_force_constants(folder)
+
+    with pytest.raises(ValueError, match='acoustic sum rule `crystal` is not supported'):
+        compute_force_constants(folder, Str('crystal'))
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `interpolate_phonon_bands` calcfunction."""
+import io
+
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.interpolate_phonon_bands import interpolate_phonon_bands
+from aiida_quantumespresso_ph.utils.force_constants import write_force_constants
+
+CELL = numpy.array([[-0.5, 0., 0.5], [0., 0.5, 0.5], [-0.5, 0.5, 0.]])
+MESH = (2, 2, 2)
+
+
+@pytest.fixture
+def generate_force_constants():
+    """Return a ``ForceConstantsData`` with random force constants on a 2 x 2 x 2 mesh."""
+
+    def _generate_force_constants():
+        from aiida_quantumespresso.data.force_constants import ForceConstantsData
+
+        force_constants = numpy.random.default_rng(0).uniform(-1, 1, MESH + (2, 3, 2, 3))
+        opposite = numpy.ix_(*((-numpy.arange(size)) % size for size in MESH))
+        force_constants = 0.5 * (force_constants + force_constants[opposite].transpose(0, 1, 2, 5, 6, 3, 4))
+        header = {
+            'ibrav': 0,
+            'celldm': [10.2, 0., 0., 0., 0., 0.],
+            'cell': CELL,
+            'species': [('Si', 25598.36731)],
+            'atom_types': [1, 1],
+            'positions': numpy.array([[0., 0., 0.], [0.25, 0.25, 0.25]]),
+        }
+        content = write_force_constants(force_constants.transpose(0, 1, 2, 4, 6, 3, 5), header)
+
+        return ForceConstantsData(io.BytesIO(content.encode('utf-8')), filename='real_space_force_constants.dat')
+
+    return _generate_force_constants
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_interpolate_phonon_bands(generate_force_constants):
+    """Test `interpolate_phonon_bands` returns the frequencies in THz for a path and a mesh of q-points."""
+    from aiida.orm import Int, KpointsData
+
+    path = KpointsData()
+    path.set_cell(CELL)
+    path.set_kpoints(numpy.indices(MESH).reshape(3, -1).T / MESH)
+
+    mesh = KpointsData()
+    mesh.set_kpoints_mesh(MESH)
+
+    force_constants = generate_force_constants()
+    bands_path = interpolate_phonon_bands(force_constants, path, chunk_size=Int(3))
+    bands_mesh = interpolate_phonon_bands(force_constants, mesh)
+
+    assert bands_path.base.attributes.get('units') == 'THz'
+    assert bands_path.get_bands().shape == (8, 6)
+    assert numpy.allclose(bands_path.get_kpoints(), path.get_kpoints())
+    assert numpy.allclose(bands_path.get_bands(), bands_mesh.get_bands())
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `merge_para_ph_outputs` calcfunction."""
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.merge_para_ph_outputs import merge_para_ph_outputs
+
+
+def generate_output(indices, wall_time_seconds=10):
+    """Return the output parameters of a calculation of the given q-point indices."""
+    from aiida.orm import Dict
+
+    output = {
+        'wall_time_seconds': wall_time_seconds,
+        'number_of_irr_representations_for_each_q': [index + 1 for index in indices],
+        'number_of_qpoints': len(indices),
+    }
+    for local_index, index in enumerate(indices, start=1):
+        output[f'dynamical_matrix_{local_index}'] = {
+            'q_point': [index, 0, 0],
+            'q_point_units': '2pi/lattice_parameter',
+            'frequencies': [float(index), 2. * index],
+            'mode_symmetry': ['A', 'B'],
+        }
+
+    return Dict(output)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_merge_para_ph_outputs():
+    """Test that merging the outputs incrementally is equivalent to merging them at once."""
+    results = merge_para_ph_outputs(output_1=generate_output([1]), output_2_3=generate_output([2, 3]))
+    merged = results['output_parameters'].get_dict()
+
+    assert merged['number_of_qpoints'] == 3
+    assert merged['wall_time_seconds'] == 20
+    assert merged['number_of_irr_representations_for_each_q'] == [2, 3, 4]
+    assert merged['qpoint_indices'] == [1, 2, 3]
+    assert merged['q_point_units'] == '2pi/lattice_parameter'
+    assert not any(key.startswith('dynamical_matrix_') for key in merged)
+
+    # The results of each q-point are stored as arrays, with one row per q-point
+    arrays = results['output_arrays']
+    assert sorted(arrays.get_arraynames()) == ['frequencies', 'mode_symmetry', 'q_point', 'qpoint_indices']
+    assert arrays.get_array('qpoint_indices').tolist() == [1, 2, 3]
+    assert arrays.get_array('q_point')[2].tolist() == [3, 0, 0]
+    assert arrays.get_array('frequencies')[1].tolist() == [2., 4.]
+    assert arrays.get_array('mode_symmetry').tolist() == [['A', 'B']] * 3
+
+    partial = merge_para_ph_outputs(output_2_3=generate_output([2, 3]))
+    assert partial['output_parameters']['qpoint_indices'] == [2, 3]
+
+    incremental = merge_para_ph_outputs(
+        merged=partial['output_parameters'], merged_arrays=partial['output_arrays'], output_1=generate_output([1])
+    )
+    assert incremental['output_parameters'].get_dict() == merged
+
+    for name in arrays.get_arraynames():
+        assert incremental['output_arrays'].get_array(name).tolist() == arrays.get_array(name).tolist()
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_merge_para_ph_outputs_partial():
+    """Test that combining the outputs merged in parts is equivalent to merging them at once."""
+    outputs = {
+        'output_1': generate_output([1]),
+        'output_2_3': generate_output([2, 3]),
+        'output_4': generate_output([4])
+    }
+    results = merge_para_ph_outputs(**outputs)
+
+    first = merge_para_ph_outputs(output_2_3=outputs['output_2_3'])
+    second = merge_para_ph_outputs(output_4=outputs['output_4'])
+    combined = merge_para_ph_outputs(
+        merged_0=first['output_parameters'],
+        merged_arrays_0=first['output_arrays'],
+        merged_1=second['output_parameters'],
+        merged_arrays_1=second['output_arrays'],
+        output_1=outputs['output_1'],
+    )
+
+    assert combined['output_parameters'].get_dict() == results['output_parameters'].get_dict()
+
+    for name in results['output_arrays'].get_arraynames():
+        expected = results['output_arrays'].get_array(name).tolist()
+        assert combined['output_arrays'].get_array(name).tolist() == expected
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_merge_para_ph_outputs_missing():
+    """Test that missing mode symmetries and frequencies that could not be parsed are filled in."""
+    output = generate_output([2])
+    output['dynamical_matrix_1']['frequencies'] = [None, 1.]
+    output['dynamical_matrix_1'].pop('mode_symmetry')
+
+    arrays = merge_para_ph_outputs(output_1=generate_output([1]), output_2=output)['output_arrays']
+
+    assert numpy.isnan(arrays.get_array('frequencies')[1, 0])
+    assert arrays.get_array('mode_symmetry').tolist() == [['A', 'B'], ['', '']]
+
+    # A column that is missing in the outputs merged by a previous call is filled in the same way
+    partial = merge_para_ph_outputs(output_2=output)
+    arrays = merge_para_ph_outputs(
+        merged=partial['output_parameters'], merged_arrays=partial['output_arrays'], output_1=generate_output([1])
+    )['output_arrays']
+
+    assert arrays.get_array('mode_symmetry').tolist() == [['A', 'B'], ['', '']]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_merge_para_ph_outputs_extra_keys():
+    """Test that the keys of the dynamical matrices that are not stored as arrays are kept in the output parameters."""
+    output = generate_output([2, 3])
+    output['dynamical_matrix_2']['dielectric_constant'] = [[1., 0., 0.], [0., 1., 0.], [0., 0., 1.]]
+
+    results = merge_para_ph_outputs(output_1=generate_output([1]), output_2_3=output)
+    merged = results['output_parameters'].get_dict()
+
+    assert merged['dynamical_matrix_3'] == {'dielectric_constant': [[1., 0., 0.], [0., 1., 0.], [0., 0., 1.]]}
+    assert not any(key in merged for key in ('dynamical_matrix_1', 'dynamical_matrix_2'))
+    assert 'dielectric_constant' not in results['output_arrays'].get_arraynames()
+
+    partial = merge_para_ph_outputs(output_2_3=output)
+    incremental = merge_para_ph_outputs(
+        merged=partial['output_parameters'], merged_arrays=partial['output_arrays'], output_1=generate_output([1])
+    )
+    assert incremental['output_parameters'].get_dict() == merged
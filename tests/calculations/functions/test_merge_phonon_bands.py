@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `merge_phonon_bands` calcfunction."""
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.merge_phonon_bands import get_dos_parameters, merge_phonon_bands
+
+MESH = (4, 4, 4)
+
+
+def generate_bands(frequencies):
+    """Return a ``BandsData`` with the given frequencies in THz."""
+    from aiida.orm import BandsData
+
+    bands = BandsData()
+    bands.set_kpoints(numpy.zeros((len(frequencies), 3)))
+    bands.set_bands(frequencies, units='THz')
+
+    return bands
+
+
+def test_get_dos_parameters():
+    """Test `get_dos_parameters` reads the keywords of the `INPUT` namelist case-insensitively."""
+    assert get_dos_parameters(None) is None
+    assert get_dos_parameters({'INPUT': {'asr': 'simple'}}) is None
+    assert get_dos_parameters({'INPUT': {
+        'dos': True,
+        'deltaE': 2,
+        'DEGAUSS': 0.5
+    }}) == {
+        'delta_e': 2.,
+        'ndos': None,
+        'degauss': 0.5,
+    }
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_merge_phonon_bands():
+    """Test `merge_phonon_bands` concatenates the chunks in order and computes the density of states of a mesh."""
+    from aiida.orm import Dict, KpointsData
+
+    kpoints = KpointsData()
+    kpoints.set_kpoints_mesh(MESH)
+
+    frequencies = numpy.random.default_rng(0).uniform(1, 10, (numpy.prod(MESH), 6))
+    chunks = {f'bands_{index}': generate_bands(chunk) for index, chunk in enumerate(numpy.array_split(frequencies, 11))}
+    parameters = Dict({'INPUT': {'dos': True, 'deltaE': 0.5}})
+
+    results = merge_phonon_bands(kpoints, parameters=parameters, **chunks)
+
+    numpy.testing.assert_allclose(results['output_phonon_bands'].get_bands(), frequencies)
+    numpy.testing.assert_allclose(results['output_phonon_bands'].get_kpoints(), kpoints.get_kpoints_mesh(True))
+
+    energies = results['output_phonon_dos'].get_x()[1]
+    dos = results['output_phonon_dos'].get_y()[0][1]
+    assert numpy.isclose(dos.sum() * (energies[1] - energies[0]), 6, rtol=1e-2)
+
+    # Without the `dos` keyword or for an explicit list of q-points, only the bands are merged
+    assert 'output_phonon_dos' not in merge_phonon_bands(kpoints, **chunks)
+
+    path = KpointsData()
+    path.set_kpoints(kpoints.get_kpoints_mesh(True))
+    assert 'output_phonon_dos' not in merge_phonon_bands(path, parameters=parameters, **chunks)
+
+    with pytest.raises(ValueError, match='the chunks contain'):
+        merge_phonon_bands(path, bands_0=chunks['bands_0'])
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `recollect_qpoints` calcfunction."""
+import io
+
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.recollect_qpoints import recollect_qpoints
+
+
+def generate_retrieved(filenames):
+    """Return a ``FolderData`` with a dynamical matrix file for each of the given filenames, containing its name."""
+    from aiida.orm import FolderData
+
+    folder = FolderData()
+
+    for filename in filenames:
+        folder.base.repository.put_object_from_filelike(io.StringIO(filename), f'DYN_MAT/{filename}')
+
+    return folder
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_recollect_qpoints():
+    """Test that `recollect_qpoints` renumbers the files and that recollecting incrementally gives the same result."""
+    recollected = recollect_qpoints(
+        qpoint_0=generate_retrieved(['dynamical-matrix-0']),
+        qpoint_1=generate_retrieved(['dynamical-matrix-']),
+    )
+    recollected = recollect_qpoints(
+        recollected=recollected,
+        qpoints_2_3=generate_retrieved(['dynamical-matrix-2', 'dynamical-matrix-3']),
+    )
+
+    assert sorted(recollected.base.repository.list_object_names('DYN_MAT')
+                  ) == [f'dynamical-matrix-{index}' for index in range(4)]
+    assert recollected.base.repository.get_object_content('DYN_MAT/dynamical-matrix-1') == 'dynamical-matrix-'
+    assert recollected.base.repository.get_object_content('DYN_MAT/dynamical-matrix-3') == 'dynamical-matrix-3'
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_recollect_qpoints_partial():
+    """Test that `recollect_qpoints` combines the folders that were recollected in parts."""
+    first = recollect_qpoints(qpoint_1=generate_retrieved(['dynamical-matrix-']))
+    second = recollect_qpoints(qpoints_2_3=generate_retrieved(['dynamical-matrix-2', 'dynamical-matrix-3']))
+    recollected = recollect_qpoints(
+        qpoint_0=generate_retrieved(['dynamical-matrix-0']),
+        recollected_0=first,
+        recollected_1=second,
+        qpoint_4=generate_retrieved(['dynamical-matrix-']),
+    )
+
+    assert sorted(recollected.base.repository.list_object_names('DYN_MAT')
+                  ) == [f'dynamical-matrix-{index}' for index in range(5)]
+    assert recollected.base.repository.get_object_content('DYN_MAT/dynamical-matrix-3') == 'dynamical-matrix-3'
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `reduce_qpoints` calcfunction."""
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.calculations.functions.distribute_qpoints import distribute_qpoints
+from aiida_quantumespresso_ph.calculations.functions.reduce_qpoints import reduce_qpoints
+from aiida_quantumespresso_ph.utils.qpoints import get_irreducible_qpoints
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_reduce_qpoints(generate_structure, generate_kpoints_mesh):
+    """Test that the q-points of `reduce_qpoints` are distributed in the same way as those of the initialization."""
+    from aiida.orm import Bool
+
+    structure = generate_structure()
+    folder = reduce_qpoints(structure, generate_kpoints_mesh(4), Bool(True))
+
+    lines = folder.base.repository.get_object_content('DYN_MAT/dynamical-matrix-0').splitlines()
+    assert lines[0].split() == ['4', '4', '4']
+    assert lines[1].split() == ['8']
+
+    qpoints = distribute_qpoints(retrieved=folder, structure=structure)
+    qpoints_crystal, _ = get_irreducible_qpoints(structure, [4, 4, 4])
+
+    assert len(qpoints) == 8
+
+    for index, qpoint_crystal in enumerate(qpoints_crystal):
+        qpoint = qpoints[f'qpoint_{index}']
+        expected = qpoint_crystal @ numpy.array(qpoint.reciprocal_cell)
+        assert numpy.allclose(qpoint.get_kpoints(cartesian=True)[0], expected)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_reduce_qpoints_shifted(generate_structure):
+    """Test that `reduce_qpoints` raises for a shifted q-point mesh."""
+    from aiida.orm import Bool, KpointsData
+
+    qpoints = KpointsData()
+    qpoints.set_kpoints_mesh([2, 2, 2], offset=[0.5, 0.5, 0.5])
+
+    with pytest.raises(ValueError, match='should not be shifted'):
+        reduce_qpoints(generate_structure(), qpoints, Bool(True))
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_distribute_qpoints_compact(generate_structure, generate_kpoints_mesh):
+    """Test that `distribute_qpoints` stores the q-points with the size of their star in a single node if compact."""
+    from aiida.orm import Bool
+
+    structure = generate_structure()
+    folder = reduce_qpoints(structure, generate_kpoints_mesh(4), Bool(True))
+    qpoints = distribute_qpoints(retrieved=folder, structure=structure, compact=Bool(True))['qpoints']
+    qpoints_crystal, multiplicities = get_irreducible_qpoints(structure, [4, 4, 4])
+
+    assert numpy.allclose(qpoints.get_kpoints(), qpoints_crystal)
+    assert numpy.all(qpoints.get_kpoints(also_weights=True)[1] == multiplicities)
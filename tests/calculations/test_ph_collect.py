@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `PhCollectCalculation` class."""
+import os
+
+import pytest
+
+from aiida_quantumespresso_ph.calculations.ph_collect import PhCollectCalculation
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_ph_collect(fixture_sandbox_folder, generate_calc_job, generate_calc_job_node, fixture_code, aiida_localhost):
+    """Test the remote copy list of a `PhCollectCalculation`."""
+    from aiida import orm
+
+    entry_point_name = 'quantumespresso_ph.ph_collect'
+
+    parent = generate_calc_job_node('quantumespresso.pw', aiida_localhost)
+    partial_folders = {
+        f'chunk_{index}': orm.RemoteData(computer=aiida_localhost, remote_path=f'/tmp/chunk_{index}')
+        for index in range(1, 3)
+    }
+    qpoints = orm.KpointsData()
+    qpoints.set_cell([[1., 0., 0.], [0., 1., 0.], [0., 0., 1.]])
+    qpoints.set_kpoints([[0., 0., 0.]])
+
+    inputs = {
+        'code': fixture_code('quantumespresso.ph'),
+        'parent_folder': parent.outputs.remote_folder,
+        'partial_folders': partial_folders,
+        'qpoints': qpoints,
+        'parameters': orm.Dict({'INPUTPH': {
+            'recover': True
+        }}),
+        'metadata': {
+            'options': {
+                'resources': {
+                    'num_machines': 1
+                },
+                'max_wallclock_seconds': 1800,
+            }
+        }
+    }
+
+    calc_info = generate_calc_job(fixture_sandbox_folder, entry_point_name, inputs)
+    dirpath_output = PhCollectCalculation._OUTPUT_SUBFOLDER  # pylint: disable=protected-access
+    dirpath_phsave = os.path.join(dirpath_output, '_ph0', 'aiida.phsave')
+
+    # The `_ph*` folders of the first chunk should be copied after the output folder of the `pw.x` calculation
+    assert calc_info.remote_copy_list[-2] == (
+        aiida_localhost.uuid, os.path.join('/tmp/chunk_1', dirpath_output, '_ph*'), dirpath_output
+    )
+    assert calc_info.remote_copy_list[-1] == (
+        aiida_localhost.uuid, os.path.join('/tmp/chunk_2', dirpath_phsave, 'dynmat.*.xml'), dirpath_phsave
+    )
@@ -472,3 +472,167 @@ def generate_upf_data():
         return UpfData(stream, filename=f'{element}.upf')
 
     return _generate_upf_data
+
+
+@pytest.fixture
+def generate_patterns():
+    """Return the content of a ``patterns.N.xml`` file as written by ``ph.x`` in the ``_ph0/{prefix}.phsave`` folder."""
+
+    def _generate_patterns(perturbations):
+        """Return the content of a ``patterns.N.xml`` file.
+
+        :param perturbations: list with the number of perturbations of each irreducible representation.
+        """
+        lines = ['<Root>', '  <IRREPS_INFO>', f'    <NUMBER_IRR_REP>{len(perturbations)}</NUMBER_IRR_REP>']
+
+        for index, number in enumerate(perturbations, start=1):
+            lines.append(f'    <REPRESENTION.{index}>')
+            lines.append(f'      <NUMBER_OF_PERTURBATIONS>{number}</NUMBER_OF_PERTURBATIONS>')
+            lines.append(f'    </REPRESENTION.{index}>')
+
+        lines.extend(['  </IRREPS_INFO>', '</Root>'])
+
+        return '\n'.join(lines) + '\n'
+
+    return _generate_patterns
+
+
+@pytest.fixture
+def generate_dynamical_matrix():
+    """Return the content of a ``dynamical-matrix-N`` file as written by ``ph.x``, with random dynamical matrices."""
+
+    def _generate_dynamical_matrix(  # pylint: disable=too-many-arguments,too-many-locals
+        number_atoms=2,
+        number_qpoints=2,
+        seed=0,
+        qpoints=None,
+        matrices=None,
+        cell=None,
+        positions=None,
+        dielectric_tensor=None,
+        effective_charges=None,
+    ):
+        """Return the content of a ``dynamical-matrix-N`` file and the arrays that were written to it.
+
+        :param number_atoms: the number of atoms in the cell.
+        :param number_qpoints: the number of q-points in the star.
+        :param seed: the seed of the random number generator.
+        :param qpoints: optional q-points of the star, instead of random ones.
+        :param matrices: optional dynamical matrices of the q-points, instead of random ones.
+        :param cell: optional lattice vectors in units of ``alat``, which are written with ``ibrav = 0``.
+        :param positions: optional positions of the atoms in units of ``alat``.
+        :param dielectric_tensor: optional dielectric tensor, which is written after the dynamical matrices.
+        :param effective_charges: optional effective charges of shape ``(nat, 3, 3)``.
+        :return: tuple of the content and a dictionary with the ``qpoints``, ``dynamical_matrices``, ``frequencies`` and
+            ``eigenvectors`` arrays.
+        """
+        import numpy
+
+        rng = numpy.random.default_rng(seed)
+        number_qpoints = number_qpoints if qpoints is None else len(qpoints)
+
+        if matrices is not None:
+            number_qpoints, number_modes = len(matrices), len(matrices[0])
+            number_atoms = number_modes // 3
+        else:
+            number_modes = 3 * number_atoms
+            matrices = rng.uniform(-1, 1, (number_qpoints, number_modes, number_modes, 2))
+            matrices = matrices[..., 0] + 1j * matrices[..., 1]
+
+        if qpoints is None:
+            qpoints = rng.uniform(-1, 1, (number_qpoints, 3))
+
+        qpoints, matrices = numpy.asarray(qpoints), numpy.asarray(matrices)
+
+        if positions is None:
+            positions = [[0.25 * atom] * 3 for atom in range(1, number_atoms + 1)]
+
+        frequencies = numpy.sort(rng.uniform(-10, 500, number_modes))
+        eigenvectors = rng.uniform(-1, 1, (number_modes, number_modes, 2))
+        eigenvectors = eigenvectors[..., 0] + 1j * eigenvectors[..., 1]
+
+        ibrav = 2 if cell is None else 0
+        lines = [
+            'Dynamical matrix file', '',
+            f'{1:3d}{number_atoms:5d}{ibrav:3d}' + ''.join(f'{value:11.7f}' for value in [10.2, 0, 0, 0, 0, 0])
+        ]
+
+        if cell is not None:
+            lines.append('Basis vectors')
+            lines.extend('  ' + ''.join(f'{value:15.9f}' for value in vector) for vector in cell)
+
+        lines.append('           1  \'Si  \'    25598.367310000')
+        for atom, position in enumerate(positions, 1):
+            lines.append(f'{atom:5d}{1:5d}' + ''.join(f'{value:18.10f}' for value in position))
+
+        for qpoint, matrix in zip(qpoints, matrices):
+            lines.extend(['', '     Dynamical  Matrix in cartesian axes', ''])
+            lines.append('     q = ( ' + ''.join(f'{value:14.9f}' for value in qpoint) + ' ) ')
+            lines.append('')
+            for atom_a in range(number_atoms):
+                for atom_b in range(number_atoms):
+                    lines.append(f'{atom_a + 1:5d}{atom_b + 1:5d}')
+                    for axis in range(3):
+                        row = matrix[3 * atom_a + axis, 3 * atom_b:3 * atom_b + 3]
+                        lines.append(''.join(f'{value.real:12.8f}{value.imag:12.8f}  ' for value in row))
+
+        if dielectric_tensor is not None:
+            lines.extend(['', '     Dielectric Tensor:', ''])
+            lines.extend(''.join(f'{value:24.12f}' for value in row) for row in dielectric_tensor)
+
+        if effective_charges is not None:
+            lines.extend(['', '     Effective Charges E-U: Z_{alpha}{s,beta}', ''])
+            for atom, charges in enumerate(effective_charges, 1):
+                lines.append(f'     atom # {atom:4d}')
+                lines.extend(''.join(f'{value:24.12f}' for value in row) for row in charges)
+
+        lines.extend(['', '     Diagonalizing the dynamical matrix', ''])
+        lines.append('     q = ( ' + ''.join(f'{value:14.9f}' for value in qpoints[0]) + ' ) ')
+        lines.extend(['', ' ' + '*' * 74])
+
+        for mode in range(number_modes):
+            frequency = frequencies[mode]
+            lines.append(f'     freq ({mode + 1:5d}) ={frequency / 33.35641:15.6f} [THz] ={frequency:15.6f} [cm-1]')
+            for atom in range(number_atoms):
+                vector = eigenvectors[mode, 3 * atom:3 * atom + 3]
+                lines.append(' (' + ''.join(f'{value.real:10.6f} {value.imag:10.6f}   ' for value in vector) + ')')
+
+        lines.append(' ' + '*' * 74)
+
+        arrays = {
+            'qpoints': numpy.round(qpoints, 9),
+            'dynamical_matrices': numpy.round(matrices.real, 8) + 1j * numpy.round(matrices.imag, 8),
+            'frequencies': numpy.round(frequencies, 6),
+            'eigenvectors': numpy.round(eigenvectors.real, 6) + 1j * numpy.round(eigenvectors.imag, 6),
+        }
+
+        return '\n'.join(lines) + '\n', arrays
+
+    return _generate_dynamical_matrix
+
+
+@pytest.fixture
+def generate_force_constants_data():
+    """Return a ``ForceConstantsData`` with the vanishing force constants of a single atom in a cubic cell."""
+
+    def _generate_force_constants_data():
+        import io
+
+        from aiida_quantumespresso.data.force_constants import ForceConstantsData
+        import numpy
+
+        from aiida_quantumespresso_ph.utils.force_constants import write_force_constants
+
+        header = {
+            'ibrav': 0,
+            'celldm': [10.2, 0., 0., 0., 0., 0.],
+            'cell': numpy.eye(3),
+            'species': [('Si', 25598.36731)],
+            'atom_types': [1],
+            'positions': numpy.zeros((1, 3)),
+        }
+        content = write_force_constants(numpy.zeros((1, 1, 1, 3, 3, 1, 1)), header)
+
+        return ForceConstantsData(io.BytesIO(content.encode('utf-8')), filename='real_space_force_constants.dat')
+
+    return _generate_force_constants_data
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Tests that the modules of the entry points of :mod:`aiida_quantumespresso_ph` are imported lazily."""
+import json
+import subprocess
+import sys
+
+import pytest
+
+DEFERRED_MODULES = (
+    'aiida_quantumespresso.calculations',
+    'aiida_quantumespresso.workflows.ph',
+    'aiida_quantumespresso.workflows.pw',
+    'aiida_quantumespresso.workflows.q2r',
+    'aiida_quantumespresso.workflows.matdyn',
+    'aiida_quantumespresso_ph.calculations.ph_collect',
+    'qe_tools',
+    'scipy',
+    'spglib',
+)
+"""Modules that are only imported once a process is defined or run, not when the workflow modules are imported."""
+
+
+@pytest.mark.parametrize(
+    'module', (
+        'aiida_quantumespresso_ph.workflows.dynamical_matrix',
+        'aiida_quantumespresso_ph.workflows.ph.main',
+        'aiida_quantumespresso_ph.workflows.ph.parallelize_qpoints',
+        'aiida_quantumespresso_ph.workflows.ph_interpolate',
+        'aiida_quantumespresso_ph.workflows.qgrid_convergence',
+    )
+)
+def test_deferred_imports(module):
+    """Test that importing the workflow modules does not import the ``DEFERRED_MODULES``.
+
+    The import is done in a fresh interpreter, since the modules are already imported by other tests.
+    """
+    script = f'import json, sys; import {module}; print(json.dumps(list(sys.modules)))'
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, check=True, text=True)
+    imported = json.loads(output.stdout.splitlines()[-1])
+
+    assert [name for name in imported if name.startswith(DEFERRED_MODULES)] == []
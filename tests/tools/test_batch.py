@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=redefined-outer-name
+"""Tests for the :mod:`aiida_quantumespresso_ph.tools.batch` module."""
+from plumpy import ProcessState
+import pytest
+
+from aiida_quantumespresso_ph.tools import batch
+from aiida_quantumespresso_ph.tools.batch import BATCH_STATUS_EXTRA_PREFIX, DynamicalMatrixBatchSubmitter, estimate_cost
+from aiida_quantumespresso_ph.workflows.dynamical_matrix import DynamicalMatrixWorkChain
+
+
+@pytest.fixture
+def get_builder(generate_inputs_dynamical_matrix):
+    """Return a function that returns the builder of a `DynamicalMatrixWorkChain` for a structure."""
+
+    def _get_builder(structure):
+        builder = DynamicalMatrixWorkChain.get_builder()
+        builder._update(generate_inputs_dynamical_matrix())  # pylint: disable=protected-access
+        builder.structure = structure
+        return builder
+
+    return _get_builder
+
+
+@pytest.fixture
+def generate_group():
+    """Return a group with silicon structures with one up to the given number of atoms."""
+
+    def _generate_group(number_of_structures):
+        from aiida.orm import Group, StructureData
+
+        group = Group(label=f'test_batch_{Group.collection.count()}').store()
+
+        for number_of_atoms in range(1, number_of_structures + 1):
+            structure = StructureData(cell=[[5., 0., 0.], [0., 5., 0.], [0., 0., 5. * number_of_atoms]])
+            for atom in range(number_of_atoms):
+                structure.append_atom(position=(0., 0., 5. * atom), symbols='Si', name='Si')
+            group.add_nodes(structure.store())
+
+        return group
+
+    return _generate_group
+
+
+@pytest.fixture
+def submit_without_daemon(monkeypatch):
+    """Replace the submission to the daemon by the creation of the process node, which remains in the created state."""
+    from aiida.engine.utils import instantiate_process
+    from aiida.manage import get_manager
+
+    def _submit(builder):
+        return instantiate_process(get_manager().get_runner(), builder).node
+
+    monkeypatch.setattr(batch, 'submit', _submit)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_estimate_cost(get_builder, generate_group):
+    """Test `estimate_cost` scales with the number of q-points, the number of atoms and the cutoff."""
+    structures = sorted(generate_group(2).nodes, key=lambda structure: len(structure.sites))
+    costs = [estimate_cost(structure, get_builder(structure)) for structure in structures]
+
+    assert costs[0] == pytest.approx(8 * 30.**1.5)
+    assert costs[1] == pytest.approx(8 * costs[0])
+
+
+@pytest.mark.usefixtures('aiida_profile', 'submit_without_daemon')
+def test_batch_submitter(get_builder, generate_group):
+    """Test `DynamicalMatrixBatchSubmitter` submits the most expensive structures first within the budget."""
+    from aiida.orm import load_node
+
+    group = generate_group(3)
+    structures = {len(structure.sites): structure for structure in group.nodes}
+
+    with pytest.raises(ValueError, match='should be a positive integer'):
+        DynamicalMatrixBatchSubmitter(group, get_builder, max_concurrent_calcjobs=0)
+
+    # The calculation jobs of other tests that did not terminate also count towards the budget
+    max_concurrent_calcjobs = batch.get_number_of_active_calcjobs() + 2
+    submitter = DynamicalMatrixBatchSubmitter(group, get_builder, max_concurrent_calcjobs=max_concurrent_calcjobs)
+    submitted = submitter.step()
+
+    assert [node.inputs.structure.uuid for node in submitted] == [structures[3].uuid, structures[2].uuid]
+    assert submitter.get_status()[structures[1].uuid]['status'] == 'pending'
+
+    # The work chains that did not start yet count towards the budget
+    assert not submitter.step()
+    assert not submitter.is_finished()
+
+    submitted[0].set_process_state(ProcessState.FINISHED)
+    submitted[0].set_exit_status(0)
+    submitted = submitter.step()
+
+    assert [node.inputs.structure.uuid for node in submitted] == [structures[1].uuid]
+    assert submitter.get_status()[structures[3].uuid]['status'] == 'finished'
+
+    # A work chain whose status was not recorded before an interruption is recovered by a new submitter
+    group.base.extras.delete(f'{BATCH_STATUS_EXTRA_PREFIX}{structures[1].uuid}')
+    submitter = DynamicalMatrixBatchSubmitter(group, get_builder, max_concurrent_calcjobs=max_concurrent_calcjobs + 10)
+
+    assert not submitter.step()
+    assert submitter.get_status()[structures[1].uuid] == {'status': 'submitted', 'pk': submitted[0].pk}
+
+    for entry in submitter.get_status().values():
+        node = load_node(entry['pk'])
+        node.set_process_state(ProcessState.FINISHED)
+        node.set_exit_status(1 if entry['status'] == 'submitted' else 0)
+
+    assert submitter.is_finished()
+    assert sorted(entry['status'] for entry in submitter.get_status().values()) == ['failed', 'failed', 'finished']
+
+
+@pytest.mark.usefixtures('aiida_profile', 'submit_without_daemon')
+def test_batch_submitter_max_concurrent_workchains(get_builder, generate_group):
+    """Test `DynamicalMatrixBatchSubmitter` limits the number of work chains that did not terminate."""
+    from aiida.orm import QueryBuilder, WorkflowNode
+
+    group = generate_group(3)
+    max_concurrent_calcjobs = batch.get_number_of_active_calcjobs() + 10
+
+    with pytest.raises(ValueError, match='should be a positive integer'):
+        DynamicalMatrixBatchSubmitter(group, get_builder, max_concurrent_calcjobs, max_concurrent_workchains=0)
+
+    # The work chains of other tests that did not terminate also count towards the limit
+    filters = {
+        'extras': {
+            'has_key': batch.BATCH_STRUCTURE_EXTRA
+        },
+        'attributes.process_state': {
+            'in': batch.ACTIVE_PROCESS_STATES
+        }
+    }
+    max_concurrent_workchains = QueryBuilder().append(WorkflowNode, filters=filters).count() + 1
+    submitter = DynamicalMatrixBatchSubmitter(
+        group, get_builder, max_concurrent_calcjobs, max_concurrent_workchains=max_concurrent_workchains
+    )
+    submitted = submitter.step()
+    assert len(submitted) == 1
+
+    # A running work chain counts towards the limit, even if it has no calculation job that did not terminate
+    submitted[0].set_process_state(ProcessState.WAITING)
+    assert not submitter.step()
+
+    submitted[0].set_process_state(ProcessState.FINISHED)
+    submitted[0].set_exit_status(0)
+    assert len(submitter.step()) == 1
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_batch_submitter_interrupted(get_builder, generate_group, monkeypatch):
+    """Test `DynamicalMatrixBatchSubmitter` does not submit a structure twice if a submission was interrupted."""
+    from aiida.engine.utils import instantiate_process
+    from aiida.manage import get_manager
+
+    group = generate_group(1)
+    structure = group.nodes[0]
+    max_concurrent_calcjobs = batch.get_number_of_active_calcjobs() + 10
+    nodes = []
+
+    def _submit_interrupted(builder):
+        nodes.append(instantiate_process(get_manager().get_runner(), builder).node)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(batch, 'submit', _submit_interrupted)
+    submitter = DynamicalMatrixBatchSubmitter(group, get_builder, max_concurrent_calcjobs=max_concurrent_calcjobs)
+
+    with pytest.raises(KeyboardInterrupt):
+        submitter.step()
+
+    assert submitter.get_status()[structure.uuid]['status'] == 'submitting'
+    assert batch.BATCH_STRUCTURE_EXTRA not in nodes[0].base.extras.all
+
+    # The work chain is recovered from its input structure instead of being submitted again
+    submitter = DynamicalMatrixBatchSubmitter(group, get_builder, max_concurrent_calcjobs=max_concurrent_calcjobs)
+    assert not submitter.step()
+    assert submitter.get_status()[structure.uuid]['status'] == 'submitted'
+    assert submitter.get_status()[structure.uuid]['pk'] == nodes[0].pk
+    assert nodes[0].base.extras.get(batch.BATCH_STRUCTURE_EXTRA) == structure.uuid
+
+    # A structure whose submission was interrupted before the work chain was created is submitted again
+    group = generate_group(1)
+    structure = group.nodes[0]
+    submission_time = batch.timezone.now().isoformat()
+    entry = {'status': 'submitting', 'cost': 1., 'submission_time': submission_time}
+    group.base.extras.set(f'{BATCH_STATUS_EXTRA_PREFIX}{structure.uuid}', entry)
+
+    monkeypatch.setattr(batch, 'submit', lambda builder: instantiate_process(get_manager().get_runner(), builder).node)
+    submitter = DynamicalMatrixBatchSubmitter(group, get_builder, max_concurrent_calcjobs=max_concurrent_calcjobs)
+    submitted = submitter.step()
+
+    assert [node.inputs.structure.uuid for node in submitted] == [structure.uuid]
+    assert submitter.get_status()[structure.uuid]['status'] == 'submitted'
+    assert submitter.get_status()[structure.uuid]['pk'] == submitted[0].pk
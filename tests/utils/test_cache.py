@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.cache` module."""
+import pytest
+
+from aiida_quantumespresso_ph.utils.cache import (
+    FORCE_CONSTANTS_CACHE_KEY_EXTRA,
+    QPOINT_CACHE_KEY_EXTRA,
+    get_cached_force_constants,
+    get_cached_workchain,
+    get_force_constants_cache_key,
+    get_inputs_fingerprint,
+    get_qpoint_cache_key,
+    get_relax_cache_key,
+    get_structure_fingerprint,
+)
+
+
+@pytest.fixture
+def generate_pw_calculation(aiida_localhost, generate_calc_job_node, generate_inputs_pw):
+    """Return a `PwCalculation` node with the default inputs."""
+
+    def _generate_pw_calculation(parameters=None):
+        return generate_calc_job_node('quantumespresso.pw', aiida_localhost, inputs=generate_inputs_pw(parameters))
+
+    return _generate_pw_calculation
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_qpoint_cache_key(generate_pw_calculation):
+    """Test `get_qpoint_cache_key`."""
+    pw_calculation = generate_pw_calculation()
+    parameters = {'INPUTPH': {'tr2_ph': 1e-16}}
+    key = get_qpoint_cache_key(pw_calculation, parameters, [0.25, 0., 0.])
+
+    # The key only depends on the content of the inputs, and not on the selection of q-points or irreps
+    assert get_qpoint_cache_key(generate_pw_calculation(), parameters, [0.25, -0., 0.]) == key
+    assert get_qpoint_cache_key(pw_calculation, {'INPUTPH': {'tr2_ph': 1e-16, 'start_q': 2}}, [0.25, 0., 0.]) == key
+
+    assert get_qpoint_cache_key(pw_calculation, parameters, [0.5, 0., 0.]) != key
+    assert get_qpoint_cache_key(pw_calculation, {'INPUTPH': {'tr2_ph': 1e-18}}, [0.25, 0., 0.]) != key
+    assert get_qpoint_cache_key(
+        generate_pw_calculation({'SYSTEM': {
+            'ecutwfc': 40.
+        }}), parameters, [0.25, 0., 0.]
+    ) != key
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_cached_workchain():
+    """Test `get_cached_workchain`."""
+    from aiida.orm import WorkflowNode
+    from plumpy import ProcessState
+
+    node = WorkflowNode().store()
+    node.base.extras.set(QPOINT_CACHE_KEY_EXTRA, 'test_get_cached_workchain')
+    assert get_cached_workchain('test_get_cached_workchain') is None
+
+    node.set_process_state(ProcessState.FINISHED)
+    node.set_exit_status(0)
+    assert get_cached_workchain('test_get_cached_workchain').pk == node.pk
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_force_constants_cache_key(generate_dynamical_matrix):
+    """Test `get_force_constants_cache_key` only depends on the content of the dynamical matrices and the parameters."""
+    import io
+
+    from aiida.orm import FolderData
+
+    def generate_folder(seed, other_files=()):
+        folder = FolderData()
+        folder.base.repository.put_object_from_filelike(
+            io.StringIO('   1   1   1\n   1\n'), 'DYN_MAT/dynamical-matrix-0'
+        )
+        content, _ = generate_dynamical_matrix(seed=seed)
+        folder.base.repository.put_object_from_filelike(io.StringIO(content), 'DYN_MAT/dynamical-matrix-1')
+
+        for filename in other_files:
+            folder.base.repository.put_object_from_filelike(io.StringIO(filename), filename)
+
+        return folder
+
+    parameters = {'method': 'q2r', 'parameters': {}}
+    key = get_force_constants_cache_key(generate_folder(0), parameters)
+
+    assert get_force_constants_cache_key(generate_folder(0, ['aiida.out']), parameters) == key
+    assert get_force_constants_cache_key(generate_folder(1), parameters) != key
+    assert get_force_constants_cache_key(generate_folder(0), {'method': 'native', 'asr': 'no'}) != key
+
+    with pytest.raises(ValueError, match='does not contain any dynamical matrix file'):
+        get_force_constants_cache_key(FolderData(), parameters)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_cached_force_constants(generate_force_constants_data):
+    """Test `get_cached_force_constants`."""
+    node = generate_force_constants_data().store()
+    assert get_cached_force_constants('test_get_cached_force_constants') is None
+
+    node.base.extras.set(FORCE_CONSTANTS_CACHE_KEY_EXTRA, 'test_get_cached_force_constants')
+    assert get_cached_force_constants('test_get_cached_force_constants').pk == node.pk
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_structure_fingerprint():
+    """Test `get_structure_fingerprint` does not depend on the orientation of the cell or the order of the sites."""
+    from aiida.orm import StructureData
+    import numpy
+
+    def generate_structure(cell, positions, kinds=('Si', 'Si')):
+        structure = StructureData(cell=cell)
+        for kind, position in zip(kinds, positions):
+            structure.append_atom(position=position, symbols='Si', name=kind)
+        return structure
+
+    alat = 5.43
+    primitive = 0.5 * alat * numpy.array([[0., 1., 1.], [1., 0., 1.], [1., 1., 0.]])
+    positions = numpy.array([[0., 0., 0.], [0.25, 0.25, 0.25]]) * alat
+    fingerprint = get_structure_fingerprint(generate_structure(primitive, positions))
+
+    # A permutation of the lattice vectors and the sites and a rigid rotation
+    rotation = numpy.array([[0., -1., 0.], [1., 0., 0.], [0., 0., 1.]])
+    assert get_structure_fingerprint(generate_structure(primitive[[1, 2, 0]], positions[::-1])) == fingerprint
+    assert get_structure_fingerprint(generate_structure(primitive @ rotation.T, positions @ rotation.T)) == fingerprint
+
+    # The conventional cubic cell with eight atoms is a different cell of the same crystal
+    shifts = numpy.array([[0., 0., 0.], [0., 0.5, 0.5], [0.5, 0., 0.5], [0.5, 0.5, 0.]]) * alat
+    conventional = numpy.concatenate([shifts + position for position in positions])
+    conventional_fingerprint = get_structure_fingerprint(
+        generate_structure(numpy.eye(3) * alat, conventional, ['Si'] * 8)
+    )
+    assert conventional_fingerprint != fingerprint
+    assert conventional_fingerprint['number_of_sites'] == 8
+    assert conventional_fingerprint['lattice'] == fingerprint['lattice']
+
+    assert get_structure_fingerprint(generate_structure(primitive * 1.01, positions * 1.01)) != fingerprint
+    assert get_structure_fingerprint(generate_structure(primitive, positions, ('Si1', 'Si2'))) != fingerprint
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_relax_cache_key(generate_inputs_dynamical_matrix):
+    """Test `get_relax_cache_key` only depends on the content of the structure and the relax inputs."""
+    from aiida.orm import Dict
+
+    inputs = generate_inputs_dynamical_matrix()
+    key = get_relax_cache_key(inputs['structure'], inputs['relax'])
+
+    # The metadata and the code do not affect the key, but the parameters do
+    other = generate_inputs_dynamical_matrix()
+    other['relax']['base']['pw']['metadata'] = {'options': {'max_wallclock_seconds': 1}}
+    other['relax']['base']['pw'].pop('code')
+    assert get_relax_cache_key(other['structure'], other['relax']) == key
+
+    other['relax']['base']['pw']['parameters'] = Dict({'SYSTEM': {'ecutwfc': 40.}})
+    assert get_relax_cache_key(other['structure'], other['relax']) != key
+
+    fingerprint = get_inputs_fingerprint(inputs['relax'])
+    assert fingerprint['base']['kpoints'] == ([2, 2, 2], [0., 0., 0.])
+    assert fingerprint['base']['pw']['pseudos']['Si'] == inputs['relax']['base']['pw']['pseudos']['Si'].md5
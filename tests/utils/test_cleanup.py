@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.cleanup` module."""
+import logging
+
+import pytest
+
+from aiida_quantumespresso_ph.utils.cleanup import clean_remote_folders, clean_remote_folders_async, get_remove_command
+
+LOGGER = logging.getLogger(__name__)
+
+
+@pytest.fixture
+def generate_remote_folders(aiida_localhost, tmp_path):
+    """Return a list of ``RemoteData`` nodes of folders with some content in a temporary directory."""
+
+    def _generate_remote_folders(number):
+        from aiida.orm import RemoteData
+
+        remote_folders = []
+
+        for index in range(number):
+            dirpath = tmp_path / f'calculation_{index}'
+            (dirpath / '_ph0').mkdir(parents=True)
+            (dirpath / '_ph0' / 'aiida.dvscf1').write_text('content')
+            remote_folders.append(RemoteData(computer=aiida_localhost, remote_path=str(dirpath)).store())
+
+        return remote_folders
+
+    return _generate_remote_folders
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_clean_remote_folders(generate_remote_folders, tmp_path):
+    """Test ``clean_remote_folders``."""
+    remote_folders = generate_remote_folders(5)
+    remote_folders[0].base.extras.set(remote_folders[0].KEY_EXTRA_CLEANED, True)
+
+    cleaned = clean_remote_folders(remote_folders, LOGGER, batch_size=2)
+
+    # The folder that was already cleaned is skipped
+    assert [folder.pk for folder in cleaned] == [folder.pk for folder in remote_folders[1:]]
+    assert all(folder.is_cleaned for folder in remote_folders)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['calculation_0']
+    assert clean_remote_folders(remote_folders, LOGGER) == []
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_clean_remote_folders_fallback(generate_remote_folders, tmp_path, monkeypatch):
+    """Test ``clean_remote_folders`` removes the folders one by one if the transport cannot execute commands."""
+    from aiida.transports.plugins.local import LocalTransport
+
+    def exec_command_wait(*_, **__):
+        raise NotImplementedError
+
+    monkeypatch.setattr(LocalTransport, 'exec_command_wait', exec_command_wait)
+
+    remote_folders = generate_remote_folders(3)
+    cleaned = clean_remote_folders(remote_folders, LOGGER)
+
+    assert len(cleaned) == 3
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_get_remove_command(tmp_path):
+    """Test the command of ``get_remove_command`` fails if any of the paths could not be removed."""
+    import os
+    import subprocess
+
+    paths = [tmp_path / 'first', tmp_path / 'second']
+    for path in paths:
+        path.mkdir()
+
+    assert subprocess.run(['bash', '-c', get_remove_command([str(path) for path in paths])],
+                          check=False).returncode == 0
+    assert not any(path.exists() for path in paths)
+
+    # An `rm` that fails for the second path, while the first path is still removed
+    (tmp_path / 'bin').mkdir()
+    (tmp_path / 'bin' / 'rm').write_text(f'#!/bin/bash\n[[ "$2" == {paths[1]} ]] && exit 1\nexec /bin/rm "$@"\n')
+    (tmp_path / 'bin' / 'rm').chmod(0o755)
+    env = {**os.environ, 'PATH': f"{tmp_path / 'bin'}:{os.environ['PATH']}"}
+
+    for path in paths:
+        path.mkdir()
+
+    command = get_remove_command([str(path) for path in paths])
+    assert subprocess.run(['bash', '-c', command], env=env, check=False).returncode == 1
+    assert not paths[0].exists()
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_clean_remote_folders_async(generate_remote_folders, tmp_path):
+    """Test ``clean_remote_folders_async`` cleans the folders through the transport queue."""
+    import asyncio
+
+    from aiida.engine.transports import TransportQueue
+
+    remote_folders = generate_remote_folders(3)
+    remote_folders[0].base.extras.set(remote_folders[0].KEY_EXTRA_CLEANED, True)
+
+    loop = asyncio.new_event_loop()
+
+    try:
+        cleaned = loop.run_until_complete(
+            clean_remote_folders_async(remote_folders, TransportQueue(loop), LOGGER, batch_size=1)
+        )
+    finally:
+        loop.close()
+
+    assert [folder.pk for folder in cleaned] == [folder.pk for folder in remote_folders[1:]]
+    assert all(folder.is_cleaned for folder in remote_folders)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['calculation_0']
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_clean_remote_folders_failed(generate_remote_folders, tmp_path, monkeypatch, caplog):
+    """Test the folders that could not be removed are reported and not marked as cleaned."""
+    from aiida.transports.plugins.local import LocalTransport
+
+    remote_folders = generate_remote_folders(2)
+    failed_path = remote_folders[1].get_remote_path()
+    rmtree = LocalTransport.rmtree
+
+    def exec_command_wait(*_, **__):
+        return 1, '', ''
+
+    def rmtree_failed(self, path):
+        if path == failed_path:
+            raise OSError('permission denied')
+        return rmtree(self, path)
+
+    monkeypatch.setattr(LocalTransport, 'exec_command_wait', exec_command_wait)
+    monkeypatch.setattr(LocalTransport, 'rmtree', rmtree_failed)
+
+    with caplog.at_level(logging.WARNING):
+        cleaned = clean_remote_folders(remote_folders, LOGGER)
+
+    assert [folder.pk for folder in cleaned] == [remote_folders[0].pk]
+    assert not remote_folders[1].is_cleaned
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['calculation_1']
+    assert f'failed to clean the remote folder `{failed_path}`' in caplog.text
+    assert 'permission denied' in caplog.text
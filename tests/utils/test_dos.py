@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.dos` module."""
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.utils.dos import get_energies, get_phonon_dos, get_tetrahedra
+
+MESH = (6, 6, 6)
+
+
+@pytest.fixture
+def frequencies():
+    """Return the frequencies of three dispersive modes on the q-points of ``MESH``, in cm^-1."""
+    qpoints = numpy.indices(MESH).reshape(3, -1).T / MESH
+    dispersion = numpy.sqrt(3 - numpy.cos(2 * numpy.pi * qpoints).sum(axis=1))
+
+    return numpy.stack([100 * dispersion + 50 * mode for mode in range(3)], axis=1)
+
+
+def test_get_tetrahedra():
+    """Test `get_tetrahedra` returns six tetrahedra per q-point whose corners are neighbours on the periodic mesh."""
+    tetrahedra = get_tetrahedra(MESH)
+    indices = numpy.indices(MESH).reshape(3, -1).T
+
+    assert tetrahedra.shape == (6 * numpy.prod(MESH), 4)
+    assert numpy.all(numpy.bincount(tetrahedra.ravel()) == 24)
+
+    # The six tetrahedra of each q-point fill the cube of the mesh of which that q-point is the lowest corner
+    differences = (indices[tetrahedra.reshape(-1, 6, 4)] - indices[:, None, None, :]) % MESH
+    assert numpy.all((differences == 0) | (differences == 1))
+
+
+def test_get_energies():
+    """Test `get_energies` includes zero and follows the `deltaE` and `ndos` conventions of `matdyn.x`."""
+    energies = get_energies(numpy.array([10., 20.]), delta_e=1.)
+    assert energies[0] == 0.
+    assert len(energies) == 22
+
+    energies = get_energies(numpy.array([-5., 20.]), ndos=6)
+    numpy.testing.assert_allclose(energies, [-5., 0., 5., 10., 15., 20.])
+
+
+@pytest.mark.parametrize('degauss', (0., 5.))
+def test_get_phonon_dos(frequencies, degauss):
+    """Test `get_phonon_dos` is normalized to the number of modes for both the tetrahedron and Gaussian methods."""
+    energies, dos = get_phonon_dos(frequencies, MESH, delta_e=0.5, degauss=degauss)
+
+    assert energies.shape == dos.shape
+    assert numpy.all(dos >= 0)
+    assert numpy.isclose(dos.sum() * 0.5, 3, rtol=1e-2)
+
+
+def test_get_phonon_dos_mesh(frequencies):
+    """Test `get_phonon_dos` raises if the number of q-points does not match the mesh."""
+    with pytest.raises(ValueError, match='does not match the mesh'):
+        get_phonon_dos(frequencies[:-1], MESH)
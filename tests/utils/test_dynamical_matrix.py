@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.dynamical_matrix` module."""
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.utils.dynamical_matrix import parse_dynamical_matrix, parse_dynamical_matrix_header
+
+
+@pytest.mark.parametrize('number_atoms, number_qpoints', ((1, 1), (2, 6)))
+def test_parse_dynamical_matrix(generate_dynamical_matrix, number_atoms, number_qpoints):
+    """Test `parse_dynamical_matrix`."""
+    content, arrays = generate_dynamical_matrix(number_atoms, number_qpoints)
+    parsed = parse_dynamical_matrix(content)
+
+    assert parsed['number_of_atoms'] == number_atoms
+    assert parsed['dynamical_matrices'].shape == (number_qpoints, 3 * number_atoms, 3 * number_atoms)
+
+    for key, array in arrays.items():
+        assert numpy.allclose(parsed[key], array, atol=1e-8), key
+
+
+def test_parse_dynamical_matrix_fixed_width(generate_dynamical_matrix):
+    """Test `parse_dynamical_matrix` for numbers of the fixed-width format that are not separated by whitespace."""
+    content, arrays = generate_dynamical_matrix(number_atoms=1, number_qpoints=1)
+    value = arrays['dynamical_matrices'][0, 0, 0]
+    content = content.replace(f'{value.real:12.8f}{value.imag:12.8f}', f'{value.real:12.8f}-99.12345678', 1)
+
+    parsed = parse_dynamical_matrix(content)
+    assert parsed['dynamical_matrices'][0, 0, 0] == pytest.approx(value.real - 99.12345678j)
+    assert numpy.allclose(parsed['dynamical_matrices'][0, 1:], arrays['dynamical_matrices'][0, 1:])
+
+
+def test_parse_dynamical_matrix_invalid(generate_dynamical_matrix):
+    """Test `parse_dynamical_matrix` raises for incomplete content."""
+    content, _ = generate_dynamical_matrix()
+
+    with pytest.raises(ValueError, match='does not contain the header'):
+        parse_dynamical_matrix('Dynamical matrix file\n')
+
+    with pytest.raises(ValueError, match='does not contain the dynamical matrices and their diagonalization'):
+        parse_dynamical_matrix(content.split('Diagonalizing')[0])
+
+    with pytest.raises(ValueError, match='expected number of frequencies'):
+        parse_dynamical_matrix(content.rsplit('freq', 1)[0])
+
+
+def test_parse_dynamical_matrix_dielectric(generate_dynamical_matrix):
+    """Test `parse_dynamical_matrix` parses the dielectric tensor and effective charges written after Gamma."""
+    dielectric_tensor = numpy.diag([13.7, 13.7, 12.1])
+    effective_charges = numpy.array([numpy.diag([2.1, 2.1, 1.9]), -numpy.diag([2.1, 2.1, 1.9])])
+    content, arrays = generate_dynamical_matrix(
+        qpoints=[[0., 0., 0.]], dielectric_tensor=dielectric_tensor, effective_charges=effective_charges
+    )
+    parsed = parse_dynamical_matrix(content)
+
+    assert numpy.allclose(parsed['dynamical_matrices'], arrays['dynamical_matrices'])
+    assert numpy.allclose(parsed['dielectric_tensor'], dielectric_tensor)
+    assert numpy.allclose(parsed['effective_charges_eu'], effective_charges)
+    assert 'dielectric_tensor' not in parse_dynamical_matrix(generate_dynamical_matrix()[0])
+
+
+def test_parse_dynamical_matrix_header(generate_dynamical_matrix):
+    """Test `parse_dynamical_matrix_header`."""
+    cell = [[-0.5, 0., 0.5], [0., 0.5, 0.5], [-0.5, 0.5, 0.]]
+    positions = [[0., 0., 0.], [0.25, 0.25, 0.25]]
+    content, _ = generate_dynamical_matrix(cell=cell, positions=positions)
+    parsed = parse_dynamical_matrix_header(content)
+
+    assert parsed['ibrav'] == 0
+    assert parsed['celldm'] == [10.2, 0., 0., 0., 0., 0.]
+    assert numpy.allclose(parsed['cell'], cell)
+    assert parsed['species'] == [('Si', 25598.36731)]
+    assert parsed['atom_types'] == [1, 1]
+    assert numpy.allclose(parsed['positions'], positions)
+    assert 'cell' not in parse_dynamical_matrix_header(generate_dynamical_matrix()[0])
+
+    with pytest.raises(ValueError, match='does not contain the header'):
+        parse_dynamical_matrix_header(content.split('Basis vectors')[0])
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.force_constants` module."""
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.utils.force_constants import get_force_constants, get_mesh_indices, get_rigid_ion_term
+
+CELL = numpy.array([[-0.5, 0., 0.5], [0., 0.5, 0.5], [-0.5, 0.5, 0.]])
+POSITIONS = numpy.array([[0., 0., 0.], [0.25, 0.25, 0.25]])
+
+
+def test_get_mesh_indices():
+    """Test `get_mesh_indices` for the q-points of a mesh in cartesian coordinates."""
+    mesh = (2, 3, 4)
+    indices = numpy.indices(mesh).reshape(3, -1).T
+    qpoints = (indices / mesh) @ numpy.linalg.inv(CELL).T - numpy.linalg.inv(CELL).T[0] / mesh[0]
+
+    assert numpy.all(get_mesh_indices(qpoints, CELL, mesh) == (indices - [1, 0, 0]) % mesh)
+
+    with pytest.raises(ValueError, match='not on the q-point mesh'):
+        get_mesh_indices(qpoints + 0.1, CELL, mesh)
+
+
+@pytest.mark.parametrize('asr', ('no', 'simple'))
+def test_get_force_constants(asr):
+    """Test `get_force_constants` is the inverse of the Fourier transform of the force constants."""
+    mesh = (2, 3, 4)
+    force_constants = numpy.random.default_rng(0).uniform(-1, 1, mesh + (2, 3, 2, 3))
+    matrices = numpy.fft.fftn(force_constants, axes=(0, 1, 2)).reshape(mesh + (6, 6))
+    indices = numpy.indices(mesh).reshape(3, -1).T
+    order = numpy.random.default_rng(1).permutation(len(indices))
+
+    result = get_force_constants(matrices.reshape(-1, 6, 6)[order], indices[order], mesh, asr=asr)
+    expected = force_constants.transpose(0, 1, 2, 4, 6, 3, 5)
+
+    if asr == 'simple':
+        assert numpy.allclose(result.sum(axis=(0, 1, 2, 6)), 0)
+        expected[0, 0, 0][..., [0, 1], [0, 1]] = result[0, 0, 0][..., [0, 1], [0, 1]]
+
+    assert numpy.allclose(result, expected)
+
+    with pytest.raises(ValueError, match='1 q-points of the mesh are missing'):
+        get_force_constants(matrices.reshape(-1, 6, 6)[1:], indices[1:], mesh)
+
+    with pytest.raises(ValueError, match='acoustic sum rule `crystal` is not supported'):
+        get_force_constants(matrices.reshape(-1, 6, 6), indices, mesh, asr='crystal')
+
+
+def test_get_rigid_ion_term():
+    """Test `get_rigid_ion_term` is hermitian and satisfies the acoustic sum rule at Gamma for neutral charges."""
+    dielectric_tensor = numpy.diag([13.7, 13.7, 12.1])
+    charges = numpy.diag([2.1, 2.1, 1.9])
+    effective_charges = numpy.array([charges, -charges])
+    arguments = (CELL, POSITIONS, 10.2, dielectric_tensor, effective_charges)
+
+    gamma, term = get_rigid_ion_term(numpy.array([[0., 0., 0.], [0.1, -0.2, 0.3]]), *arguments)
+    assert numpy.allclose(gamma.reshape(6, 2, 3).sum(axis=1), 0)
+    assert numpy.allclose(term, term.conj().T)
+    assert not numpy.allclose(term, 0)
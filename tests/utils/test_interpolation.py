@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.interpolation` module."""
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.utils.interpolation import (
+    RY_TO_CMM1,
+    get_gamma_directions,
+    get_interpolation_kernel,
+    interpolate_frequencies,
+)
+
+CELL = numpy.array([[-0.5, 0., 0.5], [0., 0.5, 0.5], [-0.5, 0.5, 0.]])
+POSITIONS = numpy.array([[0., 0., 0.], [0.25, 0.25, 0.25]])
+MESH = (3, 3, 3)
+
+
+@pytest.fixture
+def arrays():
+    """Return the arrays of random force constants, for which the dynamical matrices are hermitian."""
+    force_constants = numpy.random.default_rng(0).uniform(-1, 1, MESH + (2, 3, 2, 3))
+    opposite = numpy.ix_(*((-numpy.arange(size)) % size for size in MESH))
+    force_constants = 0.5 * (force_constants + force_constants[opposite].transpose(0, 1, 2, 5, 6, 3, 4))
+
+    return {
+        'force_constants': force_constants.transpose(0, 1, 2, 4, 6, 3, 5),
+        'cell': CELL,
+        'positions': POSITIONS,
+        'alat': 10.2,
+        'masses': numpy.array([25598.36731, 51196.73462]),
+    }
+
+
+def test_get_interpolation_kernel(arrays):
+    """Test the weights of the images of each lattice vector of `get_interpolation_kernel` sum to one."""
+    vectors, matrices = get_interpolation_kernel(arrays['force_constants'], CELL, POSITIONS)
+    indices = numpy.rint(vectors @ numpy.linalg.inv(CELL)).astype(int) % MESH
+
+    for index in numpy.ndindex(MESH):
+        images = numpy.all(indices == index, axis=1)
+        expected = arrays['force_constants'][index].transpose(2, 0, 3, 1).reshape(6, 6)
+        assert numpy.allclose(matrices[images].sum(axis=0), expected)
+
+
+@pytest.mark.parametrize('max_workers', (None, 2))
+def test_interpolate_frequencies(arrays, max_workers):
+    """Test `interpolate_frequencies` reproduces the frequencies of the dynamical matrices on the q-point mesh."""
+    indices = numpy.indices(MESH).reshape(3, -1).T
+    matrices = numpy.fft.fftn(arrays['force_constants'].transpose(0, 1, 2, 5, 3, 6, 4), axes=(0, 1, 2))
+    masses = numpy.sqrt(numpy.repeat(arrays['masses'], 3))
+    eigenvalues = numpy.linalg.eigvalsh(matrices.reshape(-1, 6, 6) / numpy.outer(masses, masses))
+    expected = numpy.sign(eigenvalues) * numpy.sqrt(numpy.abs(eigenvalues)) * RY_TO_CMM1
+
+    frequencies = interpolate_frequencies(indices / MESH, arrays, is_path=False, chunk_size=4, max_workers=max_workers)
+    assert numpy.allclose(frequencies, expected)
+
+
+def test_interpolate_frequencies_polar(arrays):
+    """Test `interpolate_frequencies` adds the non-analytic term at Gamma in the direction of the path."""
+    charges = numpy.diag([2.1, 2.1, 1.9])
+    arrays.update(dielectric_tensor=numpy.eye(3) * 13.7, effective_charges=numpy.array([charges, -charges]))
+    arrays['force_constants'] = numpy.zeros_like(arrays['force_constants'])
+
+    path = numpy.array([[1e-5, 0., 0.], [0., 0., 0.], [0., 1e-5, 0.], [0., 0., 1e-5]])
+    frequencies = interpolate_frequencies(path, arrays)
+    assert numpy.allclose(frequencies[0], frequencies[1], atol=1e-2)
+    assert not numpy.allclose(frequencies[1], interpolate_frequencies(path[1:2], arrays, is_path=False)[0], atol=1)
+
+
+def test_get_gamma_directions():
+    """Test `get_gamma_directions` takes the direction of each Gamma point from its neighbours."""
+    path = numpy.array([[0., 0., 0.], [0.5, 0., 0.], [0., 0., 0.], [0., 0., 0.], [0., 0.5, 0.]])
+    directions = get_gamma_directions(path)
+
+    assert numpy.allclose(directions, [[-1, 0, 0], [0, 0, 0], [-1, 0, 0], [0, -1, 0], [0, 0, 0]])
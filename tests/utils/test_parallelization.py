@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.parallelization` module."""
+import pytest
+
+from aiida_quantumespresso_ph.utils.parallelization import (
+    estimate_makespans,
+    get_list_makespan,
+    select_parallelization_mode,
+)
+
+
+@pytest.mark.parametrize(('durations', 'number_of_slots', 'expected'), (
+    ([1, 2, 3], 1, 6),
+    ([1, 2, 3], 3, 3),
+    ([3, 1, 1, 1], 2, 3),
+    ([1, 1, 1, 3], 2, 4),
+    ([], 2, 0),
+))
+def test_get_list_makespan(durations, number_of_slots, expected):
+    """Test ``get_list_makespan``."""
+    assert get_list_makespan(durations, number_of_slots) == expected
+
+
+def test_estimate_makespans():
+    """Test ``estimate_makespans``."""
+    makespans = estimate_makespans([100] * 4, job_overhead_seconds=10)
+    assert makespans == {'serial': 410, 'parallel': 120, 'batch': 120, 'number_of_batches': 4}
+
+    makespans = estimate_makespans([100] * 4, max_concurrent=2, job_overhead_seconds=10)
+    assert makespans == {'serial': 410, 'parallel': 230, 'batch': 220, 'number_of_batches': 2}
+
+
+def test_select_parallelization_mode():
+    """Test ``select_parallelization_mode``."""
+    # A single q-point is computed serially, since the parallel mode has the overhead of the initialization
+    assert select_parallelization_mode(estimate_makespans([100], job_overhead_seconds=10), 1) == 'serial'
+
+    # Cheap q-points are computed serially, since the overhead of the jobs dominates
+    assert select_parallelization_mode(estimate_makespans([1] * 4, job_overhead_seconds=10), 4) == 'serial'
+
+    # With unlimited concurrency, the batches would contain a single q-point, which is the parallel mode
+    assert select_parallelization_mode(estimate_makespans([100] * 4, job_overhead_seconds=10), 4) == 'parallel'
+
+    makespans = estimate_makespans([100] * 4, max_concurrent=2, job_overhead_seconds=10)
+    assert select_parallelization_mode(makespans, 4) == 'batch'
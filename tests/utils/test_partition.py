@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.partition` module."""
+import pytest
+
+from aiida_quantumespresso_ph.utils.partition import partition_costs
+
+
+@pytest.mark.parametrize(
+    'costs, number_of_parts, expected', (
+        ([], 2, []),
+        ([1, 2, 3], 1, [(0, 3)]),
+        ([1, 2, 3], 3, [(0, 1), (1, 2), (2, 3)]),
+        ([1, 2, 3], 5, [(0, 1), (1, 2), (2, 3)]),
+        ([1, 3, 3, 1], 2, [(0, 2), (2, 4)]),
+        ([5, 1, 1, 1, 1, 1], 2, [(0, 1), (1, 6)]),
+        ([2, 2, 2, 2, 2, 2, 2], 3, [(0, 3), (3, 6), (6, 7)]),
+    )
+)
+def test_partition_costs(costs, number_of_parts, expected):
+    """Test :func:`aiida_quantumespresso_ph.utils.partition.partition_costs`."""
+    assert partition_costs(costs, number_of_parts) == expected
+
+
+def test_partition_costs_balanced():
+    """Test that the most expensive range of :func:`partition_costs` is close to the mean cost."""
+    costs = [1, 4, 2, 6, 3, 3, 5, 1, 2, 4, 6, 2]
+    ranges = partition_costs(costs, 4)
+    totals = [sum(costs[start:stop]) for start, stop in ranges]
+
+    assert len(ranges) == 4
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(costs)
+    assert all(stop == start for (_, stop), (start, _) in zip(ranges[:-1], ranges[1:]))
+    assert max(totals) == 12
+
+
+def test_partition_costs_invalid():
+    """Test :func:`partition_costs` raises for an invalid number of parts."""
+    with pytest.raises(ValueError):
+        partition_costs([1, 2], 0)
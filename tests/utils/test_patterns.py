@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.patterns` module."""
+import io
+
+import pytest
+
+from aiida_quantumespresso_ph.utils.patterns import get_perturbations_from_patterns
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_perturbations_from_patterns(generate_patterns):
+    """Test :func:`aiida_quantumespresso_ph.utils.patterns.get_perturbations_from_patterns`."""
+    from aiida.orm import FolderData
+
+    folder = FolderData()
+
+    for index, perturbations in enumerate(([3, 3], [1, 1, 2, 2]), start=1):
+        stream = io.StringIO(generate_patterns(perturbations))
+        folder.base.repository.put_object_from_filelike(stream, f'patterns.{index}.xml')
+
+    assert get_perturbations_from_patterns(folder) == {1: [3, 3], 2: [1, 1, 2, 2]}
+    assert get_perturbations_from_patterns(FolderData()) == {}
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_perturbations_from_patterns_invalid():
+    """Test :func:`get_perturbations_from_patterns` raises for an incomplete patterns file."""
+    from aiida.orm import FolderData
+
+    folder = FolderData()
+    stream = io.StringIO('<Root><IRREPS_INFO><NUMBER_IRR_REP>2</NUMBER_IRR_REP></IRREPS_INFO></Root>')
+    folder.base.repository.put_object_from_filelike(stream, f'patterns.1.xml')
+
+    with pytest.raises(ValueError):
+        get_perturbations_from_patterns(folder)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.qpoints` module."""
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.utils.qpoints import (
+    get_irreducible_qpoints,
+    get_number_of_symmetries,
+    get_star_multiplicities,
+    parse_dynamical_matrix_0,
+)
+
+
+def test_get_number_of_symmetries(generate_structure):
+    """Test `get_number_of_symmetries`."""
+    assert get_number_of_symmetries(generate_structure()) == 48
+
+
+def test_get_irreducible_qpoints(generate_structure):
+    """Test `get_irreducible_qpoints` for the 4x4x4 mesh of an fcc lattice, for which `ph.x` finds 8 q-points."""
+    qpoints, multiplicities = get_irreducible_qpoints(generate_structure(), [4, 4, 4])
+
+    assert qpoints.shape == (8, 3)
+    assert numpy.all(qpoints[0] == 0)
+    assert multiplicities[0] == 1
+    assert sum(multiplicities) == 64
+
+
+def test_get_star_multiplicities(generate_structure):
+    """Test `get_star_multiplicities`."""
+    structure = generate_structure()
+    qpoints, multiplicities = get_irreducible_qpoints(structure, [4, 4, 4])
+
+    assert numpy.all(get_star_multiplicities(structure, [4, 4, 4], qpoints[::-1]) == multiplicities[::-1])
+
+    # The stars do not add up to the full mesh if a q-point is missing, or if the q-points are not on the mesh
+    assert get_star_multiplicities(structure, [4, 4, 4], qpoints[1:]) is None
+    assert get_star_multiplicities(structure, [4, 4, 4], qpoints + 0.1) is None
+
+
+def test_parse_dynamical_matrix_0():
+    """Test `parse_dynamical_matrix_0`."""
+    content = '   2   2   2\n   2\n' + '  0.0E+00  0.0E+00  0.0E+00\n' + ' -0.5E+00  0.5E+00 -0.5E+00\n'
+    mesh, qpoints = parse_dynamical_matrix_0(content)
+
+    assert mesh == [2, 2, 2]
+    assert numpy.all(qpoints == [[0., 0., 0.], [-0.5, 0.5, -0.5]])
+
+    with pytest.raises(ValueError, match='does not contain the list of q-points'):
+        parse_dynamical_matrix_0('   2   2   2\n   2\n  0.0E+00  0.0E+00  0.0E+00\n')
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Tests for the :mod:`aiida_quantumespresso_ph.utils.walltime` module."""
+import numpy
+import pytest
+
+from aiida_quantumespresso_ph.utils.walltime import (
+    MIN_WALLCLOCK_SECONDS,
+    WALLTIME_FEATURES,
+    fit_walltime_model,
+    get_predicted_resources,
+    get_walltime_sample,
+    get_walltime_samples,
+    predict_cost,
+)
+
+
+def test_fit_walltime_model():
+    """Test that ``fit_walltime_model`` recovers the coefficients of a power law."""
+    random = numpy.random.default_rng(0)
+    features = random.uniform(1, 100, size=(20, len(WALLTIME_FEATURES)))
+    costs = 2. * features[:, 0]**3 * features[:, 1] * features[:, 2] * features[:, 3]**1.5
+
+    model = fit_walltime_model(features, costs)
+    assert numpy.allclose(model['coefficients'], [numpy.log(2.), 3., 1., 1., 1.5])
+    assert model['residual'] == pytest.approx(0., abs=1e-8)
+    assert model['number_of_samples'] == 20
+
+    sample = dict(zip(WALLTIME_FEATURES, features[0]))
+    assert predict_cost(model, sample) == pytest.approx(costs[0])
+
+    # A single sample gives a cost proportional to the product of the features
+    model = fit_walltime_model(numpy.ones((1, len(WALLTIME_FEATURES))), numpy.array([100.]))
+    assert predict_cost(model, dict.fromkeys(WALLTIME_FEATURES, 1.)) == pytest.approx(100.)
+
+    with pytest.raises(ValueError, match='without any samples'):
+        fit_walltime_model(numpy.zeros((0, len(WALLTIME_FEATURES))), numpy.zeros(0))
+
+
+def test_get_predicted_resources():
+    """Test ``get_predicted_resources``."""
+    # A model with a constant cost of 10000 machine-seconds
+    model = {'coefficients': [numpy.log(10000.), 0., 0., 0., 0.], 'residual': 0., 'number_of_samples': 10}
+    features = dict.fromkeys(WALLTIME_FEATURES, 1.)
+
+    assert get_predicted_resources(model, features, 43200, safety_factor=1.) == pytest.approx((1, 10000), abs=1)
+    assert get_predicted_resources(model, features, 43200, safety_factor=2.) == pytest.approx((1, 20000), abs=1)
+
+    # The number of machines is increased until the job fits in the maximum wallclock time
+    assert get_predicted_resources(model, features, 4000, max_num_machines=4,
+                                   safety_factor=1.) == pytest.approx((3, 3334), abs=1)
+    assert get_predicted_resources(model, features, 2000, max_num_machines=4,
+                                   safety_factor=1.) == pytest.approx((4, 2000), abs=1)
+
+    # The margin of the residual and the minimum wallclock time
+    model['residual'] = 0.5
+    assert get_predicted_resources(model, features, 43200,
+                                   safety_factor=1.) == pytest.approx((1, int(numpy.ceil(10000 * numpy.e))), abs=1)
+    model['coefficients'][0] = 0.
+    assert get_predicted_resources(model, features, 43200) == pytest.approx((1, MIN_WALLCLOCK_SECONDS), abs=1)
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_walltime_samples(generate_calc_job_node, generate_inputs_pw):
+    """Test ``get_walltime_sample`` and ``get_walltime_samples``."""
+    from aiida.common import LinkType
+    from aiida.orm import Dict
+    from plumpy import ProcessState
+
+    parent = generate_calc_job_node('quantumespresso.pw', inputs=generate_inputs_pw())
+    Dict({
+        'number_of_k_points': 3
+    }).store().base.links.add_incoming(parent, link_type=LinkType.CREATE, link_label='output_parameters')
+
+    def generate_ph_node(output_parameters, parameters=None, parent_folder=None, exit_status=0):
+        node = generate_calc_job_node(
+            'quantumespresso.ph',
+            inputs={
+                'parent_folder': parent_folder or parent.outputs.remote_folder,
+                'parameters': Dict({'INPUTPH': parameters or {}}),
+                'metadata': {
+                    'options': {
+                        'resources': {
+                            'num_machines': 2
+                        }
+                    }
+                },
+            }
+        )
+        if output_parameters is not None:
+            Dict(output_parameters
+                 ).store().base.links.add_incoming(node, link_type=LinkType.CREATE, link_label='output_parameters')
+        node.set_process_state(ProcessState.FINISHED)
+        node.set_exit_status(exit_status)
+        return node
+
+    node = generate_ph_node({'wall_time_seconds': 100., 'number_of_irr_representations_for_each_q': [2, 4]})
+    assert get_walltime_sample(node) == ([1., 6., 3., 30.], 200.)
+
+    # Only the range of irreducible representations of the calculation is counted
+    node = generate_ph_node({
+        'wall_time_seconds': 50.,
+        'number_of_irr_representations_for_each_q': [4]
+    }, {
+        'start_irr': 2,
+        'last_irr': 3
+    })
+    assert get_walltime_sample(node) == ([1., 2., 3., 30.], 100.)
+
+    # Calculations without any irreducible representation, e.g. the initialization run, are skipped
+    node = generate_ph_node({'wall_time_seconds': 10., 'number_of_irr_representations_for_each_q': []})
+    assert get_walltime_sample(node) is None
+
+    # Initialization runs that only determine the irreducible representations are skipped as well
+    output_parameters = {'wall_time_seconds': 10., 'number_of_irr_representations_for_each_q': [4]}
+    node = generate_ph_node(output_parameters, {'only_init': True})
+    assert get_walltime_sample(node) is None
+    node = generate_ph_node(output_parameters, {'start_irr': 0, 'last_irr': 0})
+    assert get_walltime_sample(node) is None
+
+    features, costs = get_walltime_samples(limit=5)
+    assert features.tolist() == [[1., 2., 3., 30.], [1., 6., 3., 30.]]
+    assert costs.tolist() == [100., 200.]
+
+    # A restart chain is followed back to the `PwCalculation` and the cost includes all its calculations, where the
+    # calculation that was killed without output parameters counts its `max_wallclock_seconds` of 1800 seconds
+    output_parameters = {'wall_time_seconds': 300., 'number_of_irr_representations_for_each_q': [2, 4]}
+    first = generate_ph_node(output_parameters, exit_status=400)
+    killed = generate_ph_node(None, parent_folder=first.outputs.remote_folder, exit_status=110)
+    output_parameters = {'wall_time_seconds': 50., 'number_of_irr_representations_for_each_q': [2, 4]}
+    node = generate_ph_node(output_parameters, {'recover': True}, parent_folder=killed.outputs.remote_folder)
+    assert get_walltime_sample(node) == ([1., 6., 3., 30.], (300. + 1800. + 50.) * 2)
+
+    features, costs = get_walltime_samples(limit=5)
+    assert features.tolist() == [[1., 2., 3., 30.], [1., 6., 3., 30.], [1., 6., 3., 30.]]
+    assert costs.tolist() == [100., 200., 4300.]
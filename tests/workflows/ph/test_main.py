@@ -62,6 +62,7 @@ def generate_ph_workchain_node(generate_calc_job_node):
 def test_should_run_parallel(generate_workchain_main):
     """Test `HpWorkChain.should_parallelize_atoms`."""
     process = generate_workchain_main(qpoints=True)
+    process.setup()
     assert process.should_run_parallel()
 
 
@@ -77,6 +78,7 @@ def test_serial(generate_workchain_main):
 def test_parallel(generate_workchain_main):
     """Test `PhWorkChain.run_serial`."""
     process = generate_workchain_main()
+    process.setup()
     result = process.run_parallel()
     assert result is None
 
@@ -92,3 +94,206 @@ def test_inspect_workchain(generate_workchain_main, generate_ph_workchain_node):
 
     process.ctx.workchain = generate_ph_workchain_node(exit_status=0)
     assert process.inspect_workchain() is None
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_results_serial(generate_workchain_main, generate_ph_workchain_node):
+    """Test `PhWorkChain.results` stores the results of each q-point of a serial calculation as arrays."""
+    from aiida.common import LinkType
+    from aiida.orm import Dict
+
+    process = generate_workchain_main(qpoints=False)
+    process.ctx.workchain = generate_ph_workchain_node(use_retrieved=True)
+
+    output_parameters = Dict({
+        'wall_time_seconds': 10,
+        'number_of_irr_representations_for_each_q': [2, 3],
+        'number_of_qpoints': 2,
+        'dynamical_matrix_1': {
+            'q_point': [0., 0., 0.],
+            'frequencies': [0., 1.]
+        },
+        'dynamical_matrix_2': {
+            'q_point': [0.5, 0., 0.],
+            'frequencies': [2., 3.]
+        },
+    }).store()
+    output_parameters.base.links.add_incoming(
+        process.ctx.workchain, link_type=LinkType.RETURN, link_label='output_parameters'
+    )
+
+    process.results()
+
+    assert process.outputs['output_parameters']['qpoint_indices'] == [1, 2]
+    assert not any(key.startswith('dynamical_matrix_') for key in process.outputs['output_parameters'].keys())
+    assert process.outputs['output_arrays'].get_array('frequencies').tolist() == [[0., 1.], [2., 3.]]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_validate_inputs(generate_workchain, generate_inputs_ph):
+    """Test `PhWorkChain.validate_inputs` and `PhWorkChain.validate_parallelization_mode`."""
+    from aiida.orm import Int, Str
+
+    inputs = generate_inputs_ph()
+    qpoints = inputs.pop('qpoints')
+
+    with pytest.raises(ValueError, match='The `parallelization_mode` should be one of'):
+        generate_workchain(
+            'quantumespresso_ph.ph.main', {
+                'ph': inputs,
+                'qpoints': qpoints,
+                'parallelization_mode': Str('x')
+            }
+        )
+
+    with pytest.raises(ValueError, match='requires the `max_concurrent` input'):
+        generate_workchain(
+            'quantumespresso_ph.ph.main', {
+                'ph': inputs,
+                'qpoints': qpoints,
+                'parallelization_mode': Str('batch')
+            }
+        )
+
+    with pytest.raises(ValueError, match='should be positive'):
+        generate_workchain('quantumespresso_ph.ph.main', {'ph': inputs, 'qpoints': qpoints, 'max_concurrent': Int(0)})
+
+
+@pytest.mark.usefixtures('aiida_profile')
+@pytest.mark.parametrize(('mesh', 'max_concurrent', 'expected'), (
+    (2, None, 'serial'),
+    (6, None, 'parallel'),
+    (6, 2, 'batch'),
+))
+def test_parallelization_mode_auto(
+    generate_workchain, generate_inputs_ph, generate_kpoints_mesh, monkeypatch, mesh, max_concurrent, expected
+):
+    """Test `PhWorkChain.setup` with the `auto` parallelization mode."""
+    from aiida.orm import Int, Str, load_node
+
+    from aiida_quantumespresso_ph.utils import walltime
+    from aiida_quantumespresso_ph.utils.parallelization import PARALLELIZATION_EXTRA
+
+    # Without completed calculations in the database, each irreducible representation takes `DEFAULT_IRREP_SECONDS`
+    monkeypatch.setattr(walltime, 'get_walltime_model', lambda: None)
+
+    inputs = generate_inputs_ph()
+    inputs.pop('qpoints')
+    workchain_inputs = {'ph': inputs, 'qpoints': generate_kpoints_mesh(mesh), 'parallelization_mode': Str('auto')}
+
+    if max_concurrent is not None:
+        workchain_inputs['max_concurrent'] = Int(max_concurrent)
+
+    process = generate_workchain('quantumespresso_ph.ph.main', workchain_inputs)
+    process.setup()
+
+    assert process.ctx.parallelization_mode == expected
+    assert process.should_run_parallel() == (expected != 'serial')
+
+    extra = process.node.base.extras.get(PARALLELIZATION_EXTRA)
+    assert extra['mode'] == expected
+    assert extra['estimated_makespan_seconds'] == min(extra['makespans'].values())
+
+    if expected != 'serial':
+        process.run_parallel()
+        node = load_node(process.ctx.workchain.pk)
+        assert ('number_of_batches' in node.inputs) == (expected == 'batch')
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_parallelization_mode(generate_workchain, generate_inputs_ph):
+    """Test `PhWorkChain.setup` without the `auto` parallelization mode."""
+    from aiida.orm import Bool, Int, Str
+
+    inputs = generate_inputs_ph()
+    inputs = {'ph': inputs, 'qpoints': inputs.pop('qpoints')}
+
+    for parallelize_qpoints, expected in ((False, 'serial'), (True, 'parallel')):
+        process = generate_workchain(
+            'quantumespresso_ph.ph.main', {
+                **inputs, 'parallelize_qpoints': Bool(parallelize_qpoints)
+            }
+        )
+        process.setup()
+        assert process.ctx.parallelization_mode == expected
+
+    # The `parallelization_mode` takes precedence over `parallelize_qpoints`
+    process = generate_workchain(
+        'quantumespresso_ph.ph.main', {
+            **inputs, 'parallelize_qpoints': Bool(True),
+            'parallelization_mode': Str('batch'),
+            'max_concurrent': Int(3)
+        }
+    )
+    process.setup()
+    assert process.ctx.parallelization_mode == 'batch'
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_image(
+    generate_workchain, generate_inputs_ph, generate_calc_job_node, generate_ph_workchain_node, generate_calc_job,
+    fixture_sandbox_folder
+):
+    """Test the `image` parallelization mode of the `PhWorkChain`."""
+    import os
+
+    from aiida.common import LinkType
+    from aiida.orm import Dict, Int, Str, load_node
+
+    inputs = generate_inputs_ph()
+    inputs['settings'] = Dict({'CMDLINE': ['-nk', '2']})
+    parent_folder = inputs['parent_folder']
+    qpoints = inputs['qpoints']
+    inputs = {'ph': inputs, 'qpoints': inputs.pop('qpoints')}
+
+    with pytest.raises(ValueError, match='requires the `number_of_images` input'):
+        generate_workchain('quantumespresso_ph.ph.main', {**inputs, 'parallelization_mode': Str('image')})
+
+    with pytest.raises(ValueError, match='`number_of_images` input should be positive'):
+        generate_workchain(
+            'quantumespresso_ph.ph.main', {
+                **inputs, 'parallelization_mode': Str('image'),
+                'number_of_images': Int(0)
+            }
+        )
+
+    process = generate_workchain(
+        'quantumespresso_ph.ph.main', {
+            **inputs, 'parallelization_mode': Str('image'),
+            'number_of_images': Int(4)
+        }
+    )
+    process.setup()
+    assert process.should_run_images()
+
+    process.run_images()
+    node = load_node(process.ctx.workchain_images.pk)
+    assert node.inputs.ph.settings.get_dict()['CMDLINE'] == ['-nk', '2', '-ni', '4']
+
+    process.ctx.workchain_images = generate_ph_workchain_node(exit_status=300)
+    assert process.inspect_images() == PhWorkChain.exit_codes.ERROR_CHILD_WORKCHAIN_FAILED
+
+    process.ctx.workchain_images = generate_ph_workchain_node(exit_status=0)
+    assert process.inspect_images() is None
+
+    remote_folder = generate_calc_job_node('quantumespresso.ph', inputs={'qpoints': qpoints}).outputs.remote_folder
+    remote_folder.base.links.add_incoming(
+        process.ctx.workchain_images, link_type=LinkType.RETURN, link_label='remote_folder'
+    )
+
+    # The images are collected on the folder of the `pw.x` calculation, to which the folders of the images are copied
+    process.run_collect()
+    node = load_node(process.ctx.workchain.pk)
+    assert node.process_class.__name__ == 'PhCollectCalculation'
+    assert node.inputs.parameters.get_dict()['INPUTPH']['recover'] is True
+    assert node.inputs.parent_folder.uuid == parent_folder.uuid
+    assert node.inputs.partial_folders.images.uuid == remote_folder.uuid
+    assert node.inputs.qpoints.uuid == qpoints.uuid
+    assert node.inputs.settings.get_dict()['CMDLINE'] == ['-nk', '2']
+
+    calc_info = generate_calc_job(fixture_sandbox_folder, 'quantumespresso_ph.ph_collect', node.get_builder_restart())
+    dirpath_output = node.process_class._OUTPUT_SUBFOLDER  # pylint: disable=protected-access
+    assert calc_info.remote_copy_list[-1] == (
+        remote_folder.computer.uuid, os.path.join(remote_folder.get_remote_path(), dirpath_output,
+                                                  '_ph*'), dirpath_output
+    )
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
-# pylint: disable=no-member,redefined-outer-name
+# pylint: disable=no-member,protected-access,redefined-outer-name
 """Tests for the `PhParallelizeQpointsWorkChain` class."""
+import io
+
+import numpy
 from plumpy import ProcessState
 import pytest
 
@@ -11,12 +14,12 @@ from aiida_quantumespresso_ph.workflows.ph.parallelize_qpoints import PhParallel
 def generate_workchain_qpoints(generate_workchain, generate_inputs_ph):
     """Generate an instance of a `PhParallelizeQpointsWorkChain`."""
 
-    def _generate_workchain_qpoints(inputs=None):
+    def _generate_workchain_qpoints(inputs=None, **kwargs):
         entry_point = 'quantumespresso_ph.ph.parallelize_qpoints'
 
         inputs = generate_inputs_ph(inputs=inputs)
         qpoints = inputs.pop('qpoints')
-        process = generate_workchain(entry_point, {'ph': inputs, 'qpoints': qpoints})
+        process = generate_workchain(entry_point, {'ph': inputs, 'qpoints': qpoints, **kwargs})
 
         return process
 
@@ -46,6 +49,52 @@ def generate_ph_workchain_node(generate_calc_job_node):
     return _generate_ph_workchain_node
 
 
+@pytest.fixture
+def generate_ph_init_node(generate_patterns):
+    """Generate an instance of `WorkflowNode` of an initialization run with the given irreducible representations."""
+
+    def _generate_ph_init_node(perturbations=()):
+        from aiida.common import LinkType
+        from aiida.orm import FolderData, WorkflowNode
+
+        node = WorkflowNode().store()
+        node.set_process_state(ProcessState.FINISHED)
+        node.set_exit_status(0)
+
+        retrieved = FolderData()
+
+        for index, qpoint_perturbations in enumerate(perturbations, start=1):
+            stream = io.StringIO(generate_patterns(qpoint_perturbations))
+            retrieved.base.repository.put_object_from_filelike(stream, f'patterns.{index}.xml')
+
+        retrieved.store()
+        retrieved.base.links.add_incoming(node, link_type=LinkType.RETURN, link_label='retrieved')
+
+        return node
+
+    return _generate_ph_init_node
+
+
+@pytest.fixture
+def generate_qpoints():
+    """Generate the dictionary of q-points as returned by the `distribute_qpoints` calcfunction."""
+
+    def _generate_qpoints(number_qpoints):
+        from aiida.orm import KpointsData
+
+        qpoints = {}
+
+        for index in range(number_qpoints):
+            qpoint = KpointsData()
+            qpoint.set_cell([[1., 0., 0.], [0., 1., 0.], [0., 0., 1.]])
+            qpoint.set_kpoints([[0.1 * index, 0., 0.]], cartesian=True)
+            qpoints[f'qpoint_{index}'] = qpoint.store()
+
+        return qpoints
+
+    return _generate_qpoints
+
+
 @pytest.mark.usefixtures('aiida_profile')
 def test_run_ph_init(generate_workchain_qpoints):
     """Test `PhParallelizeQpointsWorkChain.run_ph_init`."""
@@ -73,3 +122,554 @@ def test_inspect_qpoints(generate_workchain_qpoints, generate_ph_workchain_node)
 
     result = process.inspect_qpoints()
     assert result == PhParallelizeQpointsWorkChain.exit_codes.ERROR_QPOINT_WORKCHAIN_FAILED
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_validate_inputs(generate_workchain_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.validate_inputs`."""
+    from aiida.orm import Bool, Float, Int
+
+    with pytest.raises(ValueError, match='Only one of `number_of_batches` and `batch_wallclock_seconds`'):
+        generate_workchain_qpoints(number_of_batches=Int(2), batch_wallclock_seconds=Int(3600))
+
+    with pytest.raises(ValueError, match='requires `irrep_wallclock_seconds`'):
+        generate_workchain_qpoints(batch_wallclock_seconds=Int(3600))
+
+    with pytest.raises(ValueError, match='should be positive'):
+        generate_workchain_qpoints(number_of_batches=Int(0))
+
+    generate_workchain_qpoints(batch_wallclock_seconds=Int(3600), irrep_wallclock_seconds=Float(600.))
+
+    # The q-points of `spglib` cannot be selected by their index, since their order can differ from the one of `ph.x`
+    with pytest.raises(ValueError, match='cannot be combined with `compact_qpoints`'):
+        generate_workchain_qpoints(reduce_qpoints=Bool(True), compact_qpoints=Bool(True))
+
+    with pytest.raises(ValueError, match='cannot be combined with `number_of_batches`'):
+        generate_workchain_qpoints(reduce_qpoints=Bool(True), number_of_batches=Int(2))
+
+    generate_workchain_qpoints(reduce_qpoints=Bool(True), number_of_irrep_chunks=Int(2))
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_qpoint_jobs(generate_workchain_qpoints, generate_ph_init_node, generate_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.get_qpoint_jobs`."""
+    from aiida.orm import Float, Int
+
+    perturbations = ([3, 3], [1, 1, 2, 2], [2, 2, 2], [3, 3])
+
+    process = generate_workchain_qpoints()
+    process.ctx.init_retrieved = generate_ph_init_node(perturbations).outputs.retrieved
+    process.ctx.qpoints = generate_qpoints(4)
+    assert process.get_qpoint_jobs() == [{'start_q': index, 'last_q': index} for index in range(1, 5)]
+
+    process = generate_workchain_qpoints(number_of_batches=Int(2))
+    process.ctx.init_retrieved = generate_ph_init_node(perturbations).outputs.retrieved
+    process.ctx.qpoints = generate_qpoints(4)
+    assert process.get_qpoint_jobs() == [{'start_q': 1, 'last_q': 2}, {'start_q': 3, 'last_q': 4}]
+
+    # The total cost of 11 irreducible representations requires three batches of at most 4 irreps each
+    process = generate_workchain_qpoints(batch_wallclock_seconds=Int(400), irrep_wallclock_seconds=Float(100.))
+    process.ctx.init_retrieved = generate_ph_init_node(perturbations).outputs.retrieved
+    process.ctx.qpoints = generate_qpoints(4)
+    assert process.get_qpoint_jobs() == [{
+        'start_q': 1,
+        'last_q': 1
+    }, {
+        'start_q': 2,
+        'last_q': 2
+    }, {
+        'start_q': 3,
+        'last_q': 4
+    }]
+
+    # Without patterns all q-points are assumed to have the same cost
+    process = generate_workchain_qpoints(number_of_batches=Int(2))
+    process.ctx.init_retrieved = generate_ph_init_node().outputs.retrieved
+    process.ctx.qpoints = generate_qpoints(4)
+    assert process.get_qpoint_jobs() == [{'start_q': 1, 'last_q': 2}, {'start_q': 3, 'last_q': 4}]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_job_inputs(generate_workchain_qpoints, generate_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.get_job_inputs`."""
+    process = generate_workchain_qpoints(inputs={'epsil': True})
+    process.ctx.qpoints = generate_qpoints(4)
+
+    label, inputs = process.get_job_inputs({'start_q': 1, 'last_q': 1})
+    assert label == 'qpoint_0'
+    assert inputs.qpoints == process.ctx.qpoints['qpoint_0']
+    assert inputs.ph.parameters['INPUTPH']['epsil']
+
+    label, inputs = process.get_job_inputs({'start_q': 2, 'last_q': 2})
+    assert label == 'qpoint_1'
+    assert not inputs.ph.parameters['INPUTPH']['epsil']
+
+    label, inputs = process.get_job_inputs({'start_q': 2, 'last_q': 4})
+    assert label == 'qpoints_2_4'
+    assert inputs.qpoints.get_kpoints_mesh() == ([2, 2, 2], [0., 0., 0.])
+    assert inputs.ph.parameters['INPUTPH']['start_q'] == 2
+    assert inputs.ph.parameters['INPUTPH']['last_q'] == 4
+    assert not inputs.ph.parameters['INPUTPH']['epsil']
+
+    label, inputs = process.get_job_inputs({'start_q': 1, 'last_q': 1, 'start_irr': 2, 'last_irr': 3})
+    assert label == 'qpoint_0_irreps_2_3'
+    assert inputs.qpoints == process.ctx.qpoints['qpoint_0']
+    assert inputs.ph.parameters['INPUTPH']['start_irr'] == 2
+    assert inputs.ph.parameters['INPUTPH']['last_irr'] == 3
+    assert not inputs.ph.parameters['INPUTPH']['epsil']
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_share_parent_folder(generate_workchain_qpoints, generate_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.get_job_inputs` with the `share_parent_folder` input."""
+    from aiida.orm import Bool, Dict
+
+    process = generate_workchain_qpoints()
+    process.ctx.qpoints = generate_qpoints(2)
+
+    _, inputs = process.get_job_inputs({'start_q': 1, 'last_q': 1})
+    assert 'settings' not in inputs.ph
+
+    process = generate_workchain_qpoints(share_parent_folder=Bool(True))
+    process.ctx.qpoints = generate_qpoints(2)
+
+    _, inputs = process.get_job_inputs({'start_q': 1, 'last_q': 1})
+    assert inputs.ph.settings.get_dict() == {'PARENT_FOLDER_SYMLINK': True}
+
+    # Existing settings should be kept
+    inputs = {'settings': Dict({'CMDLINE': ['-nk', '2']})}
+    process.set_parent_folder_symlink(inputs)
+    assert inputs['settings'].get_dict() == {'CMDLINE': ['-nk', '2'], 'PARENT_FOLDER_SYMLINK': True}
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_irrep_jobs(generate_workchain_qpoints, generate_ph_init_node, generate_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.get_irrep_jobs`."""
+    from aiida.orm import Int
+
+    with pytest.raises(ValueError, match='cannot be grouped in batches'):
+        generate_workchain_qpoints(number_of_irrep_chunks=Int(2), number_of_batches=Int(2))
+
+    process = generate_workchain_qpoints(number_of_irrep_chunks=Int(2))
+    process.ctx.init_retrieved = generate_ph_init_node(([3], [1, 1, 2, 2])).outputs.retrieved
+    process.ctx.qpoints = generate_qpoints(2)
+    assert process.get_qpoint_jobs() == [
+        {
+            'start_q': 1,
+            'last_q': 1
+        },
+        {
+            'start_q': 2,
+            'last_q': 2,
+            'start_irr': 1,
+            'last_irr': 3
+        },
+        {
+            'start_q': 2,
+            'last_q': 2,
+            'start_irr': 4,
+            'last_irr': 4
+        },
+    ]
+
+    # Without patterns the q-points are not split
+    process = generate_workchain_qpoints(number_of_irrep_chunks=Int(2))
+    process.ctx.init_retrieved = generate_ph_init_node().outputs.retrieved
+    process.ctx.qpoints = generate_qpoints(2)
+    assert process.get_qpoint_jobs() == [{'start_q': 1, 'last_q': 1}, {'start_q': 2, 'last_q': 2}]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_collect_irreps(generate_workchain_qpoints, generate_ph_workchain_node, generate_qpoints, aiida_localhost):
+    """Test `PhParallelizeQpointsWorkChain.run_collect_irreps`."""
+    from aiida.common import LinkType
+    from aiida.orm import Int, RemoteData
+
+    process = generate_workchain_qpoints(number_of_irrep_chunks=Int(2))
+    process.ctx.qpoints = generate_qpoints(2)
+    process.ctx.jobs = [
+        {
+            'start_q': 1,
+            'last_q': 1
+        },
+        {
+            'start_q': 2,
+            'last_q': 2,
+            'start_irr': 1,
+            'last_irr': 3
+        },
+        {
+            'start_q': 2,
+            'last_q': 2,
+            'start_irr': 4,
+            'last_irr': 4
+        },
+    ]
+    process.ctx.workchains = []
+
+    for _ in process.ctx.jobs:
+        node = generate_ph_workchain_node()
+        remote_folder = RemoteData(computer=aiida_localhost, remote_path='/tmp').store()
+        remote_folder.base.links.add_incoming(node, link_type=LinkType.RETURN, link_label='remote_folder')
+        process.ctx.workchains.append(node)
+
+    assert process.should_collect_irreps()
+
+    process.run_collect_irreps()
+
+    assert process.ctx.collected_qpoints == [2]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_ph_qgrid(generate_workchain_qpoints, generate_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.run_ph_qgrid` with a maximum number of concurrent work chains."""
+    from aiida.orm import Int
+
+    with pytest.raises(ValueError, match='should be positive'):
+        generate_workchain_qpoints(max_concurrent=Int(0))
+
+    process = generate_workchain_qpoints(max_concurrent=Int(2))
+    process.ctx.qpoints = generate_qpoints(3)
+    process.ctx.jobs = [{'start_q': index, 'last_q': index} for index in range(1, 4)]
+    process.ctx.workchains = []
+    process.ctx.retries = [0] * 3
+
+    process.run_ph_qgrid()
+    assert len(process.ctx.workchains) == 2
+    assert process.should_run_ph_qgrid()
+
+    # No slots are freed up as long as the submitted work chains are running
+    process.run_ph_qgrid()
+    assert len(process.ctx.workchains) == 2
+
+    process.ctx.workchains[0].set_process_state(ProcessState.FINISHED)
+    process.run_ph_qgrid()
+    assert len(process.ctx.workchains) == 3
+
+    # The loop continues until all submitted work chains terminated
+    assert process.should_run_ph_qgrid()
+
+    for workchain in process.ctx.workchains:
+        workchain.set_process_state(ProcessState.FINISHED)
+
+    assert not process.should_run_ph_qgrid()
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_ph_qgrid_wait_for_oldest(generate_workchain_qpoints, generate_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.run_ph_qgrid` only awaits the running work chain submitted first."""
+    from aiida.orm import Int
+
+    process = generate_workchain_qpoints(max_concurrent=Int(2))
+    process.ctx.qpoints = generate_qpoints(4)
+    process.ctx.jobs = [{'start_q': index, 'last_q': index} for index in range(1, 5)]
+    process.ctx.workchains = []
+    process.ctx.retries = [0] * 4
+
+    process.run_ph_qgrid()
+    assert [awaitable.pk for awaitable in process._awaitables] == [process.ctx.workchains[0].pk]
+
+    # The slots of all work chains that terminated in the meantime are refilled by the next step
+    for workchain in process.ctx.workchains:
+        workchain.set_process_state(ProcessState.FINISHED)
+
+    process.run_ph_qgrid()
+    assert len(process.ctx.workchains) == 4
+    assert process._awaitables[-1].pk == process.ctx.workchains[2].pk
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_ph_qgrid_retry(generate_workchain_qpoints, generate_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.run_ph_qgrid` resubmits failed jobs with escalated options."""
+    from aiida.orm import Dict, Float, Int
+
+    process = generate_workchain_qpoints(
+        max_qpoint_retries=Int(1), retry_wallclock_factor=Float(2.), retry_options=Dict({'queue_name': 'long'})
+    )
+    process.ctx.qpoints = generate_qpoints(2)
+    process.ctx.jobs = [{'start_q': index, 'last_q': index} for index in range(1, 3)]
+    process.ctx.workchains = []
+    process.ctx.retries = [0] * 2
+
+    process.run_ph_qgrid()
+    failed = process.ctx.workchains[1]
+    failed.set_process_state(ProcessState.FINISHED)
+    failed.set_exit_status(300)
+    assert process.get_retry_jobs() == [1]
+
+    process.run_ph_qgrid()
+    assert process.ctx.retries == [0, 1]
+    assert process.ctx.workchains[1].pk != failed.pk
+
+    inputs = process.ctx.workchains[1].get_metadata_inputs()
+    max_wallclock_seconds = process.inputs.ph.metadata.options.max_wallclock_seconds
+    assert inputs['ph']['metadata']['options']['max_wallclock_seconds'] == 2 * max_wallclock_seconds
+    assert inputs['ph']['metadata']['options']['queue_name'] == 'long'
+
+    # The retry budget is used up after a second failure
+    process.ctx.workchains[1].set_process_state(ProcessState.FINISHED)
+    process.ctx.workchains[1].set_exit_status(300)
+    assert process.get_retry_jobs() == []
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_reduce_qpoints(generate_workchain_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.run_reduce_qpoints`."""
+    from aiida.common import LinkType
+    from aiida.orm import Bool, Dict
+
+    # Without the number of symmetries of the `pw.x` calculation, the initialization run is used instead
+    process = generate_workchain_qpoints(reduce_qpoints=Bool(True))
+    process.run_reduce_qpoints()
+    assert process.should_run_init()
+
+    process = generate_workchain_qpoints(reduce_qpoints=Bool(True))
+    output_parameters = Dict({'number_of_symmetries': 48})
+    output_parameters.base.links.add_incoming(
+        process.inputs.ph.parent_folder.creator, link_type=LinkType.CREATE, link_label='output_parameters'
+    )
+    output_parameters.store()
+
+    process.run_reduce_qpoints()
+    assert not process.should_run_init()
+    assert 'dynamical-matrix-0' in process.ctx.init_retrieved.base.repository.list_object_names('DYN_MAT')
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_get_job_inputs_compact(generate_workchain_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.get_job_inputs` with the q-points stored in a single node."""
+    from aiida.orm import Bool, KpointsData
+
+    process = generate_workchain_qpoints(inputs={'epsil': True}, compact_qpoints=Bool(True))
+    process.ctx.qpoints = KpointsData()
+    process.ctx.qpoints.set_cell([[1., 0., 0.], [0., 1., 0.], [0., 0., 1.]])
+    process.ctx.qpoints.set_kpoints([[0., 0., 0.], [0.5, 0., 0.], [0.5, 0.5, 0.]])
+
+    assert process.get_number_of_qpoints() == 3
+
+    label, inputs = process.get_job_inputs({'start_q': 1, 'last_q': 1})
+    assert label == 'qpoints_1_1'
+    assert inputs.qpoints.get_kpoints_mesh() == ([2, 2, 2], [0., 0., 0.])
+    assert inputs.ph.parameters['INPUTPH']['start_q'] == 1
+    assert inputs.ph.parameters['INPUTPH']['last_q'] == 1
+    assert inputs.ph.parameters['INPUTPH']['epsil']
+
+    label, inputs = process.get_job_inputs({'start_q': 2, 'last_q': 2, 'start_irr': 1, 'last_irr': 2})
+    assert label == 'qpoint_1_irreps_1_2'
+    assert inputs.ph.parameters['INPUTPH']['start_q'] == 2
+    assert inputs.ph.parameters['INPUTPH']['start_irr'] == 1
+    assert not inputs.ph.parameters['INPUTPH']['epsil']
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_apply_qpoint_cache(generate_workchain_qpoints, generate_ph_workchain_node, generate_qpoints, monkeypatch):
+    """Test `PhParallelizeQpointsWorkChain.apply_qpoint_cache`."""
+    from aiida.orm import Bool
+
+    from aiida_quantumespresso_ph.utils.cache import QPOINT_CACHE_KEY_EXTRA
+
+    process = generate_workchain_qpoints(inputs={'tr2_ph': 1e-17}, use_qpoint_cache=Bool(True))
+    process.ctx.qpoints = generate_qpoints(3)
+    process.ctx.jobs = [{'start_q': index, 'last_q': index} for index in range(1, 4)]
+    process.ctx.workchains = []
+
+    cached = generate_ph_workchain_node()
+    cached.base.extras.set(QPOINT_CACHE_KEY_EXTRA, process.get_qpoint_cache_key({'start_q': 2, 'last_q': 2}))
+
+    process.apply_qpoint_cache()
+
+    assert process.ctx.jobs == [{'start_q': 2, 'last_q': 2}, {'start_q': 1, 'last_q': 1}, {'start_q': 3, 'last_q': 3}]
+    assert [workchain.pk for workchain in process.ctx.workchains] == [cached.pk]
+    assert process.get_qpoint_cache_key({'start_q': 1, 'last_q': 3}) is None
+
+    # The cache keys are computed once and set as extras of the work chains when these are submitted
+    keys = [process.get_qpoint_cache_key(job) for job in process.ctx.jobs]
+    assert process.ctx.qpoint_cache_keys == keys
+
+    monkeypatch.setattr(process, 'get_qpoint_cache_key', lambda job: pytest.fail('the cache key is computed again'))
+    process.ctx.retries = [0] * 3
+    process.run_ph_qgrid()
+    assert [workchain.base.extras.get(QPOINT_CACHE_KEY_EXTRA) for workchain in process.ctx.workchains[1:]] == keys[1:]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_predict_wallclock(generate_workchain_qpoints, generate_ph_init_node, generate_qpoints, monkeypatch):
+    """Test `PhParallelizeQpointsWorkChain` predicts the wallclock time and number of machines of each job."""
+    from aiida.orm import Bool, Int
+
+    from aiida_quantumespresso_ph.workflows.ph import parallelize_qpoints
+
+    # A model with a cost of 3000 machine-seconds per irreducible representation
+    model = {'coefficients': [numpy.log(3000.), 0., 1., 0., 0.], 'residual': 0., 'number_of_samples': 10}
+    monkeypatch.setattr(parallelize_qpoints, 'get_walltime_model', lambda: model)
+
+    process = generate_workchain_qpoints(predict_wallclock=Bool(True), max_num_machines=Int(4))
+    process.ctx.init_retrieved = generate_ph_init_node(([1], [1, 1, 1, 1, 1, 1])).outputs.retrieved
+    process.ctx.qpoints = generate_qpoints(2)
+    process.set_walltime_model()
+    assert process.ctx.qpoint_irreps == [1, 6]
+
+    options = process.inputs.ph.metadata.options
+    options_first = process.get_job_inputs({'start_q': 1, 'last_q': 1})[1].ph.metadata.options
+    options_second = process.get_job_inputs({'start_q': 2, 'last_q': 2})[1].ph.metadata.options
+
+    # The `max_wallclock_seconds` of the options is 1800 seconds, so the number of machines is increased
+    assert options_first.resources['num_machines'] == 3
+    assert options_first.max_wallclock_seconds == pytest.approx(1500, abs=1)
+    assert options_second.resources['num_machines'] == 4
+    assert options_second.max_wallclock_seconds == 1800
+    assert options.max_wallclock_seconds == 1800
+    assert options.resources['num_machines'] == 1
+
+    # Without a model, the options are used as is
+    monkeypatch.setattr(parallelize_qpoints, 'get_walltime_model', lambda: None)
+    process = generate_workchain_qpoints(predict_wallclock=Bool(True))
+    process.ctx.init_retrieved = generate_ph_init_node(([1], [1])).outputs.retrieved
+    process.ctx.qpoints = generate_qpoints(2)
+    process.set_walltime_model()
+    assert process.get_job_inputs({'start_q': 1, 'last_q': 1})[1].ph.metadata.options == options
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_clean_finished_qpoints(
+    generate_workchain_qpoints, generate_ph_workchain_node, generate_qpoints, aiida_localhost, monkeypatch
+):
+    """Test `PhParallelizeQpointsWorkChain.clean_finished_qpoints` only cleans the finished and retrieved q-points."""
+    from aiida.common import LinkType
+    from aiida.orm import Bool, CalcJobNode, FolderData, RemoteData
+
+    from aiida_quantumespresso_ph.workflows.ph import parallelize_qpoints
+
+    cleaned = []
+
+    async def clean_remote_folders_async(folders, transport_queue, logger):  # pylint: disable=unused-argument
+        cleaned.extend(folders)
+        return folders
+
+    monkeypatch.setattr(parallelize_qpoints, 'clean_remote_folders_async', clean_remote_folders_async)
+
+    def generate_job_workchain(exit_status=0, filenames=('DYN_MAT/dynamical-matrix-',)):
+        workchain = generate_ph_workchain_node(exit_status=exit_status)
+        calculation = CalcJobNode(computer=aiida_localhost, process_type='aiida.calculations:quantumespresso.ph')
+        calculation.base.links.add_incoming(workchain, link_type=LinkType.CALL_CALC, link_label='iteration_01')
+        calculation.store()
+
+        remote_folder = RemoteData(computer=aiida_localhost, remote_path='/scratch/calculation')
+        remote_folder.base.links.add_incoming(calculation, link_type=LinkType.CREATE, link_label='remote_folder')
+        remote_folder.store()
+
+        retrieved = FolderData()
+        for filename in filenames:
+            retrieved.base.repository.put_object_from_bytes(b'', filename)
+        retrieved.store().base.links.add_incoming(workchain, link_type=LinkType.RETURN, link_label='retrieved')
+
+        return workchain, calculation
+
+    process = generate_workchain_qpoints(clean_finished_qpoints=Bool(True))
+    process.ctx.qpoints = generate_qpoints(4)
+    process.ctx.jobs = [{'start_q': index, 'last_q': index} for index in range(1, 4)] + [{'start_q': 4, 'last_q': 4}]
+    process.ctx.cleaned_jobs = []
+
+    finished, calculation = generate_job_workchain()
+    failed, _ = generate_job_workchain(exit_status=300)
+    missing, _ = generate_job_workchain(filenames=())
+    running = generate_ph_workchain_node()
+    running.set_process_state(ProcessState.RUNNING)
+    process.ctx.workchains = [finished, failed, missing, running]
+
+    assert process.should_clean_finished_qpoints()
+    process.clean_finished_qpoints()
+    assert [folder.pk for folder in cleaned] == [calculation.outputs.remote_folder.pk]
+    assert process.ctx.cleaned_jobs == [0]
+
+    # The folders of a job are only cleaned once, and those of jobs reused from the cache are never cleaned
+    process.ctx.number_of_cached_jobs = 2
+    process.ctx.workchains[1], _ = generate_job_workchain()
+    process.clean_finished_qpoints()
+    assert len(cleaned) == 1
+
+    # A range of q-points is cleaned if the dynamical matrices of all of them are retrieved
+    filenames = [f'DYN_MAT/dynamical-matrix-{index}' for index in (2, 3)]
+    process.ctx.jobs[3] = {'start_q': 2, 'last_q': 3}
+    process.ctx.workchains[3], calculation = generate_job_workchain(filenames=filenames)
+    process.clean_finished_qpoints()
+    assert [folder.pk for folder in cleaned[1:]] == [calculation.outputs.remote_folder.pk]
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_recollect_finished_qpoints(generate_workchain_qpoints, generate_ph_workchain_node, generate_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.recollect_finished_qpoints` only merges the newly finished q-points."""
+    from aiida.common import LinkType
+    from aiida.orm import Bool, Dict, FolderData
+
+    def generate_job_workchain(index):
+        workchain = generate_ph_workchain_node()
+
+        retrieved = FolderData()
+        retrieved.base.repository.put_object_from_bytes(f'{index}'.encode(), 'DYN_MAT/dynamical-matrix-')
+        retrieved.store().base.links.add_incoming(workchain, link_type=LinkType.RETURN, link_label='retrieved')
+
+        output_parameters = Dict({
+            'wall_time_seconds': 1,
+            'number_of_irr_representations_for_each_q': [1],
+            'dynamical_matrix_1': {
+                'q_point': [index, 0, 0]
+            },
+        }).store()
+        output_parameters.base.links.add_incoming(workchain, link_type=LinkType.RETURN, link_label='output_parameters')
+
+        return workchain
+
+    process = generate_workchain_qpoints(incremental_recollection=Bool(True))
+    process.ctx.init_retrieved = FolderData()
+    process.ctx.init_retrieved.base.repository.put_object_from_bytes(b'0', 'DYN_MAT/dynamical-matrix-0')
+    process.ctx.init_retrieved.store()
+    process.ctx.qpoints = generate_qpoints(3)
+    process.ctx.jobs = [{'start_q': index, 'last_q': index} for index in range(1, 4)]
+    process.ctx.recollected_jobs = []
+    process.ctx.partial_result = None
+
+    running = generate_ph_workchain_node()
+    running.set_process_state(ProcessState.RUNNING)
+    process.ctx.workchains = [generate_job_workchain(1), running, generate_job_workchain(3)]
+
+    process.recollect_finished_qpoints()
+    assert process.ctx.recollected_jobs == [0, 2]
+    assert process.ctx.partial_result['output_parameters']['qpoint_indices'] == [1, 3]
+
+    # The accumulated result is extended with the q-points that finished since the previous step
+    process.ctx.workchains[1] = generate_job_workchain(2)
+    process.recollect_finished_qpoints()
+    assert process.ctx.recollected_jobs == [0, 2, 1]
+    assert process.ctx.partial_result['output_parameters']['qpoint_indices'] == [1, 2, 3]
+
+    # The final recollection only adds the initialization run to the accumulated result
+    process.run_recollect_qpoints()
+    merge = process.ctx.merged_output_parameters.creator
+    assert sorted(merge.base.links.get_incoming(link_type=LinkType.INPUT_CALC).all_link_labels()
+                  ) == ['merged', 'merged_arrays']
+    recollection = process.ctx.merged_retrieved.creator
+    assert sorted(recollection.base.links.get_incoming(link_type=LinkType.INPUT_CALC).all_link_labels()
+                  ) == ['qpoint_0', 'recollected']
+    assert process.ctx.merged_output_parameters['qpoint_indices'] == [1, 2, 3]
+    assert process.ctx.merged_output_arrays.get_array('q_point')[:, 0].tolist() == [1, 2, 3]
+    repository = process.ctx.merged_retrieved.base.repository
+    assert repository.get_object_content('DYN_MAT/dynamical-matrix-2') == '2'
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_results_invalid_dynamical_matrix(generate_workchain_qpoints):
+    """Test `PhParallelizeQpointsWorkChain.results` attaches the other outputs if the dynamical matrices are invalid."""
+    from aiida.orm import ArrayData, Dict, FolderData
+
+    process = generate_workchain_qpoints()
+    process.ctx.merged_retrieved = FolderData()
+    process.ctx.merged_retrieved.base.repository.put_object_from_bytes(b'truncated\n', 'DYN_MAT/dynamical-matrix-1')
+    process.ctx.merged_retrieved.store()
+    process.ctx.merged_output_parameters = Dict({'qpoint_indices': [1]}).store()
+    process.ctx.merged_output_arrays = ArrayData().store()
+
+    result = process.results()
+
+    assert result == PhParallelizeQpointsWorkChain.exit_codes.ERROR_COLLECT_DYNAMICAL_MATRICES_FAILED
+    assert sorted(process.outputs) == ['output_arrays', 'output_parameters', 'retrieved']
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 """Tests for the ``PhWorkChain.get_builder_from_protocol`` method."""
 from aiida.engine import ProcessBuilder
+import pytest
 
 from aiida_quantumespresso_ph.workflows.ph.main import PhWorkChain
 
@@ -47,3 +48,25 @@ def test_options(fixture_code):
     builder = PhWorkChain.get_builder_from_protocol(code, options=options)
 
     assert builder.ph.metadata['options']['queue_name'] == queue_name  # pylint: disable=no-member
+
+
+def test_predict_wallclock(fixture_code, generate_calc_job_node, generate_inputs_pw, monkeypatch):
+    """Test ``PhWorkChain.get_builder_from_protocol`` with the ``predict_wallclock`` keyword."""
+    from aiida_quantumespresso_ph.utils import walltime
+
+    code = fixture_code('quantumespresso.ph')
+    parent_folder = generate_calc_job_node('quantumespresso.pw', inputs=generate_inputs_pw()).outputs.remote_folder
+
+    # A model with a cost of 10 machine-seconds per irreducible representation
+    model = {'coefficients': [2.302585092994046, 0., 1., 0., 0.], 'residual': 0., 'number_of_samples': 10}
+    monkeypatch.setattr(walltime, 'get_walltime_model', lambda: model)
+
+    # The `qpoints_distance` of the protocol gives a 19x19x19 mesh with 220 irreducible q-points for the structure
+    builder = PhWorkChain.get_builder_from_protocol(code, parent_folder=parent_folder, predict_wallclock=True)
+    max_wallclock_seconds = builder.ph.metadata['options']['max_wallclock_seconds']  # pylint: disable=no-member
+    assert max_wallclock_seconds == pytest.approx(1.5 * 10 * 3 * 220, abs=1)
+
+    # Without a model, the protocol is used as is
+    monkeypatch.setattr(walltime, 'get_walltime_model', lambda: None)
+    builder = PhWorkChain.get_builder_from_protocol(code, parent_folder=parent_folder, predict_wallclock=True)
+    assert builder.ph.metadata['options']['max_wallclock_seconds'] == 43200  # pylint: disable=no-member
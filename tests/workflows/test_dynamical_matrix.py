@@ -96,8 +96,10 @@ def test_inspect_relax(generate_workchain_dynamical_matrix, generate_scf_workcha
 
 
 @pytest.mark.usefixtures('aiida_profile')
-def test_run_ph(generate_workchain_dynamical_matrix, generate_calc_job_node):
+def test_run_ph(generate_workchain_dynamical_matrix, generate_inputs_dynamical_matrix, generate_calc_job_node):
     """Test `DynamicalMatrixWorkChain.run_ph`."""
+    from aiida.orm import Bool, load_node
+
     process = generate_workchain_dynamical_matrix()
 
     pw_node = generate_calc_job_node(entry_point_name='quantumespresso.pw')
@@ -105,6 +107,17 @@ def test_run_ph(generate_workchain_dynamical_matrix, generate_calc_job_node):
 
     process.run_ph()
     assert 'workchain_ph' in process.ctx
+    assert not load_node(process.ctx.workchain_ph.pk).inputs.clean_finished_qpoints.value
+
+    # With `clean_workdir`, the remote folders of the q-points are cleaned as they finish
+
+    inputs = generate_inputs_dynamical_matrix()
+    inputs['clean_workdir'] = Bool(True)
+    process = generate_workchain_dynamical_matrix(inputs)
+    process.ctx.current_folder = pw_node.outputs.remote_folder
+
+    process.run_ph()
+    assert load_node(process.ctx.workchain_ph.pk).inputs.clean_finished_qpoints.value
 
 
 @pytest.mark.usefixtures('aiida_profile')
@@ -115,3 +128,79 @@ def test_inspect_ph(generate_workchain_dynamical_matrix, generate_ph_workchain_n
     process.ctx.workchain_ph = generate_ph_workchain_node(exit_status=300)
     result = process.inspect_ph()
     assert result == WorkChain.exit_codes.ERROR_SUB_PROCESS_FAILED_PH
+
+
+@pytest.fixture
+def generate_relax_workchain_node(generate_structure, aiida_localhost):
+    """Return a finished `WorkflowNode` of a relaxation with the given cache key and remote folder."""
+
+    def _generate_relax_workchain_node(key, remote_path, cleaned=False):
+        from aiida.common import LinkType
+        from aiida.orm import Dict, RemoteData, WorkflowNode
+
+        from aiida_quantumespresso_ph.utils.cache import RELAX_CACHE_KEY_EXTRA
+
+        node = WorkflowNode().store()
+        node.set_process_state(ProcessState.FINISHED)
+        node.set_exit_status(0)
+        node.base.extras.set(RELAX_CACHE_KEY_EXTRA, key)
+
+        outputs = {
+            'output_structure': generate_structure(),
+            'output_parameters': Dict(),
+            'remote_folder': RemoteData(computer=aiida_localhost, remote_path=remote_path),
+        }
+        for link_label, output in outputs.items():
+            output.store().base.links.add_incoming(node, link_type=LinkType.RETURN, link_label=link_label)
+
+        if cleaned:
+            outputs['remote_folder'].base.extras.set(RemoteData.KEY_EXTRA_CLEANED, True)
+
+        return node
+
+    return _generate_relax_workchain_node
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_relax_cache(
+    generate_workchain_dynamical_matrix, generate_inputs_dynamical_matrix, generate_relax_workchain_node, tmp_path
+):
+    """Test `DynamicalMatrixWorkChain.setup` reuses an earlier relaxation with `use_relax_cache`."""
+    from aiida.orm import Bool, load_node
+
+    from aiida_quantumespresso_ph.utils.cache import RELAX_CACHE_KEY_EXTRA
+
+    inputs = generate_inputs_dynamical_matrix()
+    inputs['use_relax_cache'] = Bool(True)
+
+    # Without an earlier relaxation, the relaxation is run and tagged with the cache key
+    process = generate_workchain_dynamical_matrix(inputs)
+    process.setup()
+    assert process.should_run_relax()
+    assert not process.should_run_scf()
+
+    process.ctx.workchain_relax = generate_relax_workchain_node(None, str(tmp_path), cleaned=True)
+    process.inspect_relax()
+    key = process.ctx.workchain_relax.base.extras.get(RELAX_CACHE_KEY_EXTRA)
+    assert key == process.ctx.relax_cache_key
+
+    # The remote folder of the relaxation has been cleaned, so only an SCF of its relaxed structure is run
+    process = generate_workchain_dynamical_matrix(inputs)
+    process.setup()
+    assert process.should_run_relax()
+    assert process.should_run_scf()
+
+    process.run_scf()
+    scf = load_node(process.ctx.workchain_relax.pk)
+    assert scf.inputs.pw.structure.pk == process.ctx.scf_structure.pk
+    assert scf.inputs.pw.parameters['CONTROL']['calculation'] == 'scf'
+
+    # The most recent relaxation whose remote folder still exists is reused directly
+    relax = generate_relax_workchain_node(key, str(tmp_path))
+    generate_relax_workchain_node(key, str(tmp_path / 'cleaned'), cleaned=True)
+
+    process = generate_workchain_dynamical_matrix(inputs)
+    process.setup()
+    assert not process.should_run_relax()
+    assert process.ctx.workchain_relax.pk == relax.pk
+    assert process.ctx.current_folder.pk == relax.outputs.remote_folder.pk
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=redefined-outer-name
+"""Tests for the `PhInterpolateWorkChain` class."""
+import pytest
+
+
+@pytest.fixture
+def generate_workchain_ph_interpolate(generate_workchain, fixture_code):
+    """Generate an instance of a `PhInterpolateWorkChain`."""
+
+    def _generate_workchain_ph_interpolate(dynmat_folder=None, q2r=True, matdyn=True, **kwargs):
+        from aiida.orm import FolderData, KpointsData
+
+        path = KpointsData()
+        path.set_kpoints([[0., 0., 0.], [0.5, 0., 0.]])
+
+        inputs = {'dynmat_folder': dynmat_folder or FolderData(), **kwargs}
+
+        if matdyn:
+            inputs['matdyn'] = {'matdyn': {'code': fixture_code('quantumespresso.matdyn'), 'kpoints': path}}
+
+            if isinstance(matdyn, dict):
+                inputs['matdyn']['matdyn'].update(matdyn)
+
+        if q2r:
+            inputs['q2r'] = {'q2r': {'code': fixture_code('quantumespresso.q2r')}}
+
+        return generate_workchain('quantumespresso.ph_interpolate', inputs)
+
+    return _generate_workchain_ph_interpolate
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_validate_inputs(generate_workchain_ph_interpolate, fixture_localhost):
+    """Test the validation of the `q2r` inputs and the `use_native_q2r` input."""
+    from aiida.orm import Bool, RemoteData
+
+    with pytest.raises(ValueError, match='The `q2r` inputs are required unless `use_native_q2r`'):
+        generate_workchain_ph_interpolate(q2r=False)
+
+    with pytest.raises(ValueError, match='The `dynmat_folder` should be a `FolderData`'):
+        generate_workchain_ph_interpolate(
+            dynmat_folder=RemoteData(computer=fixture_localhost, remote_path='/tmp'), use_native_q2r=Bool(True)
+        )
+
+    process = generate_workchain_ph_interpolate(q2r=False, use_native_q2r=Bool(True))
+    assert not process.should_run_q2r()
+    assert generate_workchain_ph_interpolate().should_run_q2r()
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_validate_native_matdyn(generate_workchain_ph_interpolate):
+    """Test the validation of the `matdyn` and `native_matdyn` inputs."""
+    from aiida.orm import KpointsData
+
+    kpoints = KpointsData()
+    kpoints.set_kpoints_mesh([4, 4, 4])
+
+    with pytest.raises(ValueError, match='Exactly one of the `matdyn` and `native_matdyn` inputs'):
+        generate_workchain_ph_interpolate(native_matdyn={'kpoints': kpoints})
+
+    process = generate_workchain_ph_interpolate(matdyn=False, native_matdyn={'kpoints': kpoints})
+    assert not process.should_run_matdyn()
+    assert process.inputs.native_matdyn.asr.value == 'no'
+    assert generate_workchain_ph_interpolate().should_run_matdyn()
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_matdyn_chunks(generate_workchain_ph_interpolate, generate_force_constants_data):
+    """Test `PhInterpolateWorkChain.run_matdyn` splits the q-points in chunks that share the force constants."""
+    from aiida.orm import Dict, Int, KpointsData, load_node
+    import numpy
+
+    with pytest.raises(ValueError, match='The `matdyn_chunks` should be a positive integer.'):
+        generate_workchain_ph_interpolate(matdyn_chunks=Int(0))
+
+    force_constants = generate_force_constants_data().store()
+    kpoints = KpointsData()
+    kpoints.set_kpoints_mesh([2, 2, 2])
+    matdyn = {'kpoints': kpoints, 'parameters': Dict({'INPUT': {'asr': 'simple', 'dos': True, 'deltaE': 0.5}})}
+
+    process = generate_workchain_ph_interpolate(matdyn=matdyn, matdyn_chunks=Int(3))
+    process.ctx.force_constants = force_constants
+
+    process.run_matdyn()
+
+    awaitables = process._awaitables  # pylint: disable=protected-access
+    assert len(awaitables) == 3
+
+    qpoints = []
+
+    for awaitable in awaitables:
+        inputs = load_node(awaitable.pk).inputs.matdyn
+        assert inputs.force_constants.uuid == force_constants.uuid
+        assert inputs.parameters.get_dict() == {'INPUT': {'asr': 'simple'}}
+        qpoints.append(inputs.kpoints.get_kpoints())
+
+    numpy.testing.assert_allclose(numpy.concatenate(qpoints), kpoints.get_kpoints_mesh(print_list=True))
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_force_constants_cache(
+    generate_workchain_ph_interpolate, generate_dynamical_matrix, generate_force_constants_data
+):
+    """Test `use_force_constants_cache` looks up the force constants by the content of the dynamical matrices."""
+    import io
+
+    from aiida.orm import Bool, FolderData, RemoteData
+
+    from aiida_quantumespresso_ph.utils.cache import FORCE_CONSTANTS_CACHE_KEY_EXTRA
+
+    def generate_folder():
+        folder = FolderData()
+        content, _ = generate_dynamical_matrix()
+        folder.base.repository.put_object_from_filelike(io.StringIO(content), 'DYN_MAT/dynamical-matrix-1')
+        return folder
+
+    with pytest.raises(ValueError, match='to look up the force constants with `use_force_constants_cache`'):
+        generate_workchain_ph_interpolate(dynmat_folder=RemoteData(), use_force_constants_cache=Bool(True))
+
+    process = generate_workchain_ph_interpolate(dynmat_folder=generate_folder(), use_force_constants_cache=Bool(True))
+    process.setup()
+    assert process.should_compute_force_constants()
+
+    # The force constants that are computed are tagged with the cache key, such that they are found by later runs
+    process.ctx.force_constants = generate_force_constants_data().store()
+    process.get_force_constants()
+    key = process.ctx.force_constants.base.extras.get(FORCE_CONSTANTS_CACHE_KEY_EXTRA)
+    assert key == process.ctx.force_constants_cache_key
+
+    process = generate_workchain_ph_interpolate(dynmat_folder=generate_folder(), use_force_constants_cache=Bool(True))
+    process.setup()
+    assert not process.should_compute_force_constants()
+    assert process.get_force_constants().base.extras.get(FORCE_CONSTANTS_CACHE_KEY_EXTRA) == key
+
+    # The native force constants are computed with other parameters, so they have another key
+    process = generate_workchain_ph_interpolate(
+        dynmat_folder=generate_folder(), q2r=False, use_native_q2r=Bool(True), use_force_constants_cache=Bool(True)
+    )
+    process.setup()
+    assert process.should_compute_force_constants()
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_matdyn_targets(generate_workchain_ph_interpolate, generate_force_constants_data):
+    """Test `PhInterpolateWorkChain.run_matdyn` runs the `matdyn_targets` with the same force constants."""
+    from aiida.orm import Dict, KpointsData, load_node
+
+    mesh = KpointsData()
+    mesh.set_kpoints_mesh([4, 4, 4])
+    parameters = Dict({'INPUT': {'asr': 'crystal', 'dos': True}})
+
+    with pytest.raises(ValueError, match='The `kpoints` of the `matdyn_targets.dos` target are not specified.'):
+        generate_workchain_ph_interpolate(matdyn_targets={'dos': {'parameters': parameters}})
+
+    targets = {'dos': {'kpoints': mesh, 'parameters': parameters}, 'mesh': {'kpoints': mesh}}
+    process = generate_workchain_ph_interpolate(matdyn_targets=targets)
+    process.ctx.force_constants = generate_force_constants_data().store()
+
+    process.run_matdyn()
+
+    workchains = {label: load_node(awaitable.pk) for label, awaitable in process.ctx.workflow_matdyn_targets.items()}
+    assert sorted(workchains) == ['dos', 'mesh']
+    assert all(node.inputs.matdyn.force_constants.pk == process.ctx.force_constants.pk for node in workchains.values())
+    assert workchains['dos'].inputs.matdyn.parameters.pk == parameters.pk
+    assert workchains['mesh'].inputs.matdyn.kpoints.pk == mesh.pk
+    assert 'parameters' not in workchains['mesh'].inputs.matdyn
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=no-member,redefined-outer-name
+"""Tests for the `PhQgridConvergenceWorkChain` class."""
+from plumpy import ProcessState
+import pytest
+
+from aiida_quantumespresso_ph.workflows.qgrid_convergence import PhQgridConvergenceWorkChain
+
+
+@pytest.fixture
+def generate_workchain_qgrid_convergence(generate_workchain, generate_inputs_ph, fixture_code):
+    """Generate an instance of a `PhQgridConvergenceWorkChain`."""
+
+    def _generate_workchain_qgrid_convergence(**kwargs):
+        from aiida.orm import KpointsData, List
+
+        entry_point = 'quantumespresso_ph.qgrid_convergence'
+
+        inputs = generate_inputs_ph()
+        inputs.pop('qpoints')
+
+        path = KpointsData()
+        path.set_kpoints([[0., 0., 0.], [0.25, 0., 0.], [0.5, 0., 0.]])
+
+        interpolate = {
+            'q2r': {
+                'q2r': {
+                    'code': fixture_code('quantumespresso.q2r')
+                }
+            },
+            'matdyn': {
+                'matdyn': {
+                    'code': fixture_code('quantumespresso.matdyn'),
+                    'kpoints': path
+                }
+            },
+        }
+        process = generate_workchain(
+            entry_point, {
+                'ph': {
+                    'ph': inputs
+                },
+                'interpolate': interpolate,
+                'initial_mesh': List([2, 2, 2]),
+                **kwargs
+            }
+        )
+
+        return process
+
+    return _generate_workchain_qgrid_convergence
+
+
+@pytest.fixture
+def generate_interpolate_workchain_node():
+    """Generate an instance of `WorkflowNode` with the given interpolated frequencies as `output_phonon_bands`."""
+
+    def _generate_interpolate_workchain_node(frequencies, exit_status=0):
+        from aiida.common import LinkType
+        from aiida.orm import BandsData, WorkflowNode
+        import numpy
+
+        node = WorkflowNode().store()
+        node.set_process_state(ProcessState.FINISHED)
+        node.set_exit_status(exit_status)
+
+        bands = BandsData()
+        bands.set_kpoints(numpy.zeros((len(frequencies), 3)))
+        bands.set_bands(numpy.array(frequencies))
+        bands.store()
+        bands.base.links.add_incoming(node, link_type=LinkType.RETURN, link_label='output_phonon_bands')
+
+        return node
+
+    return _generate_interpolate_workchain_node
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_validate_initial_mesh(generate_workchain_qgrid_convergence):
+    """Test the validation of the `initial_mesh` input."""
+    from aiida.orm import List
+
+    with pytest.raises(ValueError, match='should be a list of three positive integers'):
+        generate_workchain_qgrid_convergence(initial_mesh=List([2, 2]))
+
+    with pytest.raises(ValueError, match='should be a list of three positive integers'):
+        generate_workchain_qgrid_convergence(initial_mesh=List([2, 0, 2]))
+
+
+def test_exposed_inputs():
+    """Test the inputs that would bypass the q-point cache are not exposed in the `ph` namespace."""
+    namespace = PhQgridConvergenceWorkChain.spec().inputs['ph']
+
+    for key in ('number_of_batches', 'batch_wallclock_seconds', 'compact_qpoints', 'number_of_irrep_chunks'):
+        assert key not in namespace
+
+    assert 'max_concurrent' in namespace
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_run_ph(generate_workchain_qgrid_convergence):
+    """Test `PhQgridConvergenceWorkChain.run_ph` doubles the mesh at each iteration and uses the q-point cache."""
+    from aiida.orm import load_node
+
+    process = generate_workchain_qgrid_convergence()
+    process.setup()
+    assert process.should_run_iteration()
+
+    for mesh in (2, 4, 8):
+        process.run_ph()
+        node = load_node(process.ctx.workchain_ph.pk)
+        assert node.inputs.qpoints.get_kpoints_mesh()[0] == [mesh] * 3
+        assert node.inputs.use_qpoint_cache.value
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_inspect_convergence(generate_workchain_qgrid_convergence, generate_interpolate_workchain_node):
+    """Test `PhQgridConvergenceWorkChain.inspect_convergence` converts the frequencies from THz to cm^-1."""
+    from aiida.orm import Float
+
+    process = generate_workchain_qgrid_convergence(frequency_tolerance=Float(1.0))
+    process.setup()
+
+    # A difference of 0.02 THz is about 0.67 cm^-1, whereas 0.05 THz is about 1.67 cm^-1
+    for frequencies, is_converged in (
+        ([[0., 10.], [0., 20.]], False),
+        ([[0., 10.05], [0., 20.]], False),
+        ([[0., 10.05], [0., 20.02]], True),
+    ):
+        process.ctx.iteration += 1
+        process.ctx.workchain_interpolate = generate_interpolate_workchain_node(frequencies)
+        process.inspect_convergence()
+        assert process.ctx.is_converged is is_converged
+
+    assert not process.should_run_iteration()
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_should_run_iteration(generate_workchain_qgrid_convergence):
+    """Test `PhQgridConvergenceWorkChain.should_run_iteration` stops after the maximum number of iterations."""
+    from aiida.orm import Int
+
+    process = generate_workchain_qgrid_convergence(max_iterations=Int(2))
+    process.setup()
+    process.ctx.iteration = 1
+    assert process.should_run_iteration()
+
+    process.ctx.iteration = 2
+    assert not process.should_run_iteration()
+
+
+@pytest.mark.usefixtures('aiida_profile')
+def test_inspect_interpolate(generate_workchain_qgrid_convergence, generate_interpolate_workchain_node):
+    """Test `PhQgridConvergenceWorkChain.inspect_interpolate` returns an exit code if the interpolation failed."""
+    process = generate_workchain_qgrid_convergence()
+    process.setup()
+    process.ctx.workchain_interpolate = generate_interpolate_workchain_node([[0.]], exit_status=300)
+
+    result = process.inspect_interpolate()
+    assert result == PhQgridConvergenceWorkChain.exit_codes.ERROR_SUB_PROCESS_FAILED_INTERPOLATE